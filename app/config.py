@@ -1,29 +1,177 @@
+import os
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-DB_USER = "root"           
-DB_PASSWORD = "1234"      
-DB_HOST = "localhost"      
-DB_PORT = 3307            
-DB_NAME = "baseparqueadero3"     
+DB_USER = os.getenv("DB_USER", "root")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "1234")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = int(os.getenv("DB_PORT", "3307"))
+DB_NAME = os.getenv("DB_NAME", "baseparqueadero3")
 
 
-SQLALCHEMY_DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+# Réplica de solo lectura para reportes e historial (opcional).
+# Si no se define, las lecturas pesadas van a la base principal.
+SQLALCHEMY_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+# Segundos que se deja de intentar la réplica después de un fallo de conexión
+REPLICA_REINTENTO_SEGUNDOS = float(os.getenv("DB_REPLICA_REINTENTO", "30"))
+
+# Capacidad del parqueadero
+TOTAL_ESPACIOS = 24
+
+# Archivo de estancias finalizadas: antigüedad mínima (días) y filas por lote
+ARCHIVO_DIAS_RETENCION = int(os.getenv("ARCHIVO_DIAS_RETENCION", "90"))
+ARCHIVO_TAMANO_LOTE = int(os.getenv("ARCHIVO_TAMANO_LOTE", "500"))
+
+# Cache de reportes: memoria máxima (bytes) y vida de los reportes del día actual (segundos)
+CACHE_REPORTES_MAX_BYTES = int(os.getenv("CACHE_REPORTES_MAX_BYTES", str(32 * 1024 * 1024)))
+CACHE_REPORTES_TTL_HOY = float(os.getenv("CACHE_REPORTES_TTL_HOY", "30"))
+# Segundos después de medianoche en que el día anterior se sigue tratando como
+# abierto (retraso de la réplica y eventos del diario que llegan tarde)
+CACHE_REPORTES_GRACIA = float(os.getenv("CACHE_REPORTES_GRACIA", "900"))
+
+# Pronóstico de demanda: peso de las observaciones nuevas (suavizado
+# exponencial) y fracción de la capacidad a partir de la cual se avisa "lleno"
+PRONOSTICO_ALFA = float(os.getenv("PRONOSTICO_ALFA", "0.3"))
+PRONOSTICO_UMBRAL_LLENO = float(os.getenv("PRONOSTICO_UMBRAL_LLENO", "0.9"))
+
+# Facturas en PDF: directorio de la cache, procesos de render y renders en cola
+FACTURAS_PDF_DIR = os.getenv("FACTURAS_PDF_DIR", os.path.join("cache", "facturas"))
+FACTURAS_PDF_PROCESOS = int(os.getenv("FACTURAS_PDF_PROCESOS", "2"))
+FACTURAS_PDF_COLA = int(os.getenv("FACTURAS_PDF_COLA", "64"))
+
+# Idempotency-Key: horas que se guarda la respuesta y segundos tras los cuales
+# una petición que quedó "en curso" (proceso caído) se da por abandonada
+IDEMPOTENCIA_TTL_HORAS = float(os.getenv("IDEMPOTENCIA_TTL_HORAS", "24"))
+IDEMPOTENCIA_ABANDONO_SEGUNDOS = float(os.getenv("IDEMPOTENCIA_ABANDONO_SEGUNDOS", "60"))
+
+# Reservas: minutos antes del inicio desde los que el espacio reservado queda
+# retenido (solo entra el vehículo de la reserva) y máximo de días por reserva
+RESERVA_RETENCION_MINUTOS = int(os.getenv("RESERVA_RETENCION_MINUTOS", "60"))
+RESERVA_MAX_DIAS = int(os.getenv("RESERVA_MAX_DIAS", "30"))
+
+# Alertas de estancia: horas tras las que se avisa por un vehículo diurno,
+# minutos entre avisos repetidos (0 = un solo aviso) y URL opcional a la que
+# se envía cada alerta por POST
+ALERTAS_ACTIVAS = os.getenv("ALERTAS_ACTIVAS", "1") == "1"
+ALERTA_HORAS_ESTANCIA = float(os.getenv("ALERTA_HORAS_ESTANCIA", "8"))
+ALERTA_REPETIR_MINUTOS = float(os.getenv("ALERTA_REPETIR_MINUTOS", "60"))
+ALERTA_WEBHOOK_URL = os.getenv("ALERTA_WEBHOOK_URL", "")
+# Días que se guardan las alertas emitidas y segundos entre consultas de un
+# cliente que espera alertas nuevas (long-poll)
+ALERTAS_RETENCION_DIAS = int(os.getenv("ALERTAS_RETENCION_DIAS", "7"))
+ALERTAS_SONDEO = float(os.getenv("ALERTAS_SONDEO", "1"))
+
+# Visitas desde las que una placa se considera cliente frecuente
+CLIENTE_FRECUENTE_VISITAS = int(os.getenv("CLIENTE_FRECUENTE_VISITAS", "10"))
+
+# Control de admisión: peticiones en curso, cola y espera máxima (segundos)
+# para la puerta (entrada/salida) y para las consultas pesadas (reportes,
+# historial, facturas), que se rechazan con 503 en lugar de esperar. Las
+# consultas también se rechazan en hora pico: mientras la puerta tenga
+# ADMISION_PRISA_PUERTA o más peticiones en curso o en cola, o reciba
+# ADMISION_PRISA_TASA o más peticiones por segundo (medida en 5 s). Los
+# valores por omisión solo cortan las consultas en una hora pico real: un
+# parqueadero de 24 espacios no llega a 5 movimientos por segundo en la
+# operación normal (ver python -m app.herramientas.carga_admision)
+ADMISION_ACTIVA = os.getenv("ADMISION_ACTIVA", "1") == "1"
+ADMISION_PUERTA_LIMITE = int(os.getenv("ADMISION_PUERTA_LIMITE", "10"))
+ADMISION_PUERTA_COLA = int(os.getenv("ADMISION_PUERTA_COLA", "100"))
+ADMISION_PUERTA_ESPERA = float(os.getenv("ADMISION_PUERTA_ESPERA", "10"))
+ADMISION_CONSULTAS_LIMITE = int(os.getenv("ADMISION_CONSULTAS_LIMITE", "4"))
+ADMISION_CONSULTAS_COLA = int(os.getenv("ADMISION_CONSULTAS_COLA", "8"))
+ADMISION_CONSULTAS_ESPERA = float(os.getenv("ADMISION_CONSULTAS_ESPERA", "2"))
+ADMISION_PRISA_PUERTA = int(os.getenv("ADMISION_PRISA_PUERTA", "8"))
+ADMISION_PRISA_TASA = float(os.getenv("ADMISION_PRISA_TASA", "5"))
+# Clientes esperando alertas a la vez (long-poll async: no ocupan hilos)
+ADMISION_ALERTAS_LIMITE = int(os.getenv("ADMISION_ALERTAS_LIMITE", "50"))
+
+# Puerta: "directo" escribe en la base y usa el diario local solo si la base no
+# responde; "diario" anota todo en el diario local y lo sincroniza en lotes
+PUERTA_MODO = os.getenv("PUERTA_MODO", "directo")
+DIARIO_LOCAL_RUTA = os.getenv("DIARIO_LOCAL_RUTA", os.path.join("cache", "diario_puerta.db"))
+DIARIO_LOTE = int(os.getenv("DIARIO_LOTE", "200"))
+DIARIO_INTERVALO = float(os.getenv("DIARIO_INTERVALO", "1"))
+# Intentos tras los que un evento que falla (sin ser un conflicto) se aparta como fallido
+DIARIO_MAX_INTENTOS = int(os.getenv("DIARIO_MAX_INTENTOS", "3"))
+
+# Bitácora binaria de eventos: archivo, eventos entre instantáneas del estado
+# reconstruido y si cada registro se sincroniza a disco (fsync)
+BITACORA_RUTA = os.getenv("BITACORA_RUTA", os.path.join("cache", "eventos.bin"))
+BITACORA_INSTANTANEA_CADA = int(os.getenv("BITACORA_INSTANTANEA_CADA", "10000"))
+BITACORA_FSYNC = os.getenv("BITACORA_FSYNC", "0") == "1"
+
+# Ocupación y tarifa en memoria compartida entre los workers de uvicorn
+ESTADO_COMPARTIDO = os.getenv("ESTADO_COMPARTIDO", "1") == "1"
+
+
+def _crear_motor(url):
+    """Crear un engine; SQLite se usa como sustituto local en pruebas"""
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False})
+    return create_engine(url, pool_pre_ping=True)
 
 
 try:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    engine = _crear_motor(SQLALCHEMY_DATABASE_URL)
+    engine_lectura = _crear_motor(SQLALCHEMY_REPLICA_URL) if SQLALCHEMY_REPLICA_URL else engine
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    SessionLectura = sessionmaker(autocommit=False, autoflush=False, bind=engine_lectura)
     Base = declarative_base()
     print("✅ Conexión a la base de datos exitosa")
 except Exception as e:
     print(f"❌ No se pudo conectar a la base de datos: {e}")
 
 
+# Momento (time.monotonic) hasta el cual la réplica se considera caída
+_replica_caida_hasta = 0.0
+
+
+def abrir_sesion_lectura():
+    """
+    Abrir una sesión para lecturas pesadas (reportes, historial).
+
+    Usa la réplica si está configurada y responde; si la conexión falla,
+    marca la réplica como caída durante REPLICA_REINTENTO_SEGUNDOS y
+    devuelve una sesión de la base principal.
+    """
+    global _replica_caida_hasta
+
+    if engine_lectura is not engine and time.monotonic() >= _replica_caida_hasta:
+        db = SessionLectura()
+        try:
+            # Reserva la conexión ya (pool_pre_ping valida que siga viva)
+            db.connection()
+            return db
+        except DBAPIError as e:
+            db.close()
+            _replica_caida_hasta = time.monotonic() + REPLICA_REINTENTO_SEGUNDOS
+            print(f"⚠️ Réplica no disponible, usando la base principal: {e}")
+
+    return SessionLocal()
+
+
 def get_db():
+    """Sesión de la base principal: escrituras y lecturas que deben ver lo recién escrito"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_db_lectura():
+    """Sesión de lectura enrutada a la réplica, con respaldo en la base principal"""
+    db = abrir_sesion_lectura()
+    try:
+        yield db
+    finally:
+        db.close()
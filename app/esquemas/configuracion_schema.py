@@ -1,30 +1,17 @@
-from pydantic import BaseModel, Field, validator
-from typing import Optional
-from datetime import time as dt_time
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
+from typing import Annotated, Optional
 from decimal import Decimal
 
+# HH:MM (acepta la hora con un dígito, como strptime('%H:%M') en el servicio)
+HoraHHMM = Annotated[str, StringConstraints(strip_whitespace=True, pattern=r'^([01]?\d|2[0-3]):[0-5]\d$')]
+
 class ConfiguracionBase(BaseModel):
     """Schema base para configuración"""
     precio_media_hora: Optional[Decimal] = Field(None, ge=0, description="Precio por media hora")
     precio_hora_adicional: Optional[Decimal] = Field(None, ge=0, description="Precio por hora adicional")
     precio_nocturno: Optional[Decimal] = Field(None, ge=0, description="Precio nocturno (12 horas)")
-    hora_inicio_nocturno: Optional[str] = Field(None, description="Hora inicio período nocturno (HH:MM)")
-    hora_fin_nocturno: Optional[str] = Field(None, description="Hora fin período nocturno (HH:MM)")
-
-    @validator('hora_inicio_nocturno', 'hora_fin_nocturno')
-    def validar_formato_hora(cls, v):
-        if v is not None:
-            try:
-                # Validar formato HH:MM
-                parts = v.split(':')
-                if len(parts) != 2:
-                    raise ValueError('Formato debe ser HH:MM')
-                hora, minuto = int(parts[0]), int(parts[1])
-                if not (0 <= hora < 24 and 0 <= minuto < 60):
-                    raise ValueError('Hora o minuto inválido')
-            except:
-                raise ValueError('Formato de hora inválido, use HH:MM')
-        return v
+    hora_inicio_nocturno: Optional[HoraHHMM] = Field(None, description="Hora inicio período nocturno (HH:MM)")
+    hora_fin_nocturno: Optional[HoraHHMM] = Field(None, description="Hora fin período nocturno (HH:MM)")
 
 class ConfiguracionCreate(ConfiguracionBase):
     """Schema para crear configuración"""
@@ -43,6 +30,6 @@ class ConfiguracionResponse(BaseModel):
     hora_inicio_nocturno: str
     hora_fin_nocturno: str
     actualizado_en: Optional[str]
+    version: Optional[int] = None
 
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
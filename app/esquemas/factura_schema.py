@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
 # ========== SCHEMAS DE ENTRADA/SALIDA ==========
@@ -9,15 +9,13 @@ class EntradaSchema(BaseModel):
     espacio_numero: int
     es_nocturno: bool = False
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class SalidaSchema(BaseModel):
     """Schema para registrar salida de vehículo"""
     placa: str
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # ========== SCHEMAS DE FACTURA ==========
 
@@ -34,9 +32,9 @@ class FacturaResponse(BaseModel):
     detalles_cobro: Optional[str]
     fecha_generacion: str
     es_nocturno: bool
+    version_tarifa: Optional[int] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class FacturaDetallada(BaseModel):
     """Schema para factura detallada (para imprimir)"""
@@ -49,8 +47,7 @@ class FacturaDetallada(BaseModel):
     detalles: str
     es_nocturno: bool
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # ========== SCHEMAS DE REPORTES ==========
 
@@ -60,8 +57,7 @@ class ReporteDiario(BaseModel):
     total_vehiculos: int
     ingresos_total: float
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class HoraPicoSchema(BaseModel):
     """Schema para horas pico"""
@@ -92,5 +88,116 @@ class ReporteDetalladoSchema(BaseModel):
     espacios_mas_utilizados: list[EspacioUtilizadoSchema]
     distribucion_tiempo: DistribucionTiempoSchema
 
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class PuntoRangoSchema(BaseModel):
+    """Schema para un período de la serie del reporte por rango"""
+    periodo: str
+    vehiculos: int
+    vehiculos_nocturnos: int
+    vehiculos_diurnos: int
+    ingresos: float
+    ingresos_nocturnos: float
+    ingresos_diurnos: float
+    ocupacion_promedio: float
+    ingresos_anio_anterior: Optional[float] = None
+    variacion_interanual: Optional[float] = None
+
+class ReporteRangoSchema(BaseModel):
+    """Schema para reporte de varios días agrupado por día, semana, mes o año"""
+    desde: str
+    hasta: str
+    granularidad: str
+    total_vehiculos: int
+    vehiculos_nocturnos: int
+    vehiculos_diurnos: int
+    ingresos_total: float
+    ingresos_nocturnos: float
+    ingresos_diurnos: float
+    serie: list[PuntoRangoSchema]
+
+    model_config = ConfigDict(from_attributes=True)
+
+class PuntoOcupacionSchema(BaseModel):
+    """Schema para un punto de la serie de ocupación"""
+    hora: str
+    ocupacion: int
+    promedio: float
+    maxima: int
+
+class ReporteOcupacionSchema(BaseModel):
+    """Schema para la serie de ocupación por barrido de entradas/salidas"""
+    desde: str
+    hasta: str
+    resolucion_minutos: int
+    capacidad: int
+    ocupacion_pico: int
+    hora_pico: Optional[str]
+    minutos_lleno: float
+    estancia_promedio_minutos: float
+    total_estancias: int
+    serie: list[PuntoOcupacionSchema]
+
+    model_config = ConfigDict(from_attributes=True)
+
+class PuntoPronosticoSchema(BaseModel):
+    """Schema para una hora del pronóstico de demanda"""
+    hora: str
+    llegadas: float
+    llegadas_max: float
+    llegadas_nocturnas: float
+    ocupacion_promedio: float
+    ocupacion_maxima: float
+    lleno_probable: bool
+
+class DiaPronosticoSchema(BaseModel):
+    """Schema para el resumen de un día pronosticado"""
+    fecha: str
+    llegadas: float
+    llegadas_nocturnas: float
+    espacios_nocturnos_sugeridos: int
+    horas_llenas: int
+
+class PeriodoLlenoSchema(BaseModel):
+    """Schema para un período en que se espera el parqueadero lleno"""
+    inicio: str
+    fin: str
+    ocupacion_maxima: float
+
+class PronosticoSchema(BaseModel):
+    """Schema para el pronóstico de llegadas y ocupación por hora"""
+    desde: str
+    dias: int
+    capacidad: int
+    umbral_lleno: float
+    dias_historial: int
+    ultimo_dia_historial: str
+    horas: list[PuntoPronosticoSchema]
+    dias_resumen: list[DiaPronosticoSchema]
+    periodos_llenos: list[PeriodoLlenoSchema]
+
+    model_config = ConfigDict(from_attributes=True)
+
+class UtilizacionEspacioSchema(BaseModel):
+    """Schema para los totales de un espacio en el mapa de utilización"""
+    espacio: int
+    minutos_ocupados: float
+    minutos_libres: float
+    utilizacion: float
+    llegadas: int
+    rotacion_diaria: float
+
+class ReporteUtilizacionSchema(BaseModel):
+    """Schema para el mapa de utilización por espacio y hora del día"""
+    desde: str
+    hasta: str
+    dias: float
+    capacidad: int
+    matriz_minutos: list[list[float]]
+    minutos_disponibles_por_hora: list[float]
+    espacios: list[UtilizacionEspacioSchema]
+    utilizacion_por_hora: list[float]
+    meses_desde_resumen: int
+    estancias_leidas: int
+
+    model_config = ConfigDict(from_attributes=True)
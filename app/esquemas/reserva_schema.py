@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Optional
+from datetime import datetime
+from app.esquemas.vehiculo_schema import Placa
+
+def a_hora_local(v: datetime):
+    """Las fechas de la base no tienen zona: una fecha con zona se pasa a hora local"""
+    if v.tzinfo is not None:
+        return v.astimezone().replace(tzinfo=None)
+    return v
+
+class ReservaCreate(BaseModel):
+    """Schema para crear una reserva"""
+    placa: Placa = Field(..., description="Placa del vehículo del huésped")
+    inicio: datetime = Field(..., description="Inicio de la ventana de llegada")
+    fin: datetime = Field(..., description="Fin de la reserva")
+    espacio_numero: Optional[int] = Field(None, ge=1, le=24, description="Espacio pedido; sin él se asigna uno libre")
+    nombre_huesped: Optional[str] = Field(None, max_length=100, description="Nombre del huésped")
+
+    @field_validator('inicio', 'fin')
+    @classmethod
+    def a_hora_local(cls, v: datetime):
+        return a_hora_local(v)
+
+    @model_validator(mode='after')
+    def validar_ventana(self):
+        if self.fin <= self.inicio:
+            raise ValueError('El fin de la reserva debe ser posterior al inicio')
+        return self
+
+class ReservaIngreso(BaseModel):
+    """Schema para ingresar con una reserva"""
+    es_nocturno: bool = Field(False, description="Indica si el vehículo pagará tarifa nocturna")
@@ -1,15 +1,15 @@
-from pydantic import BaseModel, Field, validator
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, TypeAdapter
+from typing import Annotated, Optional
 from datetime import datetime
 
+# Placa: letras, dígitos, guiones y espacios internos; se guarda en mayúsculas y sin espacios a los lados
+Placa = Annotated[str, StringConstraints(
+    strip_whitespace=True, to_upper=True, min_length=1, max_length=20, pattern=r'^[A-Za-zÑñ0-9][A-Za-zÑñ0-9 -]*$'
+)]
+
 class VehiculoBase(BaseModel):
     """Schema base para vehículos"""
-    placa: str = Field(..., min_length=1, max_length=20, description="Placa del vehículo")
-
-    @validator('placa')
-    def validar_placa(cls, v):
-        """Convertir placa a mayúsculas y eliminar espacios"""
-        return v.upper().strip()
+    placa: Placa = Field(..., description="Placa del vehículo")
 
 
 class VehiculoEntrada(VehiculoBase):
@@ -20,12 +20,7 @@ class VehiculoEntrada(VehiculoBase):
 
 class VehiculoSalida(BaseModel):
     """Schema para registrar salida de un vehículo"""
-    placa: str = Field(..., min_length=1, max_length=20, description="Placa del vehículo")
-
-    @validator('placa')
-    def validar_placa(cls, v):
-        """Convertir placa a mayúsculas y eliminar espacios"""
-        return v.upper().strip()
+    placa: Placa = Field(..., description="Placa del vehículo")
 
 class VehiculoResponse(BaseModel):
     """Schema para respuesta de vehículo"""
@@ -39,8 +34,7 @@ class VehiculoResponse(BaseModel):
     es_nocturno: bool
     creado_en: str
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class VehiculoConEstimacion(BaseModel):
     """Schema para vehículo con costo estimado"""
@@ -57,8 +51,7 @@ class VehiculoConEstimacion(BaseModel):
     tiempo_estimado: str
     detalles: str
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class EspacioResponse(BaseModel):
     """Schema para respuesta de espacios"""
@@ -68,5 +61,7 @@ class EspacioResponse(BaseModel):
     entrada: Optional[str] = None
     es_nocturno: Optional[bool] = False
 
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+# Validador precompilado de la lista de espacios (GET /espacios)
+ESPACIOS_ADAPTER = TypeAdapter(list[EspacioResponse])
@@ -0,0 +1,6 @@
+"""
+Herramientas de línea de comandos para pruebas de carga y de rendimiento.
+
+Se ejecutan como módulos, por ejemplo:
+    python -m app.herramientas.generador_carga generar --anios 2
+"""
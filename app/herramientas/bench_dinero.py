@@ -0,0 +1,118 @@
+"""
+Benchmark y verificación de los agregados de dinero en centavos enteros.
+
+Genera N estancias con costos realistas (tarifa por media hora y horas
+adicionales, algunas nocturnas) y calcula el total y el total por espacio
+de tres formas:
+
+  - referencia exacta: Decimal en dólares, como salían de Numeric(10, 2);
+  - antes: float en dólares (lo que hacían los reportes con float(Decimal));
+  - ahora: centavos enteros (suma de int en Python y con NumPy int64).
+
+Verifica que los centavos den exactamente la referencia (termina con código
+1 si no) y muestra la deriva del float y el tiempo de cada camino.
+
+Uso:
+    python -m app.herramientas.bench_dinero
+    python -m app.herramientas.bench_dinero --estancias 200000
+"""
+import argparse
+import sys
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from app.utils.dinero import formatear_centavos
+
+ESPACIOS = 24
+
+
+def _estancias(n: int, semilla: int):
+    """(espacio, costo en centavos) de n estancias sintéticas"""
+    rng = np.random.default_rng(semilla)
+    minutos = np.maximum(1, rng.lognormal(np.log(90), 0.8, n)).astype(np.int64)
+    horas_adicionales = np.maximum(0, -(-(minutos - 30) // 60))
+    costos = 50 + horas_adicionales * 100
+    nocturnas = rng.random(n) < 0.12
+    costos[nocturnas] = 1000
+    # Algunas tarifas con centavos sueltos (precios configurados como 0.35, 0.85...)
+    costos += rng.choice([0, 0, 0, 35, 85], n)
+    espacios = rng.integers(0, ESPACIOS, n)
+    return espacios, costos
+
+
+def _medir(funcion):
+    """(resultado, segundos) del mejor de 3"""
+    mejor = float('inf')
+    resultado = None
+    for _ in range(3):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return resultado, mejor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Agregados de dinero: centavos enteros vs Decimal y float')
+    parser.add_argument('--estancias', type=int, default=1_000_000)
+    parser.add_argument('--semilla', type=int, default=28)
+    args = parser.parse_args(argv)
+
+    espacios, costos = _estancias(args.estancias, args.semilla)
+    espacios_py = espacios.tolist()
+    centavos_py = costos.tolist()
+    decimales = [Decimal(c).scaleb(-2) for c in centavos_py]
+    flotantes = [float(d) for d in decimales]
+
+    def por_espacio(valores, cero):
+        totales = [cero] * ESPACIOS
+        for espacio, valor in zip(espacios_py, valores):
+            totales[espacio] += valor
+        return totales
+
+    def por_espacio_numpy():
+        totales = np.zeros(ESPACIOS, dtype=np.int64)
+        np.add.at(totales, espacios, costos)
+        return totales.tolist()
+
+    casos = [
+        ('Decimal (referencia)', lambda: (sum(decimales, Decimal(0)), por_espacio(decimales, Decimal(0)))),
+        ('float dólares (antes)', lambda: (sum(flotantes), por_espacio(flotantes, 0.0))),
+        ('int centavos (Python)', lambda: (sum(centavos_py), por_espacio(centavos_py, 0))),
+        ('int centavos (NumPy)', lambda: (int(costos.sum()), por_espacio_numpy())),
+    ]
+
+    resultados = {}
+    print(f"{args.estancias:,} estancias")
+    print(f"{'camino':<24} {'ms':>9} {'total':>16} {'centavos de diferencia':>24}")
+    for nombre, funcion in casos:
+        (total, totales), segundos = _medir(funcion)
+        resultados[nombre] = (total, list(totales))
+        print(f"{nombre:<24} {segundos * 1000:>9.1f} {str(total):>16}", end='')
+        if nombre == 'Decimal (referencia)':
+            print(f" {'-':>24}")
+            referencia = int(total * 100), [int(t * 100) for t in totales]
+            continue
+        en_centavos = round(total * 100) if isinstance(total, float) else int(total)
+        if isinstance(total, float):
+            # Deriva del float: diferencia antes de redondear al centavo
+            deriva = abs(Decimal(repr(total)) * 100 - referencia[0])
+            print(f" {str(deriva.normalize()):>24}")
+        else:
+            print(f" {en_centavos - referencia[0]:>24}")
+
+    fallas = []
+    for nombre in ('int centavos (Python)', 'int centavos (NumPy)'):
+        total, totales = resultados[nombre]
+        if int(total) != referencia[0] or [int(t) for t in totales] != referencia[1]:
+            fallas.append(nombre)
+    if fallas:
+        print(f"❌ Agregados en centavos distintos de la referencia: {', '.join(fallas)}")
+        return 1
+    print(f"✅ Total y totales por espacio en centavos exactos: ${formatear_centavos(referencia[0])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
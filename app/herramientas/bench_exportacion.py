@@ -0,0 +1,181 @@
+"""
+Benchmark de memoria y tiempo de la exportación a Excel.
+
+Llena una base SQLite temporal con N facturas (100 000 por omisión) y
+exporta el rango completo de dos formas, cada una en su propio proceso
+para que la memoria máxima (ru_maxrss) sea solo la suya:
+
+  - streaming: ExportacionService.escribir_libro (openpyxl write-only,
+    facturas leídas del cursor por lotes);
+  - ingenua: Workbook() normal con las filas ORM de .all() (lo que haría
+    una exportación directa), solo la hoja de facturas.
+
+Para cada una muestra el tiempo, la memoria de partida (después de
+importar la aplicación), la máxima y el tamaño del archivo. Termina con
+código 1 si la exportación streaming no devuelve todas las facturas o si
+su memoria crece más de --max-mb sobre la de partida.
+
+Uso:
+    python -m app.herramientas.bench_exportacion
+    python -m app.herramientas.bench_exportacion --facturas 20000 --max-mb 40
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+VARIANTES = ('streaming', 'ingenua')
+DESDE = datetime(2025, 1, 1)
+DIAS = 90
+
+
+def _preparar_entorno(directorio: str):
+    """Apuntar la aplicación a archivos temporales (antes de importar app.config)"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directorio, 'exportacion.db')
+    os.environ.pop('DATABASE_REPLICA_URL', None)
+    os.environ['BITACORA_RUTA'] = os.path.join(directorio, 'eventos.bin')
+    os.environ['DIARIO_LOCAL_RUTA'] = os.path.join(directorio, 'diario.db')
+    os.environ['ESTADO_COMPARTIDO'] = '0'
+    os.environ['ALERTAS_ACTIVAS'] = '0'
+    os.environ['ADMISION_ACTIVA'] = '0'
+
+
+def _rss_mb():
+    """Memoria residente máxima del proceso en MB (Linux informa KB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _llenar(facturas: int, semilla: int):
+    """Insertar `facturas` facturas sintéticas repartidas en DIAS días"""
+    from app.config import Base, engine
+    from app.modelos.historial_factura import HistorialFactura
+    import app.modelos.vehiculo_estacionado  # noqa: F401 (relación de HistorialFactura)
+
+    Base.metadata.create_all(bind=engine, tables=[HistorialFactura.__table__])
+    rng = np.random.default_rng(semilla)
+    salidas = np.sort(rng.integers(0, DIAS * 86400, facturas))
+    minutos = np.maximum(1, rng.lognormal(np.log(90), 0.8, facturas)).astype(np.int64)
+    nocturnas = rng.random(facturas) < 0.12
+    costos = np.where(nocturnas, 1000, 50 + np.maximum(0, -(-(minutos - 30) // 60)) * 100)
+    espacios = rng.integers(1, 25, facturas)
+
+    lote = 5000
+    with engine.begin() as conexion:
+        for inicio in range(0, facturas, lote):
+            filas = []
+            for i in range(inicio, min(inicio + lote, facturas)):
+                salida = DESDE + timedelta(seconds=int(salidas[i]))
+                filas.append({
+                    'vehiculo_id': i + 1,
+                    'placa': f'PBC-{i % 9000 + 1000}',
+                    'espacio_numero': int(espacios[i]),
+                    'fecha_hora_entrada': salida - timedelta(minutes=int(minutos[i])),
+                    'fecha_hora_salida': salida,
+                    'tiempo_total_minutos': int(minutos[i]),
+                    'costo_total': int(costos[i]),
+                    'es_nocturno': bool(nocturnas[i]),
+                    'version_tarifa': 1,
+                })
+            conexion.execute(HistorialFactura.__table__.insert(), filas)
+
+
+def _exportar(variante: str, directorio: str):
+    """Ejecutar una variante (en el proceso hijo) e imprimir sus medidas en JSON"""
+    from openpyxl import Workbook
+    from app.config import SessionLocal
+    from app.modelos.historial_factura import HistorialFactura
+    from app.servicios.exportacion_service import ExportacionService
+    from app.utils.dinero import a_float
+    import app.modelos.vehiculo_estacionado  # noqa: F401
+
+    destino = os.path.join(directorio, f'{variante}.xlsx')
+    desde = DESDE.strftime('%Y-%m-%d')
+    hasta = (DESDE + timedelta(days=DIAS)).strftime('%Y-%m-%d')
+    rss_base = _rss_mb()
+    inicio = time.perf_counter()
+    db = SessionLocal()
+    try:
+        if variante == 'streaming':
+            filas = ExportacionService.escribir_libro(db, desde, hasta, destino)
+        else:
+            facturas = db.query(HistorialFactura).order_by(HistorialFactura.fecha_hora_salida).all()
+            libro = Workbook()
+            hoja = libro.active
+            hoja.append(['Factura', 'Placa', 'Espacio', 'Entrada', 'Salida',
+                         'Minutos', 'Tarifa', 'Versión tarifa', 'Costo'])
+            for f in facturas:
+                hoja.append([f.id, f.placa, f.espacio_numero, f.fecha_hora_entrada, f.fecha_hora_salida,
+                             f.tiempo_total_minutos, 'NOCTURNA' if f.es_nocturno else 'NORMAL',
+                             f.version_tarifa, a_float(f.costo_total)])
+            libro.save(destino)
+            filas = len(facturas)
+    finally:
+        db.close()
+    print(json.dumps({
+        'filas': filas,
+        'segundos': time.perf_counter() - inicio,
+        'rss_base': rss_base,
+        'rss_max': _rss_mb(),
+        'bytes': os.path.getsize(destino),
+    }))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Memoria y tiempo de la exportación a Excel')
+    parser.add_argument('--facturas', type=int, default=100_000)
+    parser.add_argument('--semilla', type=int, default=36)
+    parser.add_argument('--max-mb', type=float, default=50.0,
+                        help='Crecimiento máximo de memoria permitido a la exportación streaming')
+    parser.add_argument('--variante', choices=VARIANTES, help=argparse.SUPPRESS)
+    parser.add_argument('--directorio', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.variante:
+        _preparar_entorno(args.directorio)
+        _exportar(args.variante, args.directorio)
+        return
+
+    directorio = tempfile.mkdtemp(prefix='bench_exportacion_')
+    try:
+        _preparar_entorno(directorio)
+        print(f"🧾 Generando {args.facturas} facturas en {DIAS} días...")
+        _llenar(args.facturas, args.semilla)
+
+        resultados = {}
+        for variante in VARIANTES:
+            salida = subprocess.run(
+                [sys.executable, '-m', 'app.herramientas.bench_exportacion',
+                 '--variante', variante, '--directorio', directorio],
+                capture_output=True, text=True, check=True
+            ).stdout
+            resultados[variante] = json.loads(salida.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    print(f"{'variante':<10} {'filas':>8} {'segundos':>9} {'RSS base MB':>12} {'RSS máx MB':>11} "
+          f"{'crecimiento MB':>15} {'archivo MB':>11}")
+    for variante, r in resultados.items():
+        print(f"{variante:<10} {r['filas']:>8} {r['segundos']:>9.1f} {r['rss_base']:>12.0f} "
+              f"{r['rss_max']:>11.0f} {r['rss_max'] - r['rss_base']:>15.0f} {r['bytes'] / 2**20:>11.1f}")
+
+    streaming = resultados['streaming']
+    crecimiento = streaming['rss_max'] - streaming['rss_base']
+    if streaming['filas'] != args.facturas:
+        print(f"❌ La exportación devolvió {streaming['filas']} de {args.facturas} facturas")
+        sys.exit(1)
+    if crecimiento > args.max_mb:
+        print(f"❌ La exportación streaming creció {crecimiento:.0f} MB (máximo {args.max_mb:.0f} MB)")
+        sys.exit(1)
+    print(f"✅ Exportación streaming dentro de {args.max_mb:.0f} MB de crecimiento")
+
+
+if __name__ == '__main__':
+    main()
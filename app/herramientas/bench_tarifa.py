@@ -0,0 +1,148 @@
+"""
+Microbenchmark y verificación del cálculo de tarifas (PlanTarifario).
+
+Compara el cálculo anterior (CalculadoraPrecios con floats y math.ceil en
+cada llamada, sin los print de depuración) con el PlanTarifario compilado:
+calcular() desde dos datetime, costo() desde minutos, el tope nocturno y
+costos_lote() por estancia. Antes de medir verifica que los costos en
+centavos y los minutos coincidan con el cálculo anterior para cada duración
+de -2 a 5000 minutos, en tarifa normal y nocturna; si alguno difiere,
+termina con código 1.
+
+Uso:
+    python -m app.herramientas.bench_tarifa
+    python -m app.herramientas.bench_tarifa --repeticiones 200000
+"""
+import argparse
+import math
+import sys
+import time
+from datetime import datetime, timedelta, time as dt_time
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.utils.calculadora_precios import CalculadoraPrecios
+from app.utils.plan_tarifario import PlanTarifario, minuto_epoca
+
+# Misma tarifa en dólares (cálculo anterior) y en centavos (columnas Centavos)
+TARIFA_DOLARES = SimpleNamespace(
+    precio_media_hora=Decimal('0.50'),
+    precio_hora_adicional=Decimal('1.00'),
+    precio_nocturno=Decimal('10.00'),
+)
+TARIFA = SimpleNamespace(
+    version=1,
+    precio_media_hora=50,
+    precio_hora_adicional=100,
+    precio_nocturno=1000,
+    hora_inicio_nocturno=None,
+    hora_fin_nocturno=None,
+)
+# La misma con franja nocturna (tope por noche)
+TARIFA_FRANJA = SimpleNamespace(**{
+    **vars(TARIFA), 'hora_inicio_nocturno': dt_time(19, 0), 'hora_fin_nocturno': dt_time(7, 0)
+})
+
+ENTRADA = datetime(2025, 3, 14, 8, 15)
+MINUTOS = 200
+
+
+# ----------------------------------------------------------------------
+# Cálculo anterior (referencia)
+# ----------------------------------------------------------------------
+def _calcular_legado(config, fecha_entrada, fecha_salida, es_nocturno=False):
+    minutos_totales = int((fecha_salida - fecha_entrada).total_seconds() / 60)
+    if es_nocturno:
+        return {'costo': round(float(config.precio_nocturno), 2), 'minutos': max(minutos_totales, 1),
+                'detalles': f'TARIFA NOCTURNA FIJA: ${config.precio_nocturno}'}
+    if minutos_totales <= 0:
+        return {'costo': round(float(config.precio_media_hora), 2), 'minutos': 1,
+                'detalles': f'Primera media hora: ${config.precio_media_hora}'}
+    costo_total = float(config.precio_media_hora)
+    detalles = [f'Primera media hora: ${config.precio_media_hora}']
+    if minutos_totales < 30:
+        return {'costo': round(costo_total, 2), 'minutos': minutos_totales, 'detalles': ' | '.join(detalles)}
+    horas_adicionales = math.ceil((minutos_totales - 30) / 60.0)
+    costo_horas = horas_adicionales * float(config.precio_hora_adicional)
+    costo_total += costo_horas
+    detalles.append(f'{horas_adicionales} hora(s) adicional(es): ${costo_horas:.2f}')
+    return {'costo': round(costo_total, 2), 'minutos': minutos_totales, 'detalles': ' | '.join(detalles)}
+
+
+def verificar():
+    """Diferencias (minutos, nocturno, anterior, actual) entre el cálculo anterior y el plan"""
+    plan = PlanTarifario.desde_configuracion(TARIFA)
+    diferencias = []
+    for nocturno in (False, True):
+        for minutos in range(-2, 5001):
+            salida = ENTRADA + timedelta(minutes=minutos)
+            anterior = _calcular_legado(TARIFA_DOLARES, ENTRADA, salida, nocturno)
+            actual = plan.calcular(ENTRADA, salida, nocturno)
+            if (round(anterior['costo'] * 100), anterior['minutos']) != (actual['costo'], actual['minutos']):
+                diferencias.append((minutos, nocturno, anterior, actual))
+    return diferencias
+
+
+def _medir(funcion, repeticiones: int):
+    """Microsegundos por llamada (mejor de 3 rondas)"""
+    mejor = float('inf')
+    for _ in range(3):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor / repeticiones * 1e6
+
+
+def casos():
+    """Tuplas (nombre, función, estancias que calcula cada llamada)"""
+    plan = PlanTarifario.desde_configuracion(TARIFA)
+    plan_franja = PlanTarifario.desde_configuracion(TARIFA_FRANJA)
+    salida = ENTRADA + timedelta(minutes=MINUTOS)
+    entrada_minuto = minuto_epoca(ENTRADA)
+
+    # Lote de estancias para costos_lote (se reporta por estancia)
+    generador = np.random.default_rng(7)
+    lote = 100_000
+    entradas = entrada_minuto + generador.integers(0, 365 * 1440, lote)
+    duraciones = generador.integers(1, 3 * 1440, lote)
+    return [
+        ('Cálculo anterior (float, por llamada)',
+         lambda: _calcular_legado(TARIFA_DOLARES, ENTRADA, salida), 1),
+        ('CalculadoraPrecios.calcular_costo',
+         lambda: CalculadoraPrecios.calcular_costo(ENTRADA, salida, TARIFA), 1),
+        ('PlanTarifario.calcular',
+         lambda: plan.calcular(ENTRADA, salida), 1),
+        ('PlanTarifario.costo (minutos)',
+         lambda: plan.costo(MINUTOS), 1),
+        ('PlanTarifario.costo (con tope nocturno)',
+         lambda: plan_franja.costo(MINUTOS, entrada=entrada_minuto), 1),
+        ('PlanTarifario.costos_lote (por estancia)',
+         lambda: plan_franja.costos_lote(entradas, duraciones), lote),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Microbenchmark del cálculo de tarifas')
+    parser.add_argument('--repeticiones', type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    diferencias = verificar()
+    if diferencias:
+        for minutos, nocturno, anterior, actual in diferencias[:10]:
+            print(f"❌ {minutos} min (nocturno={nocturno}): anterior {anterior} / actual {actual}")
+        print(f"❌ {len(diferencias)} duración(es) con otro costo que el cálculo anterior")
+        sys.exit(1)
+    print("✅ Mismo costo y minutos que el cálculo anterior de -2 a 5000 minutos (normal y nocturna)")
+
+    print(f"{'caso':<44} {'µs/estancia':>12}")
+    for nombre, funcion, estancias in casos():
+        # El lote ya calcula muchas estancias por llamada: bastan unas pocas
+        repeticiones = args.repeticiones if estancias == 1 else 5
+        print(f"{nombre:<44} {_medir(funcion, repeticiones) / estancias:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Microbenchmark de validación de los esquemas de la API.
+
+Mide VehiculoEntrada, ConfiguracionUpdate, ReporteDetalladoSchema y la
+lista de espacios (TypeAdapter) validando desde dict y desde JSON, y los
+compara con las definiciones anteriores (estilo v1: @validator en Python y
+class Config) para seguir la mejora entre versiones.
+
+Uso:
+    python -m app.herramientas.bench_validacion
+    python -m app.herramientas.bench_validacion --repeticiones 50000
+"""
+import argparse
+import json
+import time
+import warnings
+from decimal import Decimal
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, TypeAdapter
+
+from app.esquemas.vehiculo_schema import VehiculoEntrada, EspacioResponse, ESPACIOS_ADAPTER
+from app.esquemas.configuracion_schema import ConfiguracionUpdate
+from app.esquemas.factura_schema import ReporteDetalladoSchema
+
+# ----------------------------------------------------------------------
+# Definiciones anteriores (referencia): validadores en Python
+# ----------------------------------------------------------------------
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore')
+    from pydantic import validator
+
+    class _VehiculoEntradaLegado(BaseModel):
+        placa: str = Field(..., min_length=1, max_length=20)
+        espacio_numero: int = Field(..., ge=1, le=24)
+        es_nocturno: bool = Field(False)
+
+        @validator('placa')
+        def validar_placa(cls, v):
+            return v.upper().strip()
+
+        class Config:
+            from_attributes = True
+
+    class _ConfiguracionUpdateLegado(BaseModel):
+        precio_media_hora: Optional[Decimal] = Field(None, ge=0)
+        precio_hora_adicional: Optional[Decimal] = Field(None, ge=0)
+        precio_nocturno: Optional[Decimal] = Field(None, ge=0)
+        hora_inicio_nocturno: Optional[str] = Field(None)
+        hora_fin_nocturno: Optional[str] = Field(None)
+
+        @validator('hora_inicio_nocturno', 'hora_fin_nocturno')
+        def validar_formato_hora(cls, v):
+            if v is not None:
+                try:
+                    parts = v.split(':')
+                    if len(parts) != 2:
+                        raise ValueError('Formato debe ser HH:MM')
+                    hora, minuto = int(parts[0]), int(parts[1])
+                    if not (0 <= hora < 24 and 0 <= minuto < 60):
+                        raise ValueError('Hora o minuto inválido')
+                except:
+                    raise ValueError('Formato de hora inválido, use HH:MM')
+            return v
+
+
+# ----------------------------------------------------------------------
+# Datos de muestra
+# ----------------------------------------------------------------------
+ENTRADA = {'placa': ' pbc-1234 ', 'espacio_numero': 7, 'es_nocturno': False}
+CONFIGURACION = {
+    'precio_media_hora': '0.50',
+    'precio_hora_adicional': '1.00',
+    'precio_nocturno': '10.00',
+    'hora_inicio_nocturno': '19:00',
+    'hora_fin_nocturno': '07:00',
+}
+REPORTE = {
+    'fecha': '2025-03-14',
+    'vehiculos_nocturnos': 12,
+    'vehiculos_diurnos': 85,
+    'ingresos_nocturnos': 120.0,
+    'ingresos_diurnos': 203.5,
+    'horas_pico': [{'hora': f'{h:02d}:00', 'cantidad': (h * 7) % 13} for h in range(24)],
+    'espacios_mas_utilizados': [{'espacio': e, 'usos': 30 - e} for e in range(1, 6)],
+    'distribucion_tiempo': {'menos_1h': 40, 'entre_1h_3h': 30, 'entre_3h_6h': 15, 'mas_6h': 0, 'nocturnos': 12},
+}
+ESPACIOS = [
+    {'numero': i, 'ocupado': i % 3 == 0, 'placa': f'PBC-{i:04d}' if i % 3 == 0 else None,
+     'entrada': '2025-03-14T08:15:00' if i % 3 == 0 else None, 'es_nocturno': False}
+    for i in range(1, 25)
+]
+
+
+def _medir(funcion, repeticiones: int):
+    """Microsegundos por llamada (mejor de 3 rondas)"""
+    mejor = float('inf')
+    for _ in range(3):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor / repeticiones * 1e6
+
+
+def casos():
+    """Tuplas (nombre, función actual, función de referencia o None)"""
+    entrada_json = json.dumps(ENTRADA)
+    configuracion_json = json.dumps(CONFIGURACION)
+    reporte_json = json.dumps(REPORTE)
+    espacios_lista = TypeAdapter(List[EspacioResponse])
+    return [
+        ('VehiculoEntrada (dict)',
+         lambda: VehiculoEntrada.model_validate(ENTRADA),
+         lambda: _VehiculoEntradaLegado.model_validate(ENTRADA)),
+        ('VehiculoEntrada (JSON)',
+         lambda: VehiculoEntrada.model_validate_json(entrada_json),
+         lambda: _VehiculoEntradaLegado.model_validate(json.loads(entrada_json))),
+        ('ConfiguracionUpdate (dict)',
+         lambda: ConfiguracionUpdate.model_validate(CONFIGURACION),
+         lambda: _ConfiguracionUpdateLegado.model_validate(CONFIGURACION)),
+        ('ConfiguracionUpdate (JSON)',
+         lambda: ConfiguracionUpdate.model_validate_json(configuracion_json),
+         lambda: _ConfiguracionUpdateLegado.model_validate(json.loads(configuracion_json))),
+        ('ReporteDetalladoSchema (dict)',
+         lambda: ReporteDetalladoSchema.model_validate(REPORTE),
+         None),
+        ('ReporteDetalladoSchema (JSON)',
+         lambda: ReporteDetalladoSchema.model_validate_json(reporte_json),
+         lambda: ReporteDetalladoSchema.model_validate(json.loads(reporte_json))),
+        ('Lista de espacios (validar + JSON)',
+         lambda: ESPACIOS_ADAPTER.dump_json(ESPACIOS_ADAPTER.validate_python(ESPACIOS)),
+         lambda: json.dumps([m.model_dump() for m in (EspacioResponse(**e) for e in ESPACIOS)])),
+        ('Lista de espacios (adaptador precompilado)',
+         lambda: espacios_lista.validate_python(ESPACIOS),
+         lambda: TypeAdapter(List[EspacioResponse]).validate_python(ESPACIOS)),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Microbenchmark de validación de esquemas')
+    parser.add_argument('--repeticiones', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    print(f"{'caso':<42} {'actual µs':>10} {'referencia µs':>14} {'mejora':>8}")
+    for nombre, actual, referencia in casos():
+        t_actual = _medir(actual, args.repeticiones)
+        if referencia is None:
+            print(f"{nombre:<42} {t_actual:>10.2f} {'-':>14} {'-':>8}")
+            continue
+        t_referencia = _medir(referencia, args.repeticiones)
+        print(f"{nombre:<42} {t_actual:>10.2f} {t_referencia:>14.2f} {t_referencia / t_actual:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Prueba de carga del control de admisión.
+
+Siembra una base SQLite temporal con el generador de carga, levanta uvicorn
+sobre ella y mide durante --segundos la latencia de la puerta: --puerta
+clientes repiten entrada -> salida, cada uno en su espacio libre. Corre
+tres escenarios, cada uno con un servidor nuevo:
+
+  - solo puerta;
+  - puerta + avalancha de --reportes clientes pidiendo
+    /api/reportes/ocupacion con parámetros que esquivan la cache, sin
+    control de admisión (ADMISION_ACTIVA=0);
+  - la misma avalancha con el control de admisión y sus valores de config.
+
+Muestra p50/p99 de entrada y salida, ciclos completos y cuántos reportes
+se atendieron o se rechazaron con 503. Termina con código 1 si con el
+control de admisión el p99 de entrada o de salida supera --max-p99-ms.
+
+Uso:
+    python -m app.herramientas.carga_admision
+    python -m app.herramientas.carga_admision --segundos 10 --reportes 20
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+
+def _preparar_entorno(directorio: str):
+    """Apuntar la aplicación a archivos temporales (antes de importar app.config)"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directorio, 'carga.db')
+    os.environ.pop('DATABASE_REPLICA_URL', None)
+    os.environ['BITACORA_RUTA'] = os.path.join(directorio, 'eventos.bin')
+    os.environ['DIARIO_LOCAL_RUTA'] = os.path.join(directorio, 'diario.db')
+    os.environ['FACTURAS_PDF_DIR'] = os.path.join(directorio, 'facturas')
+    os.environ['ESTADO_COMPARTIDO'] = '0'
+    os.environ['ALERTAS_ACTIVAS'] = '0'
+
+
+def _sembrar(dias: int):
+    """Tablas (al importar app.main) y estancias sintéticas de los últimos `dias` días"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app.main  # noqa: F401
+        from app.herramientas import generador_carga
+        argumentos = argparse.Namespace(
+            semilla=38, tasa=0.35, mediana_minutos=90, nocturnas=0.12, vehiculos=2000, anios=None, dias=dias
+        )
+        generador_carga.generar(argumentos)
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def _servidor(admision: bool):
+    """uvicorn (un worker) sobre la base temporal; devuelve la URL base"""
+    import httpx
+    puerto = _puerto_libre()
+    entorno = {**os.environ, 'ADMISION_ACTIVA': '1' if admision else '0'}
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--port', str(puerto), '--log-level', 'warning'],
+        env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{puerto}'
+    try:
+        limite = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(url + '/api/configuracion/', timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if proceso.poll() is not None or time.monotonic() > limite:
+                raise RuntimeError('uvicorn no arrancó')
+            time.sleep(0.2)
+        yield url
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+
+def _escenario(url: str, segundos: float, clientes_puerta: int, clientes_reportes: int):
+    """Correr un escenario y devolver sus medidas"""
+    import httpx
+    espacios = [e['numero'] for e in httpx.get(url + '/api/vehiculos/espacios', timeout=30).json()
+                if not e['ocupado']][:clientes_puerta]
+    if len(espacios) < clientes_puerta:
+        raise RuntimeError(f'Solo hay {len(espacios)} espacios libres para {clientes_puerta} clientes de la puerta')
+
+    fin = time.monotonic() + segundos
+    latencias = {'entrada': [], 'salida': []}
+    conteo = {'ciclos': 0, 'errores_puerta': 0, 'reportes': 0, 'reportes_503': 0}
+    lock = threading.Lock()
+    hasta = date.today()
+    desde = hasta - timedelta(days=30)
+
+    def puerta(indice: int, espacio: int):
+        placa = f'CARGA-{indice}'
+        with httpx.Client(base_url=url, timeout=60) as cliente:
+            while time.monotonic() < fin:
+                for ruta, cuerpo in (('entrada', {'placa': placa, 'espacio_numero': espacio}),
+                                     ('salida', {'placa': placa})):
+                    inicio = time.perf_counter()
+                    respuesta = cliente.post(f'/api/vehiculos/{ruta}', json=cuerpo)
+                    with lock:
+                        latencias[ruta].append(time.perf_counter() - inicio)
+                        if respuesta.status_code >= 300:
+                            conteo['errores_puerta'] += 1
+                with lock:
+                    conteo['ciclos'] += 1
+
+    def reportes(semilla: int):
+        aleatorio = random.Random(semilla)
+        with httpx.Client(base_url=url, timeout=120) as cliente:
+            while time.monotonic() < fin:
+                # Resolución distinta en cada llamada: la cache de reportes no ayuda
+                respuesta = cliente.get('/api/reportes/ocupacion', params={
+                    'desde': desde.isoformat(), 'hasta': hasta.isoformat(),
+                    'resolucion': aleatorio.randint(1, 1440)
+                })
+                with lock:
+                    conteo['reportes'] += 1
+                    if respuesta.status_code == 503:
+                        conteo['reportes_503'] += 1
+                if respuesta.status_code == 503:
+                    time.sleep(min(float(respuesta.headers.get('retry-after', 1)), 1.0))
+
+    hilos = [threading.Thread(target=puerta, args=(i, e)) for i, e in enumerate(espacios)]
+    hilos += [threading.Thread(target=reportes, args=(i,)) for i in range(clientes_reportes)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    resultado = dict(conteo)
+    for ruta, valores in latencias.items():
+        ms = np.array(valores) * 1000
+        resultado[ruta] = (np.percentile(ms, 50), np.percentile(ms, 99)) if len(ms) else (float('nan'),) * 2
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Prueba de carga del control de admisión')
+    parser.add_argument('--segundos', type=float, default=20)
+    parser.add_argument('--puerta', type=int, default=4, help='Clientes de la puerta (entrada -> salida)')
+    parser.add_argument('--reportes', type=int, default=12, help='Clientes pidiendo reportes')
+    parser.add_argument('--dias', type=int, default=90, help='Días de historia sembrados')
+    parser.add_argument('--max-p99-ms', type=float, default=1500)
+    args = parser.parse_args(argv)
+
+    directorio = tempfile.mkdtemp(prefix='carga_admision_')
+    try:
+        _preparar_entorno(directorio)
+        print(f"🧪 Sembrando {args.dias} días de estancias...")
+        _sembrar(args.dias)
+
+        escenarios = [
+            ('solo puerta', False, 0),
+            ('avalancha, sin admisión', False, args.reportes),
+            ('avalancha, con admisión', True, args.reportes),
+        ]
+        resultados = []
+        for nombre, admision, reportes in escenarios:
+            print(f"⏱️ {nombre} ({args.segundos:.0f} s)...")
+            with _servidor(admision) as url:
+                resultados.append((nombre, _escenario(url, args.segundos, args.puerta, reportes)))
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    print(f"{'escenario':<26} {'entrada p50/p99 ms':>19} {'salida p50/p99 ms':>18} "
+          f"{'ciclos':>7} {'errores':>8} {'reportes':>9} {'503':>6}")
+    for nombre, r in resultados:
+        print(f"{nombre:<26} {r['entrada'][0]:>9.0f}/{r['entrada'][1]:<9.0f} "
+              f"{r['salida'][0]:>8.0f}/{r['salida'][1]:<9.0f} {r['ciclos']:>7} {r['errores_puerta']:>8} "
+              f"{r['reportes']:>9} {r['reportes_503']:>6}")
+
+    _, con_admision = resultados[-1]
+    p99 = max(con_admision['entrada'][1], con_admision['salida'][1])
+    if p99 > args.max_p99_ms:
+        print(f"❌ Con admisión el p99 de la puerta es {p99:.0f} ms (máximo {args.max_p99_ms:.0f} ms)")
+        sys.exit(1)
+    print(f"✅ Con admisión el p99 de la puerta es {p99:.0f} ms (máximo {args.max_p99_ms:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
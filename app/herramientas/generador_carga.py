@@ -0,0 +1,469 @@
+"""
+Generador de carga sintética y reproductor de tráfico.
+
+generar: llena vehiculos_estacionados e historial_facturas con años de
+estancias realistas (y recalcula resumen_placas):
+  - llegadas según una curva por día de la semana y hora, con estacionalidad
+    anual (proceso de Poisson no homogéneo por espacio libre);
+  - duración log-normal para estancias normales y salida a la mañana
+    siguiente para las nocturnas;
+  - placas ecuatorianas (código de provincia + 2 letras + 3 o 4 dígitos) de
+    una flota con clientes frecuentes (distribución de Zipf);
+  - ningún espacio tiene dos estancias a la vez.
+
+Todo se genera con NumPy por columnas y se inserta con executemany en lotes.
+Cada espacio se divide en "carriles" semanales independientes, así que el
+bucle de generación es corto (una iteración por estancia de un carril) y
+cada iteración trabaja sobre todos los carriles a la vez.
+
+reproducir: genera el mismo tipo de tráfico a partir de ahora, comprimido
+en el tiempo, y lo envía a la API en vivo (POST /entrada y /salida) en los
+instantes programados, sin esperar a las respuestas anteriores (carga de
+lazo abierto). La latencia se mide desde el instante programado.
+
+Uso:
+    python -m app.herramientas.generador_carga generar --anios 2 [--semilla 7]
+    python -m app.herramientas.generador_carga reproducir --url http://127.0.0.1:8000 \\
+        --horas 8 --acelerar 120
+"""
+import argparse
+import contextlib
+import io
+import json
+import threading
+import time
+import uuid
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from app.utils.calculadora_precios import CalculadoraPrecios
+from app.utils.dinero import formatear_centavos
+
+ESPACIOS = 24
+
+# Días por carril de generación (un carril = un espacio durante una semana)
+DIAS_POR_CARRIL = 7
+
+# Llegadas relativas por hora del día (hotel: entradas en la mañana y
+# check-in de la tarde) y por día de la semana (lunes = 0)
+PERFIL_HORA = np.array([
+    0.15, 0.10, 0.08, 0.08, 0.10, 0.20, 0.45, 0.80, 1.10, 1.15, 1.00, 0.95,
+    0.90, 0.95, 1.10, 1.35, 1.45, 1.40, 1.30, 1.10, 0.85, 0.60, 0.40, 0.25,
+])
+PERFIL_DIA = np.array([0.90, 0.90, 0.95, 1.00, 1.20, 1.25, 0.85])
+
+# Propensión a tarifa nocturna según la hora de llegada
+PROPENSION_NOCTURNA = np.array([
+    0.6, 0.5, 0.3, 0.1, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+    0.0, 0.0, 0.1, 0.3, 0.6, 1.0, 1.6, 2.2, 2.6, 2.6, 2.0, 1.2,
+])
+
+# Estacionalidad: amplitud relativa y día del año con más demanda (vacaciones de julio/agosto)
+ESTACIONALIDAD = 0.15
+DIA_PICO = 205
+
+# Código de provincia (primera letra de la placa) y su peso en la flota
+PROVINCIAS = np.array(list('PGAUCXHOEWILRMVNSKQTZYJB'))
+PESO_PROVINCIAS = np.array([
+    30, 25, 6, 2, 2, 3, 3, 4, 3, 0.5, 3, 3, 3, 5, 1, 1, 1, 1, 1, 3, 1, 2, 2, 1,
+], dtype=float)
+# Segunda letra: las de uso particular (A, U, Z, E, X, M son comerciales u oficiales)
+SEGUNDA_LETRA = np.array(list('BCDFGHIJKLNOPQRSTVWY'))
+LETRAS = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+
+FILAS_POR_LOTE = 20000
+
+
+# ----------------------------------------------------------------------
+# Generación de estancias
+# ----------------------------------------------------------------------
+def intensidad_por_hora(inicio: np.datetime64, horas: int, tasa: float):
+    """Llegadas esperadas por espacio libre en cada hora desde `inicio`"""
+    marcas = inicio.astype('datetime64[h]') + np.arange(horas)
+    hora_del_dia = (marcas - marcas.astype('datetime64[D]')).astype(int)
+    dia_semana = (marcas.astype('datetime64[D]').astype(int) + 3) % 7  # 1970-01-01 fue jueves
+    dia_del_anio = (marcas.astype('datetime64[D]') - marcas.astype('datetime64[Y]')).astype(int)
+    estacional = 1 + ESTACIONALIDAD * np.cos(2 * np.pi * (dia_del_anio - DIA_PICO) / 365.25)
+    return tasa * PERFIL_HORA[hora_del_dia] * PERFIL_DIA[dia_semana] * estacional
+
+
+def generar_estancias(rng, inicio: np.datetime64, horas: int, espacios, tasa: float,
+                      mediana_minutos: float, fraccion_nocturna: float):
+    """
+    Estancias de `horas` horas a partir de `inicio` para los `espacios` dados.
+
+    Returns:
+        Diccionario de arreglos ordenados por entrada: espacio, entrada y
+        salida (segundos desde `inicio`), es_nocturno y activo (sigue adentro
+        al final del período; su salida no aplica)
+    """
+    espacios = np.asarray(espacios)
+    inicio = inicio.astype('datetime64[h]')
+    intensidad = intensidad_por_hora(inicio, horas, tasa)
+    rejilla = np.arange(horas + 1, dtype=float)
+    acumulada = np.concatenate(([0.0], np.cumsum(intensidad)))
+
+    # Probabilidad de tarifa nocturna por hora de llegada, escalada para que
+    # la fracción esperada sobre todas las llegadas sea la pedida
+    hora_inicial = int((inicio - inicio.astype('datetime64[D]')).astype(int))
+    llegadas_por_hora = np.bincount((np.arange(horas) + hora_inicial) % 24, weights=intensidad, minlength=24)
+    escala = fraccion_nocturna / (PROPENSION_NOCTURNA @ llegadas_por_hora / llegadas_por_hora.sum())
+    prob_nocturna = np.minimum(PROPENSION_NOCTURNA * escala, 0.95)
+
+    horas_carril = DIAS_POR_CARRIL * 24
+    inicios = np.arange(0, horas, horas_carril, dtype=float)
+    carril_espacio = np.repeat(espacios, len(inicios))
+    carril_inicio = np.tile(inicios, len(espacios))
+    carril_fin = np.minimum(carril_inicio + horas_carril, horas)
+
+    reloj = carril_inicio.copy()
+    vivos = np.ones(len(reloj), dtype=bool)
+    partes = []
+    sigma = 0.8
+    while vivos.any():
+        indices = np.flatnonzero(vivos)
+        # Siguiente llegada: salto exponencial en el tiempo "de intensidad"
+        u = np.interp(reloj[indices], rejilla, acumulada) + rng.exponential(1.0, len(indices))
+        llegada = np.interp(u, acumulada, rejilla)
+        dentro = (llegada < carril_fin[indices]) & (u < acumulada[-1])
+        vivos[indices[~dentro]] = False
+        indices, llegada = indices[dentro], llegada[dentro]
+        if not len(indices):
+            break
+
+        reloj_local = llegada + hora_inicial  # Horas desde la medianoche del primer día
+        hora_del_dia = np.floor(reloj_local).astype(int) % 24
+        nocturna = rng.random(len(indices)) < prob_nocturna[hora_del_dia]
+        # Normal: log-normal alrededor de la mediana, entre 3 minutos y 12 horas
+        duracion = np.clip(rng.lognormal(np.log(mediana_minutos / 60), sigma, len(indices)), 0.05, 12.0)
+        # Nocturna: sale a la mañana siguiente (o la misma si llegó de madrugada) entre 7 y 11
+        manana = np.floor(reloj_local / 24) * 24 + np.where(hora_del_dia < 6, 0, 24)
+        duracion_nocturna = manana + 7 + rng.random(len(indices)) * 4 - reloj_local
+        salida = llegada + np.where(nocturna, duracion_nocturna, duracion)
+
+        partes.append((carril_espacio[indices], llegada, salida, nocturna))
+        reloj[indices] = salida
+
+    espacio = np.concatenate([p[0] for p in partes])
+    entrada = np.concatenate([p[1] for p in partes])
+    salida = np.concatenate([p[2] for p in partes])
+    nocturna = np.concatenate([p[3] for p in partes])
+
+    # Una estancia que cruza el fin de su carril se solapa con las primeras
+    # del carril siguiente del mismo espacio: se descartan esas
+    orden = np.lexsort((entrada, espacio))
+    espacio, entrada, salida, nocturna = espacio[orden], entrada[orden], salida[orden], nocturna[orden]
+    desplazamiento = espacio * (horas + 1000.0)
+    ocupado_hasta = np.maximum.accumulate(salida + desplazamiento) - desplazamiento
+    libre = np.ones(len(entrada), dtype=bool)
+    libre[1:] = (entrada[1:] >= ocupado_hasta[:-1]) | (espacio[1:] != espacio[:-1])
+    espacio, entrada, salida, nocturna = espacio[libre], entrada[libre], salida[libre], nocturna[libre]
+
+    orden = np.argsort(entrada, kind='stable')
+    return {
+        'espacio': espacio[orden],
+        'entrada': np.round(entrada[orden] * 3600).astype(np.int64),
+        'salida': np.round(salida[orden] * 3600).astype(np.int64),
+        'es_nocturno': nocturna[orden],
+        'activo': salida[orden] >= horas,
+    }
+
+
+def generar_flota(rng, vehiculos: int):
+    """Placas ecuatorianas únicas ('PBC-1234'); una de cada diez con 3 dígitos"""
+    extra = int(vehiculos * 1.1) + 100
+    provincia = rng.choice(PROVINCIAS, extra, p=PESO_PROVINCIAS / PESO_PROVINCIAS.sum())
+    segunda = rng.choice(SEGUNDA_LETRA, extra)
+    tercera = rng.choice(LETRAS, extra)
+    tres_digitos = rng.random(extra) < 0.1
+    numero = np.where(tres_digitos, rng.integers(100, 1000, extra), rng.integers(1000, 10000, extra))
+    placas = np.char.add(np.char.add(np.char.add(provincia, segunda), tercera), '-')
+    placas = np.char.add(placas, numero.astype(str))
+    placas = np.unique(placas)
+    rng.shuffle(placas)
+    if len(placas) < vehiculos:
+        raise ValueError('No se pudieron generar suficientes placas distintas')
+    placas = placas[:vehiculos]
+
+    # Todas deben pasar la validación de la puerta
+    with contextlib.redirect_stdout(io.StringIO()):
+        invalidas = [p for p in placas.tolist() if not CalculadoraPrecios.validar_formato_placa(p)]
+    if invalidas:
+        raise ValueError(f'Placas generadas inválidas: {invalidas[:5]}')
+    return placas
+
+
+def asignar_placas(rng, placas, n: int, activo):
+    """Placa de cada estancia: clientes frecuentes según Zipf; las activas son distintas"""
+    pesos = 1.0 / np.arange(1, len(placas) + 1) ** 0.9
+    indices = rng.choice(len(placas), n, p=pesos / pesos.sum())
+    activas = np.flatnonzero(activo)
+    if len(activas):
+        indices[activas] = rng.choice(len(placas), len(activas), replace=False)
+    return placas[indices]
+
+
+# ----------------------------------------------------------------------
+# generar
+# ----------------------------------------------------------------------
+def _insertar(conexion, tabla: str, columnas, filas):
+    """INSERT por lotes con executemany del driver (sin pasar por el ORM)"""
+    marcador = '?' if conexion.dialect.paramstyle == 'qmark' else '%s'
+    sql = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join([marcador] * len(columnas))})"
+    for i in range(0, len(filas), FILAS_POR_LOTE):
+        conexion.exec_driver_sql(sql, filas[i:i + FILAS_POR_LOTE])
+
+
+def generar(args):
+    from sqlalchemy import func
+    from app.config import SessionLocal, engine
+    from app.modelos.vehiculo_estacionado import VehiculoEstacionado
+    from app.modelos.historial_factura import HistorialFactura
+    from app.servicios.configuracion_service import ConfiguracionService
+    from app.servicios.resumen_placa_service import ResumenPlacaService
+
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(args.semilla)
+    hasta = np.datetime64(datetime.now().replace(minute=0, second=0, microsecond=0), 'h')
+    horas = int(args.anios * 365.25 * 24) if args.dias is None else args.dias * 24
+    inicio = hasta - np.timedelta64(horas, 'h')
+
+    db = SessionLocal()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            historial = ConfiguracionService.historial(db)
+        ocupados = {e for (e,) in db.query(VehiculoEstacionado.espacio_numero).filter_by(estado='activo')}
+        siguiente_vehiculo = (db.query(func.max(VehiculoEstacionado.id)).scalar() or 0) + 1
+        siguiente_factura = (db.query(func.max(HistorialFactura.id)).scalar() or 0) + 1
+    finally:
+        db.close()
+
+    estancias = generar_estancias(
+        rng, inicio, horas, range(1, ESPACIOS + 1), args.tasa, args.mediana_minutos, args.nocturnas
+    )
+    # Los espacios ocupados de verdad conservan su vehículo: sin estancias activas generadas ahí
+    activo = estancias['activo']
+    descartar = activo & np.isin(estancias['espacio'], list(ocupados))
+    estancias = {clave: valor[~descartar] for clave, valor in estancias.items()}
+    activo = estancias['activo']
+    n = len(activo)
+
+    placas = asignar_placas(rng, generar_flota(rng, args.vehiculos), n, activo)
+    entrada = inicio.astype('datetime64[s]') + estancias['entrada']
+    salida = inicio.astype('datetime64[s]') + estancias['salida']
+    minutos = (estancias['salida'] - estancias['entrada']) // 60
+    nocturna = estancias['es_nocturno']
+
+    # Cada estancia se cobra con la versión de la tarifa vigente a su entrada
+    # (searchsorted sobre las fechas de vigencia) y cada versión en un solo
+    # cálculo vectorizado, tope nocturno incluido; el detalle se arma una vez
+    # por duración distinta y solo las estancias con tope nocturno necesitan
+    # el texto propio
+    planes = historial.planes()
+    indice_plan = historial.indices_lote(entrada)
+    costos = np.empty(n, dtype=np.int64)
+    detalles = np.empty(n, dtype=object)
+    for k in np.unique(indice_plan).tolist():
+        plan = planes[k]
+        sel = np.flatnonzero(indice_plan == k)
+        costos[sel] = plan.costos_lote(entrada[sel], minutos[sel], nocturna[sel])
+        claves, inverso = np.unique(minutos[sel] * 2 + nocturna[sel], return_inverse=True)
+        sin_tope = np.array([plan.costo(int(c // 2), bool(c % 2)) for c in claves])[inverso]
+        detalles[sel] = np.array([plan.detalles(int(c // 2), bool(c % 2)) for c in claves], dtype=object)[inverso]
+        for i in sel[costos[sel] != sin_tope].tolist():
+            detalles[i] = plan.detalles(int(minutos[i]), False, entrada[i].astype(datetime))
+    texto_costos = {c: formatear_centavos(int(c)) for c in np.unique(costos).tolist()}
+    tarifas = [
+        (plan.version, formatear_centavos(plan.media_hora),
+         formatear_centavos(plan.hora_adicional), formatear_centavos(plan.nocturno))
+        for plan in planes
+    ]
+    t_generacion = time.perf_counter() - t0
+
+    ids = np.arange(siguiente_vehiculo, siguiente_vehiculo + n)
+    if engine.dialect.name == 'sqlite':
+        # Mismo texto que guarda SQLAlchemy (siempre con microsegundos): las
+        # comparaciones con fechas enviadas desde la aplicación son de texto
+        entrada_py = np.char.replace(np.datetime_as_string(entrada.astype('datetime64[us]')), 'T', ' ').tolist()
+        salida_py = np.char.replace(np.datetime_as_string(salida.astype('datetime64[us]')), 'T', ' ').tolist()
+    else:
+        entrada_py = entrada.tolist()
+        salida_py = salida.tolist()
+    placas_py = placas.tolist()
+    espacios_py = estancias['espacio'].tolist()
+    nocturna_py = nocturna.tolist()
+    costos_py = [texto_costos[c] for c in costos.tolist()]
+    activo_py = activo.tolist()
+
+    vehiculos = [
+        (i, p, e, ent, None if act else sal, None if act else c, 'activo' if act else 'finalizado', noct, ent)
+        for i, p, e, ent, sal, c, act, noct in zip(
+            ids.tolist(), placas_py, espacios_py, entrada_py, salida_py, costos_py, activo_py, nocturna_py
+        )
+    ]
+    cerradas = np.flatnonzero(~activo)
+    facturas = [
+        (siguiente_factura + k, ids[i].item(), placas_py[i], espacios_py[i], entrada_py[i], salida_py[i],
+         int(minutos[i]) or 1, costos_py[i], detalles[i], salida_py[i], nocturna_py[i],
+         *tarifas[indice_plan[i]])
+        for k, i in enumerate(cerradas.tolist())
+    ]
+
+    t1 = time.perf_counter()
+    with engine.begin() as conexion:
+        _insertar(conexion, 'vehiculos_estacionados', (
+            'id', 'placa', 'espacio_numero', 'fecha_hora_entrada', 'fecha_hora_salida',
+            'costo_total', 'estado', 'es_nocturno', 'creado_en'
+        ), vehiculos)
+        _insertar(conexion, 'historial_facturas', (
+            'id', 'vehiculo_id', 'placa', 'espacio_numero', 'fecha_hora_entrada', 'fecha_hora_salida',
+            'tiempo_total_minutos', 'costo_total', 'detalles_cobro', 'fecha_generacion', 'es_nocturno',
+            'version_tarifa', 'precio_media_hora', 'precio_hora_adicional', 'precio_nocturno'
+        ), facturas)
+        # Las facturas insertadas no pasan por la salida: totales por placa de nuevo
+        ResumenPlacaService.recalcular(conexion)
+    t_insercion = time.perf_counter() - t1
+
+    total = time.perf_counter() - t0
+    filas = len(vehiculos) + len(facturas)
+    duracion_media = minutos[~activo & ~nocturna].mean() if (~activo & ~nocturna).any() else 0
+    ocupacion = (np.minimum(estancias['salida'], horas * 3600) - estancias['entrada']).sum() / (horas * 3600 * ESPACIOS)
+    print(f"✅ {n} estancias ({int(activo.sum())} activas) y {len(facturas)} facturas "
+          f"del {inicio} al {hasta}")
+    print(f"   Nocturnas: {nocturna.mean():.1%} | duración media (normales): {duracion_media:.0f} min | "
+          f"ocupación media: {ocupacion:.1%} | placas distintas: {len(np.unique(placas))}")
+    print(f"   Generación {t_generacion:.2f} s, inserción {t_insercion:.2f} s, total {total:.2f} s "
+          f"({filas / total * 60:,.0f} filas/min)")
+    print("   Los resúmenes por hora y por espacio los consolida el servidor en su tarea de fondo")
+
+
+# ----------------------------------------------------------------------
+# reproducir
+# ----------------------------------------------------------------------
+def _peticion(url: str, metodo: str = 'GET', cuerpo=None, timeout: float = 30.0):
+    """(estado_http, respuesta JSON) de una petición a la API"""
+    datos = None if cuerpo is None else json.dumps(cuerpo).encode('utf-8')
+    encabezados = {'Content-Type': 'application/json'}
+    if metodo == 'POST':
+        encabezados['Idempotency-Key'] = uuid.uuid4().hex
+    peticion = urllib.request.Request(url, data=datos, method=metodo, headers=encabezados)
+    try:
+        with urllib.request.urlopen(peticion, timeout=timeout) as respuesta:
+            return respuesta.status, json.loads(respuesta.read() or b'null')
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def reproducir(args):
+    rng = np.random.default_rng(args.semilla)
+    base = args.url.rstrip('/')
+
+    _, espacios = _peticion(f'{base}/api/vehiculos/espacios')
+    libres = [e['numero'] for e in espacios if not e['ocupado']]
+    if not libres:
+        print("❌ No hay espacios libres para reproducir tráfico")
+        return
+
+    ahora = np.datetime64(datetime.now().replace(minute=0, second=0, microsecond=0), 'h')
+    estancias = generar_estancias(
+        rng, ahora, args.horas, libres, args.tasa, args.mediana_minutos, args.nocturnas
+    )
+    placas = asignar_placas(rng, generar_flota(rng, args.vehiculos), len(estancias['espacio']),
+                            np.ones(len(estancias['espacio']), dtype=bool))
+
+    # Eventos en segundos reales desde el arranque
+    eventos = []
+    for k, (espacio, entrada, salida, nocturna, activo) in enumerate(zip(
+            estancias['espacio'].tolist(), estancias['entrada'].tolist(), estancias['salida'].tolist(),
+            estancias['es_nocturno'].tolist(), estancias['activo'].tolist())):
+        eventos.append((entrada / args.acelerar, 0, k, espacio, nocturna))
+        if not activo:
+            eventos.append((salida / args.acelerar, 1, k, espacio, nocturna))
+    eventos.sort()
+    if args.duracion:
+        eventos = [e for e in eventos if e[0] < args.duracion]
+    print(f"▶️ {len(eventos)} eventos en {eventos[-1][0] if eventos else 0:.0f} s "
+          f"({args.horas} h simuladas x{args.acelerar:g}) contra {base}")
+
+    lock = threading.Lock()
+    latencias = {'entrada': [], 'salida': []}
+    estados = {}
+    entradas = {}  # k -> Future de la entrada (la salida espera su resultado)
+
+    def enviar(tipo, programado, k, espacio, nocturna):
+        if tipo == 'salida':
+            estado_entrada = entradas[k].result()
+            if estado_entrada != 201:
+                with lock:
+                    estados['salida omitida'] = estados.get('salida omitida', 0) + 1
+                return None
+            estado, _ = _peticion(f'{base}/api/vehiculos/salida', 'POST', {'placa': placas[k]})
+        else:
+            estado, _ = _peticion(f'{base}/api/vehiculos/entrada', 'POST', {
+                'placa': placas[k], 'espacio_numero': espacio, 'es_nocturno': nocturna
+            })
+        latencia = time.perf_counter() - programado
+        with lock:
+            latencias[tipo].append(latencia)
+            clave = f'{tipo} {estado}'
+            estados[clave] = estados.get(clave, 0) + 1
+        return estado
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as ejecutor:
+        for segundo, es_salida, k, espacio, nocturna in eventos:
+            programado = inicio + segundo
+            espera = programado - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            tipo = 'salida' if es_salida else 'entrada'
+            futuro = ejecutor.submit(enviar, tipo, programado, k, espacio, nocturna)
+            if tipo == 'entrada':
+                entradas[k] = futuro
+
+    print(f"⏹️ Terminado en {time.perf_counter() - inicio:.1f} s")
+    for clave in sorted(estados):
+        print(f"   {clave}: {estados[clave]}")
+    for tipo, valores in latencias.items():
+        if valores:
+            p50, p95, p99 = np.percentile(np.array(valores) * 1000, [50, 95, 99])
+            print(f"   {tipo}: p50 {p50:.1f} ms | p95 {p95:.1f} ms | p99 {p99:.1f} ms | max {max(valores) * 1000:.1f} ms")
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description='Carga sintética del parqueadero')
+    sub = parser.add_subparsers(dest='modo', required=True)
+
+    def comunes(p):
+        p.add_argument('--semilla', type=int, default=None, help='Semilla del generador aleatorio')
+        p.add_argument('--tasa', type=float, default=0.35,
+                       help='Llegadas por hora a un espacio libre en una hora de intensidad 1')
+        p.add_argument('--mediana-minutos', type=float, default=90, help='Mediana de la estancia normal')
+        p.add_argument('--nocturnas', type=float, default=0.12, help='Fracción de estancias nocturnas')
+        p.add_argument('--vehiculos', type=int, default=20000, help='Tamaño de la flota de placas')
+
+    g = sub.add_parser('generar', help='Insertar estancias y facturas históricas')
+    comunes(g)
+    g.add_argument('--anios', type=float, default=1.0, help='Años hacia atrás desde ahora')
+    g.add_argument('--dias', type=int, default=None, help='Días hacia atrás (en lugar de --anios)')
+
+    r = sub.add_parser('reproducir', help='Enviar tráfico a la API en vivo')
+    comunes(r)
+    r.add_argument('--url', default='http://127.0.0.1:8000')
+    r.add_argument('--horas', type=int, default=8, help='Horas de tráfico simuladas')
+    r.add_argument('--acelerar', type=float, default=60.0, help='Factor de compresión del tiempo')
+    r.add_argument('--duracion', type=float, default=None, help='Cortar a los N segundos reales')
+    r.add_argument('--concurrencia', type=int, default=32, help='Peticiones simultáneas como máximo')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    argumentos = _argumentos()
+    if argumentos.modo == 'generar':
+        generar(argumentos)
+    else:
+        reproducir(argumentos)
@@ -0,0 +1,274 @@
+"""
+Presupuesto de SQL por endpoint.
+
+Las regresiones de rendimiento de esta API casi siempre aparecen como
+consultas de más: un joinedload perdido, un refresh después del commit, una
+lectura extra de la configuración. Esta herramienta llena una base SQLite
+temporal con el generador de carga, llama a cada ruta de vehiculo_routes,
+factura_routes, reporte_routes y configuracion_routes directamente sobre la
+aplicación ASGI (httpx.ASGITransport: sin servidor ni hilos de fondo) y registra cada
+sentencia ejecutada con los eventos de SQLAlchemy. Para cada endpoint verifica:
+
+  - cantidad de sentencias;
+  - filas devueltas por los SELECT (se cuentan con SELECT count(*) sobre la
+    misma sentencia, en la misma conexión, antes de ejecutarla);
+  - que no haya recorridos completos de tablas grandes (EXPLAIN QUERY PLAN
+    con "SCAN <tabla>", también USING INDEX o USING COVERING INDEX, que
+    recorren el índice entero), salvo las tablas permitidas en su fila.
+
+Los límites están en una sola tabla, PRESUPUESTOS: subir un número es una
+decisión que se revisa en el mismo cambio que la causa. Cada ruta se mide
+en régimen: con los resúmenes por hora y por espacio consolidados (como
+los deja la tarea de fondo del sincronizador), después de una primera
+pasada completa (que carga los índices en memoria de tarifas y reservas) y
+con la cache de reportes vacía, así que se mide el costo de calcular la
+respuesta y no el de la primera carga. La memoria compartida se desactiva
+para medir el camino que consulta la base.
+
+Uso:
+    python -m app.herramientas.presupuesto_sql
+    python -m app.herramientas.presupuesto_sql --dias 60 --detalle
+
+Termina con código 1 si algún endpoint se pasa de su presupuesto.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+
+# Tablas que siempre son pequeñas: recorrerlas completas no es un problema
+TABLAS_PEQUENAS = {'configuracion_precios', 'versiones_tarifa', 'migraciones_aplicadas'}
+
+HOY = date.today().isoformat()
+HACE_UNA_SEMANA = (date.today() - timedelta(days=7)).isoformat()
+MES_ANTERIOR = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1).isoformat()
+
+# ----------------------------------------------------------------------
+# Presupuestos revisados: (nombre, método, ruta, cuerpo, máximo de
+# sentencias, máximo de filas leídas, tablas grandes que puede recorrer)
+#
+# Las filas están pensadas para la base por defecto (--dias 30, unas 2.400
+# estancias); los reportes de rango leen también el año anterior, así que
+# crecen con los datos.
+#
+# Se ejecutan en este orden (la salida usa el vehículo de la entrada). La
+# ruta se completa con el contexto ({placa}) y el cuerpo puede ser una
+# función del contexto (placa y espacio libre).
+# ----------------------------------------------------------------------
+PRESUPUESTOS = [
+    # configuracion_routes
+    ('configuracion', 'GET', '/api/configuracion/', None, 1, 1, ()),
+    ('configuracion_versiones', 'GET', '/api/configuracion/versiones', None, 1, 10, ()),
+
+    # vehiculo_routes
+    ('vehiculos_espacios', 'GET', '/api/vehiculos/espacios', None, 1, 24, ()),
+    # Placa y espacio libres, reservas vigentes (marca del índice en memoria:
+    # suma de reservas_versiones, una fila por espacio), INSERT y recarga de
+    # la fila tras el commit
+    ('vehiculos_entrada', 'POST', '/api/vehiculos/entrada',
+     lambda ctx: {'placa': ctx['placa'], 'espacio_numero': ctx['espacio_libre']}, 5, 3,
+     ('reservas_versiones',)),
+    # Vehículo y versión vigente de la tarifa (el plan sale del historial en memoria)
+    ('vehiculos_buscar', 'GET', '/api/vehiculos/buscar/{placa}', None, 2, 2, ()),
+    # Vehículo, versión de la tarifa, UPDATE, INSERT de la factura, resumen de
+    # la placa (UPDATE, más el INSERT si es su primera visita) y refresh de ambos
+    ('vehiculos_salida', 'POST', '/api/vehiculos/salida', lambda ctx: {'placa': ctx['placa']}, 8, 4, ()),
+    # Recorre el índice de fecha_generacion en orden y se detiene en el LIMIT
+    ('vehiculos_historial', 'GET', '/api/vehiculos/historial', None, 1, 50, ('historial_facturas',)),
+    # La factura guarda su tarifa: una página grande sigue siendo una sola
+    # sentencia, sin unir cada fila con su vehículo
+    ('vehiculos_historial_500', 'GET', '/api/vehiculos/historial?limite=500', None, 1, 500, ('historial_facturas',)),
+    # Una página por el índice (placa, fecha_generacion) y las estadísticas por llave primaria
+    ('vehiculos_historial_placa', 'GET', '/api/vehiculos/{placa}/historial', None, 2, 22, ()),
+    # Rango del día sobre el índice de fecha_generacion (SEARCH, no SCAN)
+    ('vehiculos_historial_fecha', 'GET', f'/api/vehiculos/historial?fecha={HOY}', None, 1, 50, ()),
+    ('vehiculos_diario', 'GET', '/api/vehiculos/diario', None, 0, 0, ()),
+    ('vehiculos_health', 'GET', '/api/vehiculos/health', None, 0, 0, ()),
+
+    # factura_routes: la factura guarda la tarifa con que se cobró, así que el
+    # PDF sale de su propia fila (en régimen ya está en la cache de disco)
+    ('facturas_pdf', 'GET', '/api/facturas/1.pdf', None, 1, 1, ()),
+
+    # reporte_routes
+    ('reportes_diario', 'GET', '/api/reportes/diario', None, 3, 3, ()),
+    ('reportes_detallado', 'GET', '/api/reportes/detallado', None, 3, 120, ()),
+    ('reportes_rango', 'GET', f'/api/reportes/rango?desde={HACE_UNA_SEMANA}&hasta={HOY}', None, 2, 3000, ()),
+    ('reportes_ocupacion', 'GET', f'/api/reportes/ocupacion?desde={HACE_UNA_SEMANA}&hasta={HOY}', None, 1, 800, ()),
+    # Solo los días de resumen_horario nuevos para el modelo (la consolidación es de fondo)
+    ('reportes_pronostico', 'GET', '/api/reportes/pronostico', None, 1, 1500, ()),
+    # Meses cubiertos, suma del resumen por espacio y hasta dos tramos sueltos
+    # leídos de las estancias (la consolidación es de fondo)
+    ('reportes_utilizacion', 'GET', f'/api/reportes/utilizacion?desde={MES_ANTERIOR}&hasta={HOY}', None, 4, 3000, ()),
+    ('reportes_exportar', 'GET', f'/api/reportes/exportar?desde={HACE_UNA_SEMANA}&hasta={HOY}', None, 1, 800, ()),
+    ('reportes_cache', 'GET', '/api/reportes/cache', None, 0, 0, ()),
+    ('reportes_health', 'GET', '/api/reportes/health', None, 0, 0, ()),
+
+    # Al final: cambia la versión de la tarifa
+    ('configuracion_actualizar', 'PUT', '/api/configuracion/', {'precio_media_hora': '0.75'}, 4, 2, ()),
+]
+
+
+def _preparar_entorno(directorio: str):
+    """Apuntar la aplicación a archivos temporales (antes de importar app.config)"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directorio, 'presupuesto.db')
+    os.environ.pop('DATABASE_REPLICA_URL', None)
+    os.environ['BITACORA_RUTA'] = os.path.join(directorio, 'eventos.bin')
+    os.environ['DIARIO_LOCAL_RUTA'] = os.path.join(directorio, 'diario.db')
+    os.environ['FACTURAS_PDF_DIR'] = os.path.join(directorio, 'facturas')
+    os.environ['ESTADO_COMPARTIDO'] = '0'
+    os.environ['ALERTAS_ACTIVAS'] = '0'
+    os.environ['ADMISION_ACTIVA'] = '0'
+
+
+class Captura:
+    """Sentencias ejecutadas mientras está activa, con filas leídas y recorridos"""
+
+    def __init__(self, tablas):
+        self.tablas = set(tablas) - TABLAS_PEQUENAS
+        self.activa = False
+        self.sentencias = []
+
+    def antes(self, conexion, cursor, sentencia, parametros, contexto, executemany):
+        if not self.activa:
+            return
+        registro = {'sql': sentencia, 'filas': 0, 'recorridos': []}
+        self.sentencias.append(registro)
+        if executemany or not sentencia.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return
+        # Misma conexión DBAPI (misma transacción) y mismos parámetros
+        dbapi = cursor.connection
+        try:
+            registro['filas'] = dbapi.execute(f'SELECT count(*) FROM ({sentencia})', parametros).fetchone()[0]
+        except Exception:
+            registro['filas'] = None
+        for fila in dbapi.execute(f'EXPLAIN QUERY PLAN {sentencia}', parametros).fetchall():
+            # Cualquier SCAN recorre la tabla entera o un índice entero
+            # (USING INDEX / USING COVERING INDEX): solo SEARCH acota las filas
+            recorrido = re.match(r'SCAN (?:TABLE )?(\w+)', fila[-1])
+            if recorrido and recorrido.group(1) in self.tablas:
+                registro['recorridos'].append(recorrido.group(1))
+
+
+def _sembrar(dias: int):
+    """Estancias y facturas sintéticas de los últimos `dias` días, con los resúmenes consolidados"""
+    from app.herramientas import generador_carga
+    from app.config import SessionLocal
+    from app.servicios.resumen_service import ResumenService
+    argumentos = argparse.Namespace(
+        semilla=7, tasa=0.35, mediana_minutos=90, nocturnas=0.12, vehiculos=2000, anios=None, dias=dias
+    )
+    generador_carga.generar(argumentos)
+    db = SessionLocal()
+    try:
+        ResumenService.consolidar(db)
+    finally:
+        db.close()
+
+
+async def _recorrer(app, captura, cache_reportes, placa: str, medir: bool):
+    """
+    Llamar cada ruta de PRESUPUESTOS en orden.
+
+    La pasada de calentamiento (medir=False) usa otra placa y se salta las
+    PUT, que cambiarían la versión de la tarifa antes de medir.
+    """
+    import httpx
+
+    contexto = {'placa': placa}
+    resultados = []
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url='http://presupuesto') as cliente:
+        with contextlib.redirect_stdout(io.StringIO()):
+            espacios = (await cliente.get('/api/vehiculos/espacios')).json()
+        contexto['espacio_libre'] = next(e['numero'] for e in espacios if not e['ocupado'])
+        for nombre, metodo, ruta, cuerpo, *_ in PRESUPUESTOS:
+            if not medir and metodo == 'PUT':
+                continue
+            ruta = ruta.format(**contexto)
+            if callable(cuerpo):
+                cuerpo = cuerpo(contexto)
+            cache_reportes.limpiar()
+            captura.sentencias = []
+            captura.activa = medir
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    respuesta = await cliente.request(metodo, ruta, json=cuerpo)
+                    await respuesta.aread()
+            finally:
+                captura.activa = False
+            resultados.append((nombre, respuesta.status_code, list(captura.sentencias)))
+    return resultados
+
+
+def _evaluar(resultados, detalle: bool):
+    """Imprimir la tabla de resultados; devuelve la cantidad de endpoints fuera de presupuesto"""
+    limites = {p[0]: p for p in PRESUPUESTOS}
+    fallidos = 0
+    print(f"{'endpoint':<28} {'HTTP':>4} {'sentencias':>11} {'filas':>12}  recorridos")
+    for nombre, estado, sentencias in resultados:
+        _, _, _, _, max_sentencias, max_filas, permitidas = limites[nombre]
+        filas = sum(s['filas'] or 0 for s in sentencias)
+        recorridos = sorted({t for s in sentencias for t in s['recorridos']} - set(permitidas))
+        problemas = []
+        if not 200 <= estado < 300:
+            problemas.append(f'HTTP {estado}')
+        if len(sentencias) > max_sentencias:
+            problemas.append(f'{len(sentencias)} sentencias > {max_sentencias}')
+        if filas > max_filas:
+            problemas.append(f'{filas} filas > {max_filas}')
+        if recorridos:
+            problemas.append('recorre ' + ', '.join(recorridos))
+        marca = '❌' if problemas else '✅'
+        print(f"{marca} {nombre:<26} {estado:>4} {len(sentencias):>5}/{max_sentencias:<5} "
+              f"{filas:>6}/{max_filas:<5}  {', '.join(recorridos) or '-'}")
+        if problemas:
+            fallidos += 1
+            print(f"   {'; '.join(problemas)}")
+        if problemas or detalle:
+            for s in sentencias:
+                texto = ' '.join(s['sql'].split())
+                print(f"     [{s['filas'] if s['filas'] is not None else '?'} filas] {texto[:160]}")
+    return fallidos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Presupuesto de SQL por endpoint')
+    parser.add_argument('--dias', type=int, default=30, help='Días de estancias sintéticas en la base')
+    parser.add_argument('--detalle', action='store_true', help='Mostrar las sentencias de cada endpoint')
+    args = parser.parse_args(argv)
+
+    directorio = tempfile.mkdtemp(prefix='presupuesto_sql_')
+    try:
+        _preparar_entorno(directorio)
+        with contextlib.redirect_stdout(io.StringIO()):
+            from sqlalchemy import event, inspect
+            from app.main import app
+            from app.config import engine
+            from app.utils.cache_reportes import cache_reportes
+            _sembrar(args.dias)
+
+        captura = Captura(inspect(engine).get_table_names())
+        event.listen(engine, 'before_cursor_execute', captura.antes)
+
+        asyncio.run(_recorrer(app, captura, cache_reportes, 'PSQ-0000', medir=False))
+        resultados = asyncio.run(_recorrer(app, captura, cache_reportes, 'PSQ-0001', medir=True))
+        fallidos = _evaluar(resultados, args.detalle)
+        engine.dispose()
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    if fallidos:
+        print(f"❌ {fallidos} endpoint(s) fuera de presupuesto")
+        return 1
+    print(f"✅ {len(resultados)} endpoints dentro de presupuesto")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
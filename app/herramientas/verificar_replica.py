@@ -0,0 +1,162 @@
+"""
+Verificación del enrutamiento de lecturas a la réplica.
+
+Crea dos bases SQLite temporales, una como principal (DATABASE_URL) y otra
+como réplica (DATABASE_REPLICA_URL), cada una con una factura de placa
+distinta para saber de cuál leyó cada llamada. Luego pide
+/api/vehiculos/historial (get_db_lectura) directamente sobre la aplicación
+ASGI y abre sesiones con abrir_sesion_lectura y get_db, comprobando:
+
+  - con la réplica arriba, las lecturas van a la réplica y get_db a la
+    principal;
+  - con la réplica caída (su directorio renombrado y el pool cerrado, así
+    SQLite no puede abrir el archivo), la ruta responde igual desde la
+    principal y la réplica queda marcada como caída;
+  - dentro de la ventana DB_REPLICA_REINTENTO, aunque la réplica ya volvió,
+    se sigue usando la principal sin reintentar;
+  - pasada la ventana, las lecturas vuelven a la réplica.
+
+Termina con código 1 si alguna comprobación falla.
+
+Uso:
+    python -m app.herramientas.verificar_replica
+    python -m app.herramientas.verificar_replica --reintento 2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PLACA_PRINCIPAL = 'PRINCIPAL-1'
+PLACA_REPLICA = 'REPLICA-1'
+
+
+def _preparar_entorno(directorio: str, reintento: float):
+    """Apuntar la aplicación a dos bases temporales (antes de importar app.config)"""
+    os.makedirs(os.path.join(directorio, 'replica'))
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directorio, 'principal.db')
+    os.environ['DATABASE_REPLICA_URL'] = 'sqlite:///' + os.path.join(directorio, 'replica', 'replica.db')
+    os.environ['DB_REPLICA_REINTENTO'] = str(reintento)
+    os.environ['BITACORA_RUTA'] = os.path.join(directorio, 'eventos.bin')
+    os.environ['DIARIO_LOCAL_RUTA'] = os.path.join(directorio, 'diario.db')
+    os.environ['FACTURAS_PDF_DIR'] = os.path.join(directorio, 'facturas')
+    os.environ['ESTADO_COMPARTIDO'] = '0'
+    os.environ['ALERTAS_ACTIVAS'] = '0'
+    os.environ['ADMISION_ACTIVA'] = '0'
+
+
+def _sembrar():
+    """Tablas en las dos bases y una factura distinta en cada una"""
+    from app.config import Base, engine, engine_lectura
+    from app.modelos.historial_factura import HistorialFactura
+
+    for motor, placa in ((engine, PLACA_PRINCIPAL), (engine_lectura, PLACA_REPLICA)):
+        Base.metadata.create_all(bind=motor)
+        ahora = datetime.now()
+        with motor.begin() as conexion:
+            conexion.execute(HistorialFactura.__table__.insert(), [{
+                'vehiculo_id': 1, 'placa': placa, 'espacio_numero': 1,
+                'fecha_hora_entrada': ahora, 'fecha_hora_salida': ahora,
+                'tiempo_total_minutos': 1, 'costo_total': 50, 'es_nocturno': False,
+                'fecha_generacion': ahora,
+            }])
+
+
+def _placa_de(db):
+    """Placa de la única factura de la base a la que apunta la sesión"""
+    from app.modelos.historial_factura import HistorialFactura
+    return db.query(HistorialFactura.placa).scalar()
+
+
+async def _placa_ruta(app):
+    """Placa que devuelve /api/vehiculos/historial"""
+    import httpx
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url='http://replica') as cliente:
+        respuesta = await cliente.get('/api/vehiculos/historial')
+    if respuesta.status_code != 200:
+        return f'HTTP {respuesta.status_code}'
+    return [f['placa'] for f in respuesta.json()['data']]
+
+
+def _lecturas(app):
+    """(placa de la ruta, placa de abrir_sesion_lectura, placa de get_db)"""
+    from app import config
+    with contextlib.redirect_stdout(io.StringIO()):
+        ruta = asyncio.run(_placa_ruta(app))
+        db = config.abrir_sesion_lectura()
+        try:
+            lectura = _placa_de(db)
+        finally:
+            db.close()
+        generador = config.get_db()
+        db = next(generador)
+        try:
+            principal = _placa_de(db)
+        finally:
+            generador.close()
+    return ruta, lectura, principal
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Verificación del enrutamiento a la réplica de lectura')
+    parser.add_argument('--reintento', type=float, default=1.0,
+                        help='Segundos que la réplica se da por caída (DB_REPLICA_REINTENTO)')
+    args = parser.parse_args(argv)
+
+    directorio = tempfile.mkdtemp(prefix='verificar_replica_')
+    fallas = []
+
+    def comprobar(nombre, obtenido, esperado):
+        correcto = obtenido == esperado
+        print(f"{'✅' if correcto else '❌'} {nombre}: {obtenido}")
+        if not correcto:
+            fallas.append(f'{nombre}: se esperaba {esperado}, se obtuvo {obtenido}')
+
+    try:
+        _preparar_entorno(directorio, args.reintento)
+        with contextlib.redirect_stdout(io.StringIO()):
+            from app.main import app
+            from app import config
+            _sembrar()
+        replica = os.path.join(directorio, 'replica')
+        caida = replica + '-caida'
+        leer_replica = ([PLACA_REPLICA], PLACA_REPLICA, PLACA_PRINCIPAL)
+        leer_principal = ([PLACA_PRINCIPAL], PLACA_PRINCIPAL, PLACA_PRINCIPAL)
+
+        print("🔎 Réplica arriba")
+        comprobar('ruta / sesión de lectura / get_db', _lecturas(app), leer_replica)
+
+        print("🔎 Réplica caída")
+        os.rename(replica, caida)
+        config.engine_lectura.dispose()
+        comprobar('ruta / sesión de lectura / get_db', _lecturas(app), leer_principal)
+        comprobar('réplica marcada como caída', config._replica_caida_hasta > time.monotonic(), True)
+
+        print(f"🔎 Réplica de vuelta, dentro de la ventana de {args.reintento:g} s")
+        os.rename(caida, replica)
+        comprobar('ruta / sesión de lectura / get_db', _lecturas(app), leer_principal)
+
+        print("🔎 Réplica de vuelta, pasada la ventana")
+        time.sleep(max(0.0, config._replica_caida_hasta - time.monotonic()) + 0.05)
+        comprobar('ruta / sesión de lectura / get_db', _lecturas(app), leer_replica)
+        config.engine_lectura.dispose()
+        config.engine.dispose()
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    if fallas:
+        for falla in fallas:
+            print(f"❌ {falla}")
+        sys.exit(1)
+    print("✅ Enrutamiento de lecturas, respaldo en la principal y ventana de reintento correctos")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,11 @@
 # app/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, OperationalError, InterfaceError
 
-from app.config import Base, engine, SessionLocal
+from app.config import Base, engine, SessionLocal, ADMISION_ACTIVA
+from app.utils.control_admision import MiddlewareAdmision, control_admision
 
 # ----------------------------------------------------------------------
 # 🔹 Importar todos los modelos antes de crear las tablas
@@ -11,11 +13,28 @@ from app.config import Base, engine, SessionLocal
 from app.modelos import configuracion_precios
 from app.modelos import vehiculo_estacionado
 from app.modelos import historial_factura
+from app.modelos import resumen_horario
+from app.modelos import resumen_espacio
+from app.modelos import resumen_placa
+from app.modelos import evento_diario_aplicado
+from app.modelos import alerta_emitida
+from app.modelos import clave_idempotencia
+from app.modelos import reserva
+from app.modelos import version_reservas
+from app.modelos import version_tarifa
 
 # ----------------------------------------------------------------------
-# 🔹 Crear tablas automáticamente (solo si no existen)
+# 🔹 Crear tablas automáticamente (solo si no existen) y aplicar
+#    migraciones pendientes sobre tablas existentes
 # ----------------------------------------------------------------------
-Base.metadata.create_all(bind=engine)
+from app.migraciones import aplicar_migraciones
+
+try:
+    Base.metadata.create_all(bind=engine)
+    aplicar_migraciones(engine)
+except (OperationalError, InterfaceError) as e:
+    # Sin base principal la puerta arranca igual y opera con el diario local
+    print(f"⚠️ Base principal no disponible al arrancar, se usará el diario local: {e}")
 
 # ----------------------------------------------------------------------
 # 🔹 Importar routers
@@ -24,7 +43,51 @@ from app.routers import (
     configuracion_routes,
     vehiculo_routes,
     reporte_routes,
+    factura_routes,
+    evento_routes,
+    reserva_routes,
+    alerta_routes,
+)
+from app.servicios.puerta_local_service import (
+    PuertaLocalService,
+    iniciar_sincronizador,
+    detener_sincronizador,
 )
+from app.servicios.bitacora_service import BitacoraService
+from app.servicios.alerta_service import AlertaService
+from app.utils.estado_compartido import estado_compartido
+
+# ----------------------------------------------------------------------
+# 🔹 Arranque: estado de la bitácora y sincronizador del diario de la puerta
+# ----------------------------------------------------------------------
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    # Estado en memoria (ocupación y totales por día) desde la bitácora de eventos
+    try:
+        print(f"📜 Bitácora de eventos: {BitacoraService.reconstruir()} evento(s) reconstruidos")
+    except Exception as e:
+        print(f"⚠️ No se pudo reconstruir el estado de la bitácora: {e}")
+    # Ocupación y tarifa en memoria compartida antes de atender peticiones;
+    # también reconstruye el planificador de alertas desde los vehículos activos
+    db = SessionLocal()
+    try:
+        PuertaLocalService.refrescar_espejo(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        estado_compartido.invalidar()
+        print(f"⚠️ No se pudo cargar el estado compartido, se consultará la base: {e}")
+    finally:
+        db.close()
+    iniciar_sincronizador()
+    yield
+    detener_sincronizador()
+    AlertaService.detener()
+    estado_compartido.cerrar()
+    try:
+        BitacoraService.guardar_instantanea()
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar la instantánea de la bitácora: {e}")
 
 # ----------------------------------------------------------------------
 # 🔹 Instancia principal de FastAPI
@@ -32,9 +95,18 @@ from app.routers import (
 app = FastAPI(
     title="Sistema de Parqueadero",
     version="1.0",
-    description="API REST del sistema de parqueadero para hotel."
+    description="API REST del sistema de parqueadero para hotel.",
+    lifespan=ciclo_de_vida
 )
 
+# ----------------------------------------------------------------------
+# 🔹 Control de admisión: los rechazos 503 no llegan a los routers ni ocupan
+#    hilos. Se registra antes de CORS para que CORS quede por fuera y las
+#    respuestas 503 también lleven sus encabezados.
+# ----------------------------------------------------------------------
+if ADMISION_ACTIVA:
+    app.add_middleware(MiddlewareAdmision, control=control_admision)
+
 # ----------------------------------------------------------------------
 # 🔹 Configuración de CORS (para permitir peticiones desde el frontend)
 # ----------------------------------------------------------------------
@@ -57,6 +129,23 @@ app.add_middleware(
 app.include_router(configuracion_routes.router)
 app.include_router(vehiculo_routes.router)
 app.include_router(reporte_routes.router)
+app.include_router(factura_routes.router)
+app.include_router(evento_routes.router)
+app.include_router(reserva_routes.router)
+app.include_router(alerta_routes.router)
+
+# ----------------------------------------------------------------------
+# 🔹 Métricas del control de admisión
+# ----------------------------------------------------------------------
+@app.get("/api/admision/metricas")
+def metricas_admision():
+    """
+    Peticiones en curso, en cola, admitidas y rechazadas por clase de ruta.
+    """
+    return {
+        "success": True,
+        "data": control_admision.metricas()
+    }
 
 # ----------------------------------------------------------------------
 # 🔹 Endpoint raíz de prueba
@@ -0,0 +1,51 @@
+"""
+Migraciones de esquema para bases existentes.
+
+create_all solo crea las tablas que faltan; los cambios sobre tablas que ya
+existen (columnas nuevas, backfills) se aplican aquí una sola vez y quedan
+registrados en la tabla migraciones_aplicadas.
+"""
+from datetime import datetime
+from sqlalchemy import MetaData, Table, Column, String, DateTime, select
+
+from app.migraciones import m001_historial_autocontenido
+from app.migraciones import m002_versiones_tarifa
+from app.migraciones import m003_indices_fechas
+from app.migraciones import m004_resumen_placas
+from app.migraciones import m005_versiones_reservas
+from app.migraciones import m006_historial_sin_llave
+
+# Migraciones en orden de aplicación
+MIGRACIONES = [
+    ('001_historial_autocontenido', m001_historial_autocontenido.aplicar),
+    ('002_versiones_tarifa', m002_versiones_tarifa.aplicar),
+    ('003_indices_fechas', m003_indices_fechas.aplicar),
+    ('004_resumen_placas', m004_resumen_placas.aplicar),
+    ('005_versiones_reservas', m005_versiones_reservas.aplicar),
+    ('006_historial_sin_llave', m006_historial_sin_llave.aplicar),
+]
+
+_metadata = MetaData()
+migraciones_aplicadas = Table(
+    'migraciones_aplicadas', _metadata,
+    Column('nombre', String(100), primary_key=True),
+    Column('aplicada_en', DateTime, nullable=False),
+)
+
+
+def aplicar_migraciones(engine):
+    """Aplicar las migraciones pendientes (idempotente)"""
+    with engine.begin() as conexion:
+        _metadata.create_all(conexion)
+        aplicadas = set(conexion.execute(select(migraciones_aplicadas.c.nombre)).scalars())
+
+    for nombre, aplicar in MIGRACIONES:
+        if nombre in aplicadas:
+            continue
+        print(f"🔧 Aplicando migración {nombre}")
+        with engine.begin() as conexion:
+            aplicar(conexion)
+            conexion.execute(
+                migraciones_aplicadas.insert().values(nombre=nombre, aplicada_en=datetime.now())
+            )
+        print(f"✅ Migración {nombre} aplicada")
@@ -0,0 +1,36 @@
+"""
+Facturas autocontenidas: historial_facturas guarda el tipo de tarifa, la
+versión y los precios con que se cobró, y configuracion_precios lleva un
+contador de versión.
+
+Las facturas existentes toman es_nocturno del vehículo (tabla activa o
+archivo). Los precios de facturas antiguas quedan en NULL porque la tarifa
+vigente en ese momento ya no se conoce.
+"""
+from sqlalchemy import inspect
+from app.migraciones.utilidades import agregar_columna
+from app.modelos.configuracion_precios import ConfiguracionPrecios
+from app.modelos.historial_factura import HistorialFactura
+from app.servicios.archivo_service import PREFIJO_ARCHIVO
+
+
+def aplicar(conexion):
+    config = ConfiguracionPrecios.__table__.c
+    agregar_columna(conexion, 'configuracion_precios', config.version, default_sql='1')
+
+    factura = HistorialFactura.__table__.c
+    agregar_columna(conexion, 'historial_facturas', factura.es_nocturno, default_sql='0')
+    for columna in (factura.version_tarifa, factura.precio_media_hora,
+                    factura.precio_hora_adicional, factura.precio_nocturno):
+        agregar_columna(conexion, 'historial_facturas', columna)
+
+    # Backfill de es_nocturno desde la tabla activa y las tablas de archivo
+    tablas = ['vehiculos_estacionados'] + sorted(
+        nombre for nombre in inspect(conexion).get_table_names()
+        if nombre.startswith(PREFIJO_ARCHIVO)
+    )
+    for tabla in tablas:
+        conexion.exec_driver_sql(
+            f"UPDATE historial_facturas SET es_nocturno = 1 "
+            f"WHERE vehiculo_id IN (SELECT id FROM {tabla} WHERE es_nocturno = 1)"
+        )
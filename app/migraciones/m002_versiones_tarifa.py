@@ -0,0 +1,37 @@
+"""
+Historial de versiones de la tarifa (tabla versiones_tarifa).
+
+create_all ya creó la tabla; aquí se registra la configuración actual como
+primera versión, vigente desde el momento de la migración. Las versiones
+anteriores no se reconstruyen (las facturas no guardan los horarios
+nocturnos); las estancias de antes se cobran con esta primera versión.
+"""
+from datetime import datetime
+from sqlalchemy import select, func
+from app.modelos.configuracion_precios import ConfiguracionPrecios
+from app.modelos.version_tarifa import VersionTarifa
+
+
+def aplicar(conexion):
+    versiones = VersionTarifa.__table__
+    if conexion.execute(select(func.count()).select_from(versiones)).scalar():
+        return
+    config = ConfiguracionPrecios.__table__.c
+    fila = conexion.execute(
+        select(config.version, config.precio_media_hora, config.precio_hora_adicional,
+               config.precio_nocturno, config.hora_inicio_nocturno, config.hora_fin_nocturno)
+        .order_by(config.id.desc()).limit(1)
+    ).first()
+    if fila is None:
+        # Base nueva: la versión se crea junto con la configuración por defecto
+        return
+    conexion.execute(versiones.insert().values(
+        version=fila.version or 1,
+        precio_media_hora=fila.precio_media_hora,
+        precio_hora_adicional=fila.precio_hora_adicional,
+        precio_nocturno=fila.precio_nocturno,
+        hora_inicio_nocturno=fila.hora_inicio_nocturno,
+        hora_fin_nocturno=fila.hora_fin_nocturno,
+        vigente_desde=datetime.now(),
+        creado_en=datetime.utcnow()
+    ))
@@ -0,0 +1,24 @@
+"""
+Índices por fecha de entrada y de salida.
+
+Los reportes (diario, detallado, rango, ocupación) filtran
+vehiculos_estacionados por rango de fechas y la exportación lee
+historial_facturas por fecha de salida; sin estos índices cada consulta
+recorría la tabla completa. create_all solo los crea en bases nuevas. Las
+tablas de archivo ya existentes no se tocan: se leen solo para rangos
+viejos y las nuevas se crean con los índices.
+"""
+from app.migraciones.utilidades import crear_indice
+from app.modelos.historial_factura import HistorialFactura
+from app.modelos.vehiculo_estacionado import VehiculoEstacionado
+
+
+def aplicar(conexion):
+    columnas = (
+        VehiculoEstacionado.__table__.c.fecha_hora_entrada,
+        VehiculoEstacionado.__table__.c.fecha_hora_salida,
+        HistorialFactura.__table__.c.fecha_hora_salida,
+    )
+    for indice in list(VehiculoEstacionado.__table__.indexes) + list(HistorialFactura.__table__.indexes):
+        if any(columna in columnas for columna in indice.columns):
+            crear_indice(conexion, indice)
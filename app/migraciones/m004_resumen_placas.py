@@ -0,0 +1,17 @@
+"""
+Historial por placa: índice (placa, fecha_generacion) y tabla resumen_placas.
+
+create_all ya creó resumen_placas vacía; aquí se llena una sola vez con los
+totales de las facturas existentes. Desde entonces cada salida actualiza la
+fila de su placa.
+"""
+from app.migraciones.utilidades import crear_indice
+from app.modelos.historial_factura import HistorialFactura
+from app.servicios.resumen_placa_service import ResumenPlacaService
+
+
+def aplicar(conexion):
+    for indice in HistorialFactura.__table__.indexes:
+        if indice.name == 'ix_historial_facturas_placa_fecha':
+            crear_indice(conexion, indice)
+    ResumenPlacaService.recalcular(conexion)
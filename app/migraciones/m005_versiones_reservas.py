@@ -0,0 +1,20 @@
+"""
+Contadores de cambios de reservas por espacio (tabla reservas_versiones).
+
+create_all ya creó la tabla; aquí se crea una fila por espacio. Las altas
+bloquean la fila de su espacio, así que tiene que existir de antemano.
+"""
+from sqlalchemy import select
+from app.config import TOTAL_ESPACIOS
+from app.modelos.version_reservas import VersionReservas
+
+
+def aplicar(conexion):
+    versiones = VersionReservas.__table__
+    existentes = set(conexion.execute(select(versiones.c.espacio_numero)).scalars())
+    faltantes = [
+        {'espacio_numero': espacio, 'version': 0}
+        for espacio in range(1, TOTAL_ESPACIOS + 1) if espacio not in existentes
+    ]
+    if faltantes:
+        conexion.execute(versiones.insert(), faltantes)
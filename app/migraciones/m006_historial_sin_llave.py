@@ -0,0 +1,18 @@
+"""
+Facturas sin llave foránea a vehiculos_estacionados.
+
+El archivo mueve las estancias viejas fuera de la tabla activa, así que la
+factura ya no puede exigir que su vehículo siga ahí. Las bases creadas antes
+de separar el archivo tienen la llave; aquí se elimina una sola vez (SQLite
+no nombra sus llaves foráneas y no admite DROP FOREIGN KEY: se omite).
+"""
+from sqlalchemy import inspect
+from app.modelos.historial_factura import HistorialFactura
+from app.modelos.vehiculo_estacionado import VehiculoEstacionado
+
+
+def aplicar(conexion):
+    tabla = HistorialFactura.__tablename__
+    for llave in inspect(conexion).get_foreign_keys(tabla):
+        if llave.get('referred_table') == VehiculoEstacionado.__tablename__ and llave.get('name'):
+            conexion.exec_driver_sql(f"ALTER TABLE {tabla} DROP FOREIGN KEY {llave['name']}")
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Index, inspect
+
+
+def agregar_columna(conexion, tabla: str, columna: Column, default_sql: str = None):
+    """ALTER TABLE ... ADD COLUMN si la columna todavía no existe"""
+    existentes = {c['name'] for c in inspect(conexion).get_columns(tabla)}
+    if columna.name in existentes:
+        return False
+    tipo = columna.type.compile(dialect=conexion.dialect)
+    sql = f"ALTER TABLE {tabla} ADD COLUMN {columna.name} {tipo}"
+    if default_sql is not None:
+        sql += f" DEFAULT {default_sql}"
+    if not columna.nullable:
+        sql += " NOT NULL"
+    conexion.exec_driver_sql(sql)
+    return True
+
+
+def crear_indice(conexion, indice: Index):
+    """CREATE INDEX si la tabla todavía no tiene un índice con ese nombre"""
+    existentes = {i['name'] for i in inspect(conexion).get_indexes(indice.table.name)}
+    if indice.name in existentes:
+        return False
+    indice.create(conexion)
+    return True
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from app.config import Base
+
+class AlertaEmitida(Base):
+    """
+    Alertas emitidas por el planificador (canal compartido entre workers).
+
+    Solo el worker que emite las alertas escribe aquí; cualquier worker las
+    lee por id creciente para GET /api/alertas/.
+    """
+    __tablename__ = 'alertas_emitidas'
+    
+    id = Column(Integer, primary_key=True, index=True)  # secuencia que usan los clientes
+    tipo = Column(String(30), nullable=False)
+    vehiculo_id = Column(Integer, nullable=False)
+    placa = Column(String(20), nullable=False)
+    espacio = Column(Integer, nullable=False)
+    entrada = Column(DateTime, nullable=False)
+    limite = Column(DateTime, nullable=False)
+    vence = Column(DateTime, nullable=False)
+    emitida_en = Column(DateTime, nullable=False, index=True)
+
+    def to_dict(self):
+        """Convertir el modelo a diccionario (mismo formato que emite el planificador)"""
+        return {
+            'seq': self.id,
+            'tipo': self.tipo,
+            'vehiculo_id': self.vehiculo_id,
+            'placa': self.placa,
+            'espacio': self.espacio,
+            'entrada': self.entrada.isoformat(),
+            'limite': self.limite.isoformat(),
+            'vence': self.vence.isoformat(),
+            'emitida_en': self.emitida_en.isoformat()
+        }
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from datetime import datetime
+from app.config import Base
+
+class ClaveIdempotencia(Base):
+    """Respuesta guardada de una petición con encabezado Idempotency-Key"""
+    __tablename__ = 'claves_idempotencia'
+    
+    ruta = Column(String(50), primary_key=True)
+    clave = Column(String(100), primary_key=True)
+    # SHA-256 del cuerpo de la petición: la misma clave con otro cuerpo es un error
+    huella = Column(String(64), nullable=False)
+    # NULL mientras la primera petición se está procesando
+    estado_http = Column(Integer, nullable=True)
+    respuesta = Column(Text, nullable=True)  # JSON compacto
+    creada_en = Column(DateTime, nullable=False, default=datetime.now)
+    expira_en = Column(DateTime, nullable=False, index=True)
@@ -1,27 +1,32 @@
-from sqlalchemy import Column, Integer, Numeric, Time, DateTime
+from sqlalchemy import Column, Integer, Time, DateTime
 from datetime import datetime, time as dt_time
 from app.config import Base
+from app.utils.dinero import Centavos, a_float
 
 class ConfiguracionPrecios(Base):
     """Modelo para la configuración de precios del parqueadero"""
     __tablename__ = 'configuracion_precios'
     
     id = Column(Integer, primary_key=True, index=True)
-    precio_media_hora = Column(Numeric(10, 2), nullable=False, default=0.50)
-    precio_hora_adicional = Column(Numeric(10, 2), nullable=False, default=1.00)
-    precio_nocturno = Column(Numeric(10, 2), nullable=False, default=10.00)
+    # Precios en centavos (Numeric(10, 2) en la base)
+    precio_media_hora = Column(Centavos, nullable=False, default=50)
+    precio_hora_adicional = Column(Centavos, nullable=False, default=100)
+    precio_nocturno = Column(Centavos, nullable=False, default=1000)
     hora_inicio_nocturno = Column(Time, nullable=False, default=dt_time(19, 0))
     hora_fin_nocturno = Column(Time, nullable=False, default=dt_time(7, 0))
     actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Se incrementa con cada cambio de precios u horarios
+    version = Column(Integer, nullable=False, default=1)
 
     def to_dict(self):
         """Convertir el modelo a diccionario"""
         return {
             'id': self.id,
-            'precio_media_hora': float(self.precio_media_hora),
-            'precio_hora_adicional': float(self.precio_hora_adicional),
-            'precio_nocturno': float(self.precio_nocturno),
+            'precio_media_hora': a_float(self.precio_media_hora),
+            'precio_hora_adicional': a_float(self.precio_hora_adicional),
+            'precio_nocturno': a_float(self.precio_nocturno),
             'hora_inicio_nocturno': str(self.hora_inicio_nocturno),
             'hora_fin_nocturno': str(self.hora_fin_nocturno),
-            'actualizado_en': self.actualizado_en.isoformat() if self.actualizado_en else None
+            'actualizado_en': self.actualizado_en.isoformat() if self.actualizado_en else None,
+            'version': self.version
         }
\ No newline at end of file
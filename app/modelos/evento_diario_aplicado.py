@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime
+from app.config import Base
+
+class EventoDiarioAplicado(Base):
+    """
+    Eventos del diario local de la puerta ya llevados a la base.
+
+    La llave es el id del diario más la secuencia del evento: se inserta en
+    la misma transacción que aplica el evento, así que si dos procesos
+    intentan aplicar el mismo evento el segundo choca con la llave primaria
+    (espera al primero y recibe IntegrityError) en lugar de duplicar la
+    estancia o la factura.
+    """
+    __tablename__ = 'eventos_diario_aplicados'
+    
+    clave = Column(String(64), primary_key=True)  # "<id del diario>:<seq>"
+    aplicado_en = Column(DateTime, nullable=False, default=datetime.now)
@@ -1,25 +1,48 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.config import Base
+from app.utils.dinero import Centavos, a_float
 
 class HistorialFactura(Base):
     """Modelo para el historial de facturas"""
     __tablename__ = 'historial_facturas'
     
     id = Column(Integer, primary_key=True, index=True)
-    vehiculo_id = Column(Integer, ForeignKey('vehiculos_estacionados.id'), nullable=False)
+    # Sin llave foránea: el vehículo puede estar archivado fuera de vehiculos_estacionados
+    vehiculo_id = Column(Integer, nullable=False, index=True)
     placa = Column(String(20), nullable=False)
     espacio_numero = Column(Integer, nullable=False)
     fecha_hora_entrada = Column(DateTime, nullable=False)
-    fecha_hora_salida = Column(DateTime, nullable=False)
+    # Indexada: la exportación lee las facturas por fecha de salida
+    fecha_hora_salida = Column(DateTime, nullable=False, index=True)
     tiempo_total_minutos = Column(Integer, nullable=False)
-    costo_total = Column(Numeric(10, 2), nullable=False)
+    costo_total = Column(Centavos, nullable=False)  # centavos
     detalles_cobro = Column(Text)
     fecha_generacion = Column(DateTime, default=datetime.utcnow, index=True)
 
-    # Relación con vehículo
-    vehiculo = relationship("VehiculoEstacionado", back_populates="factura")
+    # Datos de la tarifa copiados al momento de la salida: la factura no
+    # necesita leer el vehículo ni la configuración para mostrarse
+    es_nocturno = Column(Boolean, nullable=False, default=False)
+    version_tarifa = Column(Integer, nullable=True)
+    precio_media_hora = Column(Centavos, nullable=True)
+    precio_hora_adicional = Column(Centavos, nullable=True)
+    precio_nocturno = Column(Centavos, nullable=True)
+
+    # Relación con vehículo (no se carga al listar facturas; acceder a ella
+    # sin cargarla explícitamente lanza error en vez de hacer un SELECT por fila)
+    vehiculo = relationship(
+        "VehiculoEstacionado",
+        back_populates="factura",
+        primaryjoin="foreign(HistorialFactura.vehiculo_id) == VehiculoEstacionado.id",
+        lazy="raise_on_sql"
+    )
+
+    __table_args__ = (
+        # Historial de una placa paginado por (fecha_generacion, id): el id
+        # va implícito en el índice (rowid en SQLite, llave primaria en InnoDB)
+        Index('ix_historial_facturas_placa_fecha', 'placa', 'fecha_generacion'),
+    )
 
     def to_dict(self):
         """Convertir el modelo a diccionario"""
@@ -31,9 +54,9 @@ class HistorialFactura(Base):
             'fecha_hora_entrada': self.fecha_hora_entrada.isoformat(),
             'fecha_hora_salida': self.fecha_hora_salida.isoformat(),
             'tiempo_total_minutos': self.tiempo_total_minutos,
-            'costo_total': float(self.costo_total),
+            'costo_total': a_float(self.costo_total),
             'detalles_cobro': self.detalles_cobro,
             'fecha_generacion': self.fecha_generacion.isoformat(),
-            'es_nocturno': self.vehiculo.es_nocturno if self.vehiculo else False  # ¡¡¡ESTO FALTABA!!!
-
+            'es_nocturno': self.es_nocturno,
+            'version_tarifa': self.version_tarifa
         }
\ No newline at end of file
@@ -0,0 +1,43 @@
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Index, CheckConstraint
+from datetime import datetime
+from app.config import Base
+
+class Reserva(Base):
+    """Reserva de un espacio para la ventana de llegada de un huésped"""
+    __tablename__ = 'reservas'
+    
+    id = Column(Integer, primary_key=True, index=True)
+    espacio_numero = Column(Integer, nullable=False)
+    placa = Column(String(20), nullable=False, index=True)
+    nombre_huesped = Column(String(100), nullable=True)
+    inicio = Column(DateTime, nullable=False)
+    fin = Column(DateTime, nullable=False)
+    estado = Column(
+        Enum('activa', 'cancelada', 'utilizada', name='estado_reserva'),
+        default='activa', nullable=False
+    )
+    # Vehículo que ingresó con la reserva (check-in)
+    vehiculo_id = Column(Integer, nullable=True)
+    creada_en = Column(DateTime, nullable=False, default=datetime.now)
+    # Última alta, cancelación o ingreso (la marca del índice en memoria es
+    # la de VersionReservas)
+    actualizada_en = Column(DateTime, nullable=False, default=datetime.now, index=True)
+
+    __table_args__ = (
+        CheckConstraint('espacio_numero >= 1 AND espacio_numero <= 24', name='check_reserva_espacio_valido'),
+        Index('ix_reservas_espacio_estado_inicio', 'espacio_numero', 'estado', 'inicio'),
+    )
+
+    def to_dict(self):
+        """Convertir el modelo a diccionario"""
+        return {
+            'id': self.id,
+            'espacio_numero': self.espacio_numero,
+            'placa': self.placa,
+            'nombre_huesped': self.nombre_huesped,
+            'inicio': self.inicio.isoformat() if self.inicio else None,
+            'fin': self.fin.isoformat() if self.fin else None,
+            'estado': self.estado,
+            'vehiculo_id': self.vehiculo_id,
+            'creada_en': self.creada_en.isoformat() if self.creada_en else None
+        }
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, Date
+from app.config import Base
+
+class ResumenEspacioMensual(Base):
+    """Agregado por mes, espacio y hora del día (base del mapa de utilización)"""
+    __tablename__ = 'resumen_espacio_mensual'
+    
+    mes = Column(Date, primary_key=True)  # primer día del mes
+    espacio = Column(Integer, primary_key=True)
+    hora = Column(Integer, primary_key=True)  # 0-23
+    # Segundos ocupados en esa hora del día sumando todos los días del mes
+    segundos_ocupados = Column(Integer, nullable=False, default=0)
+    # Estancias que entraron al espacio en esa hora del día
+    llegadas = Column(Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        """Convertir el modelo a diccionario"""
+        return {
+            'mes': self.mes.isoformat(),
+            'espacio': self.espacio,
+            'hora': self.hora,
+            'segundos_ocupados': self.segundos_ocupados,
+            'llegadas': self.llegadas
+        }
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, Date, Float
+from app.config import Base
+
+class ResumenHorario(Base):
+    """Agregado por día y hora de las estancias (base del pronóstico de demanda)"""
+    __tablename__ = 'resumen_horario'
+    
+    fecha = Column(Date, primary_key=True)
+    hora = Column(Integer, primary_key=True)  # 0-23
+    llegadas = Column(Integer, nullable=False, default=0)
+    llegadas_nocturnas = Column(Integer, nullable=False, default=0)
+    # Vehículos presentes en la hora: promedio ponderado por tiempo y máximo
+    ocupacion_promedio = Column(Float, nullable=False, default=0.0)
+    ocupacion_maxima = Column(Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        """Convertir el modelo a diccionario"""
+        return {
+            'fecha': self.fecha.isoformat(),
+            'hora': self.hora,
+            'llegadas': self.llegadas,
+            'llegadas_nocturnas': self.llegadas_nocturnas,
+            'ocupacion_promedio': self.ocupacion_promedio,
+            'ocupacion_maxima': self.ocupacion_maxima
+        }
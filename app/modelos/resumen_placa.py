@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from app.config import Base
+from app.utils.dinero import Centavos, a_float
+
+class ResumenPlaca(Base):
+    """
+    Totales de las facturas de una placa (clientes frecuentes).
+
+    Se actualiza en la misma transacción que crea cada factura, así que las
+    estadísticas de una placa son una lectura por llave primaria en lugar de
+    agregar todo su historial.
+    """
+    __tablename__ = 'resumen_placas'
+    
+    placa = Column(String(20), primary_key=True)
+    visitas = Column(Integer, nullable=False, default=0)
+    visitas_nocturnas = Column(Integer, nullable=False, default=0)
+    minutos_totales = Column(Integer, nullable=False, default=0)
+    gasto_total = Column(Centavos, nullable=False, default=0)  # centavos
+    primera_visita = Column(DateTime, nullable=False)  # entrada de la primera factura
+    ultima_visita = Column(DateTime, nullable=False)  # salida de la última factura
+
+    def to_dict(self):
+        """Convertir el modelo a diccionario"""
+        return {
+            'placa': self.placa,
+            'visitas': self.visitas,
+            'visitas_nocturnas': self.visitas_nocturnas,
+            'minutos_totales': self.minutos_totales,
+            'gasto_total': a_float(self.gasto_total),
+            'primera_visita': self.primera_visita.isoformat(),
+            'ultima_visita': self.ultima_visita.isoformat()
+        }
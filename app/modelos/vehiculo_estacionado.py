@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Enum, CheckConstraint, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Enum, CheckConstraint, Boolean
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.config import Base
+from app.utils.dinero import Centavos, a_float
 
 class VehiculoEstacionado(Base):
     """Modelo para vehículos estacionados"""
@@ -10,16 +11,22 @@ class VehiculoEstacionado(Base):
     id = Column(Integer, primary_key=True, index=True)
     placa = Column(String(20), nullable=False, index=True)
     espacio_numero = Column(Integer, nullable=False, index=True)
-    fecha_hora_entrada = Column(DateTime, nullable=False, default=datetime.now)
-    fecha_hora_salida = Column(DateTime, nullable=True)
-    costo_total = Column(Numeric(10, 2), nullable=True)
+    # Indexadas: los reportes filtran por rango de entrada y de salida
+    fecha_hora_entrada = Column(DateTime, nullable=False, default=datetime.now, index=True)
+    fecha_hora_salida = Column(DateTime, nullable=True, index=True)
+    costo_total = Column(Centavos, nullable=True)  # centavos
     estado = Column(Enum('activo', 'finalizado', name='estado_vehiculo'), default='activo', index=True)
     # CAMPO NOCTURNO
     es_nocturno = Column(Boolean, default=False, nullable=False, index=True)
     creado_en = Column(DateTime, default=datetime.now)
 
     # Relación con facturas
-    factura = relationship("HistorialFactura", back_populates="vehiculo", uselist=False)
+    factura = relationship(
+        "HistorialFactura",
+        back_populates="vehiculo",
+        uselist=False,
+        primaryjoin="VehiculoEstacionado.id == foreign(HistorialFactura.vehiculo_id)"
+    )
 
     __table_args__ = (
         # ✅ CAMBIO: De 15 a 24
@@ -34,7 +41,7 @@ class VehiculoEstacionado(Base):
             'espacio_numero': self.espacio_numero,
             'fecha_hora_entrada': self.fecha_hora_entrada.isoformat() if self.fecha_hora_entrada else None,
             'fecha_hora_salida': self.fecha_hora_salida.isoformat() if self.fecha_hora_salida else None,
-            'costo_total': float(self.costo_total) if self.costo_total else None,
+            'costo_total': a_float(self.costo_total) if self.costo_total else None,
             'estado': self.estado,
             'es_nocturno': self.es_nocturno,
             'creado_en': self.creado_en.isoformat() if self.creado_en else None
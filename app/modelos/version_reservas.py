@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer
+from app.config import Base
+
+class VersionReservas(Base):
+    """
+    Contador de cambios de las reservas de un espacio (una fila por espacio).
+
+    Cada alta, cancelación o ingreso con reserva incrementa la fila de su
+    espacio en la misma transacción. El UPDATE bloquea la fila hasta el
+    commit, así que dos altas en el mismo espacio se serializan entre
+    workers; y la suma de los contadores solo crece, por lo que sirve de
+    marca para saber si el índice en memoria está al día.
+    """
+    __tablename__ = 'reservas_versiones'
+    
+    espacio_numero = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,53 @@
+from sqlalchemy import Column, Integer, Time, DateTime
+from datetime import datetime
+from app.config import Base
+from app.utils.dinero import Centavos, a_float
+
+class VersionTarifa(Base):
+    """
+    Versión de la tarifa de precios.
+
+    Solo se agregan filas: cada cambio de configuración deja aquí los precios
+    y horarios nuevos con el momento desde el que rigen, y una estancia se
+    cobra con la versión vigente a su hora de entrada.
+    """
+    __tablename__ = 'versiones_tarifa'
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # Mismo número que configuracion_precios.version y historial_facturas.version_tarifa
+    version = Column(Integer, nullable=False, unique=True)
+    # Precios en centavos (Numeric(10, 2) en la base)
+    precio_media_hora = Column(Centavos, nullable=False)
+    precio_hora_adicional = Column(Centavos, nullable=False)
+    precio_nocturno = Column(Centavos, nullable=False)
+    hora_inicio_nocturno = Column(Time, nullable=False)
+    hora_fin_nocturno = Column(Time, nullable=False)
+    # Hora local, igual que fecha_hora_entrada de los vehículos
+    vigente_desde = Column(DateTime, nullable=False, index=True)
+    creado_en = Column(DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def desde_configuracion(cls, config, vigente_desde: datetime):
+        """Copia de la fila de ConfiguracionPrecios que rige desde `vigente_desde`"""
+        return cls(
+            version=config.version or 1,
+            precio_media_hora=config.precio_media_hora,
+            precio_hora_adicional=config.precio_hora_adicional,
+            precio_nocturno=config.precio_nocturno,
+            hora_inicio_nocturno=config.hora_inicio_nocturno,
+            hora_fin_nocturno=config.hora_fin_nocturno,
+            vigente_desde=vigente_desde
+        )
+
+    def to_dict(self):
+        """Convertir el modelo a diccionario"""
+        return {
+            'id': self.id,
+            'version': self.version,
+            'precio_media_hora': a_float(self.precio_media_hora),
+            'precio_hora_adicional': a_float(self.precio_hora_adicional),
+            'precio_nocturno': a_float(self.precio_nocturno),
+            'hora_inicio_nocturno': str(self.hora_inicio_nocturno),
+            'hora_fin_nocturno': str(self.hora_fin_nocturno),
+            'vigente_desde': self.vigente_desde.isoformat()
+        }
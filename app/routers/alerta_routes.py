@@ -0,0 +1,28 @@
+from fastapi import APIRouter, HTTPException, Query
+from app.servicios.alerta_service import AlertaService
+
+router = APIRouter(
+    prefix="/api/alertas",
+    tags=["Alertas"]
+)
+
+@router.get("/")
+async def leer_alertas(
+    desde: int = Query(0, ge=0),
+    espera: float = Query(0, ge=0, le=25),
+):
+    """
+    Alertas emitidas después de `desde` (número de secuencia) y las próximas
+    
+    Con `espera` > 0 la petición queda abierta hasta que llegue una alerta
+    nueva o pasen esos segundos (long-poll, sin ocupar un hilo). Las alertas
+    las emite un solo worker y quedan en la base, así que cualquier worker
+    las devuelve; `ultima_seq` es el valor de `desde` para la próxima lectura.
+    """
+    try:
+        return {
+            "success": True,
+            "data": await AlertaService.esperar(desde, espera)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
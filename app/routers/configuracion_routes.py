@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from app.config import get_db
 from app.servicios.configuracion_service import ConfiguracionService
 from app.esquemas.configuracion_schema import ConfiguracionResponse, ConfiguracionUpdate
+from app.utils.dinero import desde_dolares
 
 router = APIRouter(
     prefix="/api/configuracion",
@@ -23,8 +24,19 @@ def actualizar_configuracion(datos: ConfiguracionUpdate, db: Session = Depends(g
     """Actualizar la configuración de precios (Solo administrador)"""
     try:
         # Convertir el modelo Pydantic a dict excluyendo valores None
-        datos_dict = datos.dict(exclude_none=True)
+        datos_dict = datos.model_dump(exclude_none=True)
+        # Los precios llegan en dólares; internamente se manejan en centavos
+        for campo in ('precio_media_hora', 'precio_hora_adicional', 'precio_nocturno'):
+            if campo in datos_dict:
+                datos_dict[campo] = desde_dolares(datos_dict[campo])
         config = ConfiguracionService.actualizar_configuracion(db, datos_dict)
         return config.to_dict()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+@router.get("/versiones")
+def listar_versiones(db: Session = Depends(get_db)):
+    """Historial de versiones de la tarifa, la más reciente primero"""
+    try:
+        return [v.to_dict() for v in ConfiguracionService.listar_versiones(db)]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from app.servicios.bitacora_service import BitacoraService, MAX_EVENTOS_LECTURA
+
+router = APIRouter(
+    prefix="/api/eventos",
+    tags=["Eventos"]
+)
+
+@router.get("/")
+def leer_eventos(
+    desde: int = Query(0, ge=0, description="Offset devuelto como 'siguiente' en la lectura anterior"),
+    limite: int = Query(1000, ge=1, le=MAX_EVENTOS_LECTURA)
+):
+    """
+    Seguir la bitácora de eventos (entradas, salidas y cambios de tarifa)
+    
+    Devuelve los eventos a partir del offset `desde` y el offset `siguiente`
+    para continuar; un consumidor guarda ese offset y vuelve a pedir desde ahí.
+    """
+    try:
+        return {
+            "success": True,
+            "data": BitacoraService.leer(desde, limite)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/estado")
+def estado_eventos(
+    desde: Optional[str] = Query(None, description="Fecha inicial YYYY-MM-DD"),
+    hasta: Optional[str] = Query(None, description="Fecha final YYYY-MM-DD")
+):
+    """
+    Ocupación actual y totales por día reconstruidos desde la bitácora
+    """
+    try:
+        return {
+            "success": True,
+            "data": BitacoraService.resumen(desde, hasta)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from app.config import get_db_lectura
+from app.servicios.factura_service import FacturaService
+
+router = APIRouter(
+    prefix="/api/facturas",
+    tags=["Facturas"]
+)
+
+@router.get("/{factura_id}.pdf")
+def descargar_factura_pdf(factura_id: int, db: Session = Depends(get_db_lectura)):
+    """
+    Descargar la factura en PDF
+    
+    Se sirve directamente desde la cache en disco (FileResponse, sin cargar
+    el archivo en memoria); si aún no se ha renderizado, se genera y se espera.
+    """
+    try:
+        ruta = FacturaService.ruta_pdf(db, factura_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if ruta is None:
+        raise HTTPException(status_code=404, detail="Factura no encontrada")
+    
+    return FileResponse(
+        ruta,
+        media_type="application/pdf",
+        filename=f"factura_{factura_id}.pdf",
+        headers={"Cache-Control": "private, max-age=86400"}
+    )
@@ -1,16 +1,177 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
+from sqlalchemy import func
+import tempfile
 from datetime import datetime, timedelta, date
-from app.config import get_db
-from app.esquemas.factura_schema import ReporteDiario, ReporteDetalladoSchema
+from app.config import get_db_lectura
+from app.esquemas.factura_schema import (
+    ReporteDiario,
+    ReporteDetalladoSchema,
+    ReporteRangoSchema,
+    ReporteOcupacionSchema,
+    PronosticoSchema,
+    ReporteUtilizacionSchema
+)
+from app.servicios.reporte_service import ReporteService, _restar_un_anio
+from app.servicios.pronostico_service import PronosticoService
+from app.servicios.utilizacion_service import UtilizacionService
+from app.servicios.exportacion_service import ExportacionService
+from app.servicios.archivo_service import ArchivoService
+from app.servicios.configuracion_service import ConfiguracionService
+from app.utils.dinero import a_float
+from app.utils.cache_reportes import cache_reportes, dia_cerrado
 
 router = APIRouter(
     prefix="/api/reportes",
     tags=["Reportes"]
 )
 
+def _dias_del_rango(desde: str, hasta: str):
+    """Días (desde, hasta) que lee un reporte de rango, para invalidar la cache; () si no se pueden leer"""
+    try:
+        return ((datetime.fromisoformat(desde).date(), datetime.fromisoformat(hasta).date()),)
+    except ValueError:
+        return ()
+
+def _calcular_reporte_diario(db: Session, fecha_actual: date):
+    """Calcular el reporte diario (sin cache)"""
+    inicio_dia = datetime.combine(fecha_actual, datetime.min.time())
+    fin_dia = datetime.combine(fecha_actual + timedelta(days=1), datetime.min.time())
+    
+    # Estancias activas + archivadas que pueden caer en el día
+    estancias = ArchivoService.estancias(db, inicio_dia, fin_dia).c
+    
+    # Total vehículos: Los que ENTRARON este día
+    vehiculos_entraron = db.query(func.count(estancias.id)).filter(
+        estancias.fecha_hora_entrada >= inicio_dia,
+        estancias.fecha_hora_entrada < fin_dia
+    ).scalar()
+    
+    # Ingresos: Solo de los que SALIERON este día (suma en centavos)
+    ingresos_total = db.query(
+        func.coalesce(func.sum(estancias.costo_total), 0)
+    ).filter(
+        estancias.estado == "finalizado",
+        estancias.fecha_hora_salida.isnot(None),
+        estancias.fecha_hora_salida >= inicio_dia,
+        estancias.fecha_hora_salida < fin_dia
+    ).scalar()
+    
+    return ReporteDiario(
+        fecha=fecha_actual.strftime("%Y-%m-%d"),
+        total_vehiculos=vehiculos_entraron,
+        ingresos_total=a_float(ingresos_total)
+    )
+
+def _calcular_reporte_detallado(db: Session, fecha_actual: date):
+    """Calcular el reporte detallado (sin cache)"""
+    inicio_dia = datetime.combine(fecha_actual, datetime.min.time())
+    fin_dia = datetime.combine(fecha_actual + timedelta(days=1), datetime.min.time())
+    
+    # Estancias activas + archivadas; solo se leen las columnas necesarias
+    # (tuplas, no objetos ORM)
+    estancias = ArchivoService.estancias(db, inicio_dia, fin_dia).c
+    
+    # Vehículos que ENTRARON este día (para estadísticas)
+    vehiculos_entraron = db.query(
+        estancias.espacio_numero,
+        estancias.fecha_hora_entrada,
+        estancias.es_nocturno
+    ).filter(
+        estancias.fecha_hora_entrada >= inicio_dia,
+        estancias.fecha_hora_entrada < fin_dia
+    ).all()
+    
+    # Vehículos que SALIERON este día (para ingresos)
+    vehiculos_salieron = db.query(
+        estancias.fecha_hora_entrada,
+        estancias.fecha_hora_salida,
+        estancias.costo_total,
+        estancias.es_nocturno
+    ).filter(
+        estancias.estado == "finalizado",
+        estancias.fecha_hora_salida.isnot(None),
+        estancias.fecha_hora_salida >= inicio_dia,
+        estancias.fecha_hora_salida < fin_dia
+    ).all()
+    
+    # ===== CALCULAR ESTADÍSTICAS =====
+    
+    # 1. Nocturnos vs Diurnos (de los que ENTRARON)
+    nocturnos = sum(1 for v in vehiculos_entraron if v.es_nocturno)
+    diurnos = len(vehiculos_entraron) - nocturnos
+    
+    # Ingresos (de los que SALIERON), sumas enteras en centavos
+    ingresos_nocturnos = 0
+    ingresos_diurnos = 0
+    for v in vehiculos_salieron:
+        if v.es_nocturno:
+            ingresos_nocturnos += v.costo_total or 0
+        else:
+            ingresos_diurnos += v.costo_total or 0
+    
+    # 2. Horas pico (por hora de ENTRADA)
+    horas_pico_dict = {}
+    for v in vehiculos_entraron:
+        hora = v.fecha_hora_entrada.strftime("%H:00")
+        horas_pico_dict[hora] = horas_pico_dict.get(hora, 0) + 1
+    
+    horas_pico = [
+        {"hora": hora, "cantidad": cantidad}
+        for hora, cantidad in sorted(horas_pico_dict.items())
+    ]
+    
+    # 3. Espacios más utilizados (de los que ENTRARON)
+    espacios_dict = {}
+    for v in vehiculos_entraron:
+        espacios_dict[v.espacio_numero] = espacios_dict.get(v.espacio_numero, 0) + 1
+    
+    espacios_mas_utilizados = [
+        {"espacio": espacio, "usos": usos}
+        for espacio, usos in sorted(espacios_dict.items(), key=lambda x: x[1], reverse=True)[:10]
+    ]
+    
+    # 4. Distribución de tiempo (solo de los que SALIERON)
+    distribucion = {
+        "menos_1h": 0,
+        "entre_1h_3h": 0,
+        "entre_3h_6h": 0,
+        "mas_6h": 0,
+        "nocturnos": 0
+    }
+    
+    for v in vehiculos_salieron:
+        if v.es_nocturno:
+            distribucion["nocturnos"] += 1
+            continue
+            
+        if v.fecha_hora_salida:
+            minutos = (v.fecha_hora_salida - v.fecha_hora_entrada).total_seconds() / 60
+            
+            if minutos < 60:
+                distribucion["menos_1h"] += 1
+            elif minutos < 180:
+                distribucion["entre_1h_3h"] += 1
+            elif minutos < 360:
+                distribucion["entre_3h_6h"] += 1
+            else:
+                distribucion["mas_6h"] += 1
+    
+    return ReporteDetalladoSchema(
+        fecha=fecha_actual.strftime("%Y-%m-%d"),
+        vehiculos_nocturnos=nocturnos,
+        vehiculos_diurnos=diurnos,
+        ingresos_nocturnos=a_float(ingresos_nocturnos),
+        ingresos_diurnos=a_float(ingresos_diurnos),
+        horas_pico=horas_pico,
+        espacios_mas_utilizados=espacios_mas_utilizados,
+        distribucion_tiempo=distribucion
+    )
+
 @router.get("/diario", response_model=ReporteDiario)
-def obtener_reporte_diario(fecha: str = None, db: Session = Depends(get_db)):
+def obtener_reporte_diario(fecha: str = None, db: Session = Depends(get_db_lectura)):
     """
     Obtener reporte de ingresos diarios
     - Total vehículos: Los que ENTRARON ese día
@@ -22,38 +183,18 @@ def obtener_reporte_diario(fecha: str = None, db: Session = Depends(get_db)):
         else:
             fecha_actual = datetime.strptime(fecha, "%Y-%m-%d").date()
         
-        inicio_dia = datetime.combine(fecha_actual, datetime.min.time())
-        fin_dia = datetime.combine(fecha_actual + timedelta(days=1), datetime.min.time())
-        
-        from app.modelos.vehiculo_estacionado import VehiculoEstacionado
-        
-        # Total vehículos: Los que ENTRARON este día
-        vehiculos_entraron = db.query(VehiculoEstacionado).filter(
-            VehiculoEstacionado.fecha_hora_entrada >= inicio_dia,
-            VehiculoEstacionado.fecha_hora_entrada < fin_dia
-        ).count()
-        
-        # Ingresos: Solo de los que SALIERON este día
-        vehiculos_salieron = db.query(VehiculoEstacionado).filter(
-            VehiculoEstacionado.estado == "finalizado",
-            VehiculoEstacionado.fecha_hora_salida.isnot(None),
-            VehiculoEstacionado.fecha_hora_salida >= inicio_dia,
-            VehiculoEstacionado.fecha_hora_salida < fin_dia
-        ).all()
-        
-        ingresos_total = sum(v.costo_total or 0 for v in vehiculos_salieron)
-        
-        return ReporteDiario(
-            fecha=fecha_actual.strftime("%Y-%m-%d"),
-            total_vehiculos=vehiculos_entraron,
-            ingresos_total=float(ingresos_total)
+        return cache_reportes.obtener_o_calcular(
+            ('diario', fecha_actual, ConfiguracionService.version_actual(db)),
+            lambda: _calcular_reporte_diario(db, fecha_actual),
+            inmutable=dia_cerrado(fecha_actual),
+            fecha=fecha_actual
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/detallado", response_model=ReporteDetalladoSchema)
-def obtener_reporte_detallado(fecha: str = None, db: Session = Depends(get_db)):
+def obtener_reporte_detallado(fecha: str = None, db: Session = Depends(get_db_lectura)):
     """
     Reporte detallado para gráficos con DATOS REALES
     - Estadísticas de vehículos: Los que ENTRARON ese día
@@ -65,104 +206,149 @@ def obtener_reporte_detallado(fecha: str = None, db: Session = Depends(get_db)):
         else:
             fecha_actual = datetime.strptime(fecha, "%Y-%m-%d").date()
         
-        inicio_dia = datetime.combine(fecha_actual, datetime.min.time())
-        fin_dia = datetime.combine(fecha_actual + timedelta(days=1), datetime.min.time())
-        
-        from app.modelos.vehiculo_estacionado import VehiculoEstacionado
-        
-        # Vehículos que ENTRARON este día (para estadísticas)
-        vehiculos_entraron = db.query(VehiculoEstacionado).filter(
-            VehiculoEstacionado.fecha_hora_entrada >= inicio_dia,
-            VehiculoEstacionado.fecha_hora_entrada < fin_dia
-        ).all()
-        
-        # Vehículos que SALIERON este día (para ingresos)
-        vehiculos_salieron = db.query(VehiculoEstacionado).filter(
-            VehiculoEstacionado.estado == "finalizado",
-            VehiculoEstacionado.fecha_hora_salida.isnot(None),
-            VehiculoEstacionado.fecha_hora_salida >= inicio_dia,
-            VehiculoEstacionado.fecha_hora_salida < fin_dia
-        ).all()
-        
-        # ===== CALCULAR ESTADÍSTICAS =====
-        
-        # 1. Nocturnos vs Diurnos (de los que ENTRARON)
-        nocturnos = sum(1 for v in vehiculos_entraron if v.es_nocturno)
-        diurnos = len(vehiculos_entraron) - nocturnos
+        return cache_reportes.obtener_o_calcular(
+            ('detallado', fecha_actual, ConfiguracionService.version_actual(db)),
+            lambda: _calcular_reporte_detallado(db, fecha_actual),
+            inmutable=dia_cerrado(fecha_actual),
+            fecha=fecha_actual
+        )
         
-        # Ingresos (de los que SALIERON)
-        ingresos_nocturnos = sum(
-            v.costo_total or 0 
-            for v in vehiculos_salieron 
-            if v.es_nocturno
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/rango", response_model=ReporteRangoSchema)
+def obtener_reporte_rango(desde: str, hasta: str, granularidad: str = "dia", db: Session = Depends(get_db_lectura)):
+    """
+    Reporte de varios días agrupado por período
+    - granularidad: dia, semana, mes o anio
+    - Vehículos por fecha de ENTRADA, ingresos por fecha de SALIDA
+    - Ocupación promedio (%) y comparación con el año anterior
+    """
+    try:
+        # Un rango que termina antes de hoy ya no cambia
+        try:
+            inmutable = dia_cerrado(datetime.strptime(hasta, "%Y-%m-%d").date())
+        except ValueError:
+            inmutable = False
+        return cache_reportes.obtener_o_calcular(
+            ('rango', desde, hasta, granularidad, ConfiguracionService.version_actual(db)),
+            lambda: ReporteService.reporte_rango(db, desde, hasta, granularidad),
+            inmutable=inmutable,
+            fecha=None if inmutable else date.today(),
+            # También lee el mismo período del año anterior
+            periodos=[
+                dias for inicio, fin in _dias_del_rango(desde, hasta)
+                for dias in ((inicio, fin), (_restar_un_anio(inicio), _restar_un_anio(fin)))
+            ]
         )
-        ingresos_diurnos = sum(
-            v.costo_total or 0 
-            for v in vehiculos_salieron 
-            if not v.es_nocturno
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/ocupacion", response_model=ReporteOcupacionSchema)
+def obtener_reporte_ocupacion(desde: str, hasta: str, resolucion: int = 60, db: Session = Depends(get_db_lectura)):
+    """
+    Serie de ocupación del parqueadero
+    - desde / hasta: YYYY-MM-DD o YYYY-MM-DDTHH:MM
+    - resolucion: minutos por punto (1-1440)
+    - Incluye pico, minutos con el parqueadero lleno y estancia promedio
+    """
+    try:
+        try:
+            inmutable = dia_cerrado(datetime.fromisoformat(hasta).date())
+        except ValueError:
+            inmutable = False
+        return cache_reportes.obtener_o_calcular(
+            ('ocupacion', desde, hasta, resolucion),
+            lambda: ReporteService.reporte_ocupacion(db, desde, hasta, resolucion),
+            inmutable=inmutable,
+            fecha=None if inmutable else date.today(),
+            periodos=_dias_del_rango(desde, hasta)
         )
-        
-        # 2. Horas pico (por hora de ENTRADA)
-        horas_pico_dict = {}
-        for v in vehiculos_entraron:
-            hora = v.fecha_hora_entrada.strftime("%H:00")
-            horas_pico_dict[hora] = horas_pico_dict.get(hora, 0) + 1
-        
-        horas_pico = [
-            {"hora": hora, "cantidad": cantidad}
-            for hora, cantidad in sorted(horas_pico_dict.items())
-        ]
-        
-        # 3. Espacios más utilizados (de los que ENTRARON)
-        espacios_dict = {}
-        for v in vehiculos_entraron:
-            espacios_dict[v.espacio_numero] = espacios_dict.get(v.espacio_numero, 0) + 1
-        
-        espacios_mas_utilizados = [
-            {"espacio": espacio, "usos": usos}
-            for espacio, usos in sorted(espacios_dict.items(), key=lambda x: x[1], reverse=True)[:10]
-        ]
-        
-        # 4. Distribución de tiempo (solo de los que SALIERON)
-        distribucion = {
-            "menos_1h": 0,
-            "entre_1h_3h": 0,
-            "entre_3h_6h": 0,
-            "mas_6h": 0,
-            "nocturnos": 0
-        }
-        
-        for v in vehiculos_salieron:
-            if v.es_nocturno:
-                distribucion["nocturnos"] += 1
-                continue
-                
-            if v.fecha_hora_salida:
-                minutos = (v.fecha_hora_salida - v.fecha_hora_entrada).total_seconds() / 60
-                
-                if minutos < 60:
-                    distribucion["menos_1h"] += 1
-                elif minutos < 180:
-                    distribucion["entre_1h_3h"] += 1
-                elif minutos < 360:
-                    distribucion["entre_3h_6h"] += 1
-                else:
-                    distribucion["mas_6h"] += 1
-        
-        return ReporteDetalladoSchema(
-            fecha=fecha_actual.strftime("%Y-%m-%d"),
-            vehiculos_nocturnos=nocturnos,
-            vehiculos_diurnos=diurnos,
-            ingresos_nocturnos=float(ingresos_nocturnos),
-            ingresos_diurnos=float(ingresos_diurnos),
-            horas_pico=horas_pico,
-            espacios_mas_utilizados=espacios_mas_utilizados,
-            distribucion_tiempo=distribucion
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/utilizacion", response_model=ReporteUtilizacionSchema)
+def obtener_reporte_utilizacion(desde: str, hasta: str, db: Session = Depends(get_db_lectura)):
+    """
+    Mapa de utilización por espacio y hora del día
+    - desde / hasta: YYYY-MM-DD o YYYY-MM-DDTHH:MM
+    - matriz_minutos: minutos ocupados de cada espacio (fila) en cada hora del día (columna)
+    - Por espacio: minutos ocupados y libres, utilización (%), llegadas y rotación diaria
+    - Los meses completos salen del resumen mensual por espacio (lo consolida la tarea de fondo)
+    """
+    try:
+        try:
+            inmutable = dia_cerrado(datetime.fromisoformat(hasta).date())
+        except ValueError:
+            inmutable = False
+        return cache_reportes.obtener_o_calcular(
+            ('utilizacion', desde, hasta),
+            lambda: UtilizacionService.mapa(db, desde, hasta),
+            inmutable=inmutable,
+            fecha=None if inmutable else date.today(),
+            periodos=_dias_del_rango(desde, hasta)
         )
-        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/pronostico", response_model=PronosticoSchema)
+def obtener_pronostico(dias: int = 7, umbral: float = None, db: Session = Depends(get_db_lectura)):
+    """
+    Pronóstico de llegadas y ocupación por hora para los próximos días
+    - Perfil día de la semana x hora con suavizado exponencial
+    - periodos_llenos: horas seguidas con ocupación máxima esperada >= umbral
+    - espacios_nocturnos_sugeridos: espacios a reservar para huéspedes nocturnos
+    """
+    try:
+        return PronosticoService.pronostico(db, dias, umbral)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Bytes por bloque al enviar el libro de Excel
+BLOQUE_EXPORTACION = 64 * 1024
+
+@router.get("/exportar")
+def exportar_excel(desde: str, hasta: str, db: Session = Depends(get_db_lectura)):
+    """
+    Exportar los reportes del rango a Excel (.xlsx)
+    - Hojas: resumen diario, uso por espacio, duración y detalle de facturas
+    - Facturas por fecha de SALIDA
+    - El libro se escribe en un archivo temporal y se envía por bloques
+    """
+    archivo = tempfile.TemporaryFile()
+    try:
+        ExportacionService.escribir_libro(db, desde, hasta, archivo)
+    except ValueError as e:
+        archivo.close()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        archivo.close()
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    archivo.seek(0)
+    return StreamingResponse(
+        iter(lambda: archivo.read(BLOQUE_EXPORTACION), b""),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f'attachment; filename="reportes_{desde}_{hasta}.xlsx"'},
+        background=BackgroundTask(archivo.close)
+    )
+
+@router.get("/cache")
+def estadisticas_cache():
+    """Aciertos, fallos y uso de memoria de la cache de reportes"""
+    return {
+        "success": True,
+        "data": cache_reportes.estadisticas()
+    }
+
 @router.get("/health")
 def health_check():
     return {
@@ -0,0 +1,114 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
+from app.config import get_db
+from app.servicios.reserva_service import ReservaService
+from app.servicios.vehiculo_service import VehiculoService
+from app.esquemas.reserva_schema import ReservaCreate, ReservaIngreso, a_hora_local
+
+router = APIRouter(
+    prefix="/api/reservas",
+    tags=["Reservas"]
+)
+
+@router.post("/", status_code=201)
+def crear_reserva(datos: ReservaCreate, db: Session = Depends(get_db)):
+    """
+    Reservar un espacio para la ventana de llegada de un huésped
+    
+    Sin espacio_numero se asigna el primer espacio libre en la ventana.
+    """
+    try:
+        reserva = ReservaService.crear(
+            db, datos.placa, datos.inicio, datos.fin, datos.espacio_numero, datos.nombre_huesped
+        )
+        return {
+            "success": True,
+            "data": reserva.to_dict()
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/")
+def listar_reservas(
+    espacio: Optional[int] = Query(None, ge=1, le=24),
+    limite: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Reservas activas que aún no terminan, ordenadas por inicio"""
+    try:
+        return {
+            "success": True,
+            "data": [r.to_dict() for r in ReservaService.listar(db, espacio, limite)]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/disponibles")
+def espacios_disponibles(
+    desde: datetime = Query(..., description="Inicio de la ventana (ISO 8601)"),
+    hasta: datetime = Query(..., description="Fin de la ventana (ISO 8601)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Espacios libres para una ventana futura
+    
+    Un espacio está libre si ninguna reserva activa se solapa con la ventana;
+    si la ventana empieza pronto, tampoco cuentan los espacios ocupados ahora.
+    """
+    try:
+        desde, hasta = a_hora_local(desde), a_hora_local(hasta)
+        libres = ReservaService.disponibles(db, desde, hasta)
+        return {
+            "success": True,
+            "data": {
+                "desde": desde.isoformat(),
+                "hasta": hasta.isoformat(),
+                "espacios": libres,
+                "total": len(libres)
+            }
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{reserva_id}/cancelar")
+def cancelar_reserva(reserva_id: int, db: Session = Depends(get_db)):
+    """Cancelar una reserva activa (libera el espacio)"""
+    try:
+        return {
+            "success": True,
+            "data": ReservaService.cancelar(db, reserva_id).to_dict()
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{reserva_id}/ingreso", status_code=201)
+def ingresar_con_reserva(reserva_id: int, datos: ReservaIngreso = None, db: Session = Depends(get_db)):
+    """
+    Registrar la entrada del vehículo de una reserva en su espacio
+    
+    Se acepta desde RESERVA_RETENCION_MINUTOS antes del inicio hasta el fin.
+    """
+    try:
+        reserva = ReservaService.validar_ingreso(db, reserva_id)
+        vehiculo = VehiculoService.registrar_entrada(
+            db, reserva.placa, reserva.espacio_numero, datos.es_nocturno if datos else False
+        )
+        return {
+            "success": True,
+            "data": {
+                "reserva": ReservaService.obtener(db, reserva_id).to_dict(),
+                "vehiculo": vehiculo.to_dict()
+            }
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,16 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
-from typing import List
-from app.config import get_db
+from typing import List, Optional
+from app.config import get_db, get_db_lectura
 from app.servicios.vehiculo_service import VehiculoService
+from app.servicios.calculo_service import CalculoService
+from app.servicios.puerta_local_service import PuertaLocalService, es_caida_de_base, obtener_diario
+from app.servicios.idempotencia_service import (
+    IdempotenciaService,
+    huella_cuerpo,
+    REPETIDA,
+    EN_CURSO,
+    CONFLICTO
+)
 from app.esquemas.vehiculo_schema import (
     VehiculoEntrada, 
     VehiculoSalida, 
     VehiculoResponse,
     VehiculoConEstimacion,
-    EspacioResponse
+    EspacioResponse,
+    ESPACIOS_ADAPTER
 )
 from app.esquemas.factura_schema import FacturaDetallada
+from app.utils.dinero import a_float
 
 router = APIRouter(
     prefix="/api/vehiculos",
@@ -25,22 +38,123 @@ def obtener_espacios(db: Session = Depends(get_db)):
     Retorna una lista con el estado de cada espacio (ocupado/libre)
     """
     try:
-        espacios = VehiculoService.obtener_espacios(db)
-        return espacios
+        if PuertaLocalService.usar_diario():
+            espacios = PuertaLocalService.obtener_espacios()
+        else:
+            espacios = VehiculoService.obtener_espacios(db)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        if not es_caida_de_base(e):
+            raise HTTPException(status_code=500, detail=str(e))
+        espacios = PuertaLocalService.obtener_espacios()
+    # Validación y serialización con el TypeAdapter precompilado, en una sola pasada
+    return Response(
+        content=ESPACIOS_ADAPTER.dump_json(ESPACIOS_ADAPTER.validate_python(espacios)),
+        media_type="application/json"
+    )
+
+def _guardar_clave(db: Session, diario, ruta: str, clave: str, huella: str, estado_http: int, cuerpo):
+    """
+    Guardar la respuesta de la clave sin tumbar la petición: la operación ya
+    se hizo. Si la base falla se guarda en el diario local.
+    """
+    if diario is None:
+        try:
+            IdempotenciaService.guardar(db, ruta, clave, estado_http, cuerpo)
+            return
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ No se pudo guardar la Idempotency-Key en la base, queda en el diario local: {e}")
+    try:
+        IdempotenciaService.guardar_local(diario or obtener_diario(), ruta, clave, huella, estado_http, cuerpo)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar la Idempotency-Key: {e}")
+
+def _liberar_clave(db: Session, diario, ruta: str, clave: str):
+    """Liberar la clave tras un error del servidor, sin tapar el error original"""
+    try:
+        if diario is None:
+            IdempotenciaService.liberar(db, ruta, clave)
+        else:
+            diario.liberar_clave(ruta, clave)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ No se pudo liberar la Idempotency-Key: {e}")
+
+def _idempotente(db: Session, clave: Optional[str], ruta: str, datos, estado_http: int, ejecutar):
+    """
+    Ejecutar una operación con soporte de Idempotency-Key.
+    
+    Sin clave se ejecuta normalmente. Con clave, la primera petición ejecuta
+    y guarda su respuesta (también los errores 4xx); los reintentos reciben
+    la respuesta guardada con el encabezado Idempotent-Replayed. Un error 5xx
+    no se guarda, así que el reintento vuelve a ejecutar. Sin base la clave
+    se reserva y se guarda en el diario local de la puerta.
+    """
+    if not clave:
+        return ejecutar()
+    if len(clave) > 100:
+        raise HTTPException(status_code=400, detail="Idempotency-Key demasiado larga (máximo 100)")
+    
+    huella = huella_cuerpo(datos.model_dump())
+    diario = None
+    try:
+        resultado, guardada = IdempotenciaService.reservar(db, ruta, clave, huella, obtener_diario())
+    except Exception as e:
+        if not es_caida_de_base(e):
+            raise
+        # Sin base la clave queda en el diario local, como los eventos de la puerta
+        db.rollback()
+        diario = obtener_diario()
+        resultado, guardada = IdempotenciaService.reservar_local(diario, ruta, clave, huella)
+    if resultado == REPETIDA:
+        estado_guardado, cuerpo = guardada
+        return JSONResponse(status_code=estado_guardado, content=cuerpo, headers={"Idempotent-Replayed": "true"})
+    if resultado == EN_CURSO:
+        raise HTTPException(status_code=409, detail="Hay una petición en curso con esta Idempotency-Key")
+    if resultado == CONFLICTO:
+        raise HTTPException(status_code=422, detail="La Idempotency-Key ya se usó con otros datos")
+    
+    try:
+        cuerpo = ejecutar()
+    except HTTPException as e:
+        db.rollback()
+        if e.status_code < 500:
+            _guardar_clave(db, diario, ruta, clave, huella, e.status_code, {"detail": e.detail})
+        else:
+            _liberar_clave(db, diario, ruta, clave)
+        raise
+    except Exception:
+        db.rollback()
+        _liberar_clave(db, diario, ruta, clave)
+        raise
+    
+    _guardar_clave(db, diario, ruta, clave, huella, estado_http, jsonable_encoder(cuerpo))
+    return cuerpo
 
 @router.post("/entrada", response_model=VehiculoResponse, status_code=201)
-def registrar_entrada(datos: VehiculoEntrada, db: Session = Depends(get_db)):
+def registrar_entrada(
+    datos: VehiculoEntrada,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Registrar la entrada de un vehículo
     
     Args:
         datos: Placa, número de espacio y si es nocturno
+        idempotency_key: Clave opcional para reintentar sin registrar dos veces
     
     Returns:
         Información del vehículo registrado
     """
+    return _idempotente(
+        db, idempotency_key, "POST /api/vehiculos/entrada", datos, 201,
+        lambda: _registrar_entrada(db, datos)
+    )
+
+def _registrar_entrada(db: Session, datos: VehiculoEntrada):
+    if PuertaLocalService.usar_diario():
+        return _registrar_entrada_local(datos)
     try:
         vehiculo = VehiculoService.registrar_entrada(
             db, 
@@ -51,14 +165,41 @@ def registrar_entrada(datos: VehiculoEntrada, db: Session = Depends(get_db)):
         return vehiculo.to_dict()
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        if es_caida_de_base(e):
+            print(f"⚠️ Base principal no disponible, entrada anotada en el diario local: {e}")
+            return _registrar_entrada_local(datos)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _registrar_entrada_local(datos: VehiculoEntrada):
+    """Entrada anotada en el diario local (se sincroniza con la base después)"""
+    try:
+        return PuertaLocalService.registrar_entrada(datos.placa, datos.espacio_numero, datos.es_nocturno)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/salida")
-def registrar_salida(datos: VehiculoSalida, db: Session = Depends(get_db)):
+def registrar_salida(
+    datos: VehiculoSalida,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Registrar la salida de un vehículo y generar factura
+    
+    Con Idempotency-Key, un reintento devuelve la misma factura en lugar de
+    "Vehículo no encontrado o ya salió".
     """
+    return _idempotente(
+        db, idempotency_key, "POST /api/vehiculos/salida", datos, 200,
+        lambda: _registrar_salida(db, datos)
+    )
+
+def _registrar_salida(db: Session, datos: VehiculoSalida):
+    if PuertaLocalService.usar_diario():
+        return _registrar_salida_local(datos)
     try:
         resultado = VehiculoService.registrar_salida(db, datos.placa)
         vehiculo = resultado['vehiculo']
@@ -73,7 +214,7 @@ def registrar_salida(datos: VehiculoSalida, db: Session = Depends(get_db)):
                 "entrada": vehiculo.fecha_hora_entrada.isoformat(),
                 "salida": vehiculo.fecha_hora_salida.isoformat(),
                 "tiempo_total": resultado['tiempo_formateado'],
-                "costo_total": float(vehiculo.costo_total),
+                "costo_total": a_float(vehiculo.costo_total),
                 "detalles": factura.detalles_cobro,
                 "es_nocturno": vehiculo.es_nocturno,  # ✅ ¡AGREGADO!
                 "tarifa_aplicada": "NOCTURNA" if vehiculo.es_nocturno else "NORMAL"
@@ -82,14 +223,44 @@ def registrar_salida(datos: VehiculoSalida, db: Session = Depends(get_db)):
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
+        if es_caida_de_base(e):
+            print(f"⚠️ Base principal no disponible, salida anotada en el diario local: {e}")
+            return _registrar_salida_local(datos)
         raise HTTPException(status_code=500, detail=str(e))
 
+def _registrar_salida_local(datos: VehiculoSalida):
+    """Salida anotada en el diario local, cobrada con la tarifa en cache"""
+    try:
+        salida = PuertaLocalService.registrar_salida(datos.placa)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "success": True,
+        "message": "Salida registrada exitosamente",
+        "factura": {
+            "placa": salida['placa'],
+            "espacio": salida['espacio'],
+            "entrada": salida['entrada'],
+            "salida": salida['salida'],
+            "tiempo_total": CalculoService.formatear_tiempo(salida['minutos']),
+            "costo_total": a_float(salida['costo']),
+            "detalles": salida['detalles'],
+            "es_nocturno": salida['es_nocturno'],
+            "tarifa_aplicada": "NOCTURNA" if salida['es_nocturno'] else "NORMAL"
+        }
+    }
+
 @router.get("/buscar/{placa}")
 def buscar_vehiculo(placa: str, db: Session = Depends(get_db)):
     """
     Buscar un vehículo activo y mostrar costo estimado
     """
     try:
+        if PuertaLocalService.usar_diario():
+            return _buscar_vehiculo_local(placa)
         resultado = VehiculoService.buscar_vehiculo(db, placa)
         
         # Obtener datos completos del vehículo
@@ -101,7 +272,7 @@ def buscar_vehiculo(placa: str, db: Session = Depends(get_db)):
             "success": True,
             "data": {
                 **vehiculo_dict,
-                "costo_estimado": resultado['costo_estimado'],
+                "costo_estimado": a_float(resultado['costo_estimado']),
                 "tiempo_estimado": resultado['tiempo_estimado'],
                 "detalles": resultado['detalles']
             }
@@ -114,11 +285,56 @@ def buscar_vehiculo(placa: str, db: Session = Depends(get_db)):
         return respuesta
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
+        if es_caida_de_base(e):
+            return _buscar_vehiculo_local(placa)
         raise HTTPException(status_code=500, detail=str(e))
 
+def _buscar_vehiculo_local(placa: str):
+    """Vehículo y costo estimado según la ocupación local y la tarifa en cache"""
+    try:
+        resultado = PuertaLocalService.buscar_vehiculo(placa)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    ocupante = resultado['ocupante']
+    return {
+        "success": True,
+        "data": {
+            "id": None,
+            "placa": ocupante['placa'],
+            "espacio_numero": ocupante['espacio'],
+            "fecha_hora_entrada": ocupante['entrada'],
+            "fecha_hora_salida": None,
+            "costo_total": None,
+            "estado": "activo",
+            "es_nocturno": bool(ocupante['es_nocturno']),
+            "creado_en": ocupante['entrada'],
+            "costo_estimado": a_float(resultado['costo']),
+            "tiempo_estimado": CalculoService.formatear_tiempo(resultado['minutos']),
+            "detalles": resultado['detalles']
+        }
+    }
+
+@router.get("/diario")
+def estado_diario_local():
+    """
+    Estado del diario local de la puerta
+    
+    Eventos pendientes de sincronizar, conflictos detectados al llevarlos a
+    la base y disponibilidad de la base principal.
+    """
+    return {
+        "success": True,
+        "data": PuertaLocalService.estado()
+    }
+
 @router.get("/historial")
-def obtener_historial(fecha: str = None, limite: int = 50, db: Session = Depends(get_db)):
+def obtener_historial(fecha: str = None, limite: int = 50, db: Session = Depends(get_db_lectura)):
     """
     Obtener el historial de facturas
     
@@ -138,6 +354,35 @@ def obtener_historial(fecha: str = None, limite: int = 50, db: Session = Depends
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{placa}/historial")
+def obtener_historial_placa(
+    placa: str,
+    limite: int = Query(20, ge=1, le=200),
+    despues_de: Optional[str] = Query(None, description="Valor 'siguiente' devuelto en la página anterior"),
+    db: Session = Depends(get_db_lectura)
+):
+    """
+    Historial de facturas de un vehículo y sus estadísticas
+    
+    - facturas: de la más reciente a la más antigua, `limite` por página
+    - siguiente: valor para `despues_de` en la próxima página (None al final)
+    - estadisticas: visitas, gasto total y promedio, estancia promedio,
+      porcentaje nocturno y si es cliente frecuente (None sin facturas)
+    """
+    try:
+        resultado = VehiculoService.historial_placa(db, placa, limite, despues_de)
+        return {
+            "success": True,
+            "data": {
+                **resultado,
+                "facturas": [factura.to_dict() for factura in resultado['facturas']]
+            }
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/health")
 def health_check():
     """Verificar que el servicio de vehículos está funcionando"""
@@ -0,0 +1,304 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
+import asyncio
+import os
+import tempfile
+import threading
+from app.config import (
+    SessionLocal,
+    abrir_sesion_lectura,
+    ALERTAS_ACTIVAS,
+    ALERTA_HORAS_ESTANCIA,
+    ALERTA_REPETIR_MINUTOS,
+    ALERTA_WEBHOOK_URL,
+    ALERTAS_RETENCION_DIAS,
+    ALERTAS_SONDEO,
+)
+from app.modelos.vehiculo_estacionado import VehiculoEstacionado
+from app.modelos.alerta_emitida import AlertaEmitida
+from app.servicios.configuracion_service import ConfiguracionService
+from app.utils.estado_compartido import estado_compartido
+from app.utils.planificador_alertas import PlanificadorAlertas, SalidaLog, SalidaWebhook
+from app.utils import candado_proceso
+
+# Tipos de alerta
+ESTANCIA_LARGA = 'estancia_larga'
+NOCTURNO_VENCIDO = 'nocturno_vencido'
+
+# Alertas devueltas por lectura
+MAX_ALERTAS_LECTURA = 500
+
+# Long-polls de este proceso: SalidaBase los despierta al emitir aquí mismo
+_esperas = {'bucle': None, 'evento': None}
+
+
+def _evento_espera():
+    """Evento que se activa con la próxima alerta emitida por este proceso"""
+    bucle = asyncio.get_running_loop()
+    if _esperas['bucle'] is not bucle:
+        _esperas['bucle'] = bucle
+        _esperas['evento'] = asyncio.Event()
+    return _esperas['evento']
+
+
+def _despertar():
+    # En el bucle de eventos: activar el evento actual y dejar uno nuevo para las próximas esperas
+    evento = _esperas['evento']
+    _esperas['evento'] = asyncio.Event()
+    evento.set()
+
+
+class SalidaBase:
+    """
+    Salida de alertas a la tabla alertas_emitidas.
+
+    Es el canal entre workers: solo el que emite escribe, y cualquier worker
+    lee las alertas nuevas por id. Cada tanto borra las más viejas que
+    ALERTAS_RETENCION_DIAS.
+    """
+
+    def __init__(self, purgar_cada: int = 500):
+        self.purgar_cada = purgar_cada
+        self._escritas = 0
+        self._lock = threading.Lock()
+
+    def emitir(self, alerta: dict):
+        db = SessionLocal()
+        try:
+            db.add(AlertaEmitida(
+                tipo=alerta['tipo'],
+                vehiculo_id=alerta['vehiculo_id'],
+                placa=alerta['placa'],
+                espacio=alerta['espacio'],
+                entrada=datetime.fromisoformat(alerta['entrada']),
+                limite=datetime.fromisoformat(alerta['limite']),
+                vence=datetime.fromisoformat(alerta['vence']),
+                emitida_en=datetime.fromisoformat(alerta['emitida_en'])
+            ))
+            with self._lock:
+                self._escritas += 1
+                purgar = self._escritas % self.purgar_cada == 1
+            if purgar:
+                db.query(AlertaEmitida).filter(
+                    AlertaEmitida.emitida_en < datetime.now() - timedelta(days=ALERTAS_RETENCION_DIAS)
+                ).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        # Se emite desde el hilo del planificador
+        bucle = _esperas['bucle']
+        if bucle is not None and _esperas['evento'] is not None:
+            try:
+                bucle.call_soon_threadsafe(_despertar)
+            except RuntimeError:  # bucle cerrado (apagado)
+                pass
+
+
+planificador = PlanificadorAlertas([SalidaLog(), SalidaBase()])
+if ALERTA_WEBHOOK_URL:
+    planificador.agregar_salida(SalidaWebhook(ALERTA_WEBHOOK_URL))
+
+_lider = {'fd': None, 'emite': False}
+
+
+def _es_lider():
+    """
+    True si este proceso emite las alertas.
+
+    Con varios workers solo uno tiene el planificador corriendo (flock no
+    bloqueante sobre un archivo por base); los demás no duplican avisos.
+    """
+    if not candado_proceso.DISPONIBLE:  # Windows: cada proceso planifica sus alertas
+        return True
+    if _lider['fd'] is not None:
+        return True
+    fd = candado_proceso.tomar_candado(
+        os.path.join(tempfile.gettempdir(), f'{estado_compartido.nombre}.alertas.lock')
+    )
+    if fd is None:
+        return False
+    _lider['fd'] = fd
+    return True
+
+
+class AlertaService:
+    """
+    Alertas de estancias largas y de tarifas nocturnas vencidas.
+
+    Un vehículo diurno genera una alerta al cumplir ALERTA_HORAS_ESTANCIA
+    horas; uno con tarifa nocturna, si sigue adentro al terminar la franja
+    nocturna (hora_fin_nocturno) que le toca. Las alertas se repiten cada
+    ALERTA_REPETIR_MINUTOS mientras el vehículo siga adentro. El
+    planificador se actualiza en cada entrada y salida y se reconcilia con
+    los vehículos activos de la base en cada refresco del espejo de la
+    puerta, el primero al arrancar (eso también trae las entradas de otros
+    workers). Solo el proceso que emite las alertas mantiene el montículo.
+    """
+
+    @staticmethod
+    def _programacion(vehiculo, plan):
+        """(vehiculo_id, límite, datos) de la alerta de un vehículo activo"""
+        entrada = vehiculo.fecha_hora_entrada
+        if vehiculo.es_nocturno and plan.hora_fin_nocturno is not None:
+            # Primer fin de franja posterior a la entrada
+            limite = datetime.combine(entrada.date(), plan.hora_fin_nocturno)
+            if limite <= entrada:
+                limite += timedelta(days=1)
+            tipo = NOCTURNO_VENCIDO
+        else:
+            limite = entrada + timedelta(hours=ALERTA_HORAS_ESTANCIA)
+            tipo = ESTANCIA_LARGA
+        datos = {
+            'tipo': tipo,
+            'vehiculo_id': vehiculo.id,
+            'placa': vehiculo.placa,
+            'espacio': vehiculo.espacio_numero,
+            'entrada': entrada.isoformat(),
+            'limite': limite.isoformat(),
+        }
+        if ALERTA_REPETIR_MINUTOS > 0:
+            datos['repetir'] = ALERTA_REPETIR_MINUTOS * 60
+        return vehiculo.id, limite, datos
+
+    @staticmethod
+    def registrar_entrada(db: Session, vehiculo: VehiculoEstacionado):
+        """Programar la alerta de un vehículo que acaba de entrar"""
+        if not _lider['emite']:
+            return
+        try:
+            plan = ConfiguracionService.obtener_plan(db)
+            planificador.programar(*AlertaService._programacion(vehiculo, plan))
+        except Exception as e:
+            print(f"⚠️ No se pudo programar la alerta de {vehiculo.placa}: {e}")
+
+    @staticmethod
+    def registrar_salida(vehiculo: VehiculoEstacionado):
+        if _lider['emite']:
+            planificador.cancelar(vehiculo.id)
+
+    @staticmethod
+    def reconciliar(activos, plan):
+        """
+        Dejar programados exactamente los vehículos activos.
+
+        Los que ya estaban programados conservan su próxima alerta (no se
+        repiten avisos); los que faltan se agregan y los que salieron se
+        cancelan. La primera vez que este proceso obtiene el rol de emisor
+        (al arrancar, o cuando el worker que lo tenía terminó) el montículo
+        se reconstruye desde estas filas y el planificador arranca; las
+        alertas que vencieron mientras nadie las emitía salen en ese momento.
+
+        Args:
+            activos: Filas con id, placa, espacio_numero, fecha_hora_entrada y es_nocturno
+            plan: PlanTarifario vigente
+        """
+        if not ALERTAS_ACTIVAS:
+            return
+        if not _lider['emite']:
+            if not _es_lider():
+                return
+            planificador.reemplazar([AlertaService._programacion(v, plan) for v in activos])
+            planificador.iniciar()
+            _lider['emite'] = True
+            print(f"🚨 Planificador de alertas: {len(activos)} vehículo(s) activos")
+            return
+        programados = planificador.programados()
+        ids = set()
+        for vehiculo in activos:
+            ids.add(vehiculo.id)
+            if vehiculo.id not in programados:
+                planificador.programar(*AlertaService._programacion(vehiculo, plan))
+        for vehiculo_id in programados - ids:
+            planificador.cancelar(vehiculo_id)
+
+    @staticmethod
+    def detener():
+        _lider['emite'] = False
+        planificador.detener()
+
+    @staticmethod
+    def _proxima(limite: datetime, datos: dict, ahora: datetime):
+        """Próximo aviso de una alerta: el límite, o la siguiente repetición si ya pasó"""
+        if limite > ahora:
+            return limite
+        repetir = datos.get('repetir')
+        if not repetir:
+            return None
+        vence = limite.timestamp()
+        return datetime.fromtimestamp(vence + repetir * ((ahora.timestamp() - vence) // repetir + 1))
+
+    @staticmethod
+    def _leer_nuevas(desde: int):
+        """Alertas con id > desde y el último id (solo alertas_emitidas, por llave primaria)"""
+        db = abrir_sesion_lectura()
+        try:
+            alertas = db.query(AlertaEmitida).filter(
+                AlertaEmitida.id > desde
+            ).order_by(AlertaEmitida.id).limit(MAX_ALERTAS_LECTURA).all()
+            ultima = db.query(func.max(AlertaEmitida.id)).scalar() or 0
+            return [a.to_dict() for a in alertas], ultima
+        finally:
+            db.close()
+
+    @staticmethod
+    def _proximas():
+        """
+        Próximas alertas programadas (misma cuenta en cualquier worker).
+
+        El proceso que emite las toma de su montículo; los demás las calculan
+        desde los vehículos activos.
+        """
+        if not ALERTAS_ACTIVAS:
+            return []
+        if _lider['emite']:
+            return [{k: v for k, v in datos.items() if k != 'repetir'} for datos in planificador.proximas()]
+        db = abrir_sesion_lectura()
+        try:
+            plan = ConfiguracionService.obtener_plan(db)
+            ahora = datetime.now()
+            proximas = []
+            for vehiculo in db.query(VehiculoEstacionado).filter_by(estado='activo').all():
+                _, limite, datos = AlertaService._programacion(vehiculo, plan)
+                vence = AlertaService._proxima(limite, datos, ahora)
+                if vence is not None:
+                    proximas.append({**{k: v for k, v in datos.items() if k != 'repetir'},
+                                     'vence': vence.isoformat()})
+            proximas.sort(key=lambda a: a['vence'])
+            return proximas[:20]
+        finally:
+            db.close()
+
+    @staticmethod
+    async def esperar(desde: int = 0, espera: float = 0):
+        """
+        Alertas emitidas con seq > desde y las próximas programadas.
+
+        Con `espera` > 0 consulta solo alertas_emitidas (id > desde) cada
+        ALERTAS_SONDEO segundos, o antes si este mismo proceso emite una
+        alerta, hasta que aparezca una nueva o pase el tiempo. Las próximas
+        se calculan una vez, al responder. Entre consultas no ocupa ningún
+        hilo (solo cada consulta corta va al threadpool).
+        """
+        bucle = asyncio.get_running_loop()
+        fin = bucle.time() + espera
+        while True:
+            evento = _evento_espera()
+            alertas, ultima = await run_in_threadpool(AlertaService._leer_nuevas, desde)
+            restante = fin - bucle.time()
+            if alertas or restante <= 0:
+                break
+            try:
+                await asyncio.wait_for(evento.wait(), min(ALERTAS_SONDEO, restante))
+            except asyncio.TimeoutError:
+                pass
+        return {
+            'alertas': alertas,
+            'ultima_seq': ultima,
+            'proximas': await run_in_threadpool(AlertaService._proximas),
+            'emite_este_proceso': _lider['emite'],
+        }
@@ -0,0 +1,187 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import MetaData, Table, select, insert, delete, inspect, union_all, func
+from datetime import datetime, timedelta
+import re
+import time
+from app.config import ARCHIVO_DIAS_RETENCION, ARCHIVO_TAMANO_LOTE
+from app.modelos.vehiculo_estacionado import VehiculoEstacionado
+
+# Tablas de archivo: una por mes de ENTRADA, p. ej. vehiculos_estacionados_202501
+PREFIJO_ARCHIVO = 'vehiculos_estacionados_'
+_PATRON_ARCHIVO = re.compile(r'^vehiculos_estacionados_(\d{4})(\d{2})$')
+
+# Metadata propia para que create_all de la app no cree tablas de archivo vacías
+metadata_archivo = MetaData()
+
+# Segundos que se reutiliza la lista de tablas de archivo existentes
+_TTL_TABLAS = 60.0
+# nombre -> última fecha_hora_salida archivada en la tabla
+_cache_tablas = {'salidas': None, 'leido_en': 0.0}
+
+
+def _nombre_archivo(anio: int, mes: int):
+    return f'{PREFIJO_ARCHIVO}{anio:04d}{mes:02d}'
+
+
+def tabla_archivo(anio: int, mes: int):
+    """Tabla de archivo del mes indicado, con las mismas columnas que vehiculos_estacionados"""
+    nombre = _nombre_archivo(anio, mes)
+    tabla = metadata_archivo.tables.get(nombre)
+    if tabla is None:
+        columnas = [columna._copy() for columna in VehiculoEstacionado.__table__.columns]
+        tabla = Table(nombre, metadata_archivo, *columnas)
+    return tabla
+
+
+class ArchivoService:
+    """
+    Servicio para separar estancias finalizadas (archivo) de la tabla activa.
+
+    vehiculos_estacionados conserva solo los vehículos activos y las estancias
+    recientes; las finalizadas hace más de ARCHIVO_DIAS_RETENCION días se mueven
+    a tablas mensuales por fecha de entrada. Los reportes leen ambas a través de
+    ArchivoService.estancias.
+    """
+
+    @staticmethod
+    def _ultimas_salidas(db: Session, refrescar: bool = False):
+        """
+        {tabla de archivo: última salida archivada en ella} (cacheado unos segundos).
+
+        Una consulta max() por tabla sobre el índice de fecha_hora_salida; las
+        tablas de archivo solo cambian al archivar, que refresca la cache.
+        """
+        vencido = time.monotonic() - _cache_tablas['leido_en'] > _TTL_TABLAS
+        if refrescar or vencido or _cache_tablas['salidas'] is None:
+            salidas = {}
+            for nombre in inspect(db.connection()).get_table_names():
+                coincidencia = _PATRON_ARCHIVO.match(nombre)
+                if coincidencia:
+                    tabla = tabla_archivo(int(coincidencia.group(1)), int(coincidencia.group(2)))
+                    salidas[nombre] = db.execute(select(func.max(tabla.c.fecha_hora_salida))).scalar()
+            _cache_tablas['salidas'] = salidas
+            _cache_tablas['leido_en'] = time.monotonic()
+        return _cache_tablas['salidas']
+
+    @staticmethod
+    def tablas_existentes(db: Session, refrescar: bool = False):
+        """Nombres de las tablas de archivo existentes (cacheado unos segundos)"""
+        return frozenset(ArchivoService._ultimas_salidas(db, refrescar))
+
+    @staticmethod
+    def tablas_para_rango(db: Session, inicio: datetime, fin: datetime):
+        """
+        Tablas de archivo que pueden contener estancias que se cruzan con [inicio, fin).
+
+        Las tablas son por mes de entrada: sirve cualquier mes hasta el de
+        `fin` cuya última salida archivada no sea anterior a `inicio`, sin
+        importar cuánto duró la estancia.
+        """
+        salidas = ArchivoService._ultimas_salidas(db)
+        if not salidas:
+            return []
+
+        ultimo = (fin - timedelta(microseconds=1))
+        tablas = []
+        for nombre in sorted(salidas):
+            anio, mes = (int(g) for g in _PATRON_ARCHIVO.match(nombre).groups())
+            # Entraron todas después del rango, o salieron todas antes
+            if (anio, mes) > (ultimo.year, ultimo.month) or salidas[nombre] is None or salidas[nombre] < inicio:
+                continue
+            tablas.append(tabla_archivo(anio, mes))
+        return tablas
+
+    @staticmethod
+    def estancias(db: Session, inicio: datetime, fin: datetime):
+        """
+        Fuente de estancias (activa + archivo) para consultas sobre [inicio, fin).
+
+        Returns:
+            La tabla vehiculos_estacionados si no hace falta el archivo, o una
+            subconsulta UNION ALL con las mismas columnas
+        """
+        activa = VehiculoEstacionado.__table__
+        archivos = ArchivoService.tablas_para_rango(db, inicio, fin)
+        if not archivos:
+            return activa
+        return union_all(
+            select(activa),
+            *(select(tabla) for tabla in archivos)
+        ).subquery('estancias')
+
+    @staticmethod
+    def archivar(db: Session, dias: int = None, tamano_lote: int = None):
+        """
+        Mover estancias finalizadas antiguas a las tablas de archivo mensuales.
+
+        Trabaja en lotes pequeños (una transacción corta por lote) para no
+        bloquear la tabla activa mientras entran y salen vehículos.
+
+        Args:
+            db: Sesión de base de datos (principal)
+            dias: Antigüedad mínima de la salida en días (default: ARCHIVO_DIAS_RETENCION)
+            tamano_lote: Filas por lote (default: ARCHIVO_TAMANO_LOTE)
+
+        Returns:
+            Número de estancias archivadas
+        """
+        dias = ARCHIVO_DIAS_RETENCION if dias is None else dias
+        tamano_lote = tamano_lote or ARCHIVO_TAMANO_LOTE
+        corte = datetime.now() - timedelta(days=dias)
+        activa = VehiculoEstacionado.__table__
+
+        total = 0
+        ultimo_id = 0
+        while True:
+            lote = db.execute(
+                select(activa.c.id, activa.c.fecha_hora_entrada)
+                .where(
+                    activa.c.id > ultimo_id,
+                    activa.c.estado == 'finalizado',
+                    activa.c.fecha_hora_salida < corte
+                )
+                .order_by(activa.c.id)
+                .limit(tamano_lote)
+            ).all()
+            if not lote:
+                break
+            ultimo_id = lote[-1].id
+
+            # Agrupar el lote por mes de entrada
+            por_mes = {}
+            for fila in lote:
+                clave = (fila.fecha_hora_entrada.year, fila.fecha_hora_entrada.month)
+                por_mes.setdefault(clave, []).append(fila.id)
+
+            for (anio, mes), ids in por_mes.items():
+                tabla = tabla_archivo(anio, mes)
+                tabla.create(bind=db.connection(), checkfirst=True)
+                db.execute(
+                    insert(tabla).from_select(
+                        [c.name for c in activa.columns],
+                        select(activa).where(activa.c.id.in_(ids))
+                    )
+                )
+                db.execute(delete(activa).where(activa.c.id.in_(ids)))
+
+            db.commit()
+            total += len(lote)
+            print(f"📦 Archivadas {total} estancias (último id {ultimo_id})")
+
+        if total:
+            ArchivoService.tablas_existentes(db, refrescar=True)
+        return total
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.servicios.archivo_service [dias]
+    import sys
+    from app.config import SessionLocal
+
+    db = SessionLocal()
+    try:
+        dias = int(sys.argv[1]) if len(sys.argv) > 1 else None
+        archivadas = ArchivoService.archivar(db, dias)
+        print(f"✅ Archivado terminado: {archivadas} estancias")
+    finally:
+        db.close()
@@ -0,0 +1,172 @@
+from datetime import datetime
+import threading
+from app.config import BITACORA_RUTA, BITACORA_INSTANTANEA_CADA, BITACORA_FSYNC
+from app.utils.dinero import a_float
+from app.utils.bitacora_eventos import (
+    BitacoraEventos,
+    EstadoBitacora,
+    ENTRADA,
+    SALIDA,
+    TARIFA,
+    empaquetar,
+    segundos_del_dia,
+)
+
+# Eventos que se devuelven como máximo por lectura
+MAX_EVENTOS_LECTURA = 5000
+
+bitacora = BitacoraEventos(BITACORA_RUTA, fsync=BITACORA_FSYNC)
+_estado = {'actual': None, 'eventos_instantanea': 0}
+_lock_estado = threading.Lock()
+
+
+def _epoch(fecha: datetime):
+    return int(fecha.timestamp())
+
+
+class BitacoraService:
+    """
+    Servicio de la bitácora binaria de eventos.
+
+    Las entradas, salidas y cambios de tarifa se anexan después del commit
+    en la base (la base sigue siendo la fuente de verdad; la bitácora es su
+    registro cronológico). El estado en memoria (ocupación y totales por
+    día) se reconstruye desde la última instantánea más los eventos
+    posteriores y se pone al día leyendo solo lo nuevo, así que también ve
+    los eventos que anexan otros procesos.
+    """
+
+    @staticmethod
+    def _anexar(tipo: int, *valores):
+        # Un fallo de la bitácora (o una placa que no cabe) no debe tumbar la operación ya confirmada
+        try:
+            bitacora.agregar(empaquetar(tipo, *valores))
+        except Exception as e:
+            print(f"⚠️ No se pudo escribir en la bitácora de eventos: {e}")
+
+    @staticmethod
+    def registrar_entrada(placa: str, espacio: int, es_nocturno: bool, fecha: datetime):
+        BitacoraService._anexar(ENTRADA, _epoch(fecha), espacio, int(es_nocturno), placa)
+
+    @staticmethod
+    def registrar_salida(placa: str, espacio: int, es_nocturno: bool, entrada: datetime,
+                         salida: datetime, minutos: int, costo: int):
+        BitacoraService._anexar(
+            SALIDA, _epoch(salida), _epoch(entrada), espacio, int(es_nocturno), minutos, int(costo), placa
+        )
+
+    @staticmethod
+    def registrar_tarifa(config):
+        """Anexar un cambio de tarifa (fila de ConfiguracionPrecios)"""
+        BitacoraService._anexar(
+            TARIFA,
+            _epoch(datetime.now()),
+            config.version or 0,
+            int(config.precio_media_hora),
+            int(config.precio_hora_adicional),
+            int(config.precio_nocturno),
+            segundos_del_dia(config.hora_inicio_nocturno),
+            segundos_del_dia(config.hora_fin_nocturno)
+        )
+
+    @staticmethod
+    def leer(desde: int = 0, limite: int = 1000):
+        """
+        Eventos a partir del offset `desde` (para seguir la bitácora).
+
+        Returns:
+            Diccionario con eventos, siguiente (offset para la próxima
+            lectura) y al_dia (True si no quedan eventos por leer)
+        """
+        limite = max(1, min(limite, MAX_EVENTOS_LECTURA))
+        eventos, siguiente = bitacora.leer(desde, limite)
+        return {
+            'eventos': eventos,
+            'siguiente': siguiente,
+            'al_dia': len(eventos) < limite,
+        }
+
+    @staticmethod
+    def _poner_al_dia():
+        """
+        Estado reconstruido de la bitácora, puesto al día (con _lock_estado tomado).
+
+        La primera llamada carga la instantánea (si existe y no apunta más
+        allá del final del archivo) y reproduce el resto; las siguientes
+        solo leen los bytes anexados desde la anterior. Cada
+        BITACORA_INSTANTANEA_CADA eventos se guarda una instantánea nueva.
+        """
+        estado = _estado['actual']
+        if estado is None:
+            estado = EstadoBitacora.cargar_instantanea(BitacoraService.ruta_instantanea())
+            if estado is None or estado.offset > bitacora.tamano():
+                estado = EstadoBitacora()
+            _estado['actual'] = estado
+            _estado['eventos_instantanea'] = estado.eventos
+
+        estado.offset = bitacora.reproducir(estado.offset, estado.aplicar)
+
+        if estado.eventos - _estado['eventos_instantanea'] >= BITACORA_INSTANTANEA_CADA:
+            estado.guardar_instantanea(BitacoraService.ruta_instantanea())
+            _estado['eventos_instantanea'] = estado.eventos
+        return estado
+
+    @staticmethod
+    def reconstruir():
+        """Cargar el estado al arrancar; devuelve el número de eventos reconstruidos"""
+        with _lock_estado:
+            return BitacoraService._poner_al_dia().eventos
+
+    @staticmethod
+    def guardar_instantanea():
+        """Guardar el estado actual (al apagar: el próximo arranque no reproduce nada)"""
+        with _lock_estado:
+            estado = BitacoraService._poner_al_dia()
+            estado.guardar_instantanea(BitacoraService.ruta_instantanea())
+            _estado['eventos_instantanea'] = estado.eventos
+
+    @staticmethod
+    def ruta_instantanea():
+        return f'{BITACORA_RUTA}.instantanea.json'
+
+    @staticmethod
+    def resumen(desde: str = None, hasta: str = None):
+        """
+        Ocupación actual y totales por día según la bitácora.
+
+        Args:
+            desde: Fecha inicial YYYY-MM-DD (opcional, incluida)
+            hasta: Fecha final YYYY-MM-DD (opcional, incluida)
+        """
+        with _lock_estado:
+            return BitacoraService._resumir(BitacoraService._poner_al_dia(), desde, hasta)
+
+    @staticmethod
+    def _resumir(estado: EstadoBitacora, desde: str, hasta: str):
+        dias = [
+            {
+                'fecha': fecha,
+                'entradas': entradas,
+                'salidas': salidas,
+                'nocturnas': nocturnas,
+                'minutos': minutos,
+                'ingresos': a_float(centavos),
+            }
+            for fecha, (entradas, salidas, nocturnas, minutos, centavos) in sorted(estado.dias.items())
+            if (desde is None or fecha >= desde) and (hasta is None or fecha <= hasta)
+        ]
+        return {
+            'offset': estado.offset,
+            'eventos': estado.eventos,
+            'ocupacion': [
+                {
+                    'espacio': espacio,
+                    'placa': placa,
+                    'entrada': datetime.fromtimestamp(entrada).isoformat(),
+                    'es_nocturno': bool(nocturno),
+                }
+                for espacio, (placa, entrada, nocturno) in sorted(estado.ocupantes().items())
+            ],
+            'dias': dias,
+            'tarifa': estado.tarifa,
+        }
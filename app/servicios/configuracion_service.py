@@ -1,5 +1,10 @@
 from sqlalchemy.orm import Session
 from app.modelos.configuracion_precios import ConfiguracionPrecios
+from app.modelos.version_tarifa import VersionTarifa
+from app.utils.plan_tarifario import PlanTarifario
+from app.utils.historial_tarifas import historial_tarifas
+from app.servicios.bitacora_service import BitacoraService
+from app.utils.estado_compartido import estado_compartido
 from datetime import datetime
 import traceback  # <-- Añade esto
 
@@ -14,19 +19,75 @@ class ConfiguracionService:
         if not config:
             # Crear configuración por defecto si no existe
             config = ConfiguracionPrecios(
-                precio_media_hora=0.50,
-                precio_hora_adicional=1.00,
-                precio_nocturno=10.00
+                precio_media_hora=50,
+                precio_hora_adicional=100,
+                precio_nocturno=1000
             )
             db.add(config)
             db.commit()
             db.refresh(config)
+            db.add(VersionTarifa.desde_configuracion(config, datetime.now()))
+            db.commit()
         
         return config
     
+    @staticmethod
+    def version_actual(db: Session):
+        """Versión de la tarifa vigente (consulta de una sola columna, sin crear nada)"""
+        version = db.query(ConfiguracionPrecios.version).order_by(
+            ConfiguracionPrecios.id.desc()
+        ).limit(1).scalar()
+        return version or 0
+    
+    @staticmethod
+    def obtener_plan(db: Session):
+        """Obtener el PlanTarifario compilado de la configuración actual"""
+        # Tarifa publicada en memoria compartida: sin consultar la base
+        tarifa = estado_compartido.tarifa()
+        if tarifa is not None:
+            return PlanTarifario.desde_configuracion(tarifa)
+        return PlanTarifario.desde_configuracion(ConfiguracionService.obtener_configuracion(db))
+    
+    @staticmethod
+    def historial(db: Session):
+        """
+        Historial de versiones de la tarifa, recargado si cambió la vigente.
+
+        La versión vigente se lee de la memoria compartida (sin consultar la
+        base) o, si no está activa, con la consulta de una columna de
+        version_actual; solo cuando difiere de la cargada se leen de nuevo
+        las versiones.
+        """
+        tarifa = estado_compartido.tarifa()
+        vigente = tarifa.version if tarifa is not None else ConfiguracionService.version_actual(db)
+        if historial_tarifas.marca != vigente:
+            versiones = db.query(VersionTarifa).order_by(VersionTarifa.vigente_desde).all()
+            if not versiones:
+                # Base sin versiones registradas: la configuración actual rige
+                # siempre (si no existía, se crea aquí con su primera versión)
+                config = ConfiguracionService.obtener_configuracion(db)
+                historial_tarifas.cargar(
+                    [(datetime.min, PlanTarifario.desde_configuracion(config))], config.version
+                )
+            else:
+                historial_tarifas.cargar(
+                    [(v.vigente_desde, PlanTarifario.desde_configuracion(v)) for v in versiones], vigente
+                )
+        return historial_tarifas
+    
+    @staticmethod
+    def plan_vigente_en(db: Session, fecha: datetime):
+        """PlanTarifario de la versión de la tarifa que regía en `fecha` (la entrada del vehículo)"""
+        return ConfiguracionService.historial(db).vigente_en(fecha)
+    
+    @staticmethod
+    def listar_versiones(db: Session):
+        """Versiones de la tarifa, la más reciente primero"""
+        return db.query(VersionTarifa).order_by(VersionTarifa.vigente_desde.desc()).all()
+    
     @staticmethod
     def actualizar_configuracion(db: Session, datos: dict):
-        """Actualizar la configuración de precios"""
+        """Actualizar la configuración de precios (precios en centavos)"""
         # ==============================================
         # 🔍 DEBUG: Ver qué llega EXACTAMENTE
         # ==============================================
@@ -83,6 +144,13 @@ class ConfiguracionService:
                 print(f"  Valor que causó error: '{datos['hora_fin_nocturno']}'")
                 raise
         
+        # Nueva versión de la tarifa (las facturas guardan con cuál se cobraron)
+        config.version = (config.version or 1) + 1
+        # La versión anterior queda en el historial; la nueva rige desde ahora
+        db.add(VersionTarifa.desde_configuracion(config, datetime.now()))
+        
         db.commit()
         db.refresh(config)
+        BitacoraService.registrar_tarifa(config)
+        estado_compartido.publicar_tarifa(config)
         return config
\ No newline at end of file
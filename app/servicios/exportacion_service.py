@@ -0,0 +1,150 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from datetime import datetime, timedelta
+from openpyxl import Workbook
+from app.modelos.historial_factura import HistorialFactura
+from app.utils.dinero import a_float
+
+# Filas que se traen del cursor por lote
+FILAS_POR_LOTE = 2000
+
+# Mismos rangos que distribucion_tiempo de /api/reportes/detallado
+RANGOS_DURACION = (
+    ('Menos de 1 hora', 60),
+    ('Entre 1 y 3 horas', 180),
+    ('Entre 3 y 6 horas', 360),
+    ('Más de 6 horas', None),
+)
+
+
+def _rango_duracion(minutos: int):
+    for i, (_, limite) in enumerate(RANGOS_DURACION):
+        if limite is None or minutos < limite:
+            return i
+
+
+class ExportacionService:
+    """
+    Servicio para exportar reportes a Excel (.xlsx).
+
+    El libro se escribe con openpyxl en modo write-only: cada fila se pasa
+    directamente al XML de su hoja en un archivo temporal, así que la memoria
+    no crece con el número de facturas. Las facturas se leen del cursor en
+    lotes y en la misma pasada se acumulan los totales de las hojas resumen.
+    """
+
+    @staticmethod
+    def _facturas(db: Session, inicio: datetime, fin: datetime):
+        """Facturas con salida en [inicio, fin) como tuplas, leídas del cursor por lotes"""
+        hf = HistorialFactura
+        consulta = select(
+            hf.id,
+            hf.placa,
+            hf.espacio_numero,
+            hf.fecha_hora_entrada,
+            hf.fecha_hora_salida,
+            hf.tiempo_total_minutos,
+            hf.es_nocturno,
+            hf.version_tarifa,
+            hf.costo_total
+        ).where(
+            hf.fecha_hora_salida >= inicio,
+            hf.fecha_hora_salida < fin
+        ).order_by(hf.fecha_hora_salida, hf.id).execution_options(yield_per=FILAS_POR_LOTE)
+        return db.execute(consulta)
+
+    @staticmethod
+    def escribir_libro(db: Session, desde: str, hasta: str, destino):
+        """
+        Escribir el libro de reportes del rango en `destino`.
+
+        Hojas: resumen diario, uso por espacio, distribución de duración y
+        detalle de facturas (por fecha de SALIDA, como los ingresos).
+
+        Args:
+            db: Sesión de base de datos
+            desde: Fecha inicial YYYY-MM-DD (incluida)
+            hasta: Fecha final YYYY-MM-DD (incluida)
+            destino: Ruta o archivo binario donde guardar el .xlsx
+
+        Returns:
+            Número de facturas exportadas
+
+        Raises:
+            ValueError: Si las fechas son inválidas
+        """
+        try:
+            inicio = datetime.strptime(desde, '%Y-%m-%d')
+            fin = datetime.strptime(hasta, '%Y-%m-%d') + timedelta(days=1)
+        except ValueError:
+            raise ValueError("Formato de fecha inválido. Use YYYY-MM-DD")
+        if fin <= inicio:
+            raise ValueError("La fecha 'hasta' debe ser posterior a 'desde'")
+
+        libro = Workbook(write_only=True)
+        hoja_diaria = libro.create_sheet('Resumen diario')
+        hoja_espacios = libro.create_sheet('Uso por espacio')
+        hoja_duracion = libro.create_sheet('Duración')
+        hoja_facturas = libro.create_sheet('Facturas')
+
+        hoja_facturas.append([
+            'Factura', 'Placa', 'Espacio', 'Entrada', 'Salida',
+            'Minutos', 'Tarifa', 'Versión tarifa', 'Costo'
+        ])
+
+        # Totales enteros (centavos) acumulados en la misma pasada
+        por_dia = {}       # fecha -> [facturas, nocturnas, minutos, centavos]
+        por_espacio = {}   # espacio -> [facturas, minutos, centavos]
+        por_duracion = [[0, 0] for _ in RANGOS_DURACION]  # [facturas, centavos]
+        nocturnas = [0, 0]
+        total = 0
+
+        for (id_, placa, espacio, entrada, salida, minutos,
+             es_nocturno, version, centavos) in ExportacionService._facturas(db, inicio, fin):
+            centavos = centavos or 0
+            hoja_facturas.append([
+                id_, placa, espacio, entrada, salida, minutos,
+                'NOCTURNA' if es_nocturno else 'NORMAL', version, a_float(centavos)
+            ])
+            total += 1
+
+            dia = por_dia.setdefault(salida.date(), [0, 0, 0, 0])
+            dia[0] += 1
+            dia[1] += 1 if es_nocturno else 0
+            dia[2] += minutos
+            dia[3] += centavos
+
+            uso = por_espacio.setdefault(espacio, [0, 0, 0])
+            uso[0] += 1
+            uso[1] += minutos
+            uso[2] += centavos
+
+            if es_nocturno:
+                nocturnas[0] += 1
+                nocturnas[1] += centavos
+            else:
+                rango = por_duracion[_rango_duracion(minutos)]
+                rango[0] += 1
+                rango[1] += centavos
+
+        hoja_diaria.append(['Fecha', 'Facturas', 'Nocturnas', 'Diurnas', 'Minutos', 'Ingresos'])
+        for fecha in sorted(por_dia):
+            facturas, noct, minutos, centavos = por_dia[fecha]
+            hoja_diaria.append([fecha, facturas, noct, facturas - noct, minutos, a_float(centavos)])
+        hoja_diaria.append([
+            'Total', total, nocturnas[0], total - nocturnas[0],
+            sum(d[2] for d in por_dia.values()), a_float(sum(d[3] for d in por_dia.values()))
+        ])
+
+        hoja_espacios.append(['Espacio', 'Facturas', 'Minutos', 'Minutos promedio', 'Ingresos'])
+        for espacio in sorted(por_espacio):
+            facturas, minutos, centavos = por_espacio[espacio]
+            hoja_espacios.append([espacio, facturas, minutos, round(minutos / facturas, 1), a_float(centavos)])
+
+        hoja_duracion.append(['Duración', 'Facturas', 'Ingresos'])
+        for (nombre, _), (facturas, centavos) in zip(RANGOS_DURACION, por_duracion):
+            hoja_duracion.append([nombre, facturas, a_float(centavos)])
+        hoja_duracion.append(['Tarifa nocturna', nocturnas[0], a_float(nocturnas[1])])
+
+        libro.save(destino)
+        return total
@@ -0,0 +1,167 @@
+from sqlalchemy.orm import Session
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date, timedelta
+from itertools import repeat
+import multiprocessing
+import os
+import threading
+import time
+from app.config import FACTURAS_PDF_DIR, FACTURAS_PDF_PROCESOS, FACTURAS_PDF_COLA
+from app.modelos.historial_factura import HistorialFactura
+from app.utils.dinero import formatear_centavos
+from app.utils.factura_pdf import huella_factura, ruta_en_cache, guardar_en_cache
+
+# Segundos máximos que una petición espera el render de un PDF que no está en cache
+ESPERA_RENDER_SEGUNDOS = 30
+
+# "spawn": los procesos no heredan conexiones ni hilos del servidor
+_contexto = multiprocessing.get_context('spawn')
+_pool = None
+_lock_pool = threading.Lock()
+# Renders en cola o en curso; si se llenan, el PDF se genera al pedirlo
+_cupos = threading.BoundedSemaphore(FACTURAS_PDF_COLA)
+
+
+def _obtener_pool():
+    """Pool de procesos para el render (se crea al primer uso)"""
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=FACTURAS_PDF_PROCESOS, mp_context=_contexto)
+        return _pool
+
+
+def _formatear_minutos(minutos: int):
+    horas, mins = divmod(max(minutos, 0), 60)
+    if horas and mins:
+        return f'{horas}h {mins}m'
+    return f'{horas}h' if horas else f'{mins}m'
+
+
+class FacturaService:
+    """
+    Servicio para las facturas en PDF.
+
+    Los PDF se guardan en una cache en disco direccionada por contenido (la
+    huella SHA-256 de los datos impresos), así que una factura se renderiza
+    una sola vez y un cambio de plantilla genera archivos nuevos sin borrar
+    nada a mano. El render corre en un pool de procesos acotado, fuera del
+    camino de la petición de salida.
+    """
+
+    @staticmethod
+    def datos_pdf(factura: HistorialFactura):
+        """Textos que se imprimen en la factura (entrada del render y de la huella)"""
+        return {
+            'numero': str(factura.id),
+            'emitida': (factura.fecha_generacion or factura.fecha_hora_salida).strftime('%Y-%m-%d %H:%M'),
+            'placa': factura.placa,
+            'espacio': str(factura.espacio_numero),
+            'entrada': factura.fecha_hora_entrada.strftime('%Y-%m-%d %H:%M'),
+            'salida': factura.fecha_hora_salida.strftime('%Y-%m-%d %H:%M'),
+            'tiempo': _formatear_minutos(factura.tiempo_total_minutos),
+            'tarifa': 'NOCTURNA' if factura.es_nocturno else 'NORMAL',
+            'detalles': (factura.detalles_cobro or '').split(' | '),
+            'total': formatear_centavos(factura.costo_total),
+        }
+
+    @staticmethod
+    def programar_pdf(factura: HistorialFactura):
+        """
+        Encolar el render del PDF de una factura recién creada, sin esperarlo.
+
+        Si la cola está llena o el pool falla no se reintenta: el PDF se
+        genera cuando alguien lo pida.
+        """
+        try:
+            datos = FacturaService.datos_pdf(factura)
+            if os.path.exists(ruta_en_cache(FACTURAS_PDF_DIR, huella_factura(datos))):
+                return
+            if not _cupos.acquire(blocking=False):
+                print(f"⚠️ Cola de PDF llena, la factura {factura.id} se renderizará al pedirla")
+                return
+            try:
+                futuro = _obtener_pool().submit(guardar_en_cache, datos, FACTURAS_PDF_DIR)
+            except Exception:
+                _cupos.release()
+                raise
+            futuro.add_done_callback(lambda _: _cupos.release())
+        except Exception as e:
+            print(f"⚠️ No se pudo encolar el PDF de la factura {factura.id}: {e}")
+
+    @staticmethod
+    def ruta_pdf(db: Session, factura_id: int):
+        """
+        Ruta del PDF de una factura en la cache, renderizándolo si falta.
+
+        Returns:
+            Ruta del archivo, o None si la factura no existe
+        """
+        factura = db.get(HistorialFactura, factura_id)
+        if factura is None:
+            return None
+
+        datos = FacturaService.datos_pdf(factura)
+        ruta = ruta_en_cache(FACTURAS_PDF_DIR, huella_factura(datos))
+        if os.path.exists(ruta):
+            return ruta
+        return _obtener_pool().submit(guardar_en_cache, datos, FACTURAS_PDF_DIR).result(
+            timeout=ESPERA_RENDER_SEGUNDOS
+        )
+
+    @staticmethod
+    def rerenderizar_rango(db: Session, desde: date, hasta: date, procesos: int = None, forzar: bool = False):
+        """
+        Renderizar los PDF de las facturas con salida entre `desde` y `hasta` (inclusive).
+
+        Usa un pool propio con un proceso por núcleo; las facturas que ya están
+        en la cache se saltan salvo que se pida `forzar`.
+
+        Returns:
+            Diccionario con facturas, renderizadas, ya en cache y segundos
+        """
+        inicio = datetime.combine(desde, datetime.min.time())
+        fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+        facturas = db.query(HistorialFactura).filter(
+            HistorialFactura.fecha_hora_salida >= inicio,
+            HistorialFactura.fecha_hora_salida < fin
+        ).order_by(HistorialFactura.id).all()
+
+        pendientes = []
+        for factura in facturas:
+            datos = FacturaService.datos_pdf(factura)
+            ruta = ruta_en_cache(FACTURAS_PDF_DIR, huella_factura(datos))
+            if forzar and os.path.exists(ruta):
+                os.remove(ruta)
+            if forzar or not os.path.exists(ruta):
+                pendientes.append(datos)
+
+        t0 = time.perf_counter()
+        if pendientes:
+            procesos = procesos or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=procesos, mp_context=_contexto) as pool:
+                lote = max(1, len(pendientes) // (procesos * 4))
+                for _ in pool.map(guardar_en_cache, pendientes, repeat(FACTURAS_PDF_DIR), chunksize=lote):
+                    pass
+
+        return {
+            'facturas': len(facturas),
+            'renderizadas': len(pendientes),
+            'en_cache': len(facturas) - len(pendientes),
+            'segundos': round(time.perf_counter() - t0, 2),
+        }
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.servicios.factura_service DESDE HASTA [--forzar]
+    import sys
+    from app.config import SessionLocal
+
+    db = SessionLocal()
+    try:
+        desde = date.fromisoformat(sys.argv[1])
+        hasta = date.fromisoformat(sys.argv[2])
+        resultado = FacturaService.rerenderizar_rango(db, desde, hasta, forzar='--forzar' in sys.argv)
+        print(f"✅ PDF de facturas: {resultado}")
+    finally:
+        db.close()
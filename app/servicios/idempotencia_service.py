@@ -0,0 +1,157 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import hashlib
+import json
+import time
+from app.config import IDEMPOTENCIA_TTL_HORAS, IDEMPOTENCIA_ABANDONO_SEGUNDOS
+from app.modelos.clave_idempotencia import ClaveIdempotencia
+
+# Resultados de IdempotenciaService.reservar
+NUEVA = 'nueva'            # La petición debe ejecutarse
+REPETIDA = 'repetida'      # Ya hay respuesta guardada: devolverla
+EN_CURSO = 'en_curso'      # La primera petición aún se está procesando
+CONFLICTO = 'conflicto'    # La clave se usó con otro cuerpo
+
+# Segundos entre purgas de claves vencidas (por proceso)
+_INTERVALO_PURGA = 60.0
+_ultima_purga = {'en': 0.0}
+
+
+def huella_cuerpo(datos: dict):
+    """SHA-256 del cuerpo de la petición en JSON canónico"""
+    contenido = json.dumps(datos, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+class IdempotenciaService:
+    """
+    Servicio para el encabezado Idempotency-Key de las terminales de la puerta.
+
+    La primera petición con una clave inserta una fila "en curso" (la llave
+    primaria garantiza que solo una gana), ejecuta la operación y guarda el
+    código y el cuerpo de la respuesta. Los reintentos con la misma clave
+    reciben esa respuesta sin volver a ejecutar nada. Las filas vencen a las
+    IDEMPOTENCIA_TTL_HORAS horas.
+
+    Sin base principal las claves se reservan y responden en el diario local
+    de la puerta (métodos *_local); como la base no las conoce, `reservar`
+    mira primero el diario.
+    """
+
+    @staticmethod
+    def _interpretar(existente: dict, huella: str):
+        """(resultado, respuesta) para una clave del diario local que ya existía"""
+        if existente['huella'] != huella:
+            return CONFLICTO, None
+        if existente['estado_http'] is not None:
+            return REPETIDA, (existente['estado_http'], json.loads(existente['respuesta']))
+        return EN_CURSO, None
+
+    @staticmethod
+    def reservar(db: Session, ruta: str, clave: str, huella: str, diario=None):
+        """
+        Reservar la clave para esta petición o leer la respuesta ya guardada.
+
+        Args:
+            diario: DiarioLocal donde buscar primero las claves respondidas sin base
+
+        Returns:
+            Tupla (resultado, respuesta) donde resultado es NUEVA, REPETIDA,
+            EN_CURSO o CONFLICTO y respuesta es (estado_http, cuerpo) si es REPETIDA
+        """
+        ahora = datetime.now()
+        if diario is not None:
+            local = diario.leer_clave(ruta, clave, ahora)
+            if local is not None and local['estado_http'] is not None:
+                return IdempotenciaService._interpretar(local, huella)
+        IdempotenciaService._purgar_si_toca(db)
+
+        for _ in range(2):
+            db.add(ClaveIdempotencia(
+                ruta=ruta,
+                clave=clave,
+                huella=huella,
+                creada_en=ahora,
+                expira_en=ahora + timedelta(hours=IDEMPOTENCIA_TTL_HORAS)
+            ))
+            try:
+                db.commit()
+                return NUEVA, None
+            except IntegrityError:
+                db.rollback()
+
+            existente = db.get(ClaveIdempotencia, (ruta, clave), populate_existing=True)
+            if existente is None:
+                continue  # Se borró entre el INSERT y la lectura
+            if existente.huella != huella:
+                return CONFLICTO, None
+            if existente.estado_http is not None and existente.expira_en > ahora:
+                return REPETIDA, (existente.estado_http, json.loads(existente.respuesta))
+
+            abandonada = existente.creada_en < ahora - timedelta(seconds=IDEMPOTENCIA_ABANDONO_SEGUNDOS)
+            if existente.estado_http is None and not abandonada:
+                return EN_CURSO, None
+
+            # Vencida o abandonada: se libera y se vuelve a intentar
+            db.delete(existente)
+            db.commit()
+
+        return EN_CURSO, None
+
+    @staticmethod
+    def guardar(db: Session, ruta: str, clave: str, estado_http: int, cuerpo):
+        """Guardar la respuesta de la petición que reservó la clave"""
+        fila = db.get(ClaveIdempotencia, (ruta, clave))
+        if fila is None:
+            return
+        fila.estado_http = estado_http
+        fila.respuesta = json.dumps(cuerpo, separators=(',', ':'), ensure_ascii=False)
+        db.commit()
+
+    @staticmethod
+    def reservar_local(diario, ruta: str, clave: str, huella: str):
+        """Como `reservar`, en el diario local (la base principal no responde)"""
+        ahora = datetime.now()
+        existente = diario.reservar_clave(
+            ruta, clave, huella, ahora,
+            ahora + timedelta(hours=IDEMPOTENCIA_TTL_HORAS),
+            ahora - timedelta(seconds=IDEMPOTENCIA_ABANDONO_SEGUNDOS)
+        )
+        if existente is None:
+            return NUEVA, None
+        return IdempotenciaService._interpretar(existente, huella)
+
+    @staticmethod
+    def guardar_local(diario, ruta: str, clave: str, huella: str, estado_http: int, cuerpo):
+        """Guardar la respuesta en el diario local (sin base, o si guardarla en la base falló)"""
+        ahora = datetime.now()
+        diario.guardar_clave(
+            ruta, clave, huella, estado_http,
+            json.dumps(cuerpo, separators=(',', ':'), ensure_ascii=False),
+            ahora, ahora + timedelta(hours=IDEMPOTENCIA_TTL_HORAS)
+        )
+
+    @staticmethod
+    def liberar(db: Session, ruta: str, clave: str):
+        """Borrar la reserva (error del servidor): un reintento vuelve a ejecutar"""
+        db.execute(delete(ClaveIdempotencia).where(
+            ClaveIdempotencia.ruta == ruta,
+            ClaveIdempotencia.clave == clave,
+            ClaveIdempotencia.estado_http.is_(None)
+        ))
+        db.commit()
+
+    @staticmethod
+    def _purgar_si_toca(db: Session):
+        """Borrar las claves vencidas, como mucho una vez por _INTERVALO_PURGA"""
+        if time.monotonic() - _ultima_purga['en'] < _INTERVALO_PURGA:
+            return
+        _ultima_purga['en'] = time.monotonic()
+        borradas = db.execute(
+            delete(ClaveIdempotencia).where(ClaveIdempotencia.expira_en < datetime.now())
+        ).rowcount
+        db.commit()
+        if borradas:
+            print(f"🧹 {borradas} clave(s) de idempotencia vencida(s) eliminada(s)")
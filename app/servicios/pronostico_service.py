@@ -0,0 +1,198 @@
+from sqlalchemy.orm import Session
+from datetime import datetime, date, timedelta
+import math
+import threading
+import numpy as np
+from app.config import TOTAL_ESPACIOS, PRONOSTICO_ALFA, PRONOSTICO_UMBRAL_LLENO
+from app.servicios.resumen_service import ResumenService
+
+# Series del resumen horario que se pronostican (mismo orden que las columnas)
+SERIES = ('llegadas', 'llegadas_nocturnas', 'ocupacion_promedio', 'ocupacion_maxima')
+
+# Cuantil normal de la banda superior (~95% de un lado)
+Z_BANDA = 1.645
+
+# Días máximos por pronóstico
+MAX_DIAS_PRONOSTICO = 28
+
+
+class ModeloDemanda:
+    """
+    Perfil estacional día de la semana x hora con suavizado exponencial.
+
+    Para cada serie y celda (día de la semana, hora) se mantiene un nivel y una
+    varianza exponencialmente ponderados. Cada día nuevo del resumen actualiza
+    solo las 24 celdas de su día de la semana, así que el modelo se reajusta de
+    forma incremental sin volver a leer el historial.
+    """
+
+    def __init__(self, alfa: float):
+        self.alfa = alfa
+        self.nivel = np.zeros((len(SERIES), 7, 24))
+        self.varianza = np.zeros((len(SERIES), 7, 24))
+        self.observaciones = np.zeros(7, dtype=np.int64)
+        self.ultimo_dia = None
+
+    def actualizar(self, filas):
+        """
+        Incorporar filas de resumen_horario posteriores a ultimo_dia.
+
+        Args:
+            filas: Tuplas (fecha, hora, *SERIES) ordenadas por fecha y hora
+
+        Returns:
+            Número de días incorporados
+        """
+        if not filas:
+            return 0
+
+        # Matriz [día, serie, hora]; las horas sin fila quedan en cero
+        fechas = sorted({fila[0] for fila in filas})
+        posicion = {fecha: i for i, fecha in enumerate(fechas)}
+        valores = np.zeros((len(fechas), len(SERIES), 24))
+        for fila in filas:
+            valores[posicion[fila[0]], :, fila[1]] = fila[2:]
+
+        alfa = self.alfa
+        for fecha, x in zip(fechas, valores):
+            dia = fecha.weekday()
+            if self.observaciones[dia] == 0:
+                self.nivel[:, dia] = x
+            else:
+                error = x - self.nivel[:, dia]
+                self.nivel[:, dia] += alfa * error
+                self.varianza[:, dia] = (1 - alfa) * (self.varianza[:, dia] + alfa * error ** 2)
+            self.observaciones[dia] += 1
+
+        self.ultimo_dia = fechas[-1]
+        return len(fechas)
+
+    def pronosticar(self, desde: date, dias: int, umbral: float):
+        """Pronóstico por hora y resumen por día de [desde, desde + dias)"""
+        nivel = dict(zip(SERIES, self.nivel))
+        desviacion = dict(zip(SERIES, np.sqrt(self.varianza)))
+        limite_lleno = TOTAL_ESPACIOS * umbral
+
+        horas, resumen_dias, periodos = [], [], []
+        periodo = None
+        for d in range(dias):
+            fecha = desde + timedelta(days=d)
+            dia = fecha.weekday()
+            llegadas = nivel['llegadas'][dia]
+            nocturnas = nivel['llegadas_nocturnas'][dia]
+            maxima = np.minimum(nivel['ocupacion_maxima'][dia], TOTAL_ESPACIOS)
+            llenas = maxima >= limite_lleno
+
+            for h in range(24):
+                inicio = datetime.combine(fecha, datetime.min.time()) + timedelta(hours=h)
+                horas.append({
+                    'hora': inicio.isoformat(),
+                    'llegadas': round(float(llegadas[h]), 2),
+                    'llegadas_max': round(float(llegadas[h] + Z_BANDA * desviacion['llegadas'][dia, h]), 2),
+                    'llegadas_nocturnas': round(float(nocturnas[h]), 2),
+                    'ocupacion_promedio': round(float(nivel['ocupacion_promedio'][dia, h]), 2),
+                    'ocupacion_maxima': round(float(maxima[h]), 2),
+                    'lleno_probable': bool(llenas[h]),
+                })
+
+                # Horas llenas consecutivas (también entre días) forman un período
+                if llenas[h]:
+                    if periodo is None:
+                        periodo = {'inicio': inicio, 'fin': None, 'ocupacion_maxima': 0.0}
+                        periodos.append(periodo)
+                    periodo['fin'] = inicio + timedelta(hours=1)
+                    periodo['ocupacion_maxima'] = max(periodo['ocupacion_maxima'], float(maxima[h]))
+                else:
+                    periodo = None
+
+            # Espacios a reservar para huéspedes nocturnos: banda superior de
+            # las llegadas nocturnas del día (varianzas sumadas por hora)
+            banda_nocturna = Z_BANDA * math.sqrt(float(self.varianza[1, dia].sum()))
+            resumen_dias.append({
+                'fecha': fecha.isoformat(),
+                'llegadas': round(float(llegadas.sum()), 2),
+                'llegadas_nocturnas': round(float(nocturnas.sum()), 2),
+                'espacios_nocturnos_sugeridos': min(TOTAL_ESPACIOS, math.ceil(nocturnas.sum() + banda_nocturna)),
+                'horas_llenas': int(llenas.sum()),
+            })
+
+        return {
+            'horas': horas,
+            'dias_resumen': resumen_dias,
+            'periodos_llenos': [
+                {
+                    'inicio': p['inicio'].isoformat(),
+                    'fin': p['fin'].isoformat(),
+                    'ocupacion_maxima': round(p['ocupacion_maxima'], 2),
+                }
+                for p in periodos
+            ],
+        }
+
+
+# Modelo ajustado de este proceso; se reajusta con los días nuevos del resumen
+_modelo = ModeloDemanda(PRONOSTICO_ALFA)
+_lock_modelo = threading.Lock()
+
+
+class PronosticoService:
+    """Servicio de pronóstico de llegadas y ocupación por hora"""
+
+    @staticmethod
+    def obtener_modelo(db: Session):
+        """
+        Modelo en memoria, puesto al día con los días cerrados que falten.
+
+        Incorpora al modelo únicamente las filas de resumen_horario
+        posteriores a su último día; los días los consolida la tarea de fondo
+        (ResumenService.consolidar), así que la petición solo lee.
+        """
+        with _lock_modelo:
+            filas = ResumenService.leer_desde(db, _modelo.ultimo_dia)
+            dias = _modelo.actualizar(filas)
+            if dias:
+                print(f"📈 Modelo de demanda reajustado con {dias} día(s) nuevo(s)")
+        return _modelo
+
+    @staticmethod
+    def pronostico(db: Session, dias: int = 7, umbral: float = None):
+        """
+        Pronóstico de los próximos `dias` días a partir de hoy.
+
+        Args:
+            db: Sesión de base de datos (de lectura)
+            dias: Días a pronosticar (1-MAX_DIAS_PRONOSTICO)
+            umbral: Fracción de la capacidad considerada "lleno"
+
+        Returns:
+            Diccionario con la serie por hora, el resumen por día y los
+            períodos en que se espera el parqueadero lleno
+
+        Raises:
+            ValueError: Si los parámetros son inválidos o no hay historial
+        """
+        umbral = PRONOSTICO_UMBRAL_LLENO if umbral is None else umbral
+        if not 1 <= dias <= MAX_DIAS_PRONOSTICO:
+            raise ValueError(f"dias debe estar entre 1 y {MAX_DIAS_PRONOSTICO}")
+        if not 0 < umbral <= 1:
+            raise ValueError("umbral debe estar entre 0 y 1")
+
+        modelo = PronosticoService.obtener_modelo(db)
+        if modelo.ultimo_dia is None:
+            raise ValueError("No hay historial suficiente para pronosticar")
+
+        desde = date.today()
+        with _lock_modelo:
+            resultado = modelo.pronosticar(desde, dias, umbral)
+            dias_historial = int(modelo.observaciones.sum())
+            ultimo_dia = modelo.ultimo_dia
+
+        return {
+            'desde': desde.isoformat(),
+            'dias': dias,
+            'capacidad': TOTAL_ESPACIOS,
+            'umbral_lleno': umbral,
+            'dias_historial': dias_historial,
+            'ultimo_dia_historial': ultimo_dia.isoformat(),
+            **resultado,
+        }
@@ -0,0 +1,559 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import DBAPIError, OperationalError, InterfaceError, IntegrityError
+from datetime import datetime
+import threading
+import time
+from app.config import (
+    SessionLocal, PUERTA_MODO, DIARIO_LOCAL_RUTA, DIARIO_LOTE, DIARIO_INTERVALO, DIARIO_MAX_INTENTOS
+)
+from app.modelos.vehiculo_estacionado import VehiculoEstacionado
+from app.modelos.evento_diario_aplicado import EventoDiarioAplicado
+from app.modelos.historial_factura import HistorialFactura
+from app.servicios.configuracion_service import ConfiguracionService
+from app.servicios.bitacora_service import BitacoraService
+from app.servicios.alerta_service import AlertaService
+from app.servicios.resumen_placa_service import ResumenPlacaService
+from app.servicios.resumen_service import ResumenService
+from app.utils.diario_local import DiarioLocal, SINCRONIZADO, CONFLICTO
+from app.utils import candado_proceso
+from app.utils.plan_tarifario import PlanTarifario
+from app.utils.historial_tarifas import historial_tarifas
+from app.utils.cache_reportes import cache_reportes
+from app.utils.estado_compartido import estado_compartido
+
+# Segundos entre refrescos de la ocupación local y la tarifa desde la base
+INTERVALO_ESPEJO = 30.0
+# Segundos entre consolidaciones de los resúmenes por hora y por espacio
+INTERVALO_RESUMENES = 300.0
+
+_diario = None
+_lock_diario = threading.Lock()
+# Se activa al anotar un evento para que el sincronizador no espere el intervalo
+_despertar = threading.Event()
+_detener = threading.Event()
+_hilo = None
+_estado_sincronizador = {'ultima_sincronizacion': None, 'ultimo_error': None, 'base_disponible': None}
+# Candado del proceso que sincroniza el diario (uno solo entre los workers)
+_sincronizador = {'fd': None}
+
+
+def es_caida_de_base(error: Exception):
+    """True si el error indica que la base principal no está disponible"""
+    if isinstance(error, (OperationalError, InterfaceError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+def _es_sincronizador():
+    """
+    True si este proceso lleva el diario a la base.
+
+    Todos los workers comparten el archivo del diario; solo el que tiene el
+    candado (flock junto al diario) lo sincroniza. Si ese proceso muere,
+    otro lo toma en su siguiente vuelta. Sin flock (Windows) corre un solo
+    proceso; la llave de eventos_diario_aplicados evita duplicados igual.
+    """
+    if not candado_proceso.DISPONIBLE:
+        return True
+    if _sincronizador['fd'] is None:
+        _sincronizador['fd'] = candado_proceso.tomar_candado(DIARIO_LOCAL_RUTA + '.sincronizador.lock')
+    return _sincronizador['fd'] is not None
+
+
+def obtener_diario():
+    """Diario local del proceso (se abre al primer uso)"""
+    global _diario
+    with _lock_diario:
+        if _diario is None:
+            _diario = DiarioLocal(DIARIO_LOCAL_RUTA)
+        return _diario
+
+
+class PuertaLocalService:
+    """
+    Operación de la puerta sobre el diario local.
+
+    En modo "directo" (por defecto) la puerta escribe en la base principal y
+    el diario solo se usa si la base no responde o si aún quedan eventos sin
+    sincronizar. En modo "diario" toda entrada/salida se anota primero en el
+    diario (un fsync local) y un hilo la lleva a la base en lotes.
+    """
+
+    @staticmethod
+    def usar_diario():
+        """
+        True si la puerta debe escribir en el diario local en lugar de la base.
+
+        No consulta el archivo: usa la copia en memoria del diario, que se
+        pone al día al anotar y al sincronizar en este proceso, y cada
+        DIARIO_INTERVALO con lo que anotaron los demás workers.
+        """
+        return PUERTA_MODO == 'diario' or obtener_diario().hay_pendientes()
+
+    @staticmethod
+    def plan_local():
+        """PlanTarifario de la última tarifa guardada en el diario"""
+        datos = obtener_diario().leer_tarifa()
+        if datos is None:
+            raise RuntimeError('No hay tarifa en cache local; la base principal no está disponible')
+        return PlanTarifario(
+            datos['media_hora'],
+            datos['hora_adicional'],
+            datos['nocturno'],
+            datos['hora_inicio_nocturno'],
+            datos['hora_fin_nocturno'],
+            version=datos['version']
+        )
+
+    @staticmethod
+    def plan_local_en(entrada: datetime, local: PlanTarifario = None):
+        """
+        PlanTarifario vigente a la hora de entrada, sin consultar la base.
+
+        Usa el historial de versiones cargado en memoria; si la tarifa del
+        diario es más nueva que la última versión del historial (cambió
+        mientras la base no respondía), cobra con la del diario.
+        """
+        local = local or PuertaLocalService.plan_local()
+        plan = historial_tarifas.vigente_en(entrada)
+        if plan is None or (local.version or 0) > (historial_tarifas.ultima_version() or 0):
+            return local
+        return plan
+
+    @staticmethod
+    def registrar_entrada(placa: str, espacio_numero: int, es_nocturno: bool = False):
+        """
+        Registrar una entrada en el diario local.
+
+        Returns:
+            Diccionario con el formato de VehiculoEstacionado.to_dict; el id es
+            provisional (negativo) hasta que el evento llegue a la base
+
+        Raises:
+            ValueError: Si el espacio está ocupado o el vehículo ya está adentro
+        """
+        placa = placa.upper().strip()
+        if not (1 <= espacio_numero <= 24):
+            raise ValueError('El número de espacio debe estar entre 1 y 24')
+
+        # Segundos enteros: DATETIME de MySQL no guarda microsegundos y la
+        # detección de eventos ya aplicados compara fechas exactas
+        ahora = datetime.now().replace(microsecond=0)
+        seq = obtener_diario().registrar_entrada(placa, espacio_numero, es_nocturno, ahora)
+        _despertar.set()
+        return {
+            'id': -seq,
+            'placa': placa,
+            'espacio_numero': espacio_numero,
+            'fecha_hora_entrada': ahora.isoformat(),
+            'fecha_hora_salida': None,
+            'costo_total': None,
+            'estado': 'activo',
+            'es_nocturno': es_nocturno,
+            'creado_en': ahora.isoformat()
+        }
+
+    @staticmethod
+    def registrar_salida(placa: str):
+        """
+        Registrar una salida en el diario local, cobrando con la tarifa
+        vigente a la entrada (historial en memoria o tarifa en cache).
+
+        Returns:
+            Diccionario con placa, espacio, entrada, salida, minutos, costo
+            (centavos), detalles y es_nocturno
+
+        Raises:
+            ValueError: Si el vehículo no está en la ocupación local
+        """
+        placa = placa.upper().strip()
+        local = PuertaLocalService.plan_local()
+        fecha_salida = datetime.now().replace(microsecond=0)
+
+        def calcular(entrada, es_nocturno):
+            plan = PuertaLocalService.plan_local_en(entrada, local)
+            calculo = plan.calcular(entrada, fecha_salida, es_nocturno)
+            return {
+                **calculo,
+                'version_tarifa': plan.version,
+                'precio_media_hora': plan.media_hora,
+                'precio_hora_adicional': plan.hora_adicional,
+                'precio_nocturno': plan.nocturno,
+            }
+
+        _, ocupante, calculo = obtener_diario().registrar_salida(placa, fecha_salida, calcular)
+        _despertar.set()
+        return {
+            'placa': placa,
+            'espacio': ocupante['espacio'],
+            'entrada': ocupante['entrada'],
+            'salida': fecha_salida.isoformat(),
+            'minutos': calculo['minutos'],
+            'costo': calculo['costo'],
+            'detalles': calculo['detalles'],
+            'es_nocturno': bool(ocupante['es_nocturno']),
+        }
+
+    @staticmethod
+    def obtener_espacios():
+        """Estado de los 24 espacios según la ocupación local"""
+        ocupacion = obtener_diario().ocupacion()
+        espacios = []
+        for i in range(1, 25):
+            ocupante = ocupacion.get(i)
+            espacios.append({
+                'numero': i,
+                'ocupado': ocupante is not None,
+                'placa': ocupante['placa'] if ocupante else None,
+                'entrada': ocupante['entrada'] if ocupante else None,
+                'es_nocturno': bool(ocupante['es_nocturno']) if ocupante else False
+            })
+        return espacios
+
+    @staticmethod
+    def buscar_vehiculo(placa: str):
+        """
+        Vehículo de la ocupación local con su costo estimado.
+
+        Raises:
+            ValueError: Si el vehículo no está en la ocupación local
+        """
+        placa = placa.upper().strip()
+        ocupante = obtener_diario().ocupante(placa)
+        if not ocupante:
+            raise ValueError('Vehículo no encontrado')
+        entrada = datetime.fromisoformat(ocupante['entrada'])
+        calculo = PuertaLocalService.plan_local_en(entrada).calcular(
+            entrada, datetime.now(), bool(ocupante['es_nocturno'])
+        )
+        return {'ocupante': ocupante, **calculo}
+
+    # ------------------------------------------------------------------
+    # Espejo de la base principal
+    # ------------------------------------------------------------------
+    @staticmethod
+    def espejo_entrada(vehiculo: VehiculoEstacionado):
+        """Reflejar en la ocupación local una entrada escrita en la base"""
+        try:
+            obtener_diario().espejo_entrada(
+                vehiculo.placa, vehiculo.espacio_numero, vehiculo.es_nocturno,
+                vehiculo.fecha_hora_entrada.replace(microsecond=0)
+            )
+        except Exception as e:
+            print(f"⚠️ No se pudo actualizar la ocupación local: {e}")
+
+    @staticmethod
+    def espejo_salida(placa: str):
+        """Reflejar en la ocupación local una salida escrita en la base"""
+        try:
+            obtener_diario().espejo_salida(placa)
+        except Exception as e:
+            print(f"⚠️ No se pudo actualizar la ocupación local: {e}")
+
+    @staticmethod
+    def refrescar_espejo(db: Session):
+        """
+        Copiar los vehículos activos y la tarifa vigente de la base al diario
+        y a la memoria compartida de los workers, y reconciliar las alertas.
+
+        La ocupación del diario no se reemplaza mientras haya eventos
+        pendientes: en ese caso es más reciente que la de la base.
+        """
+        def consultar():
+            config = ConfiguracionService.obtener_configuracion(db)
+            activos = db.query(
+                VehiculoEstacionado.id,
+                VehiculoEstacionado.espacio_numero,
+                VehiculoEstacionado.placa,
+                VehiculoEstacionado.fecha_hora_entrada,
+                VehiculoEstacionado.es_nocturno,
+                VehiculoEstacionado.creado_en
+            ).filter(VehiculoEstacionado.estado == 'activo').all()
+            return config, activos
+
+        # La memoria compartida se recarga completa: corrige cualquier
+        # publicación perdida (un worker que murió entre el commit y publicar)
+        config, activos = estado_compartido.recargar(consultar)
+        plan = PlanTarifario.desde_configuracion(config)
+        # Historial de versiones al día para cobrar sin base si deja de responder
+        ConfiguracionService.historial(db)
+        AlertaService.reconciliar(activos, plan)
+
+        diario = obtener_diario()
+        diario.guardar_tarifa(plan)
+        if diario.consultar_pendientes():
+            return
+        diario.reemplazar_ocupacion([
+            (v.espacio_numero, v.placa, v.fecha_hora_entrada, v.es_nocturno) for v in activos
+        ])
+
+    # ------------------------------------------------------------------
+    # Sincronización con la base principal
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _aplicar_entrada(db: Session, evento: dict):
+        """
+        Insertar la entrada.
+
+        Returns:
+            Tupla (conflicto, aplicado): mensaje de conflicto o None, y True
+            si se escribió en la base (False si ya estaba aplicada)
+        """
+        entrada = datetime.fromisoformat(evento['entrada'])
+        activo = db.query(VehiculoEstacionado).filter_by(placa=evento['placa'], estado='activo').first()
+        if activo is not None:
+            if activo.fecha_hora_entrada == entrada and activo.espacio_numero == evento['espacio']:
+                return None, False  # Ya aplicado (reintento tras una caída)
+            return f"El vehículo {evento['placa']} ya está activo en el espacio {activo.espacio_numero}", False
+        ocupado = db.query(VehiculoEstacionado.placa).filter_by(
+            espacio_numero=evento['espacio'], estado='activo'
+        ).first()
+        if ocupado is not None:
+            return f"El espacio {evento['espacio']} está ocupado por {ocupado.placa}", False
+
+        db.add(VehiculoEstacionado(
+            placa=evento['placa'],
+            espacio_numero=evento['espacio'],
+            fecha_hora_entrada=entrada,
+            estado='activo',
+            es_nocturno=bool(evento['es_nocturno'])
+        ))
+        # La sesión no hace autoflush: una salida del mismo lote debe verla
+        db.flush()
+        return None, True
+
+    @staticmethod
+    def _aplicar_salida(db: Session, evento: dict):
+        """Cerrar la estancia y crear la factura; devuelve (conflicto, aplicado) como _aplicar_entrada"""
+        salida = datetime.fromisoformat(evento['salida'])
+        vehiculo = db.query(VehiculoEstacionado).filter_by(placa=evento['placa'], estado='activo').first()
+        if vehiculo is None:
+            ya_aplicada = db.query(VehiculoEstacionado.id).filter_by(
+                placa=evento['placa'], estado='finalizado', fecha_hora_salida=salida
+            ).first()
+            return (None if ya_aplicada else f"El vehículo {evento['placa']} no está activo en la base"), False
+
+        vehiculo.fecha_hora_salida = salida
+        vehiculo.costo_total = evento['costo']
+        vehiculo.estado = 'finalizado'
+        db.flush()
+        db.add(HistorialFactura(
+            vehiculo_id=vehiculo.id,
+            placa=vehiculo.placa,
+            espacio_numero=vehiculo.espacio_numero,
+            fecha_hora_entrada=vehiculo.fecha_hora_entrada,
+            fecha_hora_salida=salida,
+            tiempo_total_minutos=evento['minutos'],
+            costo_total=evento['costo'],
+            detalles_cobro=evento['detalles'],
+            es_nocturno=vehiculo.es_nocturno,
+            version_tarifa=evento['version_tarifa'],
+            precio_media_hora=evento['precio_media_hora'],
+            precio_hora_adicional=evento['precio_hora_adicional'],
+            precio_nocturno=evento['precio_nocturno']
+        ))
+        ResumenPlacaService.registrar_factura(
+            db, vehiculo.placa, vehiculo.fecha_hora_entrada, salida,
+            evento['minutos'], evento['costo'], vehiculo.es_nocturno
+        )
+        return None, True
+
+    @staticmethod
+    def _anotar_en_bitacora(evento: dict):
+        entrada = datetime.fromisoformat(evento['entrada'])
+        if evento['tipo'] == 'entrada':
+            BitacoraService.registrar_entrada(evento['placa'], evento['espacio'], evento['es_nocturno'], entrada)
+        else:
+            BitacoraService.registrar_salida(
+                evento['placa'], evento['espacio'], evento['es_nocturno'], entrada,
+                datetime.fromisoformat(evento['salida']), evento['minutos'], evento['costo']
+            )
+
+    @staticmethod
+    def _marcar_aplicado(db: Session, diario: DiarioLocal, evento: dict):
+        """
+        Registrar el evento en eventos_diario_aplicados (dentro del SAVEPOINT).
+
+        Returns:
+            False si otro proceso (o un intento anterior) ya lo aplicó
+        """
+        db.add(EventoDiarioAplicado(clave=f"{diario.id}:{evento['seq']}"))
+        try:
+            db.flush()
+        except IntegrityError:
+            return False
+        return True
+
+    @staticmethod
+    def sincronizar_lote(db: Session, limite: int = None):
+        """
+        Llevar a la base un lote de eventos pendientes en una sola transacción.
+
+        Cada evento va en un SAVEPOINT: un conflicto (espacio ocupado,
+        vehículo ya activo o inexistente) marca ese evento y no detiene el
+        lote. Cada evento aplicado deja su llave en eventos_diario_aplicados
+        en la misma transacción, así que un evento nunca se aplica dos veces
+        (también se detectan los aplicados antes de existir esa tabla). Un
+        evento que falla por otro motivo suma un intento y sigue el lote; tras
+        DIARIO_MAX_INTENTOS queda como fallido. Si la base no responde, el
+        lote entero se deshace y se reintenta después.
+
+        Returns:
+            Tupla (sincronizados, conflictos, fallidos)
+        """
+        diario = obtener_diario()
+        eventos = diario.pendientes(limite or DIARIO_LOTE)
+        if not eventos:
+            return 0, 0, 0
+
+        resultados = []
+        fallos = []
+        dias = set()
+        aplicados = []
+        for evento in eventos:
+            aplicar = PuertaLocalService._aplicar_entrada if evento['tipo'] == 'entrada' else PuertaLocalService._aplicar_salida
+            punto = db.begin_nested()
+            try:
+                if not PuertaLocalService._marcar_aplicado(db, diario, evento):
+                    punto.rollback()
+                    resultados.append((evento['seq'], SINCRONIZADO, None))
+                    continue
+                conflicto, aplicado = aplicar(db, evento)
+            except Exception as e:
+                punto.rollback()
+                if es_caida_de_base(e):
+                    raise
+                fallos.append((evento['seq'], f"{type(e).__name__}: {e}"))
+                print(f"⚠️ Error al sincronizar evento {evento['seq']} (intento {evento['intentos'] + 1}): {e}")
+                continue
+            if conflicto:
+                punto.rollback()
+            else:
+                punto.commit()
+            if conflicto:
+                resultados.append((evento['seq'], CONFLICTO, conflicto))
+                print(f"⚠️ Conflicto al sincronizar evento {evento['seq']}: {conflicto}")
+            else:
+                resultados.append((evento['seq'], SINCRONIZADO, None))
+                if aplicado:
+                    aplicados.append(evento)
+                # La estancia cambia los reportes de todos los días que cubre
+                dias.add((
+                    datetime.fromisoformat(evento['entrada']).date(),
+                    datetime.fromisoformat(evento['salida'] or evento['entrada']).date()
+                ))
+
+        # Commit de grupo: un solo commit en la base para todo el lote
+        db.commit()
+        diario.marcar(resultados)
+        fallidos = diario.anotar_fallos(fallos, DIARIO_MAX_INTENTOS)
+        if fallidos:
+            print(f"❌ {fallidos} evento(s) del diario apartados como fallidos tras {DIARIO_MAX_INTENTOS} intentos")
+        # También las entradas inmutables: un evento de ayer sincronizado hoy cambia días cerrados
+        for desde, hasta in dias:
+            cache_reportes.invalidar_dias(desde, hasta)
+        for evento in aplicados:
+            PuertaLocalService._anotar_en_bitacora(evento)
+
+        conflictos = sum(1 for _, estado, _ in resultados if estado == CONFLICTO)
+        return len(resultados) - conflictos, conflictos, fallidos
+
+    @staticmethod
+    def sincronizar_pendientes(db: Session):
+        """Sincronizar lotes hasta vaciar el diario; devuelve (sincronizados, conflictos)"""
+        total, conflictos = 0, 0
+        while True:
+            lote, en_conflicto, fallidos = PuertaLocalService.sincronizar_lote(db)
+            # Un lote con solo reintentos pendientes no avanza: se prueba en la próxima vuelta
+            if lote + en_conflicto + fallidos == 0:
+                break
+            total += lote
+            conflictos += en_conflicto
+        if total or conflictos:
+            obtener_diario().purgar_sincronizados()
+            print(f"🔄 Diario sincronizado: {total} evento(s), {conflictos} conflicto(s)")
+        return total, conflictos
+
+    @staticmethod
+    def estado():
+        """Contadores del diario y del sincronizador"""
+        return {
+            'modo': PUERTA_MODO,
+            **obtener_diario().estadisticas(),
+            **_estado_sincronizador,
+            'sincroniza_este_proceso': _sincronizador['fd'] is not None or not candado_proceso.DISPONIBLE,
+            'conflictos_recientes': obtener_diario().conflictos(20),
+            'fallidos_recientes': obtener_diario().fallidos(20),
+        }
+
+
+def _consolidar_resumenes(db: Session):
+    # Un fallo aquí no es una caída de la base para la puerta: se reintenta en el próximo intervalo
+    try:
+        ResumenService.consolidar(db)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ No se pudieron consolidar los resúmenes: {e}")
+
+
+def _bucle_sincronizador():
+    """
+    Hilo de fondo: sincroniza el diario, refresca el espejo de la base y,
+    en el worker que sincroniza, consolida los resúmenes de los reportes.
+    """
+    ultimo_espejo = 0.0
+    ultimo_resumen = 0.0
+    while not _detener.is_set():
+        _despertar.wait(DIARIO_INTERVALO)
+        _despertar.clear()
+        # Eventos anotados por otros workers: usar_diario() no consulta el archivo
+        try:
+            obtener_diario().consultar_pendientes()
+        except Exception as e:
+            print(f"⚠️ No se pudo consultar el diario local: {e}")
+        db = SessionLocal()
+        try:
+            sincronizados = 0
+            if _es_sincronizador():
+                sincronizados, _ = PuertaLocalService.sincronizar_pendientes(db)
+                if time.monotonic() - ultimo_resumen > INTERVALO_RESUMENES:
+                    _consolidar_resumenes(db)
+                    ultimo_resumen = time.monotonic()
+            # Los eventos sincronizados no pasaron por la memoria compartida
+            if sincronizados or time.monotonic() - ultimo_espejo > INTERVALO_ESPEJO:
+                PuertaLocalService.refrescar_espejo(db)
+                db.commit()
+                ultimo_espejo = time.monotonic()
+            if _estado_sincronizador['base_disponible'] is False:
+                print("✅ Base principal disponible de nuevo")
+            _estado_sincronizador['base_disponible'] = True
+            _estado_sincronizador['ultima_sincronizacion'] = datetime.now().isoformat()
+        except Exception as e:
+            db.rollback()
+            if _estado_sincronizador['base_disponible'] is not False:
+                print(f"⚠️ Sin conexión con la base principal, la puerta sigue con el diario local: {e}")
+            _estado_sincronizador['base_disponible'] = False
+            _estado_sincronizador['ultimo_error'] = str(e)
+            # Espera un poco más antes de reintentar
+            _detener.wait(DIARIO_INTERVALO * 5)
+        finally:
+            db.close()
+
+
+def iniciar_sincronizador():
+    """Arrancar el hilo de sincronización (una vez por proceso)"""
+    global _hilo
+    if _hilo is not None and _hilo.is_alive():
+        return
+    _detener.clear()
+    _hilo = threading.Thread(target=_bucle_sincronizador, name='sincronizador-diario', daemon=True)
+    _hilo.start()
+
+
+def detener_sincronizador():
+    _detener.set()
+    _despertar.set()
+    if _hilo is not None:
+        _hilo.join(timeout=5)
+    candado_proceso.soltar_candado(_sincronizador['fd'])
+    _sincronizador['fd'] = None
@@ -0,0 +1,536 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, cast, func, or_, Integer, Numeric, type_coerce
+from datetime import datetime, timedelta
+import numpy as np
+import polars as pl
+from app.config import TOTAL_ESPACIOS
+from app.servicios.archivo_service import ArchivoService
+
+# Granularidades aceptadas por /api/reportes/rango -> intervalo de polars
+GRANULARIDADES = {
+    'dia': '1d',
+    'semana': '1w',
+    'mes': '1mo',
+    'anio': '1y',
+}
+
+
+# Máximo de puntos por serie de ocupación (un mes a 1 minuto = 44.640)
+MAX_PUNTOS_OCUPACION = 100_000
+
+
+EPOCA = datetime(1970, 1, 1)
+
+
+def _a_segundos(fecha: datetime):
+    """Segundos desde EPOCA de un datetime sin zona horaria"""
+    return int((fecha - EPOCA).total_seconds())
+
+
+def _desde_segundos(segundos):
+    return EPOCA + timedelta(seconds=int(segundos))
+
+
+def _leer_fecha_hora(valor: str, es_fin: bool = False):
+    """Interpretar YYYY-MM-DD o YYYY-MM-DDTHH:MM; una fecha final sola incluye todo el día"""
+    try:
+        fecha = datetime.fromisoformat(valor)
+    except ValueError:
+        raise ValueError("Formato de fecha inválido. Use YYYY-MM-DD o YYYY-MM-DDTHH:MM")
+    if es_fin and len(valor) == 10:
+        fecha += timedelta(days=1)
+    return fecha
+
+
+def _restar_un_anio(fecha: datetime):
+    """Misma fecha un año antes (29 de febrero -> 28 de febrero)"""
+    if fecha.month == 2 and fecha.day == 29:
+        return fecha.replace(year=fecha.year - 1, day=28)
+    return fecha.replace(year=fecha.year - 1)
+
+
+def barrido_ocupacion(entrada, salida, inicio_s: int, fin_s: int, paso: int):
+    """
+    Ocupación por barrido de eventos sobre [inicio_s, fin_s) en períodos de `paso` segundos.
+
+    Cada estancia (recortada al rango) aporta +1 en su entrada y -1 en su
+    salida; los eventos se ordenan una vez (O(n log n)) y la suma acumulada da
+    la ocupación exacta en cada instante. Los valores por período salen de
+    searchsorted sobre la función escalonada y su área acumulada.
+
+    Args:
+        entrada, salida: Arrays int64 de segundos desde EPOCA
+        inicio_s, fin_s: Rango en segundos desde EPOCA
+        paso: Segundos por período
+
+    Returns:
+        Diccionario con limites de los períodos, ocupación al inicio, promedio
+        y máxima de cada período, pico, instante del pico, segundos con el
+        parqueadero lleno y número de estancias que tocan el rango
+    """
+    a = np.maximum(entrada, inicio_s)
+    b = np.minimum(salida, fin_s)
+    validas = a < b
+    a, b = a[validas], b[validas]
+
+    # Eventos ordenados por tiempo; a igual tiempo, las salidas (-1) primero
+    tiempos = np.concatenate((a, b))
+    deltas = np.concatenate((np.ones(a.size, dtype=np.int64), -np.ones(b.size, dtype=np.int64)))
+    orden = np.lexsort((deltas, tiempos))
+    tiempos = tiempos[orden]
+    ocupacion = np.cumsum(deltas[orden])
+
+    total_periodos = -(-(fin_s - inicio_s) // paso)
+    limites = inicio_s + paso * np.arange(total_periodos + 1, dtype=np.int64)
+    limites[-1] = fin_s
+
+    if tiempos.size == 0:
+        ceros = np.zeros(total_periodos, dtype=np.int64)
+        return {
+            'limites': limites,
+            'ocupacion': ceros,
+            'promedio': np.zeros(total_periodos),
+            'maxima': ceros.copy(),
+            'pico': 0,
+            'instante_pico': inicio_s,
+            'segundos_lleno': 0,
+            'total_estancias': 0,
+        }
+
+    # Duración de cada tramo constante (hasta el siguiente evento o el fin)
+    duraciones = np.append(tiempos[1:], fin_s) - tiempos
+    # Área acumulada (ocupación x segundos) al inicio de cada tramo
+    area = np.concatenate(([0], np.cumsum(ocupacion * duraciones)[:-1]))
+
+    # Ocupación y área acumulada en cada límite de período
+    idx = np.searchsorted(tiempos, limites, side='right') - 1
+    validos = idx >= 0
+    idx = np.where(validos, idx, 0)
+    occ_limites = np.where(validos, ocupacion[idx], 0)
+    area_limites = np.where(validos, area[idx] + ocupacion[idx] * (limites - tiempos[idx]), 0)
+    promedio = np.diff(area_limites) / np.diff(limites)
+
+    # Máxima por período: ocupación al inicio o la de cualquier evento dentro
+    maxima = occ_limites[:-1].copy()
+    dentro = tiempos < fin_s
+    np.maximum.at(maxima, (tiempos[dentro] - inicio_s) // paso, ocupacion[dentro])
+
+    i_pico = int(np.argmax(ocupacion))
+    return {
+        'limites': limites,
+        'ocupacion': occ_limites[:-1],
+        'promedio': promedio,
+        'maxima': maxima,
+        'pico': int(ocupacion[i_pico]),
+        'instante_pico': int(tiempos[i_pico]),
+        'segundos_lleno': int(duraciones[ocupacion >= TOTAL_ESPACIOS].sum()),
+        'total_estancias': int(a.size),
+    }
+
+
+def ocupacion_espacio_hora(espacio, entrada, salida, inicio_s: int, fin_s: int, espacios: int = TOTAL_ESPACIOS):
+    """
+    Segundos ocupados por espacio y hora del día de estancias recortadas a [inicio_s, fin_s).
+
+    Cada estancia recortada aporta su primera y su última hora (parciales)
+    con bincount, y sus horas completas intermedias con un arreglo de
+    diferencias por espacio (+1 en la primera hora completa, -1 en la hora
+    de salida) que una suma acumulada convierte en horas ocupadas. Las horas
+    absolutas se pliegan después a hora del día (0-23). No hay bucles por
+    estancia ni por minuto.
+
+    Args:
+        espacio: Array de números de espacio (1..espacios)
+        entrada, salida: Arrays int64 de segundos desde EPOCA
+        inicio_s, fin_s: Rango en segundos desde EPOCA
+        espacios: Cantidad de espacios (filas de la matriz)
+
+    Returns:
+        Array int64 (espacios x 24) de segundos ocupados
+    """
+    a = np.maximum(entrada, inicio_s)
+    b = np.minimum(salida, fin_s)
+    validas = (a < b) & (espacio >= 1) & (espacio <= espacios)
+    a, b = a[validas], b[validas]
+    fila = espacio[validas].astype(np.int64) - 1
+
+    # Horas absolutas del rango; la salida puede caer justo en el límite final
+    h0 = inicio_s // 3600
+    ancho = (fin_s - 1) // 3600 - h0 + 2
+    celdas = espacios * ancho
+    ha = a // 3600 - h0
+    hb = b // 3600 - h0
+    base = fila * ancho
+
+    # Horas parciales: la de entrada (o toda la estancia si no cambia de hora) y la de salida
+    misma = ha == hb
+    segundos = np.bincount(
+        base + ha, weights=np.where(misma, b - a, (ha + h0 + 1) * 3600 - a), minlength=celdas
+    )
+    segundos += np.bincount(
+        base[~misma] + hb[~misma], weights=b[~misma] - (hb[~misma] + h0) * 3600, minlength=celdas
+    )
+
+    # Horas completas intermedias con el arreglo de diferencias
+    largas = hb > ha + 1
+    diferencias = (
+        np.bincount(base[largas] + ha[largas] + 1, minlength=celdas)
+        - np.bincount(base[largas] + hb[largas], minlength=celdas)
+    )
+    completas = np.cumsum(diferencias.reshape(espacios, ancho), axis=1)
+    segundos = segundos.reshape(espacios, ancho) + completas * 3600
+
+    # Plegar las horas absolutas a hora del día (EPOCA empieza a medianoche)
+    hora_dia = (h0 + np.arange(ancho)) % 24
+    indice = (np.arange(espacios)[:, None] * 24 + hora_dia[None, :]).ravel()
+    matriz = np.bincount(indice, weights=segundos.ravel(), minlength=espacios * 24)
+    return np.rint(matriz).astype(np.int64).reshape(espacios, 24)
+
+
+class ReporteService:
+    """Servicio para reportes agregados sobre rangos de fechas"""
+
+    @staticmethod
+    def _leer_estancias(db: Session, inicio: datetime, fin: datetime):
+        """
+        Leer las estancias que se cruzan con [inicio, fin) como DataFrame de polars.
+        Incluye las estancias archivadas (ver ArchivoService).
+
+        Solo se piden las columnas necesarias y el costo ya viene en centavos
+        enteros desde SQL, así que no se construyen objetos ORM ni Decimals.
+        """
+        # Estancias activas + archivadas
+        ve = ArchivoService.estancias(db, inicio, fin).c
+        consulta = select(
+            ve.espacio_numero.label('espacio'),
+            ve.fecha_hora_entrada.label('entrada'),
+            ve.fecha_hora_salida.label('salida'),
+            ve.es_nocturno.label('es_nocturno'),
+            cast(func.round(type_coerce(ve.costo_total, Numeric) * 100), Integer).label('centavos'),
+        ).where(
+            ve.fecha_hora_entrada < fin,
+            or_(ve.fecha_hora_salida.is_(None), ve.fecha_hora_salida >= inicio),
+        )
+        return pl.read_database(
+            consulta,
+            connection=db.connection(),
+            schema_overrides={
+                'espacio': pl.Int32,
+                'entrada': pl.Datetime('us'),
+                'salida': pl.Datetime('us'),
+                'es_nocturno': pl.Boolean,
+                'centavos': pl.Int64,
+            },
+        )
+
+    @staticmethod
+    def _leer_intervalos_por_espacio(db: Session, inicio: datetime, fin: datetime):
+        """
+        Estancias que se cruzan con [inicio, fin) con su espacio, como arrays de NumPy.
+
+        Returns:
+            Tupla (espacio, entrada, salida); entrada y salida en segundos
+            desde EPOCA y las estancias abiertas salen "ahora"
+        """
+        df = ReporteService._leer_estancias(db, inicio, fin)
+        espacio = df['espacio'].to_numpy().astype(np.int64)
+        entrada = df['entrada'].dt.epoch('s').to_numpy().astype(np.int64)
+        salida = df['salida'].dt.epoch('s').fill_null(_a_segundos(datetime.now())).to_numpy().astype(np.int64)
+        return espacio, entrada, salida
+
+    @staticmethod
+    def _leer_intervalos(db: Session, inicio: datetime, fin: datetime):
+        """
+        Estancias que se cruzan con [inicio, fin) como arrays de NumPy.
+
+        Returns:
+            Tupla (entrada, salida, abierta, es_nocturno); entrada y salida en
+            segundos desde EPOCA. Las estancias abiertas salen "ahora" (o al
+            fin del rango si es anterior).
+        """
+        df = ReporteService._leer_estancias(db, inicio, fin)
+        fin_abiertas = min(_a_segundos(datetime.now()), _a_segundos(fin))
+        entrada = df['entrada'].dt.epoch('s').to_numpy().astype(np.int64)
+        abierta = df['salida'].is_null().to_numpy()
+        salida = df['salida'].dt.epoch('s').fill_null(fin_abiertas).to_numpy().astype(np.int64)
+        es_nocturno = df['es_nocturno'].to_numpy()
+        return entrada, salida, abierta, es_nocturno
+
+    @staticmethod
+    def reporte_rango(db: Session, desde: str, hasta: str, granularidad: str = 'dia'):
+        """
+        Reporte de ingresos, ocupación y mezcla nocturno/diurno por período
+
+        Args:
+            db: Sesión de base de datos
+            desde: Fecha inicial en formato YYYY-MM-DD (incluida)
+            hasta: Fecha final en formato YYYY-MM-DD (incluida)
+            granularidad: dia, semana, mes o anio
+
+        Returns:
+            Diccionario con totales del rango y la serie por período,
+            incluyendo la comparación con el mismo período del año anterior
+
+        Raises:
+            ValueError: Si las fechas o la granularidad son inválidas
+        """
+        if granularidad not in GRANULARIDADES:
+            raise ValueError(f"Granularidad inválida. Use: {', '.join(GRANULARIDADES)}")
+        try:
+            fecha_desde = datetime.strptime(desde, '%Y-%m-%d')
+            fecha_hasta = datetime.strptime(hasta, '%Y-%m-%d')
+        except ValueError:
+            raise ValueError("Formato de fecha inválido. Use YYYY-MM-DD")
+        if fecha_hasta < fecha_desde:
+            raise ValueError("La fecha 'hasta' debe ser posterior a 'desde'")
+
+        intervalo = GRANULARIDADES[granularidad]
+        fin = fecha_hasta + timedelta(days=1)
+        # Se lee también el año anterior para la comparación interanual, desde
+        # el inicio de su período (completo). Por semanas se lee una semana
+        # más: la semana ISO equivalente puede empezar antes que la fecha
+        # desplazada un año
+        inicio_consulta = _restar_un_anio(fecha_desde)
+        if granularidad == 'semana':
+            inicio_consulta -= timedelta(days=7)
+        inicio_consulta = pl.Series([inicio_consulta]).dt.truncate(intervalo)[0]
+        ahora = datetime.now()
+
+        df = ReporteService._leer_estancias(db, inicio_consulta, fin)
+
+        # Estancias activas cuentan como ocupadas hasta ahora (o hasta el fin del rango)
+        df = df.with_columns(
+            pl.col('salida').fill_null(pl.lit(min(ahora, fin))).alias('salida_efectiva')
+        )
+
+        # Vehículos por período de ENTRADA
+        entradas = (
+            df.filter((pl.col('entrada') >= inicio_consulta) & (pl.col('entrada') < fin))
+            .group_by(pl.col('entrada').dt.truncate(intervalo).alias('periodo'))
+            .agg(
+                pl.len().alias('vehiculos'),
+                pl.col('es_nocturno').sum().alias('vehiculos_nocturnos'),
+            )
+        )
+
+        # Ingresos por período de SALIDA (solo estancias cerradas)
+        ingresos = (
+            df.filter(
+                pl.col('salida').is_not_null()
+                & (pl.col('salida') >= inicio_consulta)
+                & (pl.col('salida') < fin)
+            )
+            .group_by(pl.col('salida').dt.truncate(intervalo).alias('periodo'))
+            .agg(
+                pl.col('centavos').fill_null(0).sum().alias('ingresos'),
+                pl.col('centavos').filter(pl.col('es_nocturno')).fill_null(0).sum().alias('ingresos_nocturnos'),
+            )
+        )
+
+        # Minutos ocupados: cada estancia se reparte entre los períodos que toca
+        ocupacion = (
+            df.with_columns(
+                pl.max_horizontal(pl.col('entrada'), pl.lit(inicio_consulta)).alias('desde_efectivo')
+            )
+            .filter(pl.col('salida_efectiva') > pl.col('desde_efectivo'))
+            .with_columns(
+                pl.datetime_ranges(
+                    pl.col('desde_efectivo').dt.truncate(intervalo),
+                    pl.col('salida_efectiva').dt.truncate(intervalo),
+                    intervalo,
+                ).alias('periodo')
+            )
+            .explode('periodo')
+            .with_columns(pl.col('periodo').dt.offset_by(intervalo).alias('fin_periodo'))
+            .with_columns(
+                (
+                    pl.min_horizontal('salida_efectiva', 'fin_periodo')
+                    - pl.max_horizontal('desde_efectivo', 'periodo')
+                ).dt.total_seconds().clip(lower_bound=0).alias('segundos')
+            )
+            .group_by('periodo')
+            .agg((pl.col('segundos').sum() / 60).alias('minutos_ocupados'))
+        )
+
+        periodos = pl.DataFrame({
+            'periodo': pl.datetime_range(
+                pl.Series([inicio_consulta]).dt.truncate(intervalo)[0],
+                fin - timedelta(microseconds=1),
+                intervalo,
+                eager=True,
+                time_unit='us',
+            )
+        })
+
+        serie = (
+            periodos
+            .join(entradas, on='periodo', how='left')
+            .join(ingresos, on='periodo', how='left')
+            .join(ocupacion, on='periodo', how='left')
+            .fill_null(0)
+            .with_columns(
+                (pl.col('vehiculos') - pl.col('vehiculos_nocturnos')).alias('vehiculos_diurnos'),
+                (pl.col('ingresos') - pl.col('ingresos_nocturnos')).alias('ingresos_diurnos'),
+                # Minutos disponibles del período, recortado al rango consultado
+                (
+                    pl.min_horizontal(pl.col('periodo').dt.offset_by(intervalo), pl.lit(fin))
+                    - pl.max_horizontal(pl.col('periodo'), pl.lit(inicio_consulta))
+                ).dt.total_minutes().alias('minutos_periodo'),
+            )
+            .with_columns(
+                (pl.col('minutos_ocupados') * 100 / (pl.col('minutos_periodo') * TOTAL_ESPACIOS))
+                .round(2).alias('ocupacion_promedio')
+            )
+        )
+
+        inicio_serie = pl.Series([fecha_desde]).dt.truncate(intervalo)[0]
+        # Rangos de más de un año se comparan también con períodos del propio rango
+        anterior = serie
+        serie = serie.filter(pl.col('periodo') >= inicio_serie)
+
+        # Totales del rango antes de unir el año anterior
+        totales = serie.select(
+            pl.col('vehiculos').sum(),
+            pl.col('vehiculos_nocturnos').sum(),
+            pl.col('vehiculos_diurnos').sum(),
+            pl.col('ingresos').sum(),
+            pl.col('ingresos_nocturnos').sum(),
+            pl.col('ingresos_diurnos').sum(),
+        ).row(0, named=True)
+
+        # Comparación interanual. Las semanas se emparejan por semana ISO (año
+        # - 1, mismo número): una semana desplazada un año ya no empieza en
+        # lunes. Los demás períodos se desplazan un año y se suman por llave:
+        # el 28 y el 29 de febrero de un año bisiesto caen en el mismo día
+        if granularidad == 'semana':
+            claves = ['anio_iso', 'semana_iso']
+            serie = serie.with_columns(
+                pl.col('periodo').dt.iso_year().alias('anio_iso'),
+                pl.col('periodo').dt.week().alias('semana_iso'),
+            )
+            anterior = anterior.select(
+                (pl.col('periodo').dt.iso_year() + 1).alias('anio_iso'),
+                pl.col('periodo').dt.week().alias('semana_iso'),
+                pl.col('ingresos'),
+                pl.col('vehiculos'),
+            )
+        else:
+            claves = ['periodo']
+            anterior = anterior.select(pl.col('periodo').dt.offset_by('1y'), 'ingresos', 'vehiculos')
+        anterior = anterior.group_by(claves).agg(
+            pl.col('ingresos').sum().alias('ingresos_anio_anterior'),
+            pl.col('vehiculos').sum().alias('vehiculos_anio_anterior'),
+        )
+        serie = (
+            serie
+            .join(anterior, on=claves, how='left')
+            .with_columns(
+                pl.when(pl.col('ingresos_anio_anterior') > 0)
+                .then(
+                    ((pl.col('ingresos') - pl.col('ingresos_anio_anterior')) * 100
+                     / pl.col('ingresos_anio_anterior')).round(2)
+                )
+                .otherwise(None)
+                .alias('variacion_interanual')
+            )
+            .sort('periodo')
+        )
+
+        puntos = []
+        for fila in serie.iter_rows(named=True):
+            anterior = fila['ingresos_anio_anterior']
+            puntos.append({
+                'periodo': fila['periodo'].date().isoformat(),
+                'vehiculos': fila['vehiculos'],
+                'vehiculos_nocturnos': fila['vehiculos_nocturnos'],
+                'vehiculos_diurnos': fila['vehiculos_diurnos'],
+                'ingresos': fila['ingresos'] / 100,
+                'ingresos_nocturnos': fila['ingresos_nocturnos'] / 100,
+                'ingresos_diurnos': fila['ingresos_diurnos'] / 100,
+                'ocupacion_promedio': fila['ocupacion_promedio'],
+                'ingresos_anio_anterior': anterior / 100 if anterior is not None else None,
+                'variacion_interanual': fila['variacion_interanual'],
+            })
+
+        return {
+            'desde': fecha_desde.date().isoformat(),
+            'hasta': fecha_hasta.date().isoformat(),
+            'granularidad': granularidad,
+            'total_vehiculos': totales['vehiculos'],
+            'vehiculos_nocturnos': totales['vehiculos_nocturnos'],
+            'vehiculos_diurnos': totales['vehiculos_diurnos'],
+            'ingresos_total': totales['ingresos'] / 100,
+            'ingresos_nocturnos': totales['ingresos_nocturnos'] / 100,
+            'ingresos_diurnos': totales['ingresos_diurnos'] / 100,
+            'serie': puntos,
+        }
+
+    @staticmethod
+    def reporte_ocupacion(db: Session, desde: str, hasta: str, resolucion: int = 60):
+        """
+        Serie de ocupación del parqueadero con barrido de eventos
+
+        Ver barrido_ocupacion: los eventos se ordenan una vez y los períodos
+        se calculan con NumPy sin recorrer minuto a minuto.
+
+        Args:
+            db: Sesión de base de datos
+            desde: Inicio (YYYY-MM-DD o YYYY-MM-DDTHH:MM)
+            hasta: Fin (YYYY-MM-DD incluye el día completo)
+            resolucion: Minutos por punto de la serie
+
+        Returns:
+            Diccionario con la serie (ocupación al inicio, promedio y máxima de
+            cada período), pico, minutos con el parqueadero lleno y estancia
+            promedio
+
+        Raises:
+            ValueError: Si el rango o la resolución son inválidos
+        """
+        inicio = _leer_fecha_hora(desde)
+        fin = _leer_fecha_hora(hasta, es_fin=True)
+        if fin <= inicio:
+            raise ValueError("La fecha 'hasta' debe ser posterior a 'desde'")
+        if not (1 <= resolucion <= 1440):
+            raise ValueError("La resolución debe estar entre 1 y 1440 minutos")
+
+        paso = resolucion * 60
+        inicio_s = _a_segundos(inicio)
+        fin_s = _a_segundos(fin)
+        total_puntos = -(-(fin_s - inicio_s) // paso)
+        if total_puntos > MAX_PUNTOS_OCUPACION:
+            raise ValueError("Demasiados puntos: aumente la resolución o reduzca el rango")
+
+        entrada, salida, abierta, _ = ReporteService._leer_intervalos(db, inicio, fin)
+
+        # Estancia promedio: estancias cerradas que salieron dentro del rango
+        cerradas = ~abierta & (salida >= inicio_s) & (salida < fin_s)
+        estancia_promedio = float(np.mean(salida[cerradas] - entrada[cerradas]) / 60) if cerradas.any() else 0.0
+
+        barrido = barrido_ocupacion(entrada, salida, inicio_s, fin_s, paso)
+        limites = barrido['limites']
+        pico = barrido['pico']
+        hora_pico = _desde_segundos(barrido['instante_pico']).isoformat() if pico > 0 else None
+
+        serie = [
+            {
+                'hora': _desde_segundos(t).isoformat(),
+                'ocupacion': int(o),
+                'promedio': round(float(p), 2),
+                'maxima': int(m),
+            }
+            for t, o, p, m in zip(limites[:-1], barrido['ocupacion'], barrido['promedio'], barrido['maxima'])
+        ]
+
+        return {
+            'desde': inicio.isoformat(),
+            'hasta': fin.isoformat(),
+            'resolucion_minutos': resolucion,
+            'capacidad': TOTAL_ESPACIOS,
+            'ocupacion_pico': pico,
+            'hora_pico': hora_pico,
+            'minutos_lleno': round(barrido['segundos_lleno'] / 60, 2),
+            'estancia_promedio_minutos': round(estancia_promedio, 2),
+            'total_estancias': barrido['total_estancias'],
+            'serie': serie,
+        }
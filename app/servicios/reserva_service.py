@@ -0,0 +1,263 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import datetime, timedelta
+import threading
+from app.config import TOTAL_ESPACIOS, RESERVA_RETENCION_MINUTOS, RESERVA_MAX_DIAS
+from app.modelos.reserva import Reserva
+from app.modelos.version_reservas import VersionReservas
+from app.modelos.vehiculo_estacionado import VehiculoEstacionado
+from app.utils.indice_reservas import IndiceReservas
+from app.utils.estado_compartido import estado_compartido
+
+# Reservas activas por espacio, en memoria de este proceso
+_indice = IndiceReservas(TOTAL_ESPACIOS)
+_lock_indice = threading.Lock()
+# Las altas de este proceso se hacen de a una (consulta de conflicto + insert)
+_lock_alta = threading.Lock()
+
+
+def _retencion():
+    return timedelta(minutes=RESERVA_RETENCION_MINUTOS)
+
+
+class ReservaService:
+    """
+    Servicio de reservas de espacios.
+
+    Una reserva activa retiene su espacio desde RESERVA_RETENCION_MINUTOS
+    antes del inicio hasta el fin: en ese lapso solo puede entrar el
+    vehículo de la reserva (la entrada la marca como utilizada). Los
+    conflictos y la disponibilidad se responden con el IndiceReservas en
+    memoria (búsqueda binaria por espacio); el índice se recarga cuando
+    cambia la suma de los contadores de VersionReservas, así que también ve
+    las reservas hechas por otros workers.
+    """
+
+    @staticmethod
+    def _tocar(db: Session, espacio_numero: int):
+        """
+        Incrementar el contador del espacio (el commit lo hace quien llama).
+
+        Deja la fila bloqueada hasta el commit: las altas en ese espacio de
+        otros workers esperan a que esta transacción termine.
+        """
+        actualizadas = db.query(VersionReservas).filter(
+            VersionReservas.espacio_numero == espacio_numero
+        ).update({VersionReservas.version: VersionReservas.version + 1}, synchronize_session=False)
+        if not actualizadas:
+            db.add(VersionReservas(espacio_numero=espacio_numero, version=1))
+            db.flush()
+
+    @staticmethod
+    def indice(db: Session):
+        """IndiceReservas al día con la tabla"""
+        # Suma de contadores que solo crecen: cambia con cada alta, cancelación o ingreso
+        marca = db.query(func.sum(VersionReservas.version)).scalar() or 0
+        with _lock_indice:
+            if _indice.marca != marca:
+                filas = db.query(
+                    Reserva.espacio_numero, Reserva.inicio, Reserva.fin, Reserva.id
+                ).filter(
+                    Reserva.estado == 'activa',
+                    Reserva.fin > datetime.now()
+                ).all()
+                _indice.cargar(filas, marca)
+        return _indice
+
+    @staticmethod
+    def _espacios_ocupados(db: Session):
+        compartidos = estado_compartido.espacios()
+        if compartidos is not None:
+            return {espacio for espacio, ocupado, *_ in compartidos if ocupado}
+        filas = db.query(VehiculoEstacionado.espacio_numero).filter_by(estado='activo').all()
+        return {espacio for espacio, in filas}
+
+    @staticmethod
+    def _validar_ventana(inicio: datetime, fin: datetime):
+        if fin <= inicio:
+            raise ValueError('El fin de la reserva debe ser posterior al inicio')
+        if fin <= datetime.now():
+            raise ValueError('La reserva ya terminó')
+        if fin - inicio > timedelta(days=RESERVA_MAX_DIAS):
+            raise ValueError(f'Una reserva puede durar como máximo {RESERVA_MAX_DIAS} días')
+
+    @staticmethod
+    def disponibles(db: Session, desde: datetime, hasta: datetime):
+        """
+        Espacios libres para una ventana futura.
+
+        Args:
+            db: Sesión de base de datos
+            desde: Inicio de la ventana
+            hasta: Fin de la ventana
+
+        Returns:
+            Lista de números de espacio sin reservas en la ventana; si la
+            ventana empieza dentro de la retención, sin los espacios ocupados ahora
+
+        Raises:
+            ValueError: Si la ventana no es válida
+        """
+        ReservaService._validar_ventana(desde, hasta)
+        ocupados = ()
+        if desde - _retencion() <= datetime.now():
+            ocupados = ReservaService._espacios_ocupados(db)
+        return ReservaService.indice(db).libres(desde, hasta, excluir=ocupados)
+
+    @staticmethod
+    def crear(db: Session, placa: str, inicio: datetime, fin: datetime,
+              espacio_numero: int = None, nombre_huesped: str = None):
+        """
+        Crear una reserva.
+
+        Args:
+            db: Sesión de base de datos
+            placa: Placa del vehículo del huésped
+            inicio: Inicio de la ventana de llegada
+            fin: Fin de la reserva
+            espacio_numero: Espacio pedido (1-24); sin él se asigna el primero libre
+            nombre_huesped: Nombre del huésped (opcional)
+
+        Raises:
+            ValueError: Si la ventana no es válida o el espacio no está disponible
+        """
+        placa = placa.upper().strip()
+        ReservaService._validar_ventana(inicio, fin)
+        if espacio_numero is not None and not (1 <= espacio_numero <= TOTAL_ESPACIOS):
+            raise ValueError(f'El número de espacio debe estar entre 1 y {TOTAL_ESPACIOS}')
+
+        with _lock_alta:
+            otra = db.query(Reserva.id, Reserva.espacio_numero).filter(
+                Reserva.placa == placa,
+                Reserva.estado == 'activa',
+                Reserva.inicio < fin,
+                Reserva.fin > inicio
+            ).first()
+            if otra:
+                raise ValueError(f'El vehículo {placa} ya tiene la reserva {otra.id} en el espacio {otra.espacio_numero}')
+
+            libres = ReservaService.disponibles(db, inicio, fin)
+            if espacio_numero is None:
+                if not libres:
+                    raise ValueError('No hay espacios libres para esa ventana')
+                candidatos = libres
+            elif espacio_numero not in libres:
+                raise ValueError(f'El espacio {espacio_numero} no está disponible para esa ventana')
+            else:
+                candidatos = [espacio_numero]
+
+            # El índice puede no ver un alta de otro worker aún sin commit: se
+            # bloquea la fila del espacio y se vuelve a buscar el solape con
+            # una lectura bloqueante, que ve lo último confirmado aunque la
+            # transacción tenga una instantánea anterior (REPEATABLE READ).
+            # Los espacios se bloquean en orden creciente: sin interbloqueos.
+            for candidato in candidatos:
+                ReservaService._tocar(db, candidato)
+                choque = db.query(Reserva.id).filter(
+                    Reserva.espacio_numero == candidato,
+                    Reserva.estado == 'activa',
+                    Reserva.inicio < fin,
+                    Reserva.fin > inicio
+                ).with_for_update().first()
+                if not choque:
+                    espacio_numero = candidato
+                    break
+            else:
+                db.rollback()
+                if espacio_numero is not None:
+                    raise ValueError(f'El espacio {espacio_numero} no está disponible para esa ventana')
+                raise ValueError('No hay espacios libres para esa ventana')
+
+            ahora = datetime.now()
+            reserva = Reserva(
+                espacio_numero=espacio_numero,
+                placa=placa,
+                nombre_huesped=nombre_huesped,
+                inicio=inicio,
+                fin=fin,
+                estado='activa',
+                creada_en=ahora,
+                actualizada_en=ahora
+            )
+            db.add(reserva)
+            db.commit()
+            db.refresh(reserva)
+
+        print(f"📅 Reserva {reserva.id}: {placa} en el espacio {espacio_numero} ({inicio} - {fin})")
+        return reserva
+
+    @staticmethod
+    def obtener(db: Session, reserva_id: int):
+        """
+        Raises:
+            ValueError: Si la reserva no existe
+        """
+        reserva = db.get(Reserva, reserva_id)
+        if reserva is None:
+            raise ValueError('Reserva no encontrada')
+        return reserva
+
+    @staticmethod
+    def listar(db: Session, espacio_numero: int = None, limite: int = 100):
+        """Reservas activas que aún no terminan, por inicio"""
+        query = db.query(Reserva).filter(Reserva.estado == 'activa', Reserva.fin > datetime.now())
+        if espacio_numero is not None:
+            query = query.filter(Reserva.espacio_numero == espacio_numero)
+        return query.order_by(Reserva.inicio).limit(limite).all()
+
+    @staticmethod
+    def cancelar(db: Session, reserva_id: int):
+        """
+        Cancelar una reserva activa.
+
+        Raises:
+            ValueError: Si la reserva no existe o no está activa
+        """
+        reserva = ReservaService.obtener(db, reserva_id)
+        if reserva.estado != 'activa':
+            raise ValueError(f'La reserva está {reserva.estado}')
+        reserva.estado = 'cancelada'
+        reserva.actualizada_en = datetime.now()
+        ReservaService._tocar(db, reserva.espacio_numero)
+        db.commit()
+        db.refresh(reserva)
+        return reserva
+
+    @staticmethod
+    def validar_ingreso(db: Session, reserva_id: int, ahora: datetime = None):
+        """
+        Reserva activa lista para ingresar (dentro de su ventana con la retención).
+
+        Raises:
+            ValueError: Si la reserva no existe, no está activa o está fuera de su ventana
+        """
+        ahora = ahora or datetime.now()
+        reserva = ReservaService.obtener(db, reserva_id)
+        if reserva.estado != 'activa':
+            raise ValueError(f'La reserva está {reserva.estado}')
+        if ahora < reserva.inicio - _retencion():
+            raise ValueError(f'La reserva empieza el {reserva.inicio.isoformat(sep=" ", timespec="minutes")}')
+        if ahora >= reserva.fin:
+            raise ValueError('La reserva ya terminó')
+        return reserva
+
+    @staticmethod
+    def retencion(db: Session, espacio_numero: int, ahora: datetime):
+        """
+        Reservas activas que retienen el espacio ahora.
+
+        Son las que se solapan con [ahora, ahora + retención): la que ya
+        empezó y las que empiezan dentro de la retención.
+        """
+        ids = ReservaService.indice(db).solapadas(espacio_numero, ahora, ahora + _retencion())
+        if not ids:
+            return []
+        return db.query(Reserva).filter(Reserva.id.in_(ids), Reserva.estado == 'activa').order_by(Reserva.inicio).all()
+
+    @staticmethod
+    def marcar_utilizada(db: Session, reserva: Reserva, vehiculo: VehiculoEstacionado):
+        """Marcar la reserva como utilizada por el vehículo (el commit lo hace quien llama)"""
+        reserva.estado = 'utilizada'
+        reserva.vehiculo_id = vehiculo.id
+        reserva.actualizada_en = datetime.now()
+        ReservaService._tocar(db, reserva.espacio_numero)
@@ -0,0 +1,104 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, insert, select, delete
+from datetime import datetime
+from app.config import CLIENTE_FRECUENTE_VISITAS
+from app.modelos.historial_factura import HistorialFactura
+from app.modelos.resumen_placa import ResumenPlaca
+from app.utils.dinero import a_float
+
+
+class ResumenPlacaService:
+    """
+    Totales por placa (resumen_placas) para el historial de un vehículo.
+
+    Cada factura suma su visita a la fila de su placa en la misma
+    transacción (salida directa o sincronización del diario local), así
+    que visitas, gasto, estancia promedio y proporción nocturna salen de
+    una lectura por llave primaria. recalcular() reconstruye la tabla desde
+    historial_facturas (migración y generador de carga).
+    """
+
+    @staticmethod
+    def registrar_factura(db: Session, placa: str, entrada: datetime, salida: datetime,
+                          minutos: int, costo: int, es_nocturno: bool):
+        """
+        Sumar una factura al resumen de su placa (sin commit).
+
+        Args:
+            db: Sesión de base de datos (la de la factura)
+            placa: Placa del vehículo
+            entrada: Entrada de la estancia facturada
+            salida: Salida de la estancia facturada
+            minutos: Minutos cobrados
+            costo: Costo en centavos
+            es_nocturno: Si se cobró con tarifa nocturna
+        """
+        c = ResumenPlaca
+        # Una salida sincronizada tarde desde el diario local puede ser anterior
+        # a la última registrada: primera y última visita no dependen del orden
+        actualizadas = db.query(c).filter(c.placa == placa).update({
+            c.visitas: c.visitas + 1,
+            c.visitas_nocturnas: c.visitas_nocturnas + (1 if es_nocturno else 0),
+            c.minutos_totales: c.minutos_totales + minutos,
+            c.gasto_total: c.gasto_total + costo,
+            c.primera_visita: case((c.primera_visita > entrada, entrada), else_=c.primera_visita),
+            c.ultima_visita: case((c.ultima_visita < salida, salida), else_=c.ultima_visita),
+        }, synchronize_session=False)
+        if actualizadas:
+            return
+        db.add(ResumenPlaca(
+            placa=placa,
+            visitas=1,
+            visitas_nocturnas=1 if es_nocturno else 0,
+            minutos_totales=minutos,
+            gasto_total=costo,
+            primera_visita=entrada,
+            ultima_visita=salida
+        ))
+        # La sesión no hace autoflush: otra salida de la misma placa en el
+        # mismo lote debe encontrar la fila
+        db.flush()
+
+    @staticmethod
+    def recalcular(conexion):
+        """Reconstruir resumen_placas agregando historial_facturas completo"""
+        f = HistorialFactura.__table__.c
+        conexion.execute(delete(ResumenPlaca.__table__))
+        conexion.execute(insert(ResumenPlaca.__table__).from_select(
+            ['placa', 'visitas', 'visitas_nocturnas', 'minutos_totales', 'gasto_total',
+             'primera_visita', 'ultima_visita'],
+            select(
+                f.placa,
+                func.count(),
+                func.sum(case((f.es_nocturno, 1), else_=0)),
+                func.sum(f.tiempo_total_minutos),
+                func.sum(f.costo_total),
+                func.min(f.fecha_hora_entrada),
+                func.max(f.fecha_hora_salida)
+            ).group_by(f.placa)
+        ))
+
+    @staticmethod
+    def estadisticas(db: Session, placa: str):
+        """
+        Estadísticas de una placa
+
+        Args:
+            db: Sesión de base de datos
+            placa: Placa del vehículo (normalizada)
+
+        Returns:
+            Diccionario con visitas, gasto total y promedio, estancia promedio,
+            proporción nocturna y si es cliente frecuente; None si la placa no
+            tiene facturas
+        """
+        resumen = db.get(ResumenPlaca, placa)
+        if resumen is None:
+            return None
+        return {
+            **resumen.to_dict(),
+            'gasto_promedio': a_float(round(resumen.gasto_total / resumen.visitas)),
+            'estancia_promedio_minutos': round(resumen.minutos_totales / resumen.visitas, 1),
+            'porcentaje_nocturno': round(100 * resumen.visitas_nocturnas / resumen.visitas, 1),
+            'frecuente': resumen.visitas >= CLIENTE_FRECUENTE_VISITAS
+        }
@@ -0,0 +1,255 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, date, timedelta
+import threading
+import numpy as np
+from app.config import TOTAL_ESPACIOS
+from app.modelos.resumen_horario import ResumenHorario
+from app.modelos.resumen_espacio import ResumenEspacioMensual
+from app.servicios.archivo_service import ArchivoService
+from app.servicios.reporte_service import (
+    ReporteService, EPOCA, _a_segundos, barrido_ocupacion, ocupacion_espacio_hora
+)
+
+# Días que se leen y agregan por consulta al consolidar
+DIAS_POR_LOTE = 31
+
+# Evita que dos peticiones de este proceso consoliden los mismos días a la vez
+_lock_consolidacion = threading.Lock()
+_lock_meses = threading.Lock()
+
+
+def inicio_mes(fecha: date):
+    return fecha.replace(day=1)
+
+
+def mes_siguiente(mes: date):
+    return date(mes.year + 1, 1, 1) if mes.month == 12 else date(mes.year, mes.month + 1, 1)
+
+
+class ResumenService:
+    """
+    Servicio para el agregado por día y hora (resumen_horario).
+
+    Cada día cerrado (anterior a hoy) se agrega una sola vez: llegadas,
+    llegadas nocturnas y ocupación promedio/máxima por hora. El pronóstico
+    se ajusta sobre estas filas en lugar de recorrer todas las estancias.
+
+    Aparte, cada mes cerrado se agrega por espacio y hora del día
+    (resumen_espacio_mensual: 576 filas por mes) para el mapa de utilización.
+    """
+
+    @staticmethod
+    def _primer_dia_sin_resumen(db: Session):
+        """Día siguiente al último consolidado, o el de la estancia más antigua"""
+        ultimo = db.query(func.max(ResumenHorario.fecha)).scalar()
+        if ultimo is not None:
+            return ultimo + timedelta(days=1)
+
+        estancias = ArchivoService.estancias(db, EPOCA, datetime.now()).c
+        primera = db.query(func.min(estancias.fecha_hora_entrada)).scalar()
+        return primera.date() if primera else None
+
+    @staticmethod
+    def _agregar_dias(db: Session, desde: date, dias: int):
+        """Filas de resumen_horario para `dias` días a partir de `desde`"""
+        inicio = datetime.combine(desde, datetime.min.time())
+        fin = inicio + timedelta(days=dias)
+        inicio_s, fin_s = _a_segundos(inicio), _a_segundos(fin)
+        horas = dias * 24
+
+        entrada, salida, _, es_nocturno = ReporteService._leer_intervalos(db, inicio, fin)
+
+        # Llegadas por hora de entrada
+        dentro = (entrada >= inicio_s) & (entrada < fin_s)
+        indice = (entrada[dentro] - inicio_s) // 3600
+        llegadas = np.bincount(indice, minlength=horas)
+        nocturnas = np.bincount(indice[es_nocturno[dentro].astype(bool)], minlength=horas)
+
+        # Ocupación por hora con el mismo barrido que /api/reportes/ocupacion
+        barrido = barrido_ocupacion(entrada, salida, inicio_s, fin_s, 3600)
+
+        return [
+            {
+                'fecha': desde + timedelta(days=i // 24),
+                'hora': i % 24,
+                'llegadas': int(llegadas[i]),
+                'llegadas_nocturnas': int(nocturnas[i]),
+                'ocupacion_promedio': round(float(barrido['promedio'][i]), 4),
+                'ocupacion_maxima': int(barrido['maxima'][i]),
+            }
+            for i in range(horas)
+        ]
+
+    @staticmethod
+    def consolidar_pendientes(db: Session, hasta: date = None):
+        """
+        Agregar los días aún no consolidados, hasta el día anterior a `hasta`.
+
+        Args:
+            db: Sesión de base de datos (principal)
+            hasta: Primer día que NO se consolida (default: hoy, que sigue abierto)
+
+        Returns:
+            Número de días consolidados
+        """
+        hasta = hasta or date.today()
+        with _lock_consolidacion:
+            desde = ResumenService._primer_dia_sin_resumen(db)
+            if desde is None or desde >= hasta:
+                return 0
+
+            total = 0
+            while desde < hasta:
+                dias = min(DIAS_POR_LOTE, (hasta - desde).days)
+                filas = ResumenService._agregar_dias(db, desde, dias)
+                try:
+                    db.execute(insert(ResumenHorario.__table__), filas)
+                    db.commit()
+                except IntegrityError:
+                    # Otro proceso consolidó estos días primero
+                    db.rollback()
+                    return total
+                desde += timedelta(days=dias)
+                total += dias
+
+            print(f"📈 Resumen horario consolidado: {total} día(s) hasta {hasta - timedelta(days=1)}")
+            return total
+
+    @staticmethod
+    def consolidar(db: Session):
+        """
+        Consolidar los días y meses cerrados que falten (tarea de fondo).
+
+        Lo ejecuta el sincronizador del diario en un solo worker: los
+        reportes solo leen los resúmenes, y lo que aún no esté consolidado lo
+        calculan desde las estancias.
+
+        Returns:
+            Tupla (días, meses) consolidados
+        """
+        return ResumenService.consolidar_pendientes(db), ResumenService.consolidar_meses_espacio(db)
+
+    @staticmethod
+    def leer_desde(db: Session, despues_de: date = None):
+        """
+        Filas de resumen posteriores a `despues_de`, ordenadas por fecha y hora.
+
+        Returns:
+            Lista de tuplas (fecha, hora, llegadas, llegadas_nocturnas,
+            ocupacion_promedio, ocupacion_maxima)
+        """
+        consulta = db.query(
+            ResumenHorario.fecha,
+            ResumenHorario.hora,
+            ResumenHorario.llegadas,
+            ResumenHorario.llegadas_nocturnas,
+            ResumenHorario.ocupacion_promedio,
+            ResumenHorario.ocupacion_maxima
+        )
+        if despues_de is not None:
+            consulta = consulta.filter(ResumenHorario.fecha > despues_de)
+        return consulta.order_by(ResumenHorario.fecha, ResumenHorario.hora).all()
+
+    @staticmethod
+    def _primer_mes_sin_resumen_espacio(db: Session):
+        """Mes siguiente al último consolidado por espacio, o el de la estancia más antigua"""
+        ultimo = db.query(func.max(ResumenEspacioMensual.mes)).scalar()
+        if ultimo is not None:
+            return mes_siguiente(ultimo)
+
+        estancias = ArchivoService.estancias(db, EPOCA, datetime.now()).c
+        primera = db.query(func.min(estancias.fecha_hora_entrada)).scalar()
+        return inicio_mes(primera.date()) if primera else None
+
+    @staticmethod
+    def _agregar_mes_espacio(db: Session, mes: date):
+        """Filas de resumen_espacio_mensual de un mes (todas las combinaciones espacio x hora)"""
+        inicio = datetime.combine(mes, datetime.min.time())
+        fin = datetime.combine(mes_siguiente(mes), datetime.min.time())
+        inicio_s, fin_s = _a_segundos(inicio), _a_segundos(fin)
+
+        espacio, entrada, salida = ReporteService._leer_intervalos_por_espacio(db, inicio, fin)
+        segundos = ocupacion_espacio_hora(espacio, entrada, salida, inicio_s, fin_s)
+
+        dentro = (entrada >= inicio_s) & (entrada < fin_s) & (espacio >= 1) & (espacio <= TOTAL_ESPACIOS)
+        llegadas = np.zeros((TOTAL_ESPACIOS, 24), dtype=np.int64)
+        np.add.at(llegadas, (espacio[dentro] - 1, (entrada[dentro] // 3600) % 24), 1)
+
+        return [
+            {
+                'mes': mes,
+                'espacio': e + 1,
+                'hora': h,
+                'segundos_ocupados': int(segundos[e, h]),
+                'llegadas': int(llegadas[e, h]),
+            }
+            for e in range(TOTAL_ESPACIOS)
+            for h in range(24)
+        ]
+
+    @staticmethod
+    def consolidar_meses_espacio(db: Session, hasta: date = None):
+        """
+        Agregar por espacio y hora los meses aún no consolidados, anteriores al de `hasta`.
+
+        Args:
+            db: Sesión de base de datos (principal)
+            hasta: Día del primer mes que NO se consolida (default: hoy, el mes sigue abierto)
+
+        Returns:
+            Número de meses consolidados
+        """
+        limite = inicio_mes(hasta or date.today())
+        with _lock_meses:
+            mes = ResumenService._primer_mes_sin_resumen_espacio(db)
+            if mes is None or mes >= limite:
+                return 0
+
+            total = 0
+            while mes < limite:
+                filas = ResumenService._agregar_mes_espacio(db, mes)
+                try:
+                    db.execute(insert(ResumenEspacioMensual.__table__), filas)
+                    db.commit()
+                except IntegrityError:
+                    # Otro proceso consolidó este mes primero
+                    db.rollback()
+                    return total
+                mes = mes_siguiente(mes)
+                total += 1
+
+            print(f"📈 Resumen por espacio consolidado: {total} mes(es) hasta {limite - timedelta(days=1)}")
+            return total
+
+    @staticmethod
+    def meses_espacio(db: Session, desde: date, hasta: date):
+        """
+        Agregado por espacio y hora de los meses consolidados en [desde, hasta).
+
+        Returns:
+            Tupla (segundos, llegadas, meses): dos arrays int64 (espacios x 24)
+            y la lista de meses que estaban consolidados
+        """
+        rango = (ResumenEspacioMensual.mes >= desde, ResumenEspacioMensual.mes < hasta)
+        meses = [
+            fila[0] for fila in db.query(ResumenEspacioMensual.mes).filter(*rango)
+            .filter(ResumenEspacioMensual.espacio == 1, ResumenEspacioMensual.hora == 0)
+            .order_by(ResumenEspacioMensual.mes).all()
+        ]
+        segundos = np.zeros((TOTAL_ESPACIOS, 24), dtype=np.int64)
+        llegadas = np.zeros((TOTAL_ESPACIOS, 24), dtype=np.int64)
+        if not meses:
+            return segundos, llegadas, []
+        # La suma de los meses la hace la base: 576 filas sin importar el rango
+        filas = db.query(
+            ResumenEspacioMensual.espacio,
+            ResumenEspacioMensual.hora,
+            func.sum(ResumenEspacioMensual.segundos_ocupados),
+            func.sum(ResumenEspacioMensual.llegadas)
+        ).filter(*rango).group_by(ResumenEspacioMensual.espacio, ResumenEspacioMensual.hora).all()
+        espacio, hora, ocupados, entradas = (np.array(columna, dtype=np.int64) for columna in zip(*filas))
+        segundos[espacio - 1, hora] = ocupados
+        llegadas[espacio - 1, hora] = entradas
+        return segundos, llegadas, meses
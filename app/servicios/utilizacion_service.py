@@ -0,0 +1,155 @@
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import numpy as np
+from app.config import TOTAL_ESPACIOS
+from app.servicios.reporte_service import (
+    ReporteService, _a_segundos, _leer_fecha_hora, ocupacion_espacio_hora
+)
+from app.servicios.resumen_service import ResumenService, inicio_mes, mes_siguiente
+
+# Rango máximo del mapa de utilización
+MAX_DIAS_UTILIZACION = 366 * 5
+
+
+class UtilizacionService:
+    """
+    Mapa de utilización por espacio y hora del día.
+
+    Para cada espacio: minutos ocupados en cada hora del día sumando todos
+    los días del rango, minutos libres, llegadas (rotación) y porcentaje de
+    uso. Los meses completos del rango se leen del resumen mensual por
+    espacio (ResumenService) y solo los tramos sueltos del principio y del
+    final se calculan desde las estancias, recortadas al tramo.
+    """
+
+    @staticmethod
+    def _desde_estancias(db: Session, inicio: datetime, fin: datetime):
+        """(segundos, llegadas) por espacio y hora de las estancias en [inicio, fin)"""
+        inicio_s, fin_s = _a_segundos(inicio), _a_segundos(fin)
+        espacio, entrada, salida = ReporteService._leer_intervalos_por_espacio(db, inicio, fin)
+        segundos = ocupacion_espacio_hora(espacio, entrada, salida, inicio_s, fin_s)
+        dentro = (entrada >= inicio_s) & (entrada < fin_s) & (espacio >= 1) & (espacio <= TOTAL_ESPACIOS)
+        llegadas = np.bincount(
+            (espacio[dentro] - 1) * 24 + (entrada[dentro] // 3600) % 24, minlength=TOTAL_ESPACIOS * 24
+        ).reshape(TOTAL_ESPACIOS, 24)
+        return segundos, llegadas, int(espacio.size)
+
+    @staticmethod
+    def _meses_cubiertos(db: Session, inicio: datetime, fin: datetime):
+        """
+        Meses completos del rango que están en el resumen mensual.
+
+        Returns:
+            Tupla (segundos, llegadas, desde, hasta) con el tramo [desde, hasta)
+            cubierto por el resumen, o None si no se puede usar
+        """
+        primero = inicio_mes(inicio.date())
+        if datetime.combine(primero, datetime.min.time()) < inicio:
+            primero = mes_siguiente(primero)
+        ultimo = inicio_mes(fin.date())
+        if primero >= ultimo:
+            return None
+
+        # Los meses los consolida la tarea de fondo; aquí solo se leen
+        segundos, llegadas, meses = ResumenService.meses_espacio(db, primero, ultimo)
+        if not meses:
+            return None
+        # Los meses se consolidan en orden: si falta alguno intermedio (otro
+        # proceso consolidando), se calcula todo desde las estancias
+        desde, hasta = meses[0], mes_siguiente(meses[-1])
+        esperados = 0
+        mes = desde
+        while mes < hasta:
+            esperados += 1
+            mes = mes_siguiente(mes)
+        if esperados != len(meses):
+            return None
+        return (
+            segundos, llegadas,
+            datetime.combine(desde, datetime.min.time()), datetime.combine(hasta, datetime.min.time())
+        )
+
+    @staticmethod
+    def mapa(db: Session, desde: str, hasta: str):
+        """
+        Mapa de utilización por espacio y hora del día sobre un rango
+
+        Args:
+            db: Sesión de base de datos
+            desde: Inicio (YYYY-MM-DD o YYYY-MM-DDTHH:MM)
+            hasta: Fin (YYYY-MM-DD incluye el día completo); se corta en el
+                momento actual
+
+        Returns:
+            Diccionario con la matriz de minutos ocupados (espacio x hora), los
+            minutos disponibles por hora del día, totales por espacio (minutos
+            ocupados y libres, utilización, llegadas y rotación diaria) y la
+            utilización de todo el parqueadero por hora
+
+        Raises:
+            ValueError: Si el rango es inválido o demasiado largo
+        """
+        inicio = _leer_fecha_hora(desde)
+        fin = min(_leer_fecha_hora(hasta, es_fin=True), datetime.now().replace(microsecond=0))
+        if fin <= inicio:
+            raise ValueError("La fecha 'hasta' debe ser posterior a 'desde' y no estar en el futuro")
+        if fin - inicio > timedelta(days=MAX_DIAS_UTILIZACION):
+            raise ValueError(f"El rango no puede superar {MAX_DIAS_UTILIZACION} días")
+
+        segundos = np.zeros((TOTAL_ESPACIOS, 24), dtype=np.int64)
+        llegadas = np.zeros((TOTAL_ESPACIOS, 24), dtype=np.int64)
+        tramos = [(inicio, fin)]
+        meses_resumen = 0
+        cubiertos = UtilizacionService._meses_cubiertos(db, inicio, fin)
+        if cubiertos is not None:
+            segundos_resumen, llegadas_resumen, desde_resumen, hasta_resumen = cubiertos
+            segundos += segundos_resumen
+            llegadas += llegadas_resumen
+            meses_resumen = (hasta_resumen.year - desde_resumen.year) * 12 + hasta_resumen.month - desde_resumen.month
+            tramos = [(inicio, desde_resumen), (hasta_resumen, fin)]
+
+        estancias_leidas = 0
+        for tramo_inicio, tramo_fin in tramos:
+            if tramo_inicio < tramo_fin:
+                s, l, leidas = UtilizacionService._desde_estancias(db, tramo_inicio, tramo_fin)
+                segundos += s
+                llegadas += l
+                estancias_leidas += leidas
+
+        # Segundos del rango en cada hora del día (lo que un espacio podría estar ocupado)
+        inicio_s, fin_s = _a_segundos(inicio), _a_segundos(fin)
+        disponibles = ocupacion_espacio_hora(
+            np.array([1]), np.array([inicio_s]), np.array([fin_s]), inicio_s, fin_s, espacios=1
+        )[0]
+
+        dias = (fin_s - inicio_s) / 86400
+        ocupados = segundos.sum(axis=1)
+        llegadas_espacio = llegadas.sum(axis=1)
+        por_espacio = [
+            {
+                'espacio': e + 1,
+                'minutos_ocupados': round(int(ocupados[e]) / 60, 2),
+                'minutos_libres': round((fin_s - inicio_s - int(ocupados[e])) / 60, 2),
+                'utilizacion': round(100 * int(ocupados[e]) / (fin_s - inicio_s), 2),
+                'llegadas': int(llegadas_espacio[e]),
+                'rotacion_diaria': round(int(llegadas_espacio[e]) / dias, 3),
+            }
+            for e in range(TOTAL_ESPACIOS)
+        ]
+        por_hora = np.divide(
+            100 * segundos.sum(axis=0), disponibles * TOTAL_ESPACIOS,
+            out=np.zeros(24), where=disponibles > 0
+        )
+
+        return {
+            'desde': inicio.isoformat(),
+            'hasta': fin.isoformat(),
+            'dias': round(dias, 3),
+            'capacidad': TOTAL_ESPACIOS,
+            'matriz_minutos': np.round(segundos / 60, 2).tolist(),
+            'minutos_disponibles_por_hora': np.round(disponibles / 60, 2).tolist(),
+            'espacios': por_espacio,
+            'utilizacion_por_hora': np.round(por_hora, 2).tolist(),
+            'meses_desde_resumen': meses_resumen,
+            'estancias_leidas': estancias_leidas,
+        }
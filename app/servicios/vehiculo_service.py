@@ -1,11 +1,19 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from sqlalchemy.orm import joinedload  # ¡¡¡NUEVO IMPORT!!!
-from datetime import datetime
+from sqlalchemy import func, or_, and_
+from datetime import datetime, date, timedelta
 from app.modelos.vehiculo_estacionado import VehiculoEstacionado
 from app.modelos.historial_factura import HistorialFactura
 from app.servicios.configuracion_service import ConfiguracionService
 from app.servicios.calculo_service import CalculoService
+from app.servicios.factura_service import FacturaService
+from app.servicios.puerta_local_service import PuertaLocalService
+from app.servicios.bitacora_service import BitacoraService
+from app.servicios.reserva_service import ReservaService
+from app.servicios.alerta_service import AlertaService
+from app.servicios.resumen_placa_service import ResumenPlacaService
+from app.utils.dinero import a_float
+from app.utils.cache_reportes import cache_reportes
+from app.utils.estado_compartido import estado_compartido
 
 class VehiculoService:
     """Servicio para manejar vehículos estacionados"""
@@ -18,6 +26,20 @@ class VehiculoService:
         Returns:
             Lista de diccionarios con el estado de cada espacio
         """
+        # Ocupación publicada en memoria compartida: sin consultar la base
+        compartidos = estado_compartido.espacios()
+        if compartidos is not None:
+            return [
+                {
+                    'numero': espacio,
+                    'ocupado': ocupado,
+                    'placa': placa,
+                    'entrada': entrada.isoformat() if ocupado else None,
+                    'es_nocturno': nocturno
+                }
+                for espacio, ocupado, nocturno, _, entrada, _, placa in compartidos
+            ]
+        
         vehiculos_activos = db.query(VehiculoEstacionado).filter_by(estado='activo').all()
         espacios = []
         for i in range(1, 25):
@@ -75,19 +97,40 @@ class VehiculoService:
         if vehiculo_activo:
             raise ValueError(f'El vehículo {placa} ya está estacionado en el espacio {vehiculo_activo.espacio_numero}')
         
+        # Espacio retenido por una reserva: solo entra el vehículo reservado
+        ahora = datetime.now()
+        retenidas = ReservaService.retencion(db, espacio_numero, ahora)
+        reserva = next((r for r in retenidas if r.placa == placa), None)
+        if retenidas and reserva is None:
+            raise ValueError(
+                f'El espacio {espacio_numero} está reservado desde {retenidas[0].inicio:%Y-%m-%d %H:%M}'
+            )
+        
         # Crear nuevo registro CON EL CAMPO es_nocturno
         vehiculo = VehiculoEstacionado(
             placa=placa,
             espacio_numero=espacio_numero,
-            fecha_hora_entrada=datetime.now(),
+            fecha_hora_entrada=ahora,
             estado='activo',
             es_nocturno=es_nocturno  # NUEVO
         )
         
         db.add(vehiculo)
+        if reserva is not None:
+            # Ingreso con la reserva: se marca utilizada en la misma transacción
+            db.flush()
+            ReservaService.marcar_utilizada(db, reserva, vehiculo)
         db.commit()
         db.refresh(vehiculo)
         
+        # Los reportes de hoy ya no son válidos
+        cache_reportes.invalidar_fecha(date.today())
+        # Ocupación local para operar la puerta si la base se cae
+        PuertaLocalService.espejo_entrada(vehiculo)
+        estado_compartido.publicar_entrada(vehiculo)
+        AlertaService.registrar_entrada(db, vehiculo)
+        BitacoraService.registrar_entrada(placa, espacio_numero, es_nocturno, vehiculo.fecha_hora_entrada)
+        
         return vehiculo
     
     @staticmethod
@@ -106,16 +149,16 @@ class VehiculoService:
         if not vehiculo:
             raise ValueError('Vehículo no encontrado o ya salió')
         
-        # Obtener configuración
-        config = ConfiguracionService.obtener_configuracion(db)
+        # Tarifa vigente a la hora de entrada: un cambio de precios posterior
+        # no afecta a los vehículos que ya estaban adentro
+        plan = ConfiguracionService.plan_vigente_en(db, vehiculo.fecha_hora_entrada)
         
         # Calcular costo (pasar es_nocturno)
         fecha_salida = datetime.now()
-        calculo = CalculoService.calcular_costo(
+        calculo = plan.calcular(
             vehiculo.fecha_hora_entrada,
             fecha_salida,
-            config,
-            vehiculo.es_nocturno  # NUEVO: pasar si es nocturno
+            vehiculo.es_nocturno
         )
         
         # Actualizar vehículo
@@ -132,14 +175,34 @@ class VehiculoService:
             fecha_hora_salida=fecha_salida,
             tiempo_total_minutos=calculo['minutos'],
             costo_total=calculo['costo'],
-            detalles_cobro=calculo['detalles']
+            detalles_cobro=calculo['detalles'],
+            es_nocturno=vehiculo.es_nocturno,
+            version_tarifa=plan.version,
+            precio_media_hora=plan.media_hora,
+            precio_hora_adicional=plan.hora_adicional,
+            precio_nocturno=plan.nocturno
         )
         
         db.add(factura)
+        ResumenPlacaService.registrar_factura(
+            db, vehiculo.placa, vehiculo.fecha_hora_entrada, fecha_salida,
+            calculo['minutos'], calculo['costo'], vehiculo.es_nocturno
+        )
         db.commit()
         db.refresh(vehiculo)
         db.refresh(factura)
         
+        cache_reportes.invalidar_fecha(date.today())
+        # El PDF se genera en segundo plano; la respuesta no lo espera
+        FacturaService.programar_pdf(factura)
+        PuertaLocalService.espejo_salida(vehiculo.placa)
+        estado_compartido.publicar_salida(vehiculo)
+        AlertaService.registrar_salida(vehiculo)
+        BitacoraService.registrar_salida(
+            vehiculo.placa, vehiculo.espacio_numero, vehiculo.es_nocturno,
+            vehiculo.fecha_hora_entrada, fecha_salida, calculo['minutos'], calculo['costo']
+        )
+        
         return {
             'vehiculo': vehiculo,
             'factura': factura,
@@ -163,24 +226,24 @@ class VehiculoService:
         """
         placa = placa.upper().strip()
         
-        vehiculo = db.query(VehiculoEstacionado).filter_by(
-            placa=placa,
-            estado='activo'
-        ).first()
+        vehiculo = VehiculoService._activo_compartido(placa)
+        if vehiculo is None:
+            vehiculo = db.query(VehiculoEstacionado).filter_by(
+                placa=placa,
+                estado='activo'
+            ).first()
         
         if not vehiculo:
             raise ValueError('Vehículo no encontrado')
         
-        # Calcular costo estimado
-        config = ConfiguracionService.obtener_configuracion(db)
-        print(f"Configuración precio_nocturno: {config.precio_nocturno}")
+        # Calcular costo estimado con la tarifa vigente a la entrada
+        plan = ConfiguracionService.plan_vigente_en(db, vehiculo.fecha_hora_entrada)
         
         # 🔍 IMPORTANTE: Pasar es_nocturno al cálculo
-        calculo = CalculoService.calcular_costo(
+        calculo = plan.calcular(
             vehiculo.fecha_hora_entrada,
             datetime.now(),
-            config,
-            vehiculo.es_nocturno  # ✅ ¡AQUÍ ESTÁ EL CAMBIO!
+            vehiculo.es_nocturno
         )
         
         
@@ -191,6 +254,27 @@ class VehiculoService:
             'detalles': calculo['detalles']
         }
     
+    @staticmethod
+    def _activo_compartido(placa: str):
+        """
+        Vehículo activo según la memoria compartida, o None si no está ahí.
+
+        Devuelve un VehiculoEstacionado transitorio (no está en la sesión):
+        solo sirve para leerlo.
+        """
+        for espacio, ocupado, nocturno, id_, entrada, creado, placa_espacio in estado_compartido.espacios() or ():
+            if ocupado and placa_espacio == placa:
+                return VehiculoEstacionado(
+                    id=id_,
+                    placa=placa_espacio,
+                    espacio_numero=espacio,
+                    fecha_hora_entrada=entrada,
+                    estado='activo',
+                    es_nocturno=nocturno,
+                    creado_en=creado
+                )
+        return None
+    
     @staticmethod
     def obtener_historial(db: Session, fecha: str = None, limite: int = 50):
         """
@@ -204,34 +288,78 @@ class VehiculoService:
         Returns:
             Lista de HistorialFactura
         """
-        # ¡¡¡CORRECCIÓN: Usar joinedload para cargar la relación!!!
-        query = db.query(HistorialFactura).options(
-            joinedload(HistorialFactura.vehiculo)  # ¡¡¡ESTO ES LO QUE FALTABA!!!
-        )
+        # Las facturas guardan es_nocturno y la tarifa: consulta de una sola tabla
+        query = db.query(HistorialFactura)
         
         if fecha:
             try:
                 fecha_obj = datetime.strptime(fecha, '%Y-%m-%d').date()
-                query = query.filter(func.date(HistorialFactura.fecha_generacion) == fecha_obj)
+                # Rango sobre la columna (no func.date): usa el índice de fecha_generacion
+                inicio = datetime.combine(fecha_obj, datetime.min.time())
+                query = query.filter(
+                    HistorialFactura.fecha_generacion >= inicio,
+                    HistorialFactura.fecha_generacion < inicio + timedelta(days=1)
+                )
             except ValueError:
                 raise ValueError("Formato de fecha inválido. Use YYYY-MM-DD")
         
         historial = query.order_by(HistorialFactura.fecha_generacion.desc()).limit(limite).all()
         
-        # Depuración: Verificar si se cargó la relación
-        if historial:
-            print(f"🔍 Depuración Historial - Primer registro:")
-            print(f"   Factura ID: {historial[0].id}")
-            print(f"   Placa: {historial[0].placa}")
-            print(f"   Vehículo cargado: {historial[0].vehiculo is not None}")
-            if historial[0].vehiculo:
-                print(f"   es_nocturno: {historial[0].vehiculo.es_nocturno}")
-                print(f"   to_dict() incluye es_nocturno?: {'es_nocturno' in historial[0].to_dict()}")
-            else:
-                print(f"   ⚠️ ERROR: Vehículo NO cargado para factura {historial[0].id}")
-        
         return historial
     
+    @staticmethod
+    def historial_placa(db: Session, placa: str, limite: int = 20, despues_de: str = None):
+        """
+        Facturas de una placa, de la más reciente a la más antigua, con sus estadísticas
+        
+        Paginación por llave (keyset): `siguiente` identifica la última
+        factura devuelta (fecha_generacion e id) y la página siguiente
+        continúa desde ahí por el índice (placa, fecha_generacion), sin
+        OFFSET; el costo de una página no crece con el historial.
+        
+        Args:
+            db: Sesión de base de datos
+            placa: Placa del vehículo
+            limite: Facturas por página
+            despues_de: Valor de `siguiente` de la página anterior (opcional)
+        
+        Returns:
+            Diccionario con placa, estadisticas (None si no tiene facturas),
+            facturas y siguiente (None en la última página)
+        
+        Raises:
+            ValueError: Si `despues_de` no es válido
+        """
+        placa = placa.upper().strip()
+        f = HistorialFactura
+        
+        query = db.query(f).filter(f.placa == placa)
+        if despues_de:
+            try:
+                fecha_texto, id_texto = despues_de.rsplit('_', 1)
+                fecha, id_ = datetime.fromisoformat(fecha_texto), int(id_texto)
+            except ValueError:
+                raise ValueError("Parámetro 'despues_de' inválido; use el valor 'siguiente' de la página anterior")
+            query = query.filter(or_(
+                f.fecha_generacion < fecha,
+                and_(f.fecha_generacion == fecha, f.id < id_)
+            ))
+        
+        # Una fila de más indica si hay otra página
+        facturas = query.order_by(f.fecha_generacion.desc(), f.id.desc()).limit(limite + 1).all()
+        siguiente = None
+        if len(facturas) > limite:
+            facturas = facturas[:limite]
+            ultima = facturas[-1]
+            siguiente = f"{ultima.fecha_generacion.isoformat()}_{ultima.id}"
+        
+        return {
+            'placa': placa,
+            'estadisticas': ResumenPlacaService.estadisticas(db, placa),
+            'facturas': facturas,
+            'siguiente': siguiente
+        }
+    
     @staticmethod
     def obtener_reporte_diario(db: Session, fecha: str = None):
         """
@@ -253,11 +381,12 @@ class VehiculoService:
             func.count(HistorialFactura.id).label('total_vehiculos'),
             func.sum(HistorialFactura.costo_total).label('ingresos_total')
         ).filter(
-            func.date(HistorialFactura.fecha_generacion) == fecha_obj
+            HistorialFactura.fecha_generacion >= datetime.combine(fecha_obj, datetime.min.time()),
+            HistorialFactura.fecha_generacion < datetime.combine(fecha_obj + timedelta(days=1), datetime.min.time())
         ).first()
         
         return {
             'fecha': fecha_obj.isoformat(),
             'total_vehiculos': resultado.total_vehiculos or 0,
-            'ingresos_total': float(resultado.ingresos_total or 0)
+            'ingresos_total': a_float(resultado.ingresos_total or 0)
         }
\ No newline at end of file
@@ -1,3 +1,4 @@
 from .calculadora_precios import CalculadoraPrecios
+from .plan_tarifario import PlanTarifario
 
-__all__ = ['CalculadoraPrecios']
\ No newline at end of file
+__all__ = ['CalculadoraPrecios', 'PlanTarifario']
\ No newline at end of file
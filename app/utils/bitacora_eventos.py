@@ -0,0 +1,399 @@
+"""
+Bitácora binaria de eventos, solo de anexado.
+
+Cada entrada, salida y cambio de tarifa se guarda como un registro de
+tamaño fijo empaquetado con struct:
+
+    cabecera '<BHI': tipo, longitud del contenido, CRC32 del contenido
+    contenido: ver FORMATOS
+
+El archivo empieza con MAGIA + versión. La versión 2 guarda la placa en
+UTF-8 en 40 bytes (20 caracteres de hasta 2 bytes: cabe cualquier placa
+válida, con Ñ); los registros de la versión 1 (placa ASCII en 12 bytes)
+se siguen leyendo. Al anexar a un archivo de la versión 1 se sube la
+versión de la cabecera, sin mover ningún offset, para que un proceso con
+el código anterior rechace el archivo en lugar de recortar los registros
+nuevos como si estuvieran incompletos.
+
+Los registros se escriben con una
+sola llamada a os.write sobre un descriptor O_APPEND (y bajo flock cuando
+existe), así que varios procesos pueden anexar sin mezclarse. Un registro
+a medias (caída en plena escritura) no pasa la verificación de longitud o
+CRC: la lectura se detiene ahí y el siguiente escritor lo recorta.
+
+La lectura usa mmap y struct.unpack_from, sin copiar el archivo. Las
+posiciones (offsets) en bytes identifican cada evento, de modo que un
+consumidor puede seguir la bitácora desde el último offset que procesó.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime, time as dt_time
+
+try:
+    import fcntl
+except ImportError:  # Windows: basta O_APPEND con un solo proceso escritor
+    fcntl = None
+
+MAGIA = b'PQEV'
+VERSION_FORMATO = 2
+VERSIONES_LEGIBLES = (1, 2)
+_ENCABEZADO_ARCHIVO = struct.Struct('<4sHH')
+_CABECERA = struct.Struct('<BHI')
+INICIO = _ENCABEZADO_ARCHIVO.size
+
+# Tipos de evento
+ENTRADA = 4
+SALIDA = 5
+TARIFA = 3
+# Formato 1 (solo lectura): placa ASCII en 12 bytes
+ENTRADA_V1 = 1
+SALIDA_V1 = 2
+
+NOMBRES = {
+    ENTRADA: 'entrada', SALIDA: 'salida', TARIFA: 'tarifa',
+    ENTRADA_V1: 'entrada', SALIDA_V1: 'salida',
+}
+
+# Bytes de la placa en UTF-8
+BYTES_PLACA = 40
+
+# Contenido de cada tipo; las fechas son segundos epoch y el dinero centavos
+FORMATOS = {
+    # fecha, espacio, es_nocturno, placa
+    ENTRADA: (struct.Struct(f'<qHB{BYTES_PLACA}s'), ('fecha', 'espacio', 'es_nocturno', 'placa')),
+    # fecha (salida), entrada, espacio, es_nocturno, minutos, costo, placa
+    SALIDA: (struct.Struct(f'<qqHBiq{BYTES_PLACA}s'),
+             ('fecha', 'entrada', 'espacio', 'es_nocturno', 'minutos', 'costo', 'placa')),
+    ENTRADA_V1: (struct.Struct('<qHB12s'), ('fecha', 'espacio', 'es_nocturno', 'placa')),
+    SALIDA_V1: (struct.Struct('<qqHBiq12s'),
+                ('fecha', 'entrada', 'espacio', 'es_nocturno', 'minutos', 'costo', 'placa')),
+    # fecha, versión, media hora, hora adicional, nocturno, inicio y fin nocturno (segundos del día, -1 = sin hora)
+    TARIFA: (struct.Struct('<qiqqqii'), ('fecha', 'version', 'media_hora', 'hora_adicional', 'nocturno',
+                                         'inicio_nocturno', 'fin_nocturno')),
+}
+
+
+def segundos_del_dia(hora: dt_time):
+    return -1 if hora is None else hora.hour * 3600 + hora.minute * 60 + hora.second
+
+
+def _placa_bytes(placa: str):
+    """
+    Placa en UTF-8 para el registro.
+
+    Raises:
+        ValueError: Si no cabe en BYTES_PLACA (nunca se recorta)
+    """
+    datos = placa.encode('utf-8')
+    if len(datos) > BYTES_PLACA:
+        raise ValueError(f'La placa {placa!r} ocupa {len(datos)} bytes (máximo {BYTES_PLACA})')
+    return datos
+
+
+def _placa_texto(datos: bytes):
+    return datos.rstrip(b'\0').decode('utf-8')
+
+
+def empaquetar(tipo: int, *valores):
+    """
+    Registro completo (cabecera + contenido) listo para anexar.
+
+    Raises:
+        ValueError: Si la placa no cabe en el registro
+    """
+    estructura, _ = FORMATOS[tipo]
+    valores = [_placa_bytes(v) if isinstance(v, str) else v for v in valores]
+    contenido = estructura.pack(*valores)
+    return _CABECERA.pack(tipo, len(contenido), zlib.crc32(contenido)) + contenido
+
+
+def recorrer(datos, desde: int, fin: int):
+    """
+    Registros válidos de `datos` (bytes o mmap) entre `desde` y `fin`.
+
+    Se detiene en el primer registro incompleto o con CRC inválido.
+
+    Yields:
+        Tuplas (offset, siguiente, tipo, valores)
+    """
+    posicion = max(desde, INICIO)
+    cabecera = _CABECERA.size
+    while posicion + cabecera <= fin:
+        tipo, longitud, crc = _CABECERA.unpack_from(datos, posicion)
+        formato = FORMATOS.get(tipo)
+        inicio = posicion + cabecera
+        siguiente = inicio + longitud
+        if formato is None or formato[0].size != longitud or siguiente > fin:
+            return
+        if zlib.crc32(datos[inicio:siguiente]) != crc:
+            return
+        yield posicion, siguiente, tipo, formato[0].unpack_from(datos, inicio)
+        posicion = siguiente
+
+
+def como_dict(offset: int, tipo: int, valores):
+    """Evento legible (JSON) a partir de un registro"""
+    _, campos = FORMATOS[tipo]
+    evento = {'offset': offset, 'tipo': NOMBRES[tipo]}
+    for campo, valor in zip(campos, valores):
+        if campo == 'placa':
+            valor = _placa_texto(valor)
+        elif campo in ('fecha', 'entrada'):
+            valor = datetime.fromtimestamp(valor).isoformat()
+        elif campo == 'es_nocturno':
+            valor = bool(valor)
+        elif campo in ('inicio_nocturno', 'fin_nocturno'):
+            valor = None if valor < 0 else f'{valor // 3600:02d}:{valor % 3600 // 60:02d}'
+        evento[campo] = valor
+    return evento
+
+
+class BitacoraEventos:
+    """Archivo de la bitácora: anexar registros y leerlos con mmap"""
+
+    def __init__(self, ruta: str, fsync: bool = False):
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self.ruta = ruta
+        self.fsync = fsync
+        self._fd = None
+        self._fin = None  # Offset final tras la última escritura de este proceso
+        self._lock = threading.Lock()
+
+    def _reparar(self, tamano: int):
+        """
+        Dejar el archivo listo para anexar (con el flock tomado): escribir el
+        encabezado si es nuevo y recortar un registro a medias al final.
+        """
+        if tamano < INICIO:
+            os.ftruncate(self._fd, 0)
+            os.write(self._fd, _ENCABEZADO_ARCHIVO.pack(MAGIA, VERSION_FORMATO, 0))
+            self._fin = INICIO
+            return
+        self._actualizar_version()
+        desde = self._fin if self._fin is not None and self._fin <= tamano else INICIO
+        fin_valido = self.fin_valido(desde)
+        if fin_valido < tamano:
+            print(f"⚠️ Bitácora: {tamano - fin_valido} byte(s) incompletos al final, se recortan")
+            os.ftruncate(self._fd, fin_valido)
+        self._fin = fin_valido
+
+    def _actualizar_version(self):
+        """Subir la versión de la cabecera de un archivo de formato anterior (con el flock tomado)"""
+        # Descriptor aparte: con O_APPEND la escritura iría al final
+        with open(self.ruta, 'r+b') as archivo:
+            magia, version, reservado = _ENCABEZADO_ARCHIVO.unpack(archivo.read(INICIO))
+            if magia != MAGIA or version not in VERSIONES_LEGIBLES:
+                raise ValueError(f'{self.ruta} no es una bitácora de eventos válida')
+            if version < VERSION_FORMATO:
+                archivo.seek(0)
+                archivo.write(_ENCABEZADO_ARCHIVO.pack(MAGIA, VERSION_FORMATO, reservado))
+                archivo.flush()
+                os.fsync(archivo.fileno())
+                print(f"🔧 Bitácora: cabecera actualizada del formato {version} al {VERSION_FORMATO}")
+
+    @staticmethod
+    def _bloquear(fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+    @staticmethod
+    def _desbloquear(fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def agregar(self, registro: bytes):
+        """
+        Anexar un registro empaquetado.
+
+        Si el archivo cambió desde la última escritura de este proceso (otro
+        proceso anexó), se validan solo los bytes nuevos antes de escribir.
+
+        Returns:
+            Offset final de la bitácora después del registro
+        """
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(self.ruta, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                self._fin = None
+            self._bloquear(self._fd)
+            try:
+                tamano = os.fstat(self._fd).st_size
+                if tamano != self._fin:
+                    self._reparar(tamano)
+                os.write(self._fd, registro)
+                if self.fsync:
+                    os.fsync(self._fd)
+                self._fin += len(registro)
+                return self._fin
+            finally:
+                self._desbloquear(self._fd)
+
+    def tamano(self):
+        try:
+            return os.path.getsize(self.ruta)
+        except FileNotFoundError:
+            return 0
+
+    def _mapear(self):
+        """mmap de solo lectura del archivo, o None si está vacío o no existe"""
+        try:
+            with open(self.ruta, 'rb') as archivo:
+                if os.fstat(archivo.fileno()).st_size < INICIO:
+                    return None
+                datos = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        magia, version, _ = _ENCABEZADO_ARCHIVO.unpack_from(datos, 0)
+        if magia != MAGIA or version not in VERSIONES_LEGIBLES:
+            datos.close()
+            raise ValueError(f'{self.ruta} no es una bitácora de eventos válida')
+        return datos
+
+    def fin_valido(self, desde: int = INICIO):
+        """Offset del final del último registro completo (validando desde `desde`)"""
+        datos = self._mapear()
+        if datos is None:
+            return INICIO
+        with datos:
+            fin = max(desde, INICIO)
+            for _, siguiente, _, _ in recorrer(datos, fin, len(datos)):
+                fin = siguiente
+            return fin
+
+    def reproducir(self, desde: int, aplicar):
+        """
+        Llamar `aplicar(offset, tipo, valores)` con cada registro desde `desde`.
+
+        Returns:
+            Offset siguiente al último registro aplicado
+        """
+        datos = self._mapear()
+        if datos is None:
+            return max(desde, INICIO)
+        with datos:
+            posicion = max(desde, INICIO)
+            for offset, siguiente, tipo, valores in recorrer(datos, posicion, len(datos)):
+                aplicar(offset, tipo, valores)
+                posicion = siguiente
+            return posicion
+
+    def leer(self, desde: int, limite: int):
+        """
+        Hasta `limite` eventos a partir de `desde`, como diccionarios.
+
+        Returns:
+            Tupla (eventos, siguiente_offset)
+        """
+        eventos = []
+        datos = self._mapear()
+        if datos is None:
+            return eventos, max(desde, INICIO)
+        with datos:
+            posicion = max(desde, INICIO)
+            for offset, siguiente, tipo, valores in recorrer(datos, posicion, len(datos)):
+                if len(eventos) >= limite:
+                    break
+                eventos.append(como_dict(offset, tipo, valores))
+                posicion = siguiente
+            return eventos, posicion
+
+
+class EstadoBitacora:
+    """
+    Estado reconstruido a partir de la bitácora: ocupación actual, totales
+    por día (fecha de salida para ingresos, de entrada para llegadas) y la
+    última tarifa.
+    """
+
+    def __init__(self):
+        self.offset = INICIO
+        self.eventos = 0
+        self.ocupacion = {}  # espacio -> (placa en bytes UTF-8, entrada epoch, es_nocturno)
+        self.dias = {}       # 'YYYY-MM-DD' -> [entradas, salidas, nocturnas, minutos, centavos]
+        self.tarifa = None
+        # Totales del día de la última hora vista: los eventos llegan en orden
+        # cronológico, así que casi nunca hace falta calcular la fecha local
+        self._hora = None
+        self._totales_hora = None
+
+    def _dia(self, epoch: int):
+        hora = epoch // 3600
+        if hora != self._hora:
+            fecha = datetime.fromtimestamp(epoch).date().isoformat()
+            totales = self.dias.get(fecha)
+            if totales is None:
+                totales = self.dias[fecha] = [0, 0, 0, 0, 0]
+            self._hora, self._totales_hora = hora, totales
+        return self._totales_hora
+
+    def aplicar(self, offset: int, tipo: int, valores):
+        self.eventos += 1
+        if tipo == ENTRADA or tipo == ENTRADA_V1:
+            fecha, espacio, nocturno, placa = valores
+            # La placa se guarda en bytes; se decodifica solo al mostrarla
+            self.ocupacion[espacio] = (placa, fecha, nocturno)
+            self._dia(fecha)[0] += 1
+        elif tipo == SALIDA or tipo == SALIDA_V1:
+            fecha, _, espacio, nocturno, minutos, costo, _ = valores
+            self.ocupacion.pop(espacio, None)
+            totales = self._dia(fecha)
+            totales[1] += 1
+            totales[2] += nocturno
+            totales[3] += minutos
+            totales[4] += costo
+        elif tipo == TARIFA:
+            self.tarifa = como_dict(offset, tipo, valores)
+
+    def ocupantes(self):
+        """Ocupación como {espacio: (placa, entrada epoch, es_nocturno)} con la placa en texto"""
+        return {
+            espacio: (_placa_texto(placa), fecha, nocturno)
+            for espacio, (placa, fecha, nocturno) in self.ocupacion.items()
+        }
+
+    def a_dict(self):
+        return {
+            'offset': self.offset,
+            'eventos': self.eventos,
+            'ocupacion': {str(espacio): valor for espacio, valor in self.ocupantes().items()},
+            'dias': self.dias,
+            'tarifa': self.tarifa,
+        }
+
+    @classmethod
+    def desde_dict(cls, datos: dict):
+        estado = cls()
+        estado.offset = datos['offset']
+        estado.eventos = datos['eventos']
+        estado.ocupacion = {
+            int(espacio): (placa.encode('utf-8'), fecha, nocturno)
+            for espacio, (placa, fecha, nocturno) in datos['ocupacion'].items()
+        }
+        estado.dias = datos['dias']
+        estado.tarifa = datos['tarifa']
+        return estado
+
+    def guardar_instantanea(self, ruta: str):
+        """Escribir la instantánea de forma atómica (archivo temporal + rename)"""
+        temporal = f'{ruta}.{os.getpid()}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump({'formato': VERSION_FORMATO, **self.a_dict()}, archivo, separators=(',', ':'))
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar_instantanea(cls, ruta: str):
+        """Instantánea guardada, o None si no existe o no se puede leer"""
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                datos = json.load(archivo)
+        except (FileNotFoundError, ValueError):
+            return None
+        if datos.get('formato') != VERSION_FORMATO:
+            return None
+        return cls.desde_dict(datos)
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from app.config import CACHE_REPORTES_MAX_BYTES, CACHE_REPORTES_TTL_HOY, CACHE_REPORTES_GRACIA
+
+
+def dia_cerrado(dia: date):
+    """
+    True si un reporte que termina en `dia` ya no cambia (se cachea como inmutable).
+
+    El día debe haber terminado hace más de CACHE_REPORTES_GRACIA segundos:
+    justo después de medianoche la réplica puede no tener aún las últimas
+    salidas de ayer, y ese resultado quedaría en la cache para siempre.
+    """
+    return datetime.now() >= datetime.combine(dia + timedelta(days=1), datetime.min.time()) + \
+        timedelta(seconds=CACHE_REPORTES_GRACIA)
+
+
+def _estimar_tamano(valor):
+    """Tamaño aproximado en bytes de un resultado (su JSON)"""
+    if hasattr(valor, 'model_dump_json'):
+        return len(valor.model_dump_json())
+    return len(json.dumps(valor, default=str))
+
+
+class _Pendiente:
+    """Cálculo en curso compartido por las peticiones concurrentes de la misma clave"""
+    __slots__ = ('evento', 'valor', 'error')
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+        self.error = None
+
+
+class CacheReportes:
+    """
+    Cache LRU de resultados de reportes, acotada por memoria.
+
+    - Las entradas inmutables (días cerrados, ver dia_cerrado) no expiran;
+      solo salen por LRU.
+    - Las demás (el día actual, y el anterior durante la gracia tras
+      medianoche) expiran a los `ttl_hoy` segundos y se invalidan en cada
+      entrada/salida de vehículos.
+    - La cache es de cada worker y las invalidaciones también: los demás
+      workers pueden servir una entrada del día actual hasta `ttl_hoy`
+      segundos (CACHE_REPORTES_TTL_HOY) después de una entrada o salida.
+    - Un evento de la puerta que llega tarde (sincronizado desde el diario)
+      quita también las inmutables cuyos períodos cubren sus días.
+    - Si varias peticiones piden la misma clave a la vez, solo una calcula y
+      las demás esperan su resultado.
+    """
+
+    def __init__(self, max_bytes: int, ttl_hoy: float):
+        self.max_bytes = max_bytes
+        self.ttl_hoy = ttl_hoy
+        self._datos = OrderedDict()  # clave -> (valor, tamaño, expira_en | None, fecha, periodos)
+        self._en_curso = {}
+        self._lock = threading.Lock()
+        # Cambia con cada invalidación: un cálculo que empezó antes no se guarda
+        self._generacion = 0
+        self.bytes_usados = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.coalescidos = 0
+        self.expulsiones = 0
+        self.invalidaciones = 0
+
+    def obtener_o_calcular(self, clave, calcular, inmutable: bool, fecha=None, periodos=None):
+        """
+        Devolver el resultado cacheado de `clave` o calcularlo una sola vez.
+
+        Args:
+            clave: Tupla (reporte, fecha(s), versión de tarifa)
+            calcular: Función sin argumentos que produce el resultado
+            inmutable: True si el resultado ya no puede cambiar (fechas pasadas)
+            fecha: Fecha del reporte, usada para invalidar por día
+            periodos: Días que lee el resultado, tuplas (desde, hasta) de date
+                inclusivas; por defecto solo `fecha`
+        """
+        if periodos is None:
+            periodos = () if fecha is None else ((fecha, fecha),)
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                expira_en = entrada[2]
+                if expira_en is None or expira_en > time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return entrada[0]
+                self._quitar(clave)
+
+            pendiente = self._en_curso.get(clave)
+            if pendiente is None:
+                pendiente = _Pendiente()
+                self._en_curso[clave] = pendiente
+                lider = True
+                self.fallos += 1
+                generacion = self._generacion
+            else:
+                lider = False
+                self.coalescidos += 1
+
+        if not lider:
+            pendiente.evento.wait()
+            if pendiente.error is not None:
+                raise pendiente.error
+            return pendiente.valor
+
+        try:
+            valor = calcular()
+        except Exception as e:
+            pendiente.error = e
+            with self._lock:
+                self._en_curso.pop(clave, None)
+            pendiente.evento.set()
+            raise
+
+        tamano = _estimar_tamano(valor)
+        with self._lock:
+            self._en_curso.pop(clave, None)
+            if generacion == self._generacion and tamano <= self.max_bytes:
+                expira_en = None if inmutable else time.monotonic() + self.ttl_hoy
+                self._datos[clave] = (valor, tamano, expira_en, fecha, tuple(periodos))
+                self.bytes_usados += tamano
+                while self.bytes_usados > self.max_bytes:
+                    clave_vieja = next(iter(self._datos))
+                    self._quitar(clave_vieja)
+                    self.expulsiones += 1
+
+        pendiente.valor = valor
+        pendiente.evento.set()
+        return valor
+
+    def _quitar(self, clave):
+        valor, tamano, _, _, _ = self._datos.pop(clave)
+        self.bytes_usados -= tamano
+
+    def invalidar_fecha(self, fecha):
+        """Quitar las entradas mutables (no inmutables) que cubren `fecha`"""
+        with self._lock:
+            self._generacion += 1
+            self.invalidaciones += 1
+            for clave in [c for c, e in self._datos.items() if e[2] is not None and e[3] == fecha]:
+                self._quitar(clave)
+
+    def invalidar_dias(self, desde, hasta):
+        """
+        Quitar todas las entradas, también las inmutables, que leen algún día de [desde, hasta].
+
+        Para eventos que llegan tarde: un día ya cerrado cambió.
+        """
+        with self._lock:
+            self._generacion += 1
+            self.invalidaciones += 1
+            for clave in [
+                c for c, e in self._datos.items()
+                if any(inicio <= hasta and desde <= fin for inicio, fin in e[4])
+            ]:
+                self._quitar(clave)
+
+    def limpiar(self):
+        """Vaciar la cache (p. ej. al cambiar la tarifa)"""
+        with self._lock:
+            self._generacion += 1
+            self._datos.clear()
+            self.bytes_usados = 0
+
+    def estadisticas(self):
+        """Contadores para ajustar el tamaño y el TTL de la cache"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos + self.coalescidos
+            return {
+                'entradas': len(self._datos),
+                'bytes_usados': self.bytes_usados,
+                'max_bytes': self.max_bytes,
+                'ttl_hoy_segundos': self.ttl_hoy,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'coalescidos': self.coalescidos,
+                'expulsiones': self.expulsiones,
+                'invalidaciones': self.invalidaciones,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0.0,
+            }
+
+
+# Cache compartida por los reportes de este proceso
+cache_reportes = CacheReportes(CACHE_REPORTES_MAX_BYTES, CACHE_REPORTES_TTL_HOY)
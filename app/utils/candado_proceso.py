@@ -0,0 +1,44 @@
+"""
+Candado entre procesos con flock sobre un archivo.
+
+Sirve para elegir un solo worker de uvicorn para una tarea de fondo: el que
+toma el candado la hace y lo conserva hasta terminar; si ese proceso muere
+el sistema operativo lo libera y otro worker lo toma en su siguiente
+intento.
+"""
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Hay candados entre procesos en esta plataforma
+DISPONIBLE = fcntl is not None
+
+
+def tomar_candado(ruta: str):
+    """
+    Intentar tomar el candado sin esperar.
+
+    Returns:
+        Descriptor del archivo (mantenerlo abierto conserva el candado), o
+        None si otro proceso lo tiene o la plataforma no tiene flock
+    """
+    if fcntl is None:
+        return None
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def soltar_candado(fd):
+    if fd is not None:
+        os.close(fd)
@@ -0,0 +1,236 @@
+"""
+Control de admisión por clase de ruta (middleware ASGI).
+
+Cada clase tiene un límite de peticiones en curso y una cola de espera
+acotada. Las rutas de la puerta (entrada/salida) esperan su turno; los
+reportes y el historial se rechazan enseguida con 503 + Retry-After cuando
+su cupo está lleno o cuando la puerta está en hora pico, para que no
+compitan por la CPU, los hilos y las conexiones de la base.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from app.config import (
+    ADMISION_PUERTA_LIMITE,
+    ADMISION_PUERTA_COLA,
+    ADMISION_PUERTA_ESPERA,
+    ADMISION_CONSULTAS_LIMITE,
+    ADMISION_CONSULTAS_COLA,
+    ADMISION_CONSULTAS_ESPERA,
+    ADMISION_PRISA_PUERTA,
+    ADMISION_PRISA_TASA,
+    ADMISION_ALERTAS_LIMITE,
+)
+
+# Segundos de la ventana con que se mide la tasa de llegadas de una clase
+VENTANA_TASA = 5.0
+
+
+class ClaseAdmision:
+    """Cupo de concurrencia y cola de espera de un grupo de rutas"""
+
+    def __init__(self, nombre, prefijos, limite, cola, espera, reintentar_en, cede_a=None, sufijos=()):
+        """
+        Args:
+            nombre: Nombre de la clase (métricas)
+            prefijos: Prefijos de ruta que pertenecen a la clase
+            limite: Peticiones en curso permitidas
+            cola: Peticiones que pueden esperar turno (0 = rechazar si no hay cupo)
+            espera: Segundos máximos de espera en la cola
+            reintentar_en: Valor del encabezado Retry-After al rechazar
+            cede_a: {clase: (umbral, tasa)}; esta clase se rechaza mientras la
+                otra tenga al menos `umbral` peticiones en curso o en cola, o
+                reciba `tasa` o más peticiones por segundo (hora pico)
+            sufijos: Pares (prefijo, sufijo) para rutas con parámetros en medio,
+                como /api/vehiculos/{placa}/historial
+        """
+        self.nombre = nombre
+        self.prefijos = tuple(prefijos)
+        self.sufijos = tuple(sufijos)
+        self.limite = limite
+        self.cola = cola
+        self.espera = espera
+        self.reintentar_en = reintentar_en
+        self.cede_a = dict(cede_a or {})
+        self._semaforo = None
+        self.en_curso = 0
+        self.esperando = 0
+        self.max_esperando = 0
+        self.admitidas = 0
+        self.rechazadas = 0
+        self.vencidas = 0
+        self._espera_total = 0.0
+        self._llegadas = deque()
+
+    def registrar_llegada(self, ahora: float):
+        self._llegadas.append(ahora)
+        while self._llegadas[0] < ahora - VENTANA_TASA:
+            self._llegadas.popleft()
+
+    def tasa(self, ahora: float):
+        """Peticiones por segundo en los últimos VENTANA_TASA segundos"""
+        while self._llegadas and self._llegadas[0] < ahora - VENTANA_TASA:
+            self._llegadas.popleft()
+        return len(self._llegadas) / VENTANA_TASA
+
+    @property
+    def semaforo(self):
+        # Se crea dentro del event loop del servidor
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.limite)
+        return self._semaforo
+
+    def metricas(self):
+        return {
+            'limite': self.limite,
+            'cola': self.cola,
+            'en_curso': self.en_curso,
+            'esperando': self.esperando,
+            'max_esperando': self.max_esperando,
+            'admitidas': self.admitidas,
+            'rechazadas': self.rechazadas,
+            'vencidas_en_cola': self.vencidas,
+            'espera_promedio_ms': round(1000 * self._espera_total / self.admitidas, 2) if self.admitidas else 0.0,
+            'tasa_por_segundo': round(self.tasa(time.monotonic()), 2),
+        }
+
+
+class ControlAdmision:
+    """Clases de admisión y su asignación por ruta"""
+
+    def __init__(self, clases):
+        self.clases = {clase.nombre: clase for clase in clases}
+
+    def clasificar(self, ruta: str):
+        for clase in self.clases.values():
+            if ruta.startswith(clase.prefijos):
+                return clase
+            if clase.sufijos:
+                sin_barra = ruta.rstrip('/')
+                if any(ruta.startswith(p) and sin_barra.endswith(s) for p, s in clase.sufijos):
+                    return clase
+        return None
+
+    async def admitir(self, clase: ClaseAdmision):
+        """
+        Esperar un cupo de la clase.
+
+        Returns:
+            True si la petición puede pasar (debe llamar a liberar), False si se rechaza
+        """
+        semaforo = clase.semaforo
+        inicio = time.monotonic()
+        clase.registrar_llegada(inicio)
+        for nombre, (umbral, tasa) in clase.cede_a.items():
+            otra = self.clases[nombre]
+            if otra.en_curso + otra.esperando >= umbral or otra.tasa(inicio) >= tasa:
+                clase.rechazadas += 1
+                return False
+        if semaforo.locked() and clase.esperando >= clase.cola:
+            clase.rechazadas += 1
+            return False
+
+        clase.esperando += 1
+        clase.max_esperando = max(clase.max_esperando, clase.esperando)
+        adquirido = admitida = False
+        try:
+            # asyncio.timeout y no wait_for: wait_for puede perder un acquire()
+            # que terminó justo al vencer el plazo o al cancelarse la petición
+            async with asyncio.timeout(clase.espera):
+                await semaforo.acquire()
+                adquirido = True
+            admitida = True
+        except TimeoutError:
+            clase.vencidas += 1
+            clase.rechazadas += 1
+            return False
+        finally:
+            clase.esperando -= 1
+            if adquirido and not admitida:
+                # Cupo obtenido pero la petición no sigue (vencida o cancelada): se devuelve
+                semaforo.release()
+
+        clase.en_curso += 1
+        clase.admitidas += 1
+        clase._espera_total += time.monotonic() - inicio
+        return True
+
+    def liberar(self, clase: ClaseAdmision):
+        clase.en_curso -= 1
+        clase.semaforo.release()
+
+    def metricas(self):
+        return {nombre: clase.metricas() for nombre, clase in self.clases.items()}
+
+
+class MiddlewareAdmision:
+    """Middleware ASGI que aplica ControlAdmision a las peticiones HTTP"""
+
+    def __init__(self, app, control: ControlAdmision):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] == 'OPTIONS':
+            return await self.app(scope, receive, send)
+
+        clase = self.control.clasificar(scope['path'])
+        if clase is None:
+            return await self.app(scope, receive, send)
+
+        if not await self.control.admitir(clase):
+            return await self._rechazar(clase, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.control.liberar(clase)
+
+    @staticmethod
+    async def _rechazar(clase: ClaseAdmision, send):
+        cuerpo = json.dumps({
+            'detail': 'Servicio ocupado, intente de nuevo en unos segundos'
+        }, ensure_ascii=False).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(cuerpo)).encode()),
+                (b'retry-after', str(clase.reintentar_en).encode()),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': cuerpo})
+
+
+# Clases del parqueadero: la puerta se protege, las consultas pesadas ceden
+control_admision = ControlAdmision([
+    ClaseAdmision(
+        'puerta',
+        ('/api/vehiculos/entrada', '/api/vehiculos/salida'),
+        limite=ADMISION_PUERTA_LIMITE,
+        cola=ADMISION_PUERTA_COLA,
+        espera=ADMISION_PUERTA_ESPERA,
+        reintentar_en=1,
+    ),
+    ClaseAdmision(
+        'consultas',
+        ('/api/reportes', '/api/vehiculos/historial', '/api/facturas'),
+        limite=ADMISION_CONSULTAS_LIMITE,
+        cola=ADMISION_CONSULTAS_COLA,
+        espera=ADMISION_CONSULTAS_ESPERA,
+        reintentar_en=5,
+        cede_a={'puerta': (ADMISION_PRISA_PUERTA, ADMISION_PRISA_TASA)},
+        # Historial de una placa: /api/vehiculos/{placa}/historial
+        sufijos=(('/api/vehiculos/', '/historial'),),
+    ),
+    # Long-poll de alertas: espera sin hilos, pero se acota cuántos clientes esperan
+    ClaseAdmision(
+        'alertas',
+        ('/api/alertas',),
+        limite=ADMISION_ALERTAS_LIMITE,
+        cola=0,
+        espera=0,
+        reintentar_en=5,
+    ),
+])
@@ -0,0 +1,409 @@
+"""
+Diario local de la puerta: SQLite en modo WAL con synchronous=FULL.
+
+Guarda en disco, con fsync en cada commit, los eventos de entrada y salida
+que aún no están en la base principal, el estado local de ocupación y la
+última tarifa conocida. Con esto la puerta puede seguir registrando
+vehículos aunque MySQL no responda. También guarda las Idempotency-Key
+respondidas sin base, para que los reintentos no registren dos veces.
+"""
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, time as dt_time
+
+# Estados de un evento del diario
+PENDIENTE = 'pendiente'
+SINCRONIZADO = 'sincronizado'
+CONFLICTO = 'conflicto'
+# Falló DIARIO_MAX_INTENTOS veces por un error que no es un conflicto: queda
+# apartado para revisión y deja de frenar a los eventos siguientes
+FALLIDO = 'fallido'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS eventos (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    placa TEXT NOT NULL,
+    espacio INTEGER NOT NULL,
+    es_nocturno INTEGER NOT NULL,
+    entrada TEXT NOT NULL,
+    salida TEXT,
+    costo INTEGER,
+    minutos INTEGER,
+    detalles TEXT,
+    version_tarifa INTEGER,
+    precio_media_hora INTEGER,
+    precio_hora_adicional INTEGER,
+    precio_nocturno INTEGER,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    error TEXT,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    creado_en TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_eventos_estado ON eventos (estado, seq);
+CREATE TABLE IF NOT EXISTS ocupacion (
+    espacio INTEGER PRIMARY KEY,
+    placa TEXT NOT NULL UNIQUE,
+    entrada TEXT NOT NULL,
+    es_nocturno INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tarifa (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    datos TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS claves_idempotencia (
+    ruta TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    huella TEXT NOT NULL,
+    estado_http INTEGER,
+    respuesta TEXT,
+    creada_en TEXT NOT NULL,
+    expira_en TEXT NOT NULL,
+    PRIMARY KEY (ruta, clave)
+);
+"""
+
+
+class DiarioLocal:
+    """Eventos pendientes, ocupación local y tarifa en un archivo SQLite"""
+
+    def __init__(self, ruta: str):
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self.ruta = ruta
+        # isolation_level=None: las transacciones se abren a mano con BEGIN IMMEDIATE
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conexion.row_factory = sqlite3.Row
+        self._conexion.execute('PRAGMA journal_mode=WAL')
+        self._conexion.execute('PRAGMA synchronous=FULL')
+        self._conexion.executescript(_ESQUEMA)
+        # Diarios creados antes de contar los intentos por evento
+        columnas = {fila['name'] for fila in self._conexion.execute('PRAGMA table_info(eventos)')}
+        if 'intentos' not in columnas:
+            self._conexion.execute('ALTER TABLE eventos ADD COLUMN intentos INTEGER NOT NULL DEFAULT 0')
+        # Identificador del diario: distingue los eventos de dos puertas con la misma secuencia
+        self._conexion.execute(
+            "INSERT OR IGNORE INTO meta (clave, valor) VALUES ('id', ?)", (uuid.uuid4().hex,)
+        )
+        self.id = self._conexion.execute("SELECT valor FROM meta WHERE clave = 'id'").fetchone()[0]
+        self._lock = threading.Lock()
+        # Copia en memoria de "hay eventos pendientes": la puerta la consulta en
+        # cada petición. La ponen al día las anotaciones y el sincronizador de
+        # este proceso, y consultar_pendientes() (las anotaciones de otros workers)
+        self._pendientes = None
+        self.consultar_pendientes()
+
+    def _transaccion(self, operacion):
+        """Ejecutar `operacion(cursor)` en una transacción; el COMMIT hace fsync"""
+        with self._lock:
+            cursor = self._conexion.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                resultado = operacion(cursor)
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+            cursor.execute('COMMIT')
+            return resultado
+
+    def _leer(self, sql: str, parametros=()):
+        with self._lock:
+            return self._conexion.execute(sql, parametros).fetchall()
+
+    # ------------------------------------------------------------------
+    # Eventos de la puerta
+    # ------------------------------------------------------------------
+    def registrar_entrada(self, placa: str, espacio: int, es_nocturno: bool, fecha: datetime):
+        """
+        Anotar una entrada validando contra la ocupación local.
+
+        Returns:
+            Número de secuencia del evento
+
+        Raises:
+            ValueError: Si el espacio está ocupado o el vehículo ya está adentro
+        """
+        def operacion(cursor):
+            ocupado = cursor.execute('SELECT placa FROM ocupacion WHERE espacio = ?', (espacio,)).fetchone()
+            if ocupado:
+                raise ValueError(f'El espacio {espacio} ya está ocupado')
+            activo = cursor.execute('SELECT espacio FROM ocupacion WHERE placa = ?', (placa,)).fetchone()
+            if activo:
+                raise ValueError(f'El vehículo {placa} ya está estacionado en el espacio {activo["espacio"]}')
+
+            cursor.execute(
+                'INSERT INTO ocupacion (espacio, placa, entrada, es_nocturno) VALUES (?, ?, ?, ?)',
+                (espacio, placa, fecha.isoformat(), int(es_nocturno))
+            )
+            cursor.execute(
+                'INSERT INTO eventos (tipo, placa, espacio, es_nocturno, entrada, creado_en) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                ('entrada', placa, espacio, int(es_nocturno), fecha.isoformat(), datetime.now().isoformat())
+            )
+            return cursor.lastrowid
+
+        seq = self._transaccion(operacion)
+        self._pendientes = True
+        return seq
+
+    def registrar_salida(self, placa: str, fecha: datetime, calcular):
+        """
+        Anotar una salida validando contra la ocupación local.
+
+        Args:
+            placa: Placa del vehículo
+            fecha: Fecha y hora de salida
+            calcular: Función (entrada, es_nocturno) -> dict con costo, minutos,
+                detalles, version_tarifa y los tres precios, en centavos
+
+        Returns:
+            Tupla (seq, ocupante, calculo)
+
+        Raises:
+            ValueError: Si el vehículo no está en la ocupación local
+        """
+        def operacion(cursor):
+            ocupante = cursor.execute('SELECT * FROM ocupacion WHERE placa = ?', (placa,)).fetchone()
+            if not ocupante:
+                raise ValueError('Vehículo no encontrado o ya salió')
+            entrada = datetime.fromisoformat(ocupante['entrada'])
+            calculo = calcular(entrada, bool(ocupante['es_nocturno']))
+
+            cursor.execute('DELETE FROM ocupacion WHERE placa = ?', (placa,))
+            cursor.execute(
+                'INSERT INTO eventos (tipo, placa, espacio, es_nocturno, entrada, salida, costo, minutos, '
+                'detalles, version_tarifa, precio_media_hora, precio_hora_adicional, precio_nocturno, creado_en) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    'salida', placa, ocupante['espacio'], ocupante['es_nocturno'], ocupante['entrada'],
+                    fecha.isoformat(), calculo['costo'], calculo['minutos'], calculo['detalles'],
+                    calculo['version_tarifa'], calculo['precio_media_hora'],
+                    calculo['precio_hora_adicional'], calculo['precio_nocturno'],
+                    datetime.now().isoformat()
+                )
+            )
+            return cursor.lastrowid, dict(ocupante), calculo
+
+        resultado = self._transaccion(operacion)
+        self._pendientes = True
+        return resultado
+
+    def pendientes(self, limite: int):
+        """Eventos pendientes más antiguos, en orden de secuencia"""
+        return [dict(fila) for fila in self._leer(
+            'SELECT * FROM eventos WHERE estado = ? ORDER BY seq LIMIT ?', (PENDIENTE, limite)
+        )]
+
+    def hay_pendientes(self):
+        """True si hay eventos pendientes (copia en memoria, sin consultar el archivo)"""
+        return self._pendientes
+
+    def consultar_pendientes(self):
+        """Consultar en el archivo si hay eventos pendientes y actualizar la copia en memoria"""
+        self._pendientes = bool(self._leer('SELECT 1 FROM eventos WHERE estado = ? LIMIT 1', (PENDIENTE,)))
+        return self._pendientes
+
+    def marcar(self, resultados):
+        """
+        Marcar eventos como sincronizados o en conflicto.
+
+        Args:
+            resultados: Lista de tuplas (seq, estado, error)
+        """
+        def operacion(cursor):
+            cursor.executemany(
+                'UPDATE eventos SET estado = ?, error = ? WHERE seq = ?',
+                [(estado, error, seq) for seq, estado, error in resultados]
+            )
+        self._transaccion(operacion)
+        self.consultar_pendientes()
+
+    def anotar_fallos(self, fallos, max_intentos: int):
+        """
+        Sumar un intento fallido a cada evento; al llegar a `max_intentos` pasa a FALLIDO.
+
+        Args:
+            fallos: Lista de tuplas (seq, error)
+            max_intentos: Intentos tras los que el evento se aparta
+
+        Returns:
+            Número de eventos que pasaron a FALLIDO
+        """
+        def operacion(cursor):
+            cursor.executemany(
+                'UPDATE eventos SET intentos = intentos + 1, error = ?, '
+                'estado = CASE WHEN intentos + 1 >= ? THEN ? ELSE estado END WHERE seq = ?',
+                [(error, max_intentos, FALLIDO, seq) for seq, error in fallos]
+            )
+            marcadores = ', '.join('?' * len(fallos))
+            return cursor.execute(
+                f'SELECT COUNT(*) FROM eventos WHERE estado = ? AND seq IN ({marcadores})',
+                (FALLIDO, *[seq for seq, _ in fallos])
+            ).fetchone()[0]
+        if not fallos:
+            return 0
+        apartados = self._transaccion(operacion)
+        self.consultar_pendientes()
+        return apartados
+
+    def purgar_sincronizados(self):
+        """Borrar los eventos ya sincronizados (los conflictos se conservan)"""
+        return self._transaccion(
+            lambda cursor: cursor.execute('DELETE FROM eventos WHERE estado = ?', (SINCRONIZADO,)).rowcount
+        )
+
+    def conflictos(self, limite: int = 100):
+        return [dict(fila) for fila in self._leer(
+            'SELECT * FROM eventos WHERE estado = ? ORDER BY seq LIMIT ?', (CONFLICTO, limite)
+        )]
+
+    def fallidos(self, limite: int = 100):
+        return [dict(fila) for fila in self._leer(
+            'SELECT * FROM eventos WHERE estado = ? ORDER BY seq LIMIT ?', (FALLIDO, limite)
+        )]
+
+    def estadisticas(self):
+        filas = self._leer('SELECT estado, COUNT(*) AS total FROM eventos GROUP BY estado')
+        conteo = {fila['estado']: fila['total'] for fila in filas}
+        return {
+            'pendientes': conteo.get(PENDIENTE, 0),
+            'sincronizados': conteo.get(SINCRONIZADO, 0),
+            'conflictos': conteo.get(CONFLICTO, 0),
+            'fallidos': conteo.get(FALLIDO, 0),
+            'ocupados': self._leer('SELECT COUNT(*) AS total FROM ocupacion')[0]['total'],
+        }
+
+    # ------------------------------------------------------------------
+    # Ocupación local (espejo de los vehículos activos)
+    # ------------------------------------------------------------------
+    def ocupacion(self):
+        """Vehículos adentro según el estado local, por espacio"""
+        return {fila['espacio']: dict(fila) for fila in self._leer('SELECT * FROM ocupacion')}
+
+    def ocupante(self, placa: str):
+        filas = self._leer('SELECT * FROM ocupacion WHERE placa = ?', (placa,))
+        return dict(filas[0]) if filas else None
+
+    def espejo_entrada(self, placa: str, espacio: int, es_nocturno: bool, fecha: datetime):
+        """Reflejar una entrada registrada directamente en la base principal"""
+        self._transaccion(lambda cursor: cursor.execute(
+            'INSERT OR REPLACE INTO ocupacion (espacio, placa, entrada, es_nocturno) VALUES (?, ?, ?, ?)',
+            (espacio, placa, fecha.isoformat(), int(es_nocturno))
+        ))
+
+    def espejo_salida(self, placa: str):
+        """Reflejar una salida registrada directamente en la base principal"""
+        self._transaccion(lambda cursor: cursor.execute('DELETE FROM ocupacion WHERE placa = ?', (placa,)))
+
+    def reemplazar_ocupacion(self, filas):
+        """
+        Reemplazar la ocupación local por la de la base principal.
+
+        Args:
+            filas: Tuplas (espacio, placa, entrada, es_nocturno)
+        """
+        def operacion(cursor):
+            cursor.execute('DELETE FROM ocupacion')
+            cursor.executemany(
+                'INSERT OR REPLACE INTO ocupacion (espacio, placa, entrada, es_nocturno) VALUES (?, ?, ?, ?)',
+                [
+                    (espacio, placa, entrada.replace(microsecond=0).isoformat(), int(bool(nocturno)))
+                    for espacio, placa, entrada, nocturno in filas
+                ]
+            )
+        self._transaccion(operacion)
+
+    # ------------------------------------------------------------------
+    # Idempotency-Key sin base principal
+    # ------------------------------------------------------------------
+    def leer_clave(self, ruta: str, clave: str, ahora: datetime):
+        """Clave vigente (dict con huella, estado_http y respuesta), o None"""
+        filas = self._leer(
+            'SELECT * FROM claves_idempotencia WHERE ruta = ? AND clave = ? AND expira_en > ?',
+            (ruta, clave, ahora.isoformat())
+        )
+        return dict(filas[0]) if filas else None
+
+    def reservar_clave(self, ruta: str, clave: str, huella: str, ahora: datetime,
+                       expira_en: datetime, abandonada_antes: datetime):
+        """
+        Reservar una clave (fila sin respuesta) si no existe.
+
+        Una fila vencida, o sin respuesta y creada antes de `abandonada_antes`,
+        se reemplaza.
+
+        Returns:
+            None si se reservó; si no, la fila existente como dict
+        """
+        def operacion(cursor):
+            cursor.execute(
+                'DELETE FROM claves_idempotencia WHERE ruta = ? AND clave = ? AND '
+                '(expira_en <= ? OR (estado_http IS NULL AND creada_en < ?))',
+                (ruta, clave, ahora.isoformat(), abandonada_antes.isoformat())
+            )
+            cursor.execute(
+                'INSERT OR IGNORE INTO claves_idempotencia (ruta, clave, huella, creada_en, expira_en) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (ruta, clave, huella, ahora.isoformat(), expira_en.isoformat())
+            )
+            if cursor.rowcount:
+                return None
+            return dict(cursor.execute(
+                'SELECT * FROM claves_idempotencia WHERE ruta = ? AND clave = ?', (ruta, clave)
+            ).fetchone())
+        return self._transaccion(operacion)
+
+    def guardar_clave(self, ruta: str, clave: str, huella: str, estado_http: int, respuesta: str,
+                      ahora: datetime, expira_en: datetime):
+        """Guardar la respuesta de una clave (la crea si no estaba reservada) y purgar las vencidas"""
+        def operacion(cursor):
+            cursor.execute('DELETE FROM claves_idempotencia WHERE expira_en <= ?', (ahora.isoformat(),))
+            cursor.execute(
+                'INSERT INTO claves_idempotencia (ruta, clave, huella, estado_http, respuesta, creada_en, expira_en) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (ruta, clave) DO UPDATE SET '
+                'estado_http = excluded.estado_http, respuesta = excluded.respuesta',
+                (ruta, clave, huella, estado_http, respuesta, ahora.isoformat(), expira_en.isoformat())
+            )
+        self._transaccion(operacion)
+
+    def liberar_clave(self, ruta: str, clave: str):
+        """Borrar una reserva sin respuesta"""
+        self._transaccion(lambda cursor: cursor.execute(
+            'DELETE FROM claves_idempotencia WHERE ruta = ? AND clave = ? AND estado_http IS NULL', (ruta, clave)
+        ))
+
+    # ------------------------------------------------------------------
+    # Tarifa en cache
+    # ------------------------------------------------------------------
+    def guardar_tarifa(self, plan):
+        """Guardar los datos de un PlanTarifario"""
+        datos = json.dumps({
+            'version': plan.version,
+            'media_hora': plan.media_hora,
+            'hora_adicional': plan.hora_adicional,
+            'nocturno': plan.nocturno,
+            'hora_inicio_nocturno': plan.hora_inicio_nocturno.isoformat() if plan.hora_inicio_nocturno else None,
+            'hora_fin_nocturno': plan.hora_fin_nocturno.isoformat() if plan.hora_fin_nocturno else None,
+        })
+        self._transaccion(lambda cursor: cursor.execute(
+            'INSERT OR REPLACE INTO tarifa (id, datos) VALUES (1, ?)', (datos,)
+        ))
+
+    def leer_tarifa(self):
+        """Datos de la última tarifa guardada, o None"""
+        filas = self._leer('SELECT datos FROM tarifa WHERE id = 1')
+        if not filas:
+            return None
+        datos = json.loads(filas[0]['datos'])
+        for campo in ('hora_inicio_nocturno', 'hora_fin_nocturno'):
+            if datos[campo]:
+                datos[campo] = dt_time.fromisoformat(datos[campo])
+        return datos
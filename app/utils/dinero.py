@@ -0,0 +1,78 @@
+from decimal import Decimal
+from numbers import Integral
+from sqlalchemy import Numeric
+from sqlalchemy.types import TypeDecorator
+
+
+def desde_dolares(valor):
+    """
+    Convertir un monto en dólares (Decimal, str, float o int) a centavos.
+
+    Un int aquí son dólares enteros: desde_dolares(5) == 500.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, bool):
+        raise TypeError('Monto inválido: bool')
+    return int((Decimal(str(valor)) * 100).to_integral_value())
+
+
+def desde_centavos(valor):
+    """
+    Validar un monto que ya está en centavos y devolverlo como int.
+
+    Acepta enteros (también de NumPy) y Decimal sin fracción; un float o un
+    texto se rechazan en lugar de adivinar la unidad.
+
+    Raises:
+        TypeError: Si el valor no es un entero
+        ValueError: Si es un Decimal con fracción de centavo
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, bool):
+        raise TypeError('Monto en centavos inválido: bool')
+    if isinstance(valor, Integral):
+        return int(valor)
+    if isinstance(valor, Decimal):
+        if valor != valor.to_integral_value():
+            raise ValueError(f'Monto en centavos con fracción: {valor}')
+        return int(valor)
+    raise TypeError(f'Monto en centavos debe ser entero, no {type(valor).__name__}; use desde_dolares')
+
+
+def a_float(centavos):
+    """Convertir centavos a float en dólares (solo para respuestas de la API)"""
+    if centavos is None:
+        return None
+    return centavos / 100
+
+
+def formatear_centavos(centavos):
+    """Formatear centavos como texto de dinero: 150 -> '1.50', -5 -> '-0.05'"""
+    signo = '-' if centavos < 0 else ''
+    dolares, resto = divmod(abs(centavos), 100)
+    return f'{signo}{dolares}.{resto:02d}'
+
+
+class Centavos(TypeDecorator):
+    """
+    Columna de dinero que en Python se maneja como centavos enteros.
+
+    En la base se sigue guardando como Numeric(10, 2), así que el esquema
+    existente no cambia; la conversión a Decimal ocurre solo al enviar y
+    recibir valores. Sumas y promedios hechos en SQL sobre estas columnas
+    también se devuelven en centavos.
+    """
+    impl = Numeric(10, 2)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return Decimal(desde_centavos(value)).scaleb(-2)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return int((Decimal(value) * 100).to_integral_value())
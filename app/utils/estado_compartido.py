@@ -0,0 +1,429 @@
+"""
+Estado compartido entre los workers de uvicorn (multiprocessing.shared_memory).
+
+Un segmento de memoria de diseño fijo guarda la ocupación de los espacios,
+la tarifa vigente en centavos y un contador de versión. Las entradas,
+salidas y cambios de tarifa lo publican después del commit en la base, y
+todos los workers leen de él el tablero de espacios y la tarifa sin
+consultar la base.
+
+Consistencia con un seqlock: el escritor (uno a la vez, serializado con
+flock entre procesos) incrementa la secuencia a impar, escribe y la deja
+par; el lector copia el segmento y reintenta si la secuencia era impar o
+cambió durante la copia. El segmento es pequeño (~1.5 KB), así que copiarlo
+entero es más barato que leer campo por campo. El lector reintenta a lo
+sumo COPIA_ESPERA segundos y después consulta la base; un escritor que
+encuentra la secuencia impar (otro murió a medias) la sube a par y deja el
+segmento sin cargar hasta la próxima recarga.
+
+Vida del segmento: cada proceso que lo usa tiene un flock compartido sobre
+un archivo de vida. El primero en llegar (nadie más tiene el flock) marca
+como no cargado un segmento que haya quedado de una ejecución anterior; el
+último en cerrar lo borra. Una escritura que falla a medias también lo deja
+sin cargar, y los lectores consultan la base hasta la próxima recarga. Sin
+fcntl no hay cómo coordinar los procesos y el estado compartido se desactiva.
+
+Diseño (little-endian):
+    cabecera: magia, versión del diseño, capacidad, cargado, secuencia, versión
+    tarifa:   versión, media hora, hora adicional, nocturno, inicio y fin
+              nocturno (segundos del día, -1 = sin hora)
+    espacios: por espacio: ocupado, es_nocturno, id, entrada, creado_en
+              (microsegundos desde 1970 sin zona), placa
+"""
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, time as dt_time
+from multiprocessing import shared_memory
+from app.config import SQLALCHEMY_DATABASE_URL, TOTAL_ESPACIOS, ESTADO_COMPARTIDO
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock el estado compartido queda desactivado
+    fcntl = None
+
+MAGIA = 0x50415251  # 'PARQ'
+VERSION_DISENO = 1
+
+_CABECERA = struct.Struct('<IHHB3xQQ')
+_SECUENCIA = struct.Struct('<Q')
+_OFFSET_SECUENCIA = 12
+_TARIFA = struct.Struct('<qqqqii')
+_ESPACIO = struct.Struct('<BB6xqqq20s4x')
+_OFFSET_TARIFA = _CABECERA.size
+_OFFSET_ESPACIOS = _OFFSET_TARIFA + _TARIFA.size
+
+# Segundos que un lector reintenta la copia antes de rendirse y usar la base
+COPIA_ESPERA = 0.05
+
+_EPOCA = datetime(1970, 1, 1)
+_MICRO = timedelta(microseconds=1)
+
+
+def _a_micro(fecha: datetime):
+    return (fecha - _EPOCA) // _MICRO
+
+
+def _de_micro(valor: int):
+    return _EPOCA + timedelta(microseconds=valor)
+
+
+def _segundos(hora):
+    return -1 if hora is None else hora.hour * 3600 + hora.minute * 60 + hora.second
+
+
+def _hora(segundos: int):
+    return None if segundos < 0 else dt_time(segundos // 3600, segundos % 3600 // 60, segundos % 60)
+
+
+class _TarifaCompartida:
+    """Fila de tarifa leída del segmento (misma interfaz que ConfiguracionPrecios para PlanTarifario)"""
+    __slots__ = ('version', 'precio_media_hora', 'precio_hora_adicional', 'precio_nocturno',
+                 'hora_inicio_nocturno', 'hora_fin_nocturno')
+
+    def __init__(self, valores):
+        version, media, hora, nocturno, inicio, fin = valores
+        self.version = version
+        self.precio_media_hora = media
+        self.precio_hora_adicional = hora
+        self.precio_nocturno = nocturno
+        self.hora_inicio_nocturno = _hora(inicio)
+        self.hora_fin_nocturno = _hora(fin)
+
+
+class EstadoCompartido:
+    """Ocupación y tarifa en memoria compartida, con seqlock"""
+
+    def __init__(self, nombre: str, capacidad: int, activo: bool = True):
+        if activo and fcntl is None:
+            print("⚠️ Estado compartido desactivado: requiere fcntl para coordinar los workers")
+            activo = False
+        self.activo = activo
+        self.nombre = nombre
+        self.capacidad = capacidad
+        self.tamano = _OFFSET_ESPACIOS + capacidad * _ESPACIO.size
+        self._shm = None
+        self._lock = threading.Lock()
+        self._lock_segmento = threading.Lock()
+        self._lock_archivo = None
+        self._vida = None
+        # Lecturas decodificadas de este worker, por versión del estado
+        self._cache = {'version': None, 'espacios': None, 'tarifa': None}
+
+    # ------------------------------------------------------------------
+    # Segmento y bloqueo de escritura
+    # ------------------------------------------------------------------
+    def _ruta(self, sufijo: str):
+        return os.path.join(tempfile.gettempdir(), f'{self.nombre}.{sufijo}')
+
+    def _entrar(self):
+        """
+        Tomar el flock compartido de vida.
+
+        Returns:
+            True si ningún otro proceso usaba el segmento
+        """
+        fd = os.open(self._ruta('vida'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            primero = True
+        except BlockingIOError:
+            primero = False
+        # Con el exclusivo tomado se pasa a compartido; si no, se espera a que
+        # el último proceso termine de borrar el segmento
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        self._vida = fd
+        return primero
+
+    def _segmento(self):
+        if self._shm is not None:
+            return self._shm
+        with self._lock_segmento:
+            if self._shm is None:
+                primero = self._entrar()
+                try:
+                    shm = shared_memory.SharedMemory(name=self.nombre, create=True, size=self.tamano)
+                    existia = False
+                except FileExistsError:
+                    shm = shared_memory.SharedMemory(name=self.nombre)
+                    existia = True
+                if shm.size < self.tamano:
+                    shm.close()
+                    raise RuntimeError(f'El segmento {self.nombre} es más pequeño que el diseño actual')
+                # El segmento vive mientras haya workers: lo borra el último en cerrar
+                try:
+                    from multiprocessing import resource_tracker
+                    resource_tracker.unregister(shm._name, 'shared_memory')
+                except Exception:
+                    pass
+                if primero and existia:
+                    # Quedó de una ejecución anterior: no vale hasta recargarlo
+                    self._invalidar_buf(shm.buf)
+                self._shm = shm
+        return self._shm
+
+    def _bloquear(self):
+        if fcntl is None:
+            return
+        if self._lock_archivo is None:
+            ruta = self._ruta('lock')
+            self._lock_archivo = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._lock_archivo, fcntl.LOCK_EX)
+
+    def _desbloquear(self):
+        if fcntl is not None and self._lock_archivo is not None:
+            fcntl.flock(self._lock_archivo, fcntl.LOCK_UN)
+
+    def _invalidar_buf(self, buf):
+        """Marcar el segmento como no cargado (con el seqlock, como cualquier escritura)"""
+        self._bloquear()
+        try:
+            magia, diseno, capacidad, _, secuencia, version = _CABECERA.unpack_from(buf, 0)
+            if magia != MAGIA or diseno != VERSION_DISENO or capacidad != self.capacidad:
+                return
+            # Secuencia siempre par al terminar, aunque un escritor haya muerto a medias
+            secuencia += 2 - secuencia % 2
+            _CABECERA.pack_into(buf, 0, MAGIA, VERSION_DISENO, self.capacidad, 0, secuencia, version + 1)
+        finally:
+            self._desbloquear()
+
+    def _escribir(self, operacion, marcar_cargado=False):
+        """
+        Ejecutar `operacion(buf)` como escritor del seqlock.
+
+        La versión del estado se incrementa en cada escritura. Si la operación
+        falla, el segmento queda a medio escribir y se marca como no cargado.
+        """
+        with self._lock:
+            buf = self._segmento().buf
+            self._bloquear()
+            try:
+                magia, diseno, capacidad, cargado, secuencia, version = _CABECERA.unpack_from(buf, 0)
+                if magia != MAGIA or diseno != VERSION_DISENO or capacidad != self.capacidad:
+                    cargado, version = 0, 0
+                if secuencia % 2:
+                    # Un escritor murió a medias (el flock ya no lo tiene nadie): el
+                    # contenido no vale y la paridad se corrige antes de seguir
+                    secuencia += 1
+                    cargado = 0
+                # Secuencia impar: escritura en curso
+                secuencia += 1
+                _CABECERA.pack_into(buf, 0, MAGIA, VERSION_DISENO, self.capacidad, cargado, secuencia, version)
+                try:
+                    resultado = operacion(buf)
+                except BaseException:
+                    cargado = 0
+                    raise
+                else:
+                    if marcar_cargado:
+                        cargado = 1
+                finally:
+                    _CABECERA.pack_into(buf, 0, MAGIA, VERSION_DISENO, self.capacidad, cargado,
+                                        secuencia + 1, version + 1)
+                return resultado
+            finally:
+                self._desbloquear()
+
+    def _copiar(self):
+        """
+        Copia consistente del segmento (reintenta mientras haya una escritura en curso).
+
+        Returns:
+            Bytes del segmento, o None si no se logró una copia en COPIA_ESPERA
+            segundos (escritura larga o escritor muerto a medias)
+        """
+        buf = self._segmento().buf
+        intentos = 0
+        limite = None
+        while True:
+            antes = _SECUENCIA.unpack_from(buf, _OFFSET_SECUENCIA)[0]
+            if antes % 2 == 0:
+                copia = bytes(buf[:self.tamano])
+                if _SECUENCIA.unpack_from(buf, _OFFSET_SECUENCIA)[0] == antes:
+                    return copia
+            intentos += 1
+            if intentos % 100 == 0:
+                ahora = time.monotonic()
+                if limite is None:
+                    limite = ahora + COPIA_ESPERA
+                elif ahora >= limite:
+                    return None
+                time.sleep(0)
+
+    # ------------------------------------------------------------------
+    # Publicación
+    # ------------------------------------------------------------------
+    def _escribir_espacio(self, buf, espacio: int, vehiculo):
+        offset = _OFFSET_ESPACIOS + (espacio - 1) * _ESPACIO.size
+        if vehiculo is None:
+            _ESPACIO.pack_into(buf, offset, 0, 0, 0, 0, 0, b'')
+            return
+        _ESPACIO.pack_into(
+            buf, offset, 1, int(bool(vehiculo.es_nocturno)), vehiculo.id,
+            _a_micro(vehiculo.fecha_hora_entrada),
+            _a_micro(vehiculo.creado_en or vehiculo.fecha_hora_entrada),
+            vehiculo.placa.encode('utf-8')[:20]
+        )
+
+    @staticmethod
+    def _escribir_tarifa(buf, config):
+        _TARIFA.pack_into(
+            buf, _OFFSET_TARIFA,
+            config.version or 0,
+            int(config.precio_media_hora),
+            int(config.precio_hora_adicional),
+            int(config.precio_nocturno),
+            _segundos(config.hora_inicio_nocturno),
+            _segundos(config.hora_fin_nocturno)
+        )
+
+    def _publicar(self, operacion):
+        # Se publica después del commit: un fallo aquí no debe tumbar la operación.
+        # El estado se corrige en la próxima recarga desde la base.
+        if not self.activo:
+            return
+        try:
+            self._escribir(operacion)
+        except Exception as e:
+            print(f"⚠️ No se pudo publicar en el estado compartido: {e}")
+
+    def publicar_entrada(self, vehiculo):
+        """Marcar el espacio del VehiculoEstacionado como ocupado"""
+        self._publicar(lambda buf: self._escribir_espacio(buf, vehiculo.espacio_numero, vehiculo))
+
+    def publicar_salida(self, vehiculo):
+        """Liberar el espacio si sigue ocupado por ese mismo vehículo"""
+        def operacion(buf):
+            offset = _OFFSET_ESPACIOS + (vehiculo.espacio_numero - 1) * _ESPACIO.size
+            ocupado, _, id_, _, _, _ = _ESPACIO.unpack_from(buf, offset)
+            if ocupado and id_ == vehiculo.id:
+                self._escribir_espacio(buf, vehiculo.espacio_numero, None)
+        self._publicar(operacion)
+
+    def publicar_tarifa(self, config):
+        """Publicar la tarifa de una fila de ConfiguracionPrecios"""
+        self._publicar(lambda buf: self._escribir_tarifa(buf, config))
+
+    def recargar(self, consultar):
+        """
+        Reemplazar todo el estado por el de la base.
+
+        `consultar()` se ejecuta con el bloqueo de escritura tomado y devuelve
+        (config, vehiculos_activos); así una publicación de otro worker no
+        puede quedar intercalada entre la consulta y la escritura.
+
+        Returns:
+            Lo que devolvió `consultar`
+        """
+        if not self.activo:
+            return consultar()
+
+        def operacion(buf):
+            config, activos = consultar()
+            por_espacio = {v.espacio_numero: v for v in activos}
+            self._escribir_tarifa(buf, config)
+            for espacio in range(1, self.capacidad + 1):
+                self._escribir_espacio(buf, espacio, por_espacio.get(espacio))
+            return config, activos
+        return self._escribir(operacion, marcar_cargado=True)
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def _leer(self):
+        """(espacios, tarifa) decodificados; se decodifica solo si cambió la versión"""
+        copia = self._copiar()
+        if copia is None:
+            return None
+        magia, diseno, capacidad, cargado, _, version = _CABECERA.unpack_from(copia, 0)
+        if magia != MAGIA or diseno != VERSION_DISENO or capacidad != self.capacidad or not cargado:
+            return None
+        cache = self._cache
+        if cache['version'] == version:
+            return cache['espacios'], cache['tarifa']
+
+        espacios = []
+        for espacio in range(1, self.capacidad + 1):
+            ocupado, nocturno, id_, entrada, creado, placa = _ESPACIO.unpack_from(
+                copia, _OFFSET_ESPACIOS + (espacio - 1) * _ESPACIO.size
+            )
+            if ocupado:
+                espacios.append((espacio, True, bool(nocturno), id_, _de_micro(entrada), _de_micro(creado),
+                                 placa.rstrip(b'\0').decode('utf-8')))
+            else:
+                espacios.append((espacio, False, False, None, None, None, None))
+        tarifa = _TarifaCompartida(_TARIFA.unpack_from(copia, _OFFSET_TARIFA))
+        self._cache = cache = {'version': version, 'espacios': espacios, 'tarifa': tarifa}
+        return espacios, tarifa
+
+    def version(self):
+        """Versión del estado, o None si aún no se cargó"""
+        if not self.activo:
+            return None
+        copia = self._copiar()
+        if copia is None:
+            return None
+        magia, _, _, cargado, _, version = _CABECERA.unpack_from(copia, 0)
+        return version if magia == MAGIA and cargado else None
+
+    def espacios(self):
+        """Tuplas (espacio, ocupado, es_nocturno, id, entrada, creado_en, placa), o None si no está cargado"""
+        if not self.activo:
+            return None
+        leido = self._leer()
+        return None if leido is None else leido[0]
+
+    def tarifa(self):
+        """Tarifa vigente (interfaz de ConfiguracionPrecios), o None si no está cargado"""
+        if not self.activo:
+            return None
+        leido = self._leer()
+        return None if leido is None else leido[1]
+
+    def invalidar(self):
+        """Marcar el estado como no cargado: los lectores vuelven a la base hasta la próxima recarga"""
+        if not self.activo:
+            return
+        try:
+            with self._lock:
+                self._invalidar_buf(self._segmento().buf)
+        except Exception as e:
+            print(f"⚠️ No se pudo invalidar el estado compartido: {e}")
+
+    def cerrar(self):
+        """Soltar el segmento; el último proceso en cerrar lo borra"""
+        with self._lock_segmento:
+            if self._shm is None:
+                return
+            try:
+                fcntl.flock(self._vida, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                ultimo = True
+            except BlockingIOError:
+                ultimo = False
+            self._shm.close()
+            if ultimo:
+                try:
+                    # unlink() lo quita del resource_tracker: se registra de nuevo para que cuadre
+                    from multiprocessing import resource_tracker
+                    resource_tracker.register(self._shm._name, 'shared_memory')
+                    self._shm.unlink()
+                except FileNotFoundError:
+                    pass
+            self._shm = None
+            self._cache = {'version': None, 'espacios': None, 'tarifa': None}
+            os.close(self._vida)
+            self._vida = None
+
+
+def nombre_segmento(url_base: str):
+    """Nombre del segmento para una base: dos instalaciones en la misma máquina no se mezclan"""
+    return f'parq_{hashlib.sha1(url_base.encode()).hexdigest()[:12]}_v{VERSION_DISENO}'
+
+
+# Estado compartido de los workers de este servidor
+estado_compartido = EstadoCompartido(
+    nombre_segmento(SQLALCHEMY_DATABASE_URL), TOTAL_ESPACIOS, activo=ESTADO_COMPARTIDO
+)
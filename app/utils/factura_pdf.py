@@ -0,0 +1,124 @@
+"""
+Render de facturas en PDF con reportlab.
+
+Este módulo no importa la app ni SQLAlchemy: lo cargan los procesos del pool
+de render, que solo reciben un diccionario de textos ya formateados.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from io import BytesIO
+from reportlab.lib.pagesizes import A6
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+# Cambiarla invalida todos los PDF cacheados (cambia la huella de cada factura)
+VERSION_PLANTILLA = 1
+
+
+def huella_factura(datos: dict):
+    """SHA-256 del contenido de la factura y de la versión de la plantilla"""
+    contenido = json.dumps(
+        {'plantilla': VERSION_PLANTILLA, **datos},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def ruta_en_cache(directorio: str, huella: str):
+    """Ruta del PDF dentro de la cache: <dir>/ab/abcdef....pdf"""
+    return os.path.join(directorio, huella[:2], f'{huella}.pdf')
+
+
+def renderizar_factura(datos: dict):
+    """
+    Dibujar la factura en una página A6 (tamaño ticket).
+
+    invariant=1 fija la fecha de creación y el id del documento, así que el
+    mismo contenido produce siempre los mismos bytes.
+
+    Returns:
+        Bytes del PDF
+    """
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A6, invariant=1)
+    pdf.setTitle(f"Factura {datos['numero']}")
+    ancho, alto = A6
+    x = 8 * mm
+    y = alto - 12 * mm
+
+    pdf.setFont('Helvetica-Bold', 12)
+    pdf.drawString(x, y, 'Parqueadero del Hotel')
+    y -= 6 * mm
+    pdf.setFont('Helvetica', 9)
+    pdf.drawString(x, y, f"Factura N° {datos['numero']}")
+    pdf.drawRightString(ancho - x, y, datos['emitida'])
+    y -= 4 * mm
+    pdf.line(x, y, ancho - x, y)
+    y -= 6 * mm
+
+    filas = [
+        ('Placa', datos['placa']),
+        ('Espacio', datos['espacio']),
+        ('Entrada', datos['entrada']),
+        ('Salida', datos['salida']),
+        ('Tiempo', datos['tiempo']),
+        ('Tarifa', datos['tarifa']),
+    ]
+    for etiqueta, valor in filas:
+        pdf.setFont('Helvetica-Bold', 9)
+        pdf.drawString(x, y, etiqueta)
+        pdf.setFont('Helvetica', 9)
+        pdf.drawString(x + 22 * mm, y, valor)
+        y -= 5 * mm
+
+    y -= 2 * mm
+    pdf.setFont('Helvetica-Bold', 9)
+    pdf.drawString(x, y, 'Detalle')
+    y -= 5 * mm
+    pdf.setFont('Helvetica', 8)
+    for linea in datos['detalles']:
+        pdf.drawString(x + 2 * mm, y, linea)
+        y -= 4 * mm
+
+    y -= 2 * mm
+    pdf.line(x, y, ancho - x, y)
+    y -= 7 * mm
+    pdf.setFont('Helvetica-Bold', 12)
+    pdf.drawString(x, y, 'TOTAL')
+    pdf.drawRightString(ancho - x, y, f"$ {datos['total']}")
+
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def guardar_en_cache(datos: dict, directorio: str):
+    """
+    Renderizar la factura y guardarla en la cache si aún no está.
+
+    Se escribe en un archivo temporal y se renombra, así que un lector nunca
+    ve un PDF a medio escribir y dos procesos que rendericen la misma factura
+    producen el mismo archivo.
+
+    Returns:
+        Ruta del PDF en la cache
+    """
+    ruta = ruta_en_cache(directorio, huella_factura(datos))
+    if os.path.exists(ruta):
+        return ruta
+
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    contenido = renderizar_factura(datos)
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(contenido)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return ruta
@@ -0,0 +1,70 @@
+"""
+Historial de versiones de la tarifa para cobrar con la vigente a la entrada.
+
+Las versiones se guardan ordenadas por vigente_desde con su PlanTarifario
+ya compilado; la versión que rige en un momento es la última que empezó a
+regir antes (o en ese momento), y se encuentra con una búsqueda binaria
+(bisect) sin consultar la base. Las estancias anteriores a la primera
+versión registrada se cobran con ella.
+"""
+import threading
+from bisect import bisect_right
+
+import numpy as np
+
+
+class HistorialTarifas:
+    """Fechas de vigencia ordenadas y sus planes, protegidos con un lock"""
+
+    def __init__(self):
+        self._desde = []
+        self._planes = []
+        self._lock = threading.Lock()
+        # Versión de la tarifa vigente cuando se cargó (ver ConfiguracionService)
+        self.marca = None
+
+    def cargar(self, versiones, marca=None):
+        """
+        Reemplazar el contenido.
+
+        Args:
+            versiones: Tuplas (vigente_desde, PlanTarifario)
+            marca: Versión vigente al momento de leerlas
+        """
+        ordenadas = sorted(versiones, key=lambda v: (v[0], v[1].version or 0))
+        with self._lock:
+            self._desde = [desde for desde, _ in ordenadas]
+            self._planes = [plan for _, plan in ordenadas]
+            self.marca = marca
+
+    def vigente_en(self, fecha):
+        """PlanTarifario que regía en `fecha`, o None si el historial está vacío"""
+        with self._lock:
+            if not self._planes:
+                return None
+            return self._planes[max(bisect_right(self._desde, fecha) - 1, 0)]
+
+    def indices_lote(self, fechas):
+        """
+        Índice (en planes()) de la versión vigente en cada fecha.
+
+        Args:
+            fechas: Arreglo datetime64
+        """
+        with self._lock:
+            desde = np.array(self._desde, dtype='datetime64[us]')
+        indices = np.searchsorted(desde, fechas.astype('datetime64[us]'), side='right') - 1
+        return np.maximum(indices, 0)
+
+    def planes(self):
+        """Planes en orden de vigencia"""
+        with self._lock:
+            return list(self._planes)
+
+    def ultima_version(self):
+        with self._lock:
+            return self._planes[-1].version if self._planes else None
+
+
+# Historial de este proceso
+historial_tarifas = HistorialTarifas()
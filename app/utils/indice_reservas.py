@@ -0,0 +1,99 @@
+"""
+Índice de reservas por espacio para consultar conflictos en O(log n).
+
+Las reservas activas de un mismo espacio nunca se solapan (se rechaza la
+que choca con otra), así que basta una lista ordenada por inicio por
+espacio: con intervalos disjuntos ordenados, los finales también quedan
+ordenados y la única reserva que puede chocar con [desde, hasta) es la
+última que empieza antes de `hasta`. Una búsqueda binaria (bisect) la
+encuentra, sin el costo de un árbol de intervalos general.
+
+Los tiempos se guardan como segundos enteros desde 1970 (sin zona).
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+_EPOCA = datetime(1970, 1, 1)
+_SEGUNDO = timedelta(seconds=1)
+
+
+def a_segundos(fecha: datetime):
+    return (fecha - _EPOCA) // _SEGUNDO
+
+
+class IndiceReservas:
+    """Listas ordenadas (inicio, fin, id) por espacio, protegidas con un lock"""
+
+    def __init__(self, capacidad: int):
+        self.capacidad = capacidad
+        self._inicios = {}
+        self._fines = {}
+        self._intervalos = {}
+        self._lock = threading.Lock()
+        # Marca de la tabla con la que se cargó (ver ReservaService)
+        self.marca = None
+
+    def cargar(self, reservas, marca=None):
+        """
+        Reemplazar el contenido.
+
+        Args:
+            reservas: Tuplas (espacio, inicio, fin, id) con datetime
+            marca: Marca de la tabla al momento de leer las reservas
+        """
+        por_espacio = {}
+        for espacio, inicio, fin, id_ in reservas:
+            por_espacio.setdefault(espacio, []).append((a_segundos(inicio), a_segundos(fin), id_))
+        for intervalos in por_espacio.values():
+            intervalos.sort()
+        with self._lock:
+            self._intervalos = por_espacio
+            self._inicios = {espacio: [i[0] for i in lista] for espacio, lista in por_espacio.items()}
+            self._fines = {espacio: [i[1] for i in lista] for espacio, lista in por_espacio.items()}
+            self.marca = marca
+
+    def _conflicto(self, espacio: int, desde: int, hasta: int):
+        inicios = self._inicios.get(espacio)
+        if not inicios:
+            return None
+        # Última reserva que empieza antes de `hasta`: la única que puede solaparse
+        i = bisect_left(inicios, hasta) - 1
+        if i >= 0:
+            inicio, fin, id_ = self._intervalos[espacio][i]
+            if fin > desde:
+                return id_
+        return None
+
+    def conflicto(self, espacio: int, desde: datetime, hasta: datetime):
+        """Id de la reserva del espacio que se solapa con [desde, hasta), o None"""
+        with self._lock:
+            return self._conflicto(espacio, a_segundos(desde), a_segundos(hasta))
+
+    def solapadas(self, espacio: int, desde: datetime, hasta: datetime):
+        """
+        Ids de todas las reservas del espacio que se solapan con [desde, hasta).
+
+        Son un tramo contiguo de la lista: desde la primera que termina
+        después de `desde` hasta la última que empieza antes de `hasta`.
+        """
+        a, b = a_segundos(desde), a_segundos(hasta)
+        with self._lock:
+            if espacio not in self._inicios:
+                return []
+            primera = bisect_right(self._fines[espacio], a)
+            ultima = bisect_left(self._inicios[espacio], b)
+            return [id_ for _, _, id_ in self._intervalos[espacio][primera:ultima]]
+
+    def libres(self, desde: datetime, hasta: datetime, excluir=()):
+        """Espacios sin reservas en [desde, hasta), sin contar los de `excluir`"""
+        a, b = a_segundos(desde), a_segundos(hasta)
+        with self._lock:
+            return [
+                espacio for espacio in range(1, self.capacidad + 1)
+                if espacio not in excluir and self._conflicto(espacio, a, b) is None
+            ]
+
+    def tamano(self):
+        with self._lock:
+            return sum(len(lista) for lista in self._intervalos.values())
@@ -0,0 +1,289 @@
+from datetime import datetime, timedelta
+import numpy as np
+from app.utils.dinero import desde_centavos, formatear_centavos
+
+MINUTOS_DIA = 1440
+_EPOCA = datetime(1970, 1, 1)
+_MINUTO = timedelta(minutes=1)
+
+
+def minuto_epoca(fecha):
+    """Minutos enteros desde 1970-01-01 (sin zona; el minuto 0 es medianoche)"""
+    if isinstance(fecha, datetime):
+        return (fecha.replace(second=0, microsecond=0) - _EPOCA) // _MINUTO
+    return int(fecha)
+
+
+class PlanTarifario:
+    """
+    Tarifa compilada e inmutable para el cálculo rápido de costos.
+
+    Se construye una sola vez a partir de una fila de ConfiguracionPrecios y
+    guarda los precios en centavos enteros. El costo de una estancia normal
+    solo depende del bloque de horas cobradas, así que los costos y textos de
+    detalle de los primeros BLOQUES_MEMO bloques se precalculan en tablas y
+    una consulta de costo es una lectura de tupla.
+
+    Franja nocturna: si la configuración tiene hora_inicio_nocturno y
+    hora_fin_nocturno distintas, las horas adicionales que caen dentro de
+    cada noche se cobran como máximo a precio_nocturno (tope por noche), sin
+    necesidad de marcar la estancia como nocturna. La parte de la estancia
+    dentro de cada franja se calcula por intersección de intervalos en
+    forma cerrada (la franja puede cruzar la medianoche): una estancia de
+    varios días cuesta O(1), sin recorrer minutos ni días. La marca
+    es_nocturno sigue siendo la tarifa nocturna fija.
+    """
+
+    # Bloques precalculados: bloque 0 = primera media hora, bloque n = n horas adicionales
+    BLOQUES_MEMO = 72
+
+    __slots__ = (
+        'version',
+        'media_hora',
+        'hora_adicional',
+        'nocturno',
+        'hora_inicio_nocturno',
+        'hora_fin_nocturno',
+        '_tabla_costos',
+        '_tabla_detalles',
+        '_detalle_nocturno',
+        '_franja',
+    )
+
+    def __init__(self, media_hora, hora_adicional, nocturno,
+                 hora_inicio_nocturno=None, hora_fin_nocturno=None, version=None):
+        """
+        Args:
+            media_hora: Precio de la primera media hora en centavos
+            hora_adicional: Precio de cada hora adicional en centavos
+            nocturno: Precio fijo de la tarifa nocturna en centavos
+            hora_inicio_nocturno: Hora de inicio del período nocturno
+            hora_fin_nocturno: Hora de fin del período nocturno
+            version: Versión de la tarifa (se copia a cada factura)
+        """
+        asignar = object.__setattr__
+        asignar(self, 'version', version)
+        asignar(self, 'media_hora', int(media_hora))
+        asignar(self, 'hora_adicional', int(hora_adicional))
+        asignar(self, 'nocturno', int(nocturno))
+        asignar(self, 'hora_inicio_nocturno', hora_inicio_nocturno)
+        asignar(self, 'hora_fin_nocturno', hora_fin_nocturno)
+
+        texto_media = f'Primera media hora: ${formatear_centavos(self.media_hora)}'
+        costos = [self.media_hora]
+        detalles = [texto_media]
+        for bloque in range(1, self.BLOQUES_MEMO + 1):
+            costo_horas = bloque * self.hora_adicional
+            costos.append(self.media_hora + costo_horas)
+            detalles.append(
+                f'{texto_media} | {bloque} hora(s) adicional(es): ${formatear_centavos(costo_horas)}'
+            )
+
+        asignar(self, '_tabla_costos', tuple(costos))
+        asignar(self, '_tabla_detalles', tuple(detalles))
+        asignar(self, '_detalle_nocturno', f'TARIFA NOCTURNA FIJA: ${formatear_centavos(self.nocturno)}')
+
+        # Franja nocturna como (inicio en minutos del día, duración en minutos)
+        franja = None
+        if hora_inicio_nocturno is not None and hora_fin_nocturno is not None:
+            inicio = hora_inicio_nocturno.hour * 60 + hora_inicio_nocturno.minute
+            duracion = (hora_fin_nocturno.hour * 60 + hora_fin_nocturno.minute - inicio) % MINUTOS_DIA
+            if duracion:
+                franja = (inicio, duracion)
+        asignar(self, '_franja', franja)
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError('PlanTarifario es inmutable')
+
+    def __repr__(self):
+        return (f'PlanTarifario(version={self.version}, media_hora={self.media_hora}, '
+                f'hora_adicional={self.hora_adicional}, nocturno={self.nocturno})')
+
+    @classmethod
+    def desde_configuracion(cls, config):
+        """
+        Obtener el plan compilado para una fila de ConfiguracionPrecios.
+
+        Los planes se guardan por valor de la tarifa, así que mientras la
+        configuración no cambie se reutiliza el mismo objeto.
+        """
+        version = getattr(config, 'version', None)
+        clave = (
+            version,
+            config.precio_media_hora,
+            config.precio_hora_adicional,
+            config.precio_nocturno,
+            config.hora_inicio_nocturno,
+            config.hora_fin_nocturno,
+        )
+        plan = _planes.get(clave)
+        if plan is None:
+            plan = cls(
+                desde_centavos(config.precio_media_hora),
+                desde_centavos(config.precio_hora_adicional),
+                desde_centavos(config.precio_nocturno),
+                config.hora_inicio_nocturno,
+                config.hora_fin_nocturno,
+                version,
+            )
+            if len(_planes) >= 32:
+                _planes.clear()
+            _planes[clave] = plan
+        return plan
+
+    @staticmethod
+    def bloque(minutos):
+        """Bloque cobrado para una duración: 0 = primera media hora, n = n horas adicionales"""
+        if minutos < 30:
+            return 0
+        # ceil((minutos - 30) / 60) con aritmética entera
+        return (minutos + 29) // 60
+
+    def _exceso_nocturno(self, minutos_noche):
+        """Lo que las horas de una noche cobradas a tarifa normal exceden del precio nocturno"""
+        if minutos_noche <= 0:
+            return 0
+        return max(0, (minutos_noche + 59) // 60 * self.hora_adicional - self.nocturno)
+
+    def tope_nocturno(self, entrada, minutos):
+        """
+        Descuento por el tope nocturno de una estancia.
+
+        Las horas adicionales empiezan a contar después de la primera media
+        hora, así que el intervalo que se intersecta con las franjas es
+        [entrada + 30, entrada + minutos). Con el eje desplazado al inicio de
+        la franja, la noche k ocupa [k·1440, k·1440 + duración): solo la
+        primera y la última noche pueden quedar parciales y las del medio
+        están completas.
+
+        Args:
+            entrada: datetime de entrada o minutos desde 1970 (minuto_epoca)
+            minutos: Duración de la estancia en minutos
+
+        Returns:
+            Tupla (descuento en centavos, noches con tope)
+        """
+        if self._franja is None or minutos <= 30:
+            return 0, 0
+        inicio, duracion = self._franja
+        a = minuto_epoca(entrada) + 30 - inicio
+        b = a - 30 + minutos
+        k0, k1 = a // MINUTOS_DIA, (b - 1) // MINUTOS_DIA
+
+        def noche(k):
+            return max(0, min(b, k * MINUTOS_DIA + duracion) - max(a, k * MINUTOS_DIA))
+
+        excesos = [self._exceso_nocturno(noche(k0))]
+        if k1 > k0:
+            excesos.append(self._exceso_nocturno(noche(k1)))
+        completas = max(0, k1 - k0 - 1)
+        exceso_completa = self._exceso_nocturno(duracion)
+        descuento = sum(excesos) + completas * exceso_completa
+        noches = sum(1 for e in excesos if e) + (completas if exceso_completa else 0)
+        return descuento, noches
+
+    def costo(self, minutos, nocturno=False, entrada=None):
+        """
+        Costo en centavos de una estancia de `minutos` minutos.
+
+        Con `entrada` (datetime o minuto_epoca) se aplica el tope por noche
+        de la franja nocturna.
+        """
+        if nocturno:
+            return self.nocturno
+        bloque = self.bloque(minutos)
+        if bloque <= self.BLOQUES_MEMO:
+            costo = self._tabla_costos[bloque]
+        else:
+            costo = self.media_hora + bloque * self.hora_adicional
+        if entrada is not None:
+            costo -= self.tope_nocturno(entrada, minutos)[0]
+        return costo
+
+    def detalles(self, minutos, nocturno=False, entrada=None):
+        """Texto de detalle del cobro (mismo formato que CalculadoraPrecios)"""
+        if nocturno:
+            return self._detalle_nocturno
+        if minutos == 30:
+            # Justo la media hora: se detalla con 0 horas adicionales
+            return f'{self._tabla_detalles[0]} | 0 hora(s) adicional(es): $0.00'
+        bloque = self.bloque(minutos)
+        if bloque <= self.BLOQUES_MEMO:
+            texto = self._tabla_detalles[bloque]
+        else:
+            costo_horas = bloque * self.hora_adicional
+            texto = (f'{self._tabla_detalles[0]} | {bloque} hora(s) adicional(es): '
+                     f'${formatear_centavos(costo_horas)}')
+        if entrada is not None:
+            descuento, noches = self.tope_nocturno(entrada, minutos)
+            if descuento:
+                texto += (f' | Tope nocturno (${formatear_centavos(self.nocturno)} por noche) '
+                          f'en {noches} noche(s): -${formatear_centavos(descuento)}')
+        return texto
+
+    def calcular(self, fecha_entrada, fecha_salida, nocturno=False):
+        """
+        Calcular el cobro de una estancia entre dos datetime.
+
+        Returns:
+            Diccionario con costo (centavos), minutos y detalles
+        """
+        minutos = int((fecha_salida - fecha_entrada).total_seconds() // 60)
+        return {
+            'costo': self.costo(minutos, nocturno, fecha_entrada),
+            # Al menos 1 minuto para mostrar
+            'minutos': minutos if minutos > 0 else 1,
+            'detalles': self.detalles(minutos, nocturno, fecha_entrada)
+        }
+
+    def costos_lote(self, entradas, minutos, nocturnos=None):
+        """
+        Costos en centavos de muchas estancias a la vez (reportes, simulaciones).
+
+        Misma regla que costo(..., entrada=...), evaluada con operaciones de
+        NumPy sobre los arreglos completos.
+
+        Args:
+            entradas: Arreglo datetime64 o de minutos desde 1970
+            minutos: Duraciones en minutos
+            nocturnos: Marcas es_nocturno (opcional)
+
+        Returns:
+            Arreglo int64 de costos en centavos
+        """
+        entradas = np.asarray(entradas)
+        if np.issubdtype(entradas.dtype, np.datetime64):
+            entradas = entradas.astype('datetime64[m]').astype(np.int64)
+        entradas = entradas.astype(np.int64)
+        minutos = np.asarray(minutos, dtype=np.int64)
+
+        bloques = np.where(minutos < 30, 0, (minutos + 29) // 60)
+        costos = self.media_hora + bloques * self.hora_adicional
+
+        if self._franja is not None:
+            inicio, duracion = self._franja
+
+            def exceso(noche):
+                horas = (noche + 59) // 60
+                return np.where(noche > 0, np.maximum(0, horas * self.hora_adicional - self.nocturno), 0)
+
+            def noche(k, a, b):
+                base = k * MINUTOS_DIA
+                return np.maximum(0, np.minimum(b, base + duracion) - np.maximum(a, base))
+
+            a = entradas + 30 - inicio
+            b = entradas - inicio + minutos
+            k0 = a // MINUTOS_DIA
+            k1 = (b - 1) // MINUTOS_DIA
+            descuento = exceso(noche(k0, a, b))
+            descuento += np.where(k1 > k0, exceso(noche(k1, a, b)), 0)
+            descuento += np.maximum(0, k1 - k0 - 1) * int(self._exceso_nocturno(duracion))
+            costos -= np.where(minutos > 30, descuento, 0)
+
+        if nocturnos is not None:
+            costos = np.where(np.asarray(nocturnos, dtype=bool), self.nocturno, costos)
+        return costos
+
+
+# Planes compilados por valor de tarifa
+_planes = {}
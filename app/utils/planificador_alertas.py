@@ -0,0 +1,181 @@
+"""
+Planificador de alertas con un montículo (heapq) de vencimientos.
+
+Cada vehículo activo tiene a lo sumo un vencimiento vigente. El hilo del
+planificador duerme en una Condition hasta el vencimiento más próximo (o
+hasta que llegue uno más cercano), emite la alerta por las salidas
+registradas y, si la alerta se repite, vuelve a programarla. Cancelar un
+vehículo no busca en el montículo: solo se olvida su vencimiento vigente y
+la entrada vieja se descarta cuando llega a la cima (borrado perezoso).
+"""
+import heapq
+import itertools
+import json
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+
+class SalidaLog:
+    """Salida de alertas al log del servidor"""
+
+    def emitir(self, alerta: dict):
+        print(f"🚨 Alerta {alerta['tipo']}: {alerta['placa']} en el espacio {alerta['espacio']} "
+              f"(entrada {alerta['entrada']}, límite {alerta['limite']})")
+
+
+class SalidaWebhook:
+    """Salida de alertas por HTTP POST con el JSON de la alerta"""
+
+    def __init__(self, url: str, timeout: float = 3.0):
+        self.url = url
+        self.timeout = timeout
+
+    def emitir(self, alerta: dict):
+        peticion = urllib.request.Request(
+            self.url,
+            data=json.dumps(alerta).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+            respuesta.read()
+
+
+class PlanificadorAlertas:
+    """Montículo de vencimientos por vehículo y el hilo que los emite"""
+
+    def __init__(self, salidas=None, reloj=time.time):
+        self._monticulo = []
+        # vehiculo_id -> número de la entrada vigente en el montículo
+        self._vigentes = {}
+        self._cond = threading.Condition()
+        self._contador = itertools.count()
+        self._salidas = list(salidas or [])
+        self._reloj = reloj
+        self._hilo = None
+        self._detener = False
+        self.emitidas = 0
+
+    def agregar_salida(self, salida):
+        self._salidas.append(salida)
+
+    def _empujar(self, limite: float, vehiculo_id: int, datos: dict):
+        numero = next(self._contador)
+        self._vigentes[vehiculo_id] = numero
+        heapq.heappush(self._monticulo, (limite, numero, vehiculo_id, datos))
+        return numero
+
+    def programar(self, vehiculo_id: int, limite: datetime, datos: dict):
+        """
+        Programar (o reprogramar) la alerta de un vehículo.
+
+        Args:
+            vehiculo_id: Id del vehículo activo
+            limite: Momento de la alerta
+            datos: Datos de la alerta; con 'repetir' (segundos) se repite
+        """
+        with self._cond:
+            self._empujar(limite.timestamp(), vehiculo_id, datos)
+            # Si quedó en la cima, el hilo debe despertar antes de lo que planeaba
+            if self._monticulo[0][2] == vehiculo_id:
+                self._cond.notify()
+
+    def cancelar(self, vehiculo_id: int):
+        with self._cond:
+            self._vigentes.pop(vehiculo_id, None)
+            # Compactar si las entradas descartadas ya son mayoría
+            if len(self._monticulo) > 2 * len(self._vigentes) + 64:
+                self._monticulo = [e for e in self._monticulo if self._vigentes.get(e[2]) == e[1]]
+                heapq.heapify(self._monticulo)
+
+    def reemplazar(self, programadas):
+        """
+        Reemplazar todo el contenido (recuperación desde la base).
+
+        Args:
+            programadas: Tuplas (vehiculo_id, limite, datos)
+        """
+        with self._cond:
+            self._vigentes = {}
+            self._monticulo = []
+            for vehiculo_id, limite, datos in programadas:
+                numero = next(self._contador)
+                self._vigentes[vehiculo_id] = numero
+                self._monticulo.append((limite.timestamp(), numero, vehiculo_id, datos))
+            heapq.heapify(self._monticulo)
+            self._cond.notify()
+
+    def programados(self):
+        """Ids de los vehículos con alerta vigente"""
+        with self._cond:
+            return set(self._vigentes)
+
+    def proximas(self, limite: int = 20):
+        """Próximas alertas vigentes, por vencimiento"""
+        with self._cond:
+            vigentes = [e for e in self._monticulo if self._vigentes.get(e[2]) == e[1]]
+        return [
+            {**datos, 'vence': datetime.fromtimestamp(vence).isoformat()}
+            for vence, _, _, datos in heapq.nsmallest(limite, vigentes)
+        ]
+
+    def _siguiente(self):
+        """Esperar y sacar la próxima alerta vencida (con la Condition tomada); None al detener"""
+        while not self._detener:
+            # Descartar las entradas canceladas o reprogramadas que llegaron a la cima
+            while self._monticulo and self._vigentes.get(self._monticulo[0][2]) != self._monticulo[0][1]:
+                heapq.heappop(self._monticulo)
+            if not self._monticulo:
+                self._cond.wait()
+                continue
+            ahora = self._reloj()
+            espera = self._monticulo[0][0] - ahora
+            if espera > 0:
+                self._cond.wait(timeout=espera)
+                continue
+            vence, _, vehiculo_id, datos = heapq.heappop(self._monticulo)
+            del self._vigentes[vehiculo_id]
+            repetir = datos.get('repetir')
+            if repetir:
+                # Una alerta atrasada (recuperada al arrancar) sale una sola
+                # vez y la repetición sigue desde ahora, sin ponerse al día
+                self._empujar(vence + repetir * ((ahora - vence) // repetir + 1), vehiculo_id, datos)
+            return vence, datos
+        return None
+
+    def _emitir(self, vence: float, datos: dict):
+        alerta = {k: v for k, v in datos.items() if k != 'repetir'}
+        alerta['vence'] = datetime.fromtimestamp(vence).isoformat()
+        alerta['emitida_en'] = datetime.now().isoformat()
+        for salida in self._salidas:
+            # Una salida caída no debe frenar a las demás ni al planificador
+            try:
+                salida.emitir(alerta)
+            except Exception as e:
+                print(f"⚠️ No se pudo emitir la alerta por {type(salida).__name__}: {e}")
+        self.emitidas += 1
+
+    def _bucle(self):
+        while True:
+            with self._cond:
+                siguiente = self._siguiente()
+            if siguiente is None:
+                return
+            self._emitir(*siguiente)
+
+    def iniciar(self):
+        with self._cond:
+            if self._hilo is not None and self._hilo.is_alive():
+                return
+            self._detener = False
+        self._hilo = threading.Thread(target=self._bucle, name='planificador-alertas', daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        with self._cond:
+            self._detener = True
+            self._cond.notify()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)